@@ -0,0 +1,146 @@
+# d:\Datos\Desktop\Asistente Contable\benchmarks\bench_common.py
+"""
+Utilidades compartidas por los benchmarks: medición de tiempo y memoria, metadatos
+del entorno y guardado/comparación de resultados en JSON.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+
+def git_revision() -> str:
+    """Commit actual (abreviado) con sufijo '-dirty' si hay cambios sin confirmar; 'desconocido' sin git."""
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def environment_info() -> Dict[str, Any]:
+    return {
+        "git_revision": git_revision(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "implementacion": platform.python_implementation(),
+        "plataforma": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def measure_time(func: Callable[[], Any], repeat: int = 5, number: Optional[int] = None,
+                 min_run_s: float = 0.2) -> Dict[str, float]:
+    """
+    Ejecuta `func` en `repeat` rondas de `number` llamadas (si no se indica, se calibra para que
+    cada ronda dure al menos `min_run_s`). Devuelve tiempos por llamada y operaciones por segundo.
+    """
+    func()  # calentamiento (imports perezosos, cachés)
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            if time.perf_counter() - start >= min_run_s or number >= 1_000_000:
+                break
+            number *= 2
+    per_call: List[float] = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            per_call.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    best = min(per_call)
+    median = statistics.median(per_call)
+    return {
+        "llamadas_por_ronda": number,
+        "rondas": repeat,
+        "mejor_us": best * 1e6,
+        "mediana_us": median * 1e6,
+        "ops_por_s": (1.0 / median) if median else 0.0,
+    }
+
+
+def measure_allocations(func: Callable[[], Any], number: int = 20) -> Dict[str, float]:
+    """
+    Memoria asignada por llamada con tracemalloc: pico (KiB) durante una llamada y número de
+    bloques asignados por llamada en promedio sobre `number` llamadas (incluye los liberados).
+    """
+    func()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before_current, _ = tracemalloc.get_traced_memory()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+
+        # Bloques asignados: diferencia de estadísticas agrupadas por línea entre dos instantáneas,
+        # manteniendo vivos los resultados para que no se descuenten al liberarse.
+        snapshot_before = tracemalloc.take_snapshot()
+        keep_alive = [func() for _ in range(number)]
+        snapshot_after = tracemalloc.take_snapshot()
+        del keep_alive
+    finally:
+        tracemalloc.stop()
+    stats = snapshot_after.compare_to(snapshot_before, "lineno")
+    allocated_blocks = sum(max(0, stat.count_diff) for stat in stats)
+    allocated_bytes = sum(max(0, stat.size_diff) for stat in stats)
+    return {
+        "pico_kib": (peak - before_current) / 1024,
+        "bloques_retenidos_por_llamada": allocated_blocks / number,
+        "kib_retenidos_por_llamada": allocated_bytes / 1024 / number,
+    }
+
+
+def default_results_path(suite_name: str) -> str:
+    return os.path.join(DEFAULT_RESULTS_DIR, f"{suite_name}_{git_revision()}.json")
+
+
+def save_results(path: str, suite_name: str, params: Dict[str, Any], results: Dict[str, Dict[str, Any]]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    payload = {"suite": suite_name, "entorno": environment_info(), "parametros": params, "resultados": results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+
+
+def print_results(results: Dict[str, Dict[str, Any]], baseline_path: Optional[str] = None):
+    """Imprime una tabla de resultados; con `baseline_path` añade la aceleración respecto a ese JSON."""
+    baseline: Dict[str, Dict[str, Any]] = {}
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f).get("resultados", {})
+    name_width = max([len(name) for name in results] + [10])
+    header = f"{'benchmark':<{name_width}}  {'mediana_us':>12}  {'ops/s':>12}  {'pico_kib':>10}"
+    if baseline:
+        header += f"  {'vs base':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        line = (f"{name:<{name_width}}  {result.get('mediana_us', 0.0):>12.1f}  {result.get('ops_por_s', 0.0):>12.1f}"
+                f"  {result.get('pico_kib', 0.0):>10.1f}")
+        base_result = baseline.get(name)
+        if base_result and result.get("mediana_us"):
+            line += f"  {base_result['mediana_us'] / result['mediana_us']:>7.2f}x"
+        print(line)
@@ -0,0 +1,124 @@
+# d:\Datos\Desktop\Asistente Contable\benchmarks\bench_parser.py
+"""
+Micro-benchmarks del parser de comprobantes (src/core/xml_parser.py):
+parse_xml, extract_data_from_xml, _parse_detalles y _parse_fecha, sobre documentos
+sintéticos deterministas (benchmarks/sri_synthetic.py).
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_parser
+    python -m benchmarks.bench_parser --detalles 10 200 --comparar benchmarks/results/parser_abc1234.json
+
+Los resultados se guardan en benchmarks/results/parser_<commit>.json para comparar entre commits.
+"""
+import os
+import logging
+import argparse
+import tempfile
+import xml.etree.ElementTree as ET
+from typing import Dict, Any, List, Optional
+
+from benchmarks.bench_common import measure_time, measure_allocations, save_results, print_results, default_results_path
+from benchmarks.sri_synthetic import SyntheticSriGenerator
+from src.core import xml_backend, xml_parser, date_utils
+
+SUITE_NAME = "parser"
+
+_FECHAS_MUESTRA = [
+    "15/03/2024",                    # fechaEmision
+    "2024-03-15T10:15:30-05:00",     # fechaAutorizacion habitual
+    "2024-03-15T10:15:30.123-05:00", # con milisegundos
+    "2024-03-15T15:15:30Z",
+    "15/03/2024 10:15:30",
+]
+
+
+def _write_document(directory: str, name: str, xml_text: str) -> str:
+    xml_path = os.path.join(directory, f"{name}.xml")
+    with open(xml_path, "w", encoding="utf-8") as f:
+        f.write(xml_text)
+    return xml_path
+
+
+def _detalles_element(xml_path: str) -> ET.Element:
+    """Elemento <detalles> del comprobante (CDATA) de una factura, tal como lo recibe _parse_detalles."""
+    comprobante_cdata = xml_backend.parse_file(xml_path).findtext("comprobante").lstrip('\ufeff')
+    return xml_backend.parse_string(comprobante_cdata).find("detalles")
+
+
+def build_cases(directory: str, detalles_sizes: List[int], seed: int) -> Dict[str, str]:
+    """Genera un archivo por caso de prueba. Devuelve {nombre_caso: ruta_xml}."""
+    generator = SyntheticSriGenerator(seed=seed)
+    cases: Dict[str, str] = {}
+    for num_detalles in detalles_sizes:
+        cases[f"factura_{num_detalles}det"] = _write_document(directory, f"factura_{num_detalles}", generator.factura(num_detalles)[0])
+    cases["nota_credito"] = _write_document(directory, "nota_credito", generator.nota_credito()[0])
+    cases["nota_debito"] = _write_document(directory, "nota_debito", generator.nota_debito()[0])
+    cases["retencion_v1"] = _write_document(directory, "retencion_v1", generator.retencion("1.0.0")[0])
+    cases["retencion_v2"] = _write_document(directory, "retencion_v2", generator.retencion("2.0.0")[0])
+    return cases
+
+
+def run_suite(detalles_sizes: List[int], repeat: int, seed: int, with_allocations: bool = True) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def record(name: str, func):
+        result = measure_time(func, repeat=repeat)
+        if with_allocations:
+            result.update(measure_allocations(func))
+        results[name] = result
+        print(f"  {name}: {result['mediana_us']:.1f} us")
+
+    with tempfile.TemporaryDirectory(prefix="bench_parser_") as tmp_dir:
+        cases = build_cases(tmp_dir, detalles_sizes, seed)
+
+        for case_name, xml_path in cases.items():
+            record(f"parse_xml/{case_name}", lambda p=xml_path: xml_parser.parse_xml(p))
+
+        for case_name, xml_path in cases.items():
+            parsed = xml_parser.parse_xml(xml_path)
+            cod_doc = parsed["info_tributaria"]["cod_doc"]
+            entity_id = parsed["id_comprador_raw"]
+            record(f"extract_data_from_xml/{case_name}",
+                   lambda d=parsed, p=xml_path, c=cod_doc, e=entity_id: xml_parser.extract_data_from_xml(d, p, c, e, []))
+
+        for num_detalles in detalles_sizes:
+            detalles_element = _detalles_element(cases[f"factura_{num_detalles}det"])
+            record(f"_parse_detalles/{num_detalles}det", lambda el=detalles_element: xml_parser._parse_detalles(el))
+
+        for fecha_str in _FECHAS_MUESTRA:
+            record(f"_parse_fecha/{fecha_str}", lambda f=fecha_str: xml_parser._parse_fecha(f, "bench.xml", "bench"))
+            # Sin la memoización de date_utils: costo de la primera aparición de cada fecha
+            record(f"parse_fecha_sin_cache/{fecha_str}", lambda f=fecha_str: date_utils.parse_fecha.__wrapped__(f))
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de xml_parser.")
+    parser.add_argument("--detalles", type=int, nargs="+", default=[1, 10, 100], help="Tamaños de factura (líneas de detalle).")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Rondas de medición por benchmark.")
+    parser.add_argument("--semilla", type=int, default=1234)
+    parser.add_argument("--backend", choices=["lxml", "etree"], help="Backend XML (por defecto: el de src/core/xml_backend.py).")
+    parser.add_argument("--sin-memoria", action="store_true", help="No medir asignaciones (más rápido).")
+    parser.add_argument("--salida", help="Ruta del JSON de resultados (por defecto: benchmarks/results/parser_<commit>.json).")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para mostrar la aceleración.")
+    args = parser.parse_args(argv)
+
+    # El parser registra en DEBUG/WARNING por documento; no se quiere medir el logging de consola
+    logging.basicConfig(level=logging.ERROR)
+    if args.backend:
+        xml_backend.set_backend(args.backend)
+    print(f"Backend XML: {xml_backend.get_backend_name()}")
+
+    results = run_suite(args.detalles, args.repeticiones, args.semilla, not args.sin_memoria)
+    output_path = args.salida or default_results_path(SUITE_NAME)
+    save_results(output_path, SUITE_NAME,
+                 {"detalles": args.detalles, "repeticiones": args.repeticiones, "semilla": args.semilla,
+                  "backend": xml_backend.get_backend_name()}, results)
+    print()
+    print_results(results, args.comparar)
+    print(f"\nResultados guardados en {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
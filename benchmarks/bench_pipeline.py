@@ -0,0 +1,205 @@
+# d:\Datos\Desktop\Asistente Contable\benchmarks\bench_pipeline.py
+"""
+Benchmark de extremo a extremo del procesamiento por lotes, sin GUI:
+pre-análisis de cabeceras -> staged_pipeline.run_staged (parseo, PDF, respaldo)
+-> export_to_excel -> create_zip_archive, con las mismas etapas que src/cli.py.
+Con --pdf-diferido no se generan PDFs (modo "PDFs en segundo plano" de la GUI).
+
+Mide, por tamaño de corpus y número de workers: documentos/s, tiempo por etapa,
+RSS pico (proceso principal y workers) y tamaño de las salidas.
+
+Uso (desde la raíz del repositorio, en Linux sin pantalla):
+    python -m benchmarks.bench_pipeline --documentos 1000
+    python -m benchmarks.bench_pipeline --documentos 1000 10000 100000 --workers 1 2 4 8
+    python -m benchmarks.bench_pipeline --documentos 10000 --pdf-diferido
+
+Los corpus generados se guardan en benchmarks/corpus/ y se reutilizan entre ejecuciones.
+"""
+import os
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import Dict, Any, List, Optional
+
+from benchmarks.bench_common import REPO_ROOT, save_results, default_results_path
+from benchmarks.sri_synthetic import SyntheticSriGenerator
+from src.core import batch_pipeline, staged_pipeline
+from src.core.worker_pool import WorkerPool
+from src.utils import report_layout
+from src.utils.report_ledger import ReportLedger
+from src.utils.exporter import export_to_excel, ExcelExportStatus
+from src.utils.file_utils import create_zip_archive
+
+SUITE_NAME = "pipeline"
+DEFAULT_CORPUS_DIR = os.path.join(REPO_ROOT, "benchmarks", "corpus")
+_CORPUS_DONE_MARKER = ".completo"
+
+
+def ensure_corpus(corpus_root: str, num_docs: int, num_detalles: int, seed: int) -> List[str]:
+    """Genera (o reutiliza) un corpus mixto de `num_docs` comprobantes. Devuelve las rutas ordenadas."""
+    corpus_dir = os.path.join(corpus_root, f"docs{num_docs}_det{num_detalles}_seed{seed}")
+    if not os.path.exists(os.path.join(corpus_dir, _CORPUS_DONE_MARKER)):
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+        print(f"Generando corpus de {num_docs} documentos en {corpus_dir}...")
+        SyntheticSriGenerator(seed=seed).write_batch(corpus_dir, num_docs, num_detalles=num_detalles)
+        open(os.path.join(corpus_dir, _CORPUS_DONE_MARKER), "w").close()
+    return sorted(os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir) if name.endswith(".xml"))
+
+
+def _read_status_kib(pid: str, field: str) -> int:
+    """Valor en KiB de un campo de /proc/<pid>/status (VmHWM = RSS pico). 0 si no está disponible."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _reset_peak_rss():
+    """Reinicia el RSS pico del proceso actual (Linux >= 4.0); sin efecto en otros sistemas."""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _workers_peak_rss_kib(worker_pool: WorkerPool) -> int:
+    # Los workers viven mientras dure el pool: se lee su VmHWM antes de cerrarlo
+    executor = worker_pool._executor
+    processes = getattr(executor, "_processes", None) or {}
+    return max((_read_status_kib(str(pid), "VmHWM") for pid in processes), default=0)
+
+
+def _dir_size_bytes(path: str) -> int:
+    total = 0
+    for dir_path, _dir_names, file_names in os.walk(path):
+        for name in file_names:
+            total += os.path.getsize(os.path.join(dir_path, name))
+    return total
+
+
+def run_pipeline_once(xml_files: List[str], num_workers: int, work_dir: str, zip_type: str,
+                      render_pdf: bool = True) -> Dict[str, Any]:
+    """Una ejecución completa del lote. Devuelve tiempos por etapa, memoria y tamaños."""
+    backup_dir = os.path.join(work_dir, "respaldo")
+    temp_pdf_dir = os.path.join(work_dir, "pdf_temp")
+    os.makedirs(temp_pdf_dir, exist_ok=True)
+    stage_s: Dict[str, float] = {}
+    _reset_peak_rss()
+
+    worker_pool = WorkerPool(num_workers)
+    try:
+        start = time.perf_counter()
+        executor = worker_pool.get_executor()
+        for future in [executor.submit(os.getpid) for _ in range(num_workers)]:
+            future.result()
+        stage_s["arranque_pool"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        unique_id_by_path: Dict[str, str] = {}
+        for xml_path, header in batch_pipeline.scan_headers(executor, xml_files, num_workers):
+            if header and header.get("numero_autorizacion"):
+                unique_id_by_path[xml_path] = header["numero_autorizacion"]
+        xml_files_to_dispatch, _skipped = batch_pipeline.drop_duplicates_before_dispatch(xml_files, unique_id_by_path, set())
+        stage_s["cabeceras"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch_results = batch_pipeline.BatchResults()
+        data_by_coddoc = ReportLedger()
+        for _xml_path, worker_result in staged_pipeline.run_staged(executor, xml_files_to_dispatch, num_workers, temp_pdf_dir,
+                                                                   backup_base_dir=backup_dir, render_pdf=render_pdf):
+            processed_row = batch_results.add_worker_result(worker_result)
+            if processed_row:
+                row_data, cod_doc, backup_pdf_path = processed_row
+                row_data["backup_pdf_path"] = backup_pdf_path
+                data_by_coddoc.append(cod_doc, row_data)
+        stage_s["procesamiento"] = time.perf_counter() - start
+        workers_rss_kib = _workers_peak_rss_kib(worker_pool)
+    finally:
+        worker_pool.shutdown(wait=True)
+
+    excel_path = os.path.join(work_dir, "reporte.xlsx")
+    start = time.perf_counter()
+    export_status = export_to_excel(report_layout.build_excel_sheets(data_by_coddoc), excel_path)
+    stage_s["excel"] = time.perf_counter() - start
+
+    zip_path = os.path.join(work_dir, "comprobantes.zip")
+    start = time.perf_counter()
+    zip_ok = create_zip_archive(report_layout.build_zip_entries(batch_results.xml_to_pdf_map, data_by_coddoc, zip_type), zip_path)
+    stage_s["zip"] = time.perf_counter() - start
+
+    total_s = sum(stage_s.values())
+    return {
+        "documentos": len(xml_files),
+        "procesados": batch_results.newly_processed_count,
+        "errores_criticos": len(batch_results.critical_errors),
+        "workers": num_workers,
+        "tiempo_total_s": total_s,
+        "docs_por_s": len(xml_files) / total_s if total_s else 0.0,
+        "docs_por_s_procesamiento": len(xml_files) / stage_s["procesamiento"] if stage_s["procesamiento"] else 0.0,
+        "etapas_s": stage_s,
+        "rss_pico_principal_mib": _read_status_kib("self", "VmHWM") / 1024,
+        "rss_pico_worker_mib": workers_rss_kib / 1024,
+        "excel_ok": export_status == ExcelExportStatus.SUCCESS,
+        "excel_mib": os.path.getsize(excel_path) / 2 ** 20 if os.path.exists(excel_path) else 0.0,
+        "zip_ok": bool(zip_ok),
+        "zip_mib": os.path.getsize(zip_path) / 2 ** 20 if os.path.exists(zip_path) else 0.0,
+        "respaldo_mib": _dir_size_bytes(backup_dir) / 2 ** 20,
+    }
+
+
+def _default_worker_counts() -> List[int]:
+    cpu_count = os.cpu_count() or 1
+    counts = []
+    workers = 1
+    while workers < cpu_count:
+        counts.append(workers)
+        workers *= 2
+    counts.append(cpu_count)
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo del procesamiento por lotes.")
+    parser.add_argument("--documentos", type=int, nargs="+", default=[1000], help="Tamaños de corpus (p. ej. 1000 10000 100000).")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="Números de workers (por defecto: 1, 2, 4... hasta cpu_count).")
+    parser.add_argument("--detalles", type=int, default=10, help="Líneas de detalle por factura.")
+    parser.add_argument("--semilla", type=int, default=1234)
+    parser.add_argument("--pdf-diferido", action="store_true", help="Sin generar PDFs (solo filas y respaldo del XML).")
+    parser.add_argument("--zip", dest="zip_type", choices=report_layout.ZIP_EXPORT_TYPES, default="pdf_xml_by_type")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_DIR, help="Carpeta donde se guardan los corpus generados.")
+    parser.add_argument("--salida", help="Ruta del JSON de resultados (por defecto: benchmarks/results/pipeline_<commit>.json).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    worker_counts = args.workers or _default_worker_counts()
+    results: Dict[str, Dict[str, Any]] = {}
+    for num_docs in args.documentos:
+        xml_files = ensure_corpus(args.corpus, num_docs, args.detalles, args.semilla)
+        for num_workers in worker_counts:
+            # Respaldo y temporales nuevos en cada ejecución: se mide el camino frío (sin PDFs reutilizados)
+            with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as work_dir:
+                result = run_pipeline_once(xml_files, num_workers, work_dir, args.zip_type, not args.pdf_diferido)
+            name = f"{num_docs}docs/{num_workers}w"
+            results[name] = result
+            stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["etapas_s"].items())
+            print(f"{name}: {result['docs_por_s']:.1f} docs/s ({stages}); "
+                  f"RSS pico {result['rss_pico_principal_mib']:.0f} MiB principal / {result['rss_pico_worker_mib']:.0f} MiB worker; "
+                  f"Excel {result['excel_mib']:.1f} MiB, ZIP {result['zip_mib']:.1f} MiB")
+
+    output_path = args.salida or default_results_path(SUITE_NAME)
+    save_results(output_path, SUITE_NAME,
+                 {"documentos": args.documentos, "workers": worker_counts, "detalles": args.detalles,
+                  "semilla": args.semilla, "zip": args.zip_type, "pdf_diferido": args.pdf_diferido}, results)
+    print(f"\nResultados guardados en {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+# d:\Datos\Desktop\Asistente Contable\benchmarks\check_backend_equivalence.py
+"""
+Comprueba que los backends XML (lxml y ElementTree, ver src/core/xml_backend.py) producen
+exactamente el mismo `parsed_data` y la misma fila de extract_data_from_xml.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.check_backend_equivalence                  # corpus sintético
+    python -m benchmarks.check_backend_equivalence C:\\XML\\reales    # además, XML reales (recursivo)
+
+Devuelve código 0 si todo coincide, 1 si hay diferencias y 2 si lxml no está instalado.
+"""
+import os
+import logging
+import argparse
+import tempfile
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from benchmarks.sri_synthetic import SyntheticSriGenerator, DOC_KINDS
+from src.core import xml_backend, xml_parser
+
+
+def _parse_with(backend: str, xml_path: str) -> Tuple[Any, Any]:
+    xml_backend.set_backend(backend)
+    parsed = xml_parser.parse_xml(xml_path)
+    if not parsed:
+        return None, None
+    conversion_errors: List[str] = []
+    row = xml_parser.extract_data_from_xml(parsed, xml_path, parsed['info_tributaria'].get('cod_doc'),
+                                           parsed.get('id_comprador_raw'), conversion_errors)
+    return parsed, (row, conversion_errors)
+
+
+def _first_difference(a: Any, b: Any, path: str = "", names: Tuple[str, str] = ("lxml", "etree")) -> Optional[str]:
+    if isinstance(a, Mapping) and isinstance(b, Mapping): # dict o registro de document_model
+        for key in list(a) + [k for k in b if k not in a]:
+            if key not in a or key not in b:
+                return f"{path}/{key}: solo en {names[0] if key in a else names[1]}"
+            difference = _first_difference(a[key], b[key], f"{path}/{key}", names)
+            if difference:
+                return difference
+        return None
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        if len(a) != len(b):
+            return f"{path}: longitud {len(a)} != {len(b)}"
+        for idx, (item_a, item_b) in enumerate(zip(a, b)):
+            difference = _first_difference(item_a, item_b, f"{path}[{idx}]", names)
+            if difference:
+                return difference
+        return None
+    return None if a == b and type(a) is type(b) else f"{path}: {a!r} != {b!r}"
+
+
+def _synthetic_corpus(directory: str) -> List[str]:
+    paths: List[str] = []
+    for seed, buyer_id, num_detalles in ((1, "1712345678001", 1), (2, "1712345678", 25), (3, "0990000000001", 300)):
+        generator = SyntheticSriGenerator(seed=seed, buyer_id=buyer_id)
+        paths += generator.write_batch(os.path.join(directory, f"seed{seed}"), len(DOC_KINDS) * 4, num_detalles=num_detalles)
+    return paths
+
+
+def _collect_xml(folders: List[str]) -> List[str]:
+    paths: List[str] = []
+    for folder in folders:
+        for dir_path, _dir_names, file_names in os.walk(folder):
+            paths += [os.path.join(dir_path, name) for name in file_names if name.lower().endswith(".xml")]
+    return paths
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Equivalencia de los backends XML lxml/ElementTree.")
+    parser.add_argument("carpetas", nargs="*", help="Carpetas con XML reales a comprobar además del corpus sintético.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.CRITICAL)
+
+    if not xml_backend.LXML_AVAILABLE:
+        print("lxml no está instalado: no hay nada que comparar.")
+        return 2
+
+    differences: Dict[str, str] = {}
+    with tempfile.TemporaryDirectory(prefix="xml_backends_") as tmp_dir:
+        xml_files = _synthetic_corpus(tmp_dir) + _collect_xml(args.carpetas)
+        for xml_path in xml_files:
+            difference = _first_difference(_parse_with("lxml", xml_path), _parse_with("etree", xml_path))
+            if difference:
+                differences[xml_path] = difference
+
+    for xml_path, difference in differences.items():
+        print(f"DIFERENCIA {xml_path}: {difference}")
+    print(f"{len(xml_files)} archivo(s) comparados, {len(differences)} con diferencias.")
+    return 1 if differences else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
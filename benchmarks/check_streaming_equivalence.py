@@ -0,0 +1,95 @@
+# d:\Datos\Desktop\Asistente Contable\benchmarks\check_streaming_equivalence.py
+"""
+Comprueba que el parseo en streaming (src/core/xml_streaming.py) produce exactamente el mismo
+`parsed_data` y la misma fila de extract_data_from_xml que el parseo con el árbol completo,
+y mide la memoria máxima de ambos en las facturas más grandes.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.check_streaming_equivalence                  # corpus sintético
+    python -m benchmarks.check_streaming_equivalence C:\\XML\\reales    # además, XML reales (recursivo)
+
+Devuelve código 0 si todo coincide y 1 si hay diferencias.
+"""
+import os
+import pickle
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from benchmarks.check_backend_equivalence import _first_difference, _synthetic_corpus, _collect_xml
+from benchmarks.sri_synthetic import SyntheticSriGenerator
+from src.core import xml_parser, xml_streaming
+
+# Facturas grandes: (semilla, número de detalles)
+_LARGE_FACTURAS = ((11, 2000), (12, 10000))
+
+
+def _materialize(value: Any) -> Any:
+    """Copia comparable: StreamedDetalles se convierte en lista."""
+    if isinstance(value, xml_streaming.StreamedDetalles):
+        return list(value)
+    if isinstance(value, Mapping):
+        return {key: _materialize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_materialize(item) for item in value]
+    return value
+
+
+def _parse(xml_path: str, streaming: bool) -> Tuple[Any, Any]:
+    parsed = xml_parser.parse_xml(xml_path, streaming=streaming)
+    if not parsed:
+        return None, None
+    conversion_errors: List[str] = []
+    row = xml_parser.extract_data_from_xml(parsed, xml_path, parsed['info_tributaria'].get('cod_doc'),
+                                           parsed.get('id_comprador_raw'), conversion_errors)
+    if streaming: # El resultado debe poder enviarse a otro proceso
+        parsed = pickle.loads(pickle.dumps(parsed))
+    return _materialize(parsed), (row, conversion_errors)
+
+
+def _peak_memory(xml_path: str, streaming: bool) -> float:
+    """MiB máximos asignados durante parse_xml + extract_data_from_xml + un recorrido de los detalles."""
+    tracemalloc.start()
+    parsed = xml_parser.parse_xml(xml_path, streaming=streaming)
+    xml_parser.extract_data_from_xml(parsed, xml_path, parsed['info_tributaria'].get('cod_doc'),
+                                     parsed.get('id_comprador_raw'), [])
+    for _item in parsed['detalles']: # Como lo recorre el generador de PDF
+        pass
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Equivalencia del parseo en streaming con el parseo completo.")
+    parser.add_argument("carpetas", nargs="*", help="Carpetas con XML reales a comprobar además del corpus sintético.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.CRITICAL)
+
+    differences: Dict[str, str] = {}
+    with tempfile.TemporaryDirectory(prefix="xml_streaming_") as tmp_dir:
+        large_files: List[str] = []
+        for seed, num_detalles in _LARGE_FACTURAS:
+            large_files += SyntheticSriGenerator(seed=seed).write_batch(
+                os.path.join(tmp_dir, f"grandes{seed}"), 1, kinds=["01"], num_detalles=num_detalles)
+        xml_files = _synthetic_corpus(tmp_dir) + large_files + _collect_xml(args.carpetas)
+        for xml_path in xml_files:
+            difference = _first_difference(_parse(xml_path, True), _parse(xml_path, False), names=("streaming", "árbol"))
+            if difference:
+                differences[xml_path] = difference
+
+        for xml_path in large_files:
+            size_mib = os.path.getsize(xml_path) / (1024 * 1024)
+            print(f"{os.path.basename(xml_path)} ({size_mib:.1f} MiB): memoria máxima "
+                  f"árbol {_peak_memory(xml_path, False):.1f} MiB, streaming {_peak_memory(xml_path, True):.1f} MiB")
+
+    for xml_path, difference in differences.items():
+        print(f"DIFERENCIA {xml_path}: {difference}")
+    print(f"{len(xml_files)} archivo(s) comparados, {len(differences)} con diferencias.")
+    return 1 if differences else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
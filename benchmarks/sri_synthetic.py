@@ -0,0 +1,361 @@
+# d:\Datos\Desktop\Asistente Contable\benchmarks\sri_synthetic.py
+"""
+Generador de comprobantes electrónicos sintéticos con la misma forma que los XML
+autorizados del SRI: sobre <autorizacion> con el comprobante dentro de un CDATA.
+
+Tipos soportados: Factura (01) con N detalles, Nota de Crédito (04), Nota de Débito (05)
+y Comprobante de Retención (07) en versiones 1.0.0 y 2.0.0.
+
+Uso desde línea de comandos (genera un lote mixto en una carpeta):
+    python -m benchmarks.sri_synthetic C:\\Temp\\xml_sinteticos --cantidad 500 --detalles 20
+"""
+import os
+import random
+import argparse
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+# Tipos de documento que sabe generar este módulo ("07v1"/"07v2" = retención v1.0.0/v2.0.0)
+DOC_KINDS = ["01", "04", "05", "07v1", "07v2"]
+
+_RAZONES_SOCIALES = [
+    "COMERCIAL ANDINA S.A.", "DISTRIBUIDORA DEL PACIFICO CIA. LTDA.", "FERRETERIA EL CONSTRUCTOR",
+    "SUPERMERCADOS LA ECONOMIA S.A.", "SERVICIOS CONTABLES INTEGRALES", "FARMACIAS SALUD TOTAL",
+]
+_DESCRIPCIONES = [
+    "Papel bond A4 75g resma", "Tóner impresora láser", "Servicio de mantenimiento mensual",
+    "Cable UTP categoría 6 (metro)", "Agua purificada botellón 20L", "Licencia de software anual",
+    "Combustible diésel – galón", "Honorarios profesionales",
+]
+
+
+def clave_acceso_check_digit(clave_48: str) -> str:
+    """Dígito verificador módulo 11 de la clave de acceso (factores 2..7 de derecha a izquierda)."""
+    total = 0
+    factor = 2
+    for digit in reversed(clave_48):
+        total += int(digit) * factor
+        factor = 2 if factor == 7 else factor + 1
+    check = 11 - (total % 11)
+    if check == 11:
+        return "0"
+    if check == 10:
+        return "1"
+    return str(check)
+
+
+def build_clave_acceso(fecha: date, cod_doc: str, ruc: str, ambiente: str, estab: str, pto_emi: str,
+                       secuencial: str, codigo_numerico: str, tipo_emision: str = "1") -> str:
+    clave_48 = f"{fecha.strftime('%d%m%Y')}{cod_doc}{ruc}{ambiente}{estab}{pto_emi}{secuencial}{codigo_numerico}{tipo_emision}"
+    return clave_48 + clave_acceso_check_digit(clave_48)
+
+
+class SyntheticSriGenerator:
+    """
+    Genera comprobantes deterministas a partir de una semilla: el mismo `seed`
+    produce exactamente los mismos archivos, para comparar mediciones entre commits.
+    """
+
+    def __init__(self, seed: int = 1234, buyer_id: str = "1712345678001", buyer_name: str = "CLIENTE DE PRUEBA"):
+        self._rng = random.Random(seed)
+        self.buyer_id = buyer_id
+        self.buyer_name = buyer_name
+        self._secuencial = 0
+
+    # --- Piezas comunes ---
+
+    def _next_secuencial(self) -> str:
+        self._secuencial += 1
+        return f"{self._secuencial:09d}"
+
+    def _random_ruc(self) -> str:
+        return f"{self._rng.randint(100000000, 999999999):09d}0001"
+
+    def _random_fecha(self) -> date:
+        return date(2024, 1, 1) + timedelta(days=self._rng.randint(0, 364))
+
+    def _money(self, low: float = 1.0, high: float = 500.0) -> float:
+        return round(self._rng.uniform(low, high), 2)
+
+    def _info_tributaria(self, cod_doc: str, fecha: date) -> Tuple[str, str]:
+        ruc = self._random_ruc()
+        secuencial = self._next_secuencial()
+        clave = build_clave_acceso(fecha, cod_doc, ruc, "2", "001", "001", secuencial,
+                                   f"{self._rng.randint(0, 99999999):08d}")
+        razon_social = self._rng.choice(_RAZONES_SOCIALES)
+        xml = (
+            "<infoTributaria>"
+            "<ambiente>2</ambiente><tipoEmision>1</tipoEmision>"
+            f"<razonSocial>{escape(razon_social)}</razonSocial>"
+            f"<nombreComercial>{escape(razon_social)}</nombreComercial>"
+            f"<ruc>{ruc}</ruc><claveAcceso>{clave}</claveAcceso><codDoc>{cod_doc}</codDoc>"
+            f"<estab>001</estab><ptoEmi>001</ptoEmi><secuencial>{secuencial}</secuencial>"
+            "<dirMatriz>Av. Amazonas N34-120 y Av. Colón, Quito</dirMatriz>"
+            "</infoTributaria>"
+        )
+        return xml, clave
+
+    def _buyer_tipo_id(self) -> str:
+        return "04" if len(self.buyer_id) == 13 else "05"
+
+    def _info_adicional(self) -> str:
+        return (
+            "<infoAdicional>"
+            "<campoAdicional nombre=\"Email\">cliente@example.com</campoAdicional>"
+            "<campoAdicional nombre=\"Teléfono\">022345678</campoAdicional>"
+            "</infoAdicional>"
+        )
+
+    def _detalles(self, num_detalles: int) -> Tuple[str, float, float]:
+        parts: List[str] = ["<detalles>"]
+        base_15 = 0.0
+        base_0 = 0.0
+        for idx in range(num_detalles):
+            cantidad = self._rng.randint(1, 10)
+            precio = self._money(0.5, 120.0)
+            subtotal = round(cantidad * precio, 2)
+            gravado = self._rng.random() < 0.7
+            codigo_porcentaje, tarifa = ("4", "15") if gravado else ("0", "0")
+            valor_iva = round(subtotal * 0.15, 2) if gravado else 0.0
+            if gravado:
+                base_15 += subtotal
+            else:
+                base_0 += subtotal
+            parts.append(
+                "<detalle>"
+                f"<codigoPrincipal>P{idx:05d}</codigoPrincipal><codigoAuxiliar>A{idx:05d}</codigoAuxiliar>"
+                f"<descripcion>{escape(self._rng.choice(_DESCRIPCIONES))}</descripcion>"
+                f"<cantidad>{cantidad}.000000</cantidad><precioUnitario>{precio:.6f}</precioUnitario>"
+                f"<descuento>0.00</descuento><precioTotalSinImpuesto>{subtotal:.2f}</precioTotalSinImpuesto>"
+                "<detallesAdicionales><detAdicional nombre=\"Lote\" valor=\"L-2024\"/></detallesAdicionales>"
+                f"<impuestos><impuesto><codigo>2</codigo><codigoPorcentaje>{codigo_porcentaje}</codigoPorcentaje>"
+                f"<tarifa>{tarifa}</tarifa><baseImponible>{subtotal:.2f}</baseImponible><valor>{valor_iva:.2f}</valor>"
+                "</impuesto></impuestos>"
+                "</detalle>"
+            )
+        parts.append("</detalles>")
+        return "".join(parts), round(base_15, 2), round(base_0, 2)
+
+    @staticmethod
+    def _total_con_impuestos(base_15: float, base_0: float) -> Tuple[str, float]:
+        iva = round(base_15 * 0.15, 2)
+        xml = (
+            "<totalConImpuestos>"
+            f"<totalImpuesto><codigo>2</codigo><codigoPorcentaje>4</codigoPorcentaje><baseImponible>{base_15:.2f}</baseImponible>"
+            f"<tarifa>15</tarifa><valor>{iva:.2f}</valor></totalImpuesto>"
+            f"<totalImpuesto><codigo>2</codigo><codigoPorcentaje>0</codigoPorcentaje><baseImponible>{base_0:.2f}</baseImponible>"
+            "<tarifa>0</tarifa><valor>0.00</valor></totalImpuesto>"
+            "</totalConImpuestos>"
+        )
+        return xml, iva
+
+    @staticmethod
+    def _wrap_autorizacion(comprobante_xml: str, clave: str, fecha: date) -> str:
+        return (
+            "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+            "<autorizacion>"
+            "<estado>AUTORIZADO</estado>"
+            f"<numeroAutorizacion>{clave}</numeroAutorizacion>"
+            f"<fechaAutorizacion>{fecha.isoformat()}T10:15:30-05:00</fechaAutorizacion>"
+            "<ambiente>PRODUCCIÓN</ambiente>"
+            f"<comprobante><![CDATA[<?xml version=\"1.0\" encoding=\"UTF-8\"?>{comprobante_xml}]]></comprobante>"
+            "<mensajes/>"
+            "</autorizacion>"
+        )
+
+    # --- Tipos de documento ---
+
+    def factura(self, num_detalles: int = 10) -> Tuple[str, str]:
+        """Devuelve (xml_autorizacion, clave_acceso) de una Factura con `num_detalles` líneas."""
+        fecha = self._random_fecha()
+        info_trib, clave = self._info_tributaria("01", fecha)
+        detalles_xml, base_15, base_0 = self._detalles(num_detalles)
+        totales_xml, iva = self._total_con_impuestos(base_15, base_0)
+        total_sin_impuestos = round(base_15 + base_0, 2)
+        importe_total = round(total_sin_impuestos + iva, 2)
+        comprobante = (
+            "<factura id=\"comprobante\" version=\"1.1.0\">"
+            f"{info_trib}"
+            "<infoFactura>"
+            f"<fechaEmision>{fecha.strftime('%d/%m/%Y')}</fechaEmision>"
+            "<dirEstablecimiento>Av. Amazonas N34-120</dirEstablecimiento><obligadoContabilidad>SI</obligadoContabilidad>"
+            f"<tipoIdentificacionComprador>{self._buyer_tipo_id()}</tipoIdentificacionComprador>"
+            f"<razonSocialComprador>{escape(self.buyer_name)}</razonSocialComprador>"
+            f"<identificacionComprador>{self.buyer_id}</identificacionComprador>"
+            "<direccionComprador>Quito</direccionComprador>"
+            f"<totalSinImpuestos>{total_sin_impuestos:.2f}</totalSinImpuestos><totalDescuento>0.00</totalDescuento>"
+            f"{totales_xml}"
+            f"<propina>0.00</propina><importeTotal>{importe_total:.2f}</importeTotal><moneda>DOLAR</moneda>"
+            f"<pagos><pago><formaPago>20</formaPago><total>{importe_total:.2f}</total><plazo>30</plazo><unidadTiempo>dias</unidadTiempo></pago></pagos>"
+            "</infoFactura>"
+            f"{detalles_xml}"
+            f"{self._info_adicional()}"
+            "</factura>"
+        )
+        return self._wrap_autorizacion(comprobante, clave, fecha), clave
+
+    def nota_credito(self, num_detalles: int = 3) -> Tuple[str, str]:
+        fecha = self._random_fecha()
+        info_trib, clave = self._info_tributaria("04", fecha)
+        detalles_xml, base_15, base_0 = self._detalles(num_detalles)
+        totales_xml, iva = self._total_con_impuestos(base_15, base_0)
+        total_sin_impuestos = round(base_15 + base_0, 2)
+        comprobante = (
+            "<notaCredito id=\"comprobante\" version=\"1.1.0\">"
+            f"{info_trib}"
+            "<infoNotaCredito>"
+            f"<fechaEmision>{fecha.strftime('%d/%m/%Y')}</fechaEmision>"
+            f"<tipoIdentificacionComprador>{self._buyer_tipo_id()}</tipoIdentificacionComprador>"
+            f"<razonSocialComprador>{escape(self.buyer_name)}</razonSocialComprador>"
+            f"<identificacionComprador>{self.buyer_id}</identificacionComprador>"
+            "<obligadoContabilidad>SI</obligadoContabilidad>"
+            f"<codDocModificado>01</codDocModificado><numDocModificado>001-001-{self._rng.randint(1, 999999):09d}</numDocModificado>"
+            f"<fechaEmisionDocSustento>{(fecha - timedelta(days=5)).strftime('%d/%m/%Y')}</fechaEmisionDocSustento>"
+            f"<totalSinImpuestos>{total_sin_impuestos:.2f}</totalSinImpuestos>"
+            f"<valorModificacion>{total_sin_impuestos + iva:.2f}</valorModificacion><moneda>DOLAR</moneda>"
+            f"{totales_xml}"
+            "<motivo>Devolución de mercadería</motivo>"
+            "</infoNotaCredito>"
+            f"{detalles_xml}"
+            f"{self._info_adicional()}"
+            "</notaCredito>"
+        )
+        return self._wrap_autorizacion(comprobante, clave, fecha), clave
+
+    def nota_debito(self, num_motivos: int = 2) -> Tuple[str, str]:
+        fecha = self._random_fecha()
+        info_trib, clave = self._info_tributaria("05", fecha)
+        valores = [self._money(5.0, 80.0) for _ in range(num_motivos)]
+        base = round(sum(valores), 2)
+        iva = round(base * 0.15, 2)
+        motivos_xml = "".join(f"<motivo><razon>Interés por mora {idx + 1}</razon><valor>{valor:.2f}</valor></motivo>"
+                              for idx, valor in enumerate(valores))
+        comprobante = (
+            "<notaDebito id=\"comprobante\" version=\"1.0.0\">"
+            f"{info_trib}"
+            "<infoNotaDebito>"
+            f"<fechaEmision>{fecha.strftime('%d/%m/%Y')}</fechaEmision>"
+            f"<tipoIdentificacionComprador>{self._buyer_tipo_id()}</tipoIdentificacionComprador>"
+            f"<razonSocialComprador>{escape(self.buyer_name)}</razonSocialComprador>"
+            f"<identificacionComprador>{self.buyer_id}</identificacionComprador>"
+            "<obligadoContabilidad>SI</obligadoContabilidad>"
+            f"<codDocModificado>01</codDocModificado><numDocModificado>001-001-{self._rng.randint(1, 999999):09d}</numDocModificado>"
+            f"<fechaEmisionDocSustento>{(fecha - timedelta(days=10)).strftime('%d/%m/%Y')}</fechaEmisionDocSustento>"
+            f"<totalSinImpuestos>{base:.2f}</totalSinImpuestos>"
+            f"<impuestos><impuesto><codigo>2</codigo><codigoPorcentaje>4</codigoPorcentaje><tarifa>15</tarifa>"
+            f"<baseImponible>{base:.2f}</baseImponible><valor>{iva:.2f}</valor></impuesto></impuestos>"
+            f"<valorTotal>{base + iva:.2f}</valorTotal>"
+            "</infoNotaDebito>"
+            f"<motivos>{motivos_xml}</motivos>"
+            f"{self._info_adicional()}"
+            "</notaDebito>"
+        )
+        return self._wrap_autorizacion(comprobante, clave, fecha), clave
+
+    def _info_comp_retencion(self, fecha: date, version: str) -> str:
+        extra_v2 = "<parteRel>NO</parteRel>" if version == "2.0.0" else ""
+        return (
+            "<infoCompRetencion>"
+            f"<fechaEmision>{fecha.strftime('%d/%m/%Y')}</fechaEmision><obligadoContabilidad>SI</obligadoContabilidad>"
+            f"<tipoIdentificacionSujetoRetenido>{self._buyer_tipo_id()}</tipoIdentificacionSujetoRetenido>"
+            f"{extra_v2}"
+            f"<razonSocialSujetoRetenido>{escape(self.buyer_name)}</razonSocialSujetoRetenido>"
+            f"<identificacionSujetoRetenido>{self.buyer_id}</identificacionSujetoRetenido>"
+            f"<periodoFiscal>{fecha.strftime('%m/%Y')}</periodoFiscal>"
+            "</infoCompRetencion>"
+        )
+
+    def retencion(self, version: str = "2.0.0", num_retenciones: int = 2) -> Tuple[str, str]:
+        """Comprobante de Retención v1.0.0 (impuestos/impuesto) o v2.0.0 (docsSustento/retenciones)."""
+        fecha = self._random_fecha()
+        info_trib, clave = self._info_tributaria("07", fecha)
+        fecha_sustento = (fecha - timedelta(days=2)).strftime('%d/%m/%Y')
+        num_doc_sustento = f"001001{self._rng.randint(1, 999999):09d}"
+        lineas = []
+        for idx in range(num_retenciones):
+            codigo = "1" if idx % 2 == 0 else "2"
+            base = self._money(50.0, 2000.0)
+            porcentaje = 2.0 if codigo == "1" else 30.0
+            lineas.append((codigo, "312" if codigo == "1" else "1", base, porcentaje, round(base * porcentaje / 100, 2)))
+
+        if version == "1.0.0":
+            impuestos_xml = "".join(
+                f"<impuesto><codigo>{codigo}</codigo><codigoRetencion>{cod_ret}</codigoRetencion>"
+                f"<baseImponible>{base:.2f}</baseImponible><porcentajeRetener>{porcentaje:.2f}</porcentajeRetener>"
+                f"<valorRetenido>{valor:.2f}</valorRetenido><codDocSustento>01</codDocSustento>"
+                f"<numDocSustento>{num_doc_sustento}</numDocSustento><fechaEmisionDocSustento>{fecha_sustento}</fechaEmisionDocSustento></impuesto>"
+                for codigo, cod_ret, base, porcentaje, valor in lineas)
+            cuerpo = f"<impuestos>{impuestos_xml}</impuestos>"
+        else:
+            retenciones_xml = "".join(
+                f"<retencion><codigo>{codigo}</codigo><codigoRetencion>{cod_ret}</codigoRetencion>"
+                f"<baseImponible>{base:.2f}</baseImponible><porcentajeRetener>{porcentaje:.2f}</porcentajeRetener>"
+                f"<valorRetenido>{valor:.2f}</valorRetenido></retencion>"
+                for codigo, cod_ret, base, porcentaje, valor in lineas)
+            total_base = round(sum(linea[2] for linea in lineas), 2)
+            cuerpo = (
+                "<docsSustento><docSustento>"
+                f"<codSustento>01</codSustento><codDocSustento>01</codDocSustento><numDocSustento>{num_doc_sustento}</numDocSustento>"
+                f"<fechaEmisionDocSustento>{fecha_sustento}</fechaEmisionDocSustento>"
+                f"<numAutDocSustento>{self._rng.randint(10 ** 48, 10 ** 49 - 1)}</numAutDocSustento>"
+                f"<pagoLocExt>01</pagoLocExt><totalSinImpuestos>{total_base:.2f}</totalSinImpuestos><importeTotal>{total_base:.2f}</importeTotal>"
+                f"<retenciones>{retenciones_xml}</retenciones>"
+                "</docSustento></docsSustento>"
+            )
+        comprobante = (
+            f"<comprobanteRetencion id=\"comprobante\" version=\"{version}\">"
+            f"{info_trib}"
+            f"{self._info_comp_retencion(fecha, version)}"
+            f"{cuerpo}"
+            f"{self._info_adicional()}"
+            "</comprobanteRetencion>"
+        )
+        return self._wrap_autorizacion(comprobante, clave, fecha), clave
+
+    def document(self, kind: str, num_detalles: int = 10) -> Tuple[str, str]:
+        """Genera un documento de un tipo de DOC_KINDS."""
+        if kind == "01":
+            return self.factura(num_detalles)
+        if kind == "04":
+            return self.nota_credito(max(1, num_detalles // 3))
+        if kind == "05":
+            return self.nota_debito()
+        if kind == "07v1":
+            return self.retencion("1.0.0")
+        if kind == "07v2":
+            return self.retencion("2.0.0")
+        raise ValueError(f"Tipo de documento sintético desconocido: {kind}")
+
+    def write_batch(self, output_dir: str, count: int, kinds: Optional[List[str]] = None,
+                    num_detalles: int = 10) -> List[str]:
+        """Escribe `count` archivos "<clave>.xml" alternando los tipos de `kinds`. Devuelve las rutas."""
+        kinds = kinds or DOC_KINDS
+        os.makedirs(output_dir, exist_ok=True)
+        paths: List[str] = []
+        for idx in range(count):
+            xml_text, clave = self.document(kinds[idx % len(kinds)], num_detalles)
+            xml_path = os.path.join(output_dir, f"{clave}.xml")
+            with open(xml_path, "w", encoding="utf-8") as f:
+                f.write(xml_text)
+            paths.append(xml_path)
+        return paths
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Genera comprobantes XML sintéticos del SRI.")
+    parser.add_argument("carpeta", help="Carpeta de salida.")
+    parser.add_argument("--cantidad", type=int, default=100, help="Número de archivos a generar.")
+    parser.add_argument("--detalles", type=int, default=10, help="Líneas de detalle por factura.")
+    parser.add_argument("--tipos", nargs="+", choices=DOC_KINDS, default=DOC_KINDS, help="Tipos de documento a alternar.")
+    parser.add_argument("--semilla", type=int, default=1234)
+    parser.add_argument("--comprador", default="1712345678001", help="Identificación del comprador/sujeto retenido.")
+    args = parser.parse_args(argv)
+    generator = SyntheticSriGenerator(seed=args.semilla, buyer_id=args.comprador)
+    paths = generator.write_batch(args.carpeta, args.cantidad, args.tipos, args.detalles)
+    print(f"{len(paths)} archivo(s) generados en {args.carpeta}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,226 @@
+# d:\Datos\Desktop\Asistente Contable\src\cli.py
+"""
+Modo por lotes sin interfaz gráfica.
+
+Ejemplo:
+    python -m src.cli C:\\XML\\cliente1 --entidad 1712345678 --salida C:\\Reportes --zip pdf_xml_by_date
+
+Procesa los XML con el mismo pipeline que la GUI (src/core/staged_pipeline.py: parseo y PDF
+en un pool de procesos, respaldos en hilos de E/S) y escribe el reporte Excel y el ZIP.
+Los XML ya procesados y sin cambios se toman de la caché de parseo (src/core/parse_cache.py).
+"""
+import os
+import sys
+import argparse
+import logging
+import multiprocessing
+from datetime import datetime
+from operator import itemgetter
+from typing import List, Optional, Dict, Any
+
+from src.core import batch_pipeline, folder_scan, staged_pipeline
+from src.core.pdf_generator import create_temp_folder
+from src.core.parse_cache import ParseCache
+from src.core.worker_pool import WorkerPool
+from src.core.execution_strategy import ExecutionStrategy
+from src.core.worker_tasks import get_default_backup_base_dir, BACKUP_DIR_ENV_VAR
+from src.utils import report_layout
+from src.utils.report_ledger import ReportLedger
+from src.utils.exporter import export_to_excel, ExcelExportStatus
+from src.utils.file_utils import cleanup_temp_folder, create_zip_archive
+
+logger = logging.getLogger(__name__)
+
+EXIT_OK = 0
+EXIT_FILE_ERRORS = 1
+EXIT_USAGE_ERROR = 2
+EXIT_CANCELLED = 130 # Ctrl+C
+
+ZIP_EXPORT_NONE = "ninguno"
+
+
+def _safe_entity_name(razon_social: Optional[str]) -> str:
+    """Mismo criterio que MainWindow._get_save_file_dialog para el nombre de los archivos de salida."""
+    entity_rs_safe = "General"
+    if razon_social:
+        entity_rs_safe = razon_social.replace(" ", "_").replace(".", "")
+        if not entity_rs_safe or "generico" in entity_rs_safe.lower():
+            entity_rs_safe = "General"
+    return entity_rs_safe
+
+
+def _resolve_entity(compradores_info_map: Dict[str, Dict[str, Any]], entity_arg: Optional[str]) -> Optional[str]:
+    if entity_arg:
+        id_base = batch_pipeline.get_id_base(entity_arg, batch_pipeline.classify_id(entity_arg))
+        return id_base if id_base in compradores_info_map else None
+    if len(compradores_info_map) == 1:
+        return next(iter(compradores_info_map))
+    return None
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli",
+        description="Procesa comprobantes electrónicos XML del SRI sin interfaz gráfica: "
+                    "genera PDFs, respaldos, el reporte Excel y el ZIP.")
+    parser.add_argument("entradas", nargs="+", help="Archivos XML, ZIP con XML o carpetas (se recorren recursivamente).")
+    parser.add_argument("--solo-clave", action="store_true",
+                        help="En carpetas y ZIP, considerar solo los XML con la clave de acceso en el nombre.")
+    parser.add_argument("--entidad", help="Cédula o RUC del comprador/sujeto retenido a procesar. "
+                                          "Obligatorio si los XML pertenecen a más de una entidad.")
+    parser.add_argument("--tipo-id", choices=["ruc", "cedula", "ambos"], default="ambos",
+                        help="Para personas naturales con documentos a nombre de la cédula y del RUC (por defecto: ambos).")
+    parser.add_argument("--salida", default=os.getcwd(), help="Carpeta donde se escriben el Excel y el ZIP (por defecto: carpeta actual).")
+    parser.add_argument("--zip", dest="zip_type", choices=report_layout.ZIP_EXPORT_TYPES + [ZIP_EXPORT_NONE],
+                        default="pdf_xml_by_type", help="Estructura del ZIP, o 'ninguno' para no generarlo.")
+    parser.add_argument("--sin-excel", action="store_true", help="No generar el reporte Excel.")
+    parser.add_argument("--respaldo", help=f"Carpeta base de respaldos (por defecto: ${BACKUP_DIR_ENV_VAR} o la de la aplicación).")
+    parser.add_argument("--workers", type=int, default=None, help="Número de procesos (por defecto: núcleos de la CPU).")
+    parser.add_argument("--regenerar-pdf", action="store_true", help="Generar el PDF aunque ya exista en el respaldo.")
+    parser.add_argument("--sin-cache", action="store_true", help="No usar la caché de parseo (se parsean todos los XML).")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostrar mensajes de depuración.")
+    return parser
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    backup_base_dir = args.respaldo or get_default_backup_base_dir()
+
+    worker_pool = WorkerPool(args.workers)
+    batch_id = worker_pool.begin_batch()
+    # El pool solo arranca si el lote lo justifica: unos pocos archivos se procesan en línea
+    execution_strategy = ExecutionStrategy(worker_pool)
+    temp_pdf_dir = ""
+    cache = None if args.sin_cache else ParseCache.open_default()
+    completed_results = None
+    try:
+        scan_plan = execution_strategy.plan_scan(args.entradas)
+        print("Analizando archivos XML...")
+        # Las cabeceras se leen mientras se recorren las carpetas; luego se ordenan por ruta
+        # para que la elección entre duplicados no dependa del orden del recorrido
+        cached_entries: Dict[str, Dict[str, Any]] = {}
+        headers = sorted(batch_pipeline.scan_headers_streaming(
+            scan_plan.executor, folder_scan.iter_input_files(args.entradas, only_clave=args.solo_clave),
+            scan_plan.num_workers, cache, cached_entries), key=itemgetter(0))
+        if not headers:
+            print("No se encontraron archivos XML en las entradas indicadas.", file=sys.stderr)
+            return EXIT_USAGE_ERROR
+        print(f"{len(headers)} archivo(s) XML analizados.")
+        os.makedirs(args.salida, exist_ok=True)
+        compradores_info_map: Dict[str, Dict[str, Any]] = {}
+        unique_id_by_path: Dict[str, str] = {}
+        for xml_path, header in headers:
+            if not header:
+                continue
+            if header.get("numero_autorizacion"):
+                unique_id_by_path[xml_path] = header["numero_autorizacion"]
+            batch_pipeline.add_header_to_compradores_map(compradores_info_map, xml_path, header)
+        if not compradores_info_map:
+            print("No se pudo extraer información de comprador válida de ningún archivo XML.", file=sys.stderr)
+            return EXIT_USAGE_ERROR
+
+        id_base = _resolve_entity(compradores_info_map, args.entidad)
+        if not id_base:
+            print("Indique la entidad con --entidad. Entidades encontradas:", file=sys.stderr)
+            for id_base_found, data in sorted(compradores_info_map.items()):
+                print(f"  {id_base_found}  {data['razon_social_canonica']}", file=sys.stderr)
+            return EXIT_USAGE_ERROR
+        razon_social = compradores_info_map[id_base]["razon_social_canonica"]
+
+        id_type = None
+        if batch_pipeline.needs_id_type_clarification(compradores_info_map, id_base):
+            id_type = "cédula" if args.tipo_id == "cedula" else args.tipo_id
+        xml_files_for_entity, id_display = batch_pipeline.select_files_for_entity(compradores_info_map, id_base, id_type)
+
+        batch_results = batch_pipeline.BatchResults()
+        xml_files_to_dispatch, batch_results.skipped_duplicate_count = batch_pipeline.drop_duplicates_before_dispatch(
+            xml_files_for_entity, unique_id_by_path, batch_results.known_ids)
+
+        try:
+            temp_pdf_dir = create_temp_folder()
+        except Exception as e_temp:
+            batch_results.add_critical_error("N/A", f"Error creando dir. temporal: {e_temp}")
+
+        cached_results, xml_files_to_dispatch = batch_pipeline.take_cached_results(
+            xml_files_to_dispatch, cached_entries, backup_base_dir, not args.regenerar_pdf)
+
+        print(f"Procesando {len(cached_results) + len(xml_files_to_dispatch)} archivo(s) para {razon_social} ({id_display})...")
+        data_by_coddoc = ReportLedger()
+
+        plan = execution_strategy.plan(len(xml_files_to_dispatch))
+
+        def _completed_results():
+            yield from ((result["xml_path"], result) for result in cached_results)
+            # Respaldos en hilos de E/S; el executor solo parsea y genera PDFs (src/core/staged_pipeline.py)
+            yield from execution_strategy.measure_results(staged_pipeline.run_staged(
+                plan.executor, xml_files_to_dispatch, plan.num_workers, temp_pdf_dir, dict(headers),
+                not args.regenerar_pdf, backup_base_dir, batch_id=batch_id), batch_id)
+
+        completed_results = _completed_results()
+        for xml_path, result in completed_results:
+            if cache:
+                cache.add(result.get("cache_entry"))
+            processed_row = batch_results.add_worker_result(result)
+            if processed_row:
+                row_data, cod_doc, backup_pdf_path = processed_row
+                row_data.setdefault("original_xml_path", xml_path)
+                row_data["backup_pdf_path"] = backup_pdf_path
+                data_by_coddoc.append(cod_doc, row_data)
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        entity_name = _safe_entity_name(razon_social)
+        if not args.sin_excel and data_by_coddoc:
+            excel_path = os.path.join(args.salida, f"Reporte_{entity_name}_{timestamp}.xlsx")
+            export_status = export_to_excel(report_layout.build_excel_sheets(data_by_coddoc), excel_path)
+            if export_status == ExcelExportStatus.SUCCESS:
+                print(f"Reporte Excel: {excel_path}")
+            else:
+                batch_results.add_critical_error(os.path.basename(excel_path), f"Exportación a Excel fallida ({export_status}).")
+        if args.zip_type != ZIP_EXPORT_NONE and batch_results.xml_to_pdf_map:
+            zip_path = os.path.join(args.salida, f"Comprobantes_{entity_name}_{timestamp}.zip")
+            zip_entries = report_layout.build_zip_entries(batch_results.xml_to_pdf_map, data_by_coddoc, args.zip_type)
+            if zip_entries and create_zip_archive(zip_entries, zip_path):
+                print(f"Archivo ZIP: {zip_path}")
+            else:
+                batch_results.add_critical_error(os.path.basename(zip_path), "No se pudo crear el archivo ZIP.")
+
+        print(f"{len(xml_files_for_entity)} archivo(s) XML considerados.")
+        print(f"  - {batch_results.newly_processed_count} nuevo(s) registrado(s).")
+        if batch_results.skipped_duplicate_count:
+            print(f"  - {batch_results.skipped_duplicate_count} duplicado(s) omitido(s).")
+        for message_list, title in ((batch_results.conversion_errors, "Advertencias de conversión"),
+                                    (batch_results.pdf_errors, "Advertencias PDF")):
+            if message_list:
+                print(f"{title} ({len(message_list)}):")
+                for message in message_list: print(f"  - {message}")
+        if batch_results.critical_errors:
+            print(f"Errores críticos ({len(batch_results.critical_errors)}):", file=sys.stderr)
+            for err in batch_results.critical_errors:
+                print(f"  - {err.get('file', 'N/A')}: {err.get('message', 'Desconocido')}", file=sys.stderr)
+            return EXIT_FILE_ERRORS
+        return EXIT_OK
+    except KeyboardInterrupt:
+        # Los workers dejan los bloques en curso; lo que está en cola se descarta al cerrar
+        worker_pool.cancel_batch(batch_id)
+        if completed_results is not None:
+            completed_results.close()
+        print("Proceso cancelado.", file=sys.stderr)
+        return EXIT_CANCELLED
+    finally:
+        execution_strategy.close()
+        worker_pool.shutdown(wait=True, cancel_futures=True)
+        if cache:
+            cache.close()
+        if temp_pdf_dir:
+            cleanup_temp_folder(temp_pdf_dir)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _build_arg_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+    return run_batch(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
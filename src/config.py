@@ -1,5 +1,6 @@
 # d:\Datos\Desktop\Asistente Contable\src\config.py
 import os
+import sys
 import logging
 
 # --- Información de la Aplicación ---
@@ -19,6 +20,15 @@ else: # macOS, Linux
 APP_DATA_DIR = os.path.join(_app_data_base, APP_AUTHOR, APP_NAME)
 LOG_DIR = os.path.join(APP_DATA_DIR, "Logs")
 
+# Base de datos local (caché de parseo, ver src/core/parse_cache.py).
+# Desde el código fuente se usa data/asistente_contable.db del repositorio; en el ejecutable
+# empaquetado la carpeta del bundle es de solo lectura, así que la base vive en APP_DATA_DIR.
+if getattr(sys, 'frozen', False):
+    DATA_DIR = APP_DATA_DIR
+else:
+    DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DATABASE_PATH = os.getenv('ASISTENTE_DB_PATH') or os.path.join(DATA_DIR, "asistente_contable.db")
+
 # Crear directorios si no existen (se puede hacer aquí o en main.py al inicio)
 os.makedirs(LOG_DIR, exist_ok=True)
 
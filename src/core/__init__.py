@@ -0,0 +1,3 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\__init__.py
+# Los módulos de src/core (y src/utils/report_layout.py, report_ledger.py) no importan Qt;
+# worker_tasks solo de forma opcional. Los usan también src/cli.py y los procesos hijos del pool.
@@ -0,0 +1,337 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\batch_pipeline.py
+import os
+import logging
+from collections import defaultdict
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from itertools import islice
+from typing import List, Optional, Dict, Any, Tuple, Set, Iterator, Iterable
+
+from src.core import parse_cache, clave_acceso
+from src.core.worker_tasks import result_from_cache_entry
+from src.core.clave_acceso import clave_acceso_from_filename
+from src.core.xml_header_scanner import scan_xml_header, scan_xml_headers, header_from_clave_acceso, COD_DOCS_WITH_BUYER
+
+logger = logging.getLogger(__name__)
+
+# Etapas del procesamiento por lotes compartidas por WorkerThread (GUI) y src/cli.py; las
+# decisiones interactivas (qué entidad, qué tipo de ID) las toma quien llama.
+
+# Fila lista para la tabla/reporte: (row_data, cod_doc, backup_pdf_path)
+ProcessedRow = Tuple[Dict[str, Any], str, Optional[str]]
+
+# Pre-análisis en streaming: archivos por tarea y tareas en curso por worker
+STREAM_SCAN_CHUNK = 64
+_STREAM_TASKS_PER_WORKER = 4
+
+
+def classify_id(id_str: str) -> str:
+    if not id_str: return "desconocido"
+    if id_str.isdigit():
+        if len(id_str) == 10: return "cedula"
+        if len(id_str) == 13 and id_str.endswith("001"): return "ruc_persona_natural"
+        if len(id_str) == 13: return "ruc_sociedad"
+    return "otro"
+
+
+def get_id_base(id_str: str, id_type: str) -> str:
+    if id_type == "ruc_persona_natural": return id_str[:10]
+    return id_str
+
+
+def scan_headers(executor: Executor, xml_files: List[str], num_workers: int,
+                 cached_entries: Optional[Dict[str, Dict[str, Any]]] = None) -> Iterator[Tuple[str, Optional[Dict[str, str]]]]:
+    """
+    Lee solo las cabeceras (codDoc, claveAcceso, comprador), repartidas entre todos los workers.
+    No se leen:
+    - los archivos presentes en `cached_entries` (ParseCache.lookup_many): su cabecera sale
+      de la caché de parseo;
+    - los que tienen en el nombre una clave de acceso válida de un tipo de documento sin
+      comprador (ver headers_from_filename_claves).
+    """
+    known_headers = {xml_path: parse_cache.header_from_cache_entry(cache_entry, xml_path)
+                     for xml_path, cache_entry in (cached_entries or {}).items()}
+    known_headers.update(headers_from_filename_claves(
+        [xml_path for xml_path in xml_files if xml_path not in known_headers]))
+    if not known_headers:
+        scan_chunksize = max(1, min(256, len(xml_files) // (num_workers * 4)))
+        return zip(xml_files, executor.map(scan_xml_header, xml_files, chunksize=scan_chunksize))
+    xml_files_to_scan = [xml_path for xml_path in xml_files if xml_path not in known_headers]
+    return _merge_known_headers(executor, xml_files, xml_files_to_scan, num_workers, known_headers)
+
+
+def _merge_known_headers(executor: Executor, xml_files: List[str], xml_files_to_scan: List[str], num_workers: int,
+                         known_headers: Dict[str, Dict[str, str]]) -> Iterator[Tuple[str, Optional[Dict[str, str]]]]:
+    scanned_headers = iter(())
+    if xml_files_to_scan:
+        scan_chunksize = max(1, min(256, len(xml_files_to_scan) // (num_workers * 4)))
+        scanned_headers = executor.map(scan_xml_header, xml_files_to_scan, chunksize=scan_chunksize)
+    # Se conserva el orden de xml_files; los escaneados llegan en el mismo orden relativo
+    for xml_path in xml_files:
+        header = known_headers.get(xml_path)
+        if header is not None:
+            yield xml_path, header
+        else:
+            yield xml_path, next(scanned_headers)
+
+
+def headers_from_filename_claves(xml_files: List[str]) -> Dict[str, Dict[str, str]]:
+    """
+    Clasifica los archivos por la clave de acceso de su nombre (validada en bloque, sin leerlos).
+    Devuelve la cabecera de los que son de un tipo de documento sin comprador (Liquidación de
+    Compra, Guía de Remisión...), que nunca se asignan a una entidad y no hace falta escanear.
+    Registra una advertencia con las claves cuyo dígito verificador no es correcto.
+    """
+    headers, invalid_names = _classify_filename_claves(xml_files)
+    _log_filename_claves(len(headers), invalid_names)
+    return headers
+
+
+def _classify_filename_claves(xml_files: List[str]) -> Tuple[Dict[str, Dict[str, str]], List[str]]:
+    claves_in_names = [clave_acceso_from_filename(xml_path) for xml_path in xml_files]
+    headers: Dict[str, Dict[str, str]] = {}
+    invalid_names: List[str] = []
+    for xml_path, clave in zip(xml_files, clave_acceso.decode_many(claves_in_names)):
+        if clave is None:
+            continue
+        if not clave.valida:
+            invalid_names.append(os.path.basename(xml_path))
+        elif clave.cod_doc not in COD_DOCS_WITH_BUYER:
+            headers[xml_path] = header_from_clave_acceso(clave.clave, clave.cod_doc, xml_path)
+    return headers, invalid_names
+
+
+def _log_filename_claves(discarded_count: int, invalid_names: List[str]):
+    if invalid_names:
+        logger.warning(f"Pre-análisis: {len(invalid_names)} archivo(s) con clave de acceso inválida en el nombre "
+                       f"(dígito verificador o fecha): {', '.join(invalid_names[:5])}"
+                       f"{'...' if len(invalid_names) > 5 else ''}. Se leerá su contenido.")
+    if discarded_count:
+        logger.info(f"Pre-análisis: {discarded_count} archivo(s) de tipos sin comprador descartados por su clave de acceso.")
+
+
+def scan_headers_streaming(executor: Executor, xml_paths: Iterable[str], num_workers: int,
+                           cache: Optional[parse_cache.ParseCache],
+                           cached_entries: Dict[str, Dict[str, Any]]) -> Iterator[Tuple[str, Optional[Dict[str, str]]]]:
+    """
+    Igual que scan_headers, pero consume `xml_paths` a medida que llega (folder_scan.iter_input_files):
+    cada bloque de STREAM_SCAN_CHUNK rutas se consulta en la caché de parseo (sus entradas se
+    agregan a `cached_entries`) y el resto se envía al pool sin esperar a que termine el recorrido.
+    Las cabeceras se entregan en el orden en que se obtienen, no en el de `xml_paths`.
+    Si quien consume deja de iterar (cancelación), los bloques que no empezaron se descartan.
+    """
+    paths_iter = iter(xml_paths)
+    max_pending = max(1, num_workers * _STREAM_TASKS_PER_WORKER)
+    pending = {}
+    discarded_count = 0
+    invalid_names: List[str] = []
+    total_count = 0
+    cached_before = len(cached_entries)
+    try:
+        while True:
+            chunk = list(islice(paths_iter, STREAM_SCAN_CHUNK))
+            exhausted = not chunk
+            if chunk:
+                total_count += len(chunk)
+                chunk_cached = cache.lookup_many(chunk, log_summary=False) if cache else {}
+                cached_entries.update(chunk_cached)
+                for xml_path, cache_entry in chunk_cached.items():
+                    yield xml_path, parse_cache.header_from_cache_entry(cache_entry, xml_path)
+                to_classify = [xml_path for xml_path in chunk if xml_path not in chunk_cached]
+                chunk_headers, chunk_invalid = _classify_filename_claves(to_classify)
+                discarded_count += len(chunk_headers)
+                invalid_names.extend(chunk_invalid)
+                yield from chunk_headers.items()
+                xml_files_to_scan = [xml_path for xml_path in to_classify if xml_path not in chunk_headers]
+                if xml_files_to_scan:
+                    pending[executor.submit(scan_xml_headers, xml_files_to_scan)] = xml_files_to_scan
+            # Con el pool lleno, o al terminar el recorrido, se esperan resultados
+            while pending and (len(pending) >= max_pending or exhausted):
+                done, _not_done = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from zip(pending.pop(future), future.result())
+            if exhausted:
+                break
+    finally:
+        for future in pending:
+            future.cancel()
+    _log_filename_claves(discarded_count, invalid_names)
+    if len(cached_entries) > cached_before:
+        logger.info(f"Caché de parseo: {len(cached_entries) - cached_before} de {total_count} archivo(s) sin cambios.")
+
+
+def add_header_to_compradores_map(compradores_info_map: Dict[str, Dict[str, Any]], xml_path: str, header: Dict[str, str]):
+    """
+    Agrupa el archivo bajo el ID base de su comprador:
+    {id_base: {"razon_social_canonica": str, "ids_especificos": {id: {"tipo": str, "paths": [...]}}}}
+    """
+    id_c_raw = header.get("id_comprador_raw", "N/A")
+    rs_c = header.get("razon_social_comprador", "N/A")
+    if id_c_raw == "N/A" or rs_c == "N/A":
+        return
+    rs_c = rs_c.strip()
+    id_type = classify_id(id_c_raw)
+    id_base_for_map = get_id_base(id_c_raw, id_type)
+    if id_base_for_map not in compradores_info_map:
+        compradores_info_map[id_base_for_map] = {"razon_social_canonica": rs_c, "ids_especificos": {}}
+    current_canonical_rs = compradores_info_map[id_base_for_map]["razon_social_canonica"].upper()
+    if "CONSUMIDOR FINAL" in current_canonical_rs and "CONSUMIDOR FINAL" not in rs_c.upper():
+        compradores_info_map[id_base_for_map]["razon_social_canonica"] = rs_c
+    elif not current_canonical_rs and rs_c:
+        compradores_info_map[id_base_for_map]["razon_social_canonica"] = rs_c
+    if id_c_raw not in compradores_info_map[id_base_for_map]["ids_especificos"]:
+        compradores_info_map[id_base_for_map]["ids_especificos"][id_c_raw] = {"tipo": id_type, "paths": []}
+    compradores_info_map[id_base_for_map]["ids_especificos"][id_c_raw]["paths"].append(xml_path)
+
+
+def needs_id_type_clarification(compradores_info_map: Dict[str, Dict[str, Any]], id_base: str) -> bool:
+    """True si el ID base tiene documentos a nombre de la cédula y también del RUC de persona natural."""
+    ids_especificos_del_base = compradores_info_map[id_base]["ids_especificos"]
+    es_cedula_base = ids_especificos_del_base.get(id_base, {}).get("tipo") == "cedula"
+    ruc_pn_derivado_de_base = f"{id_base}001"
+    tiene_ruc_pn_asociado = ruc_pn_derivado_de_base in ids_especificos_del_base and ids_especificos_del_base[ruc_pn_derivado_de_base].get("tipo") == "ruc_persona_natural"
+    return es_cedula_base and tiene_ruc_pn_asociado
+
+
+def select_files_for_entity(compradores_info_map: Dict[str, Dict[str, Any]], id_base: str,
+                            id_type: Optional[str]) -> Tuple[List[str], str]:
+    """
+    Archivos a procesar para el ID base elegido y el tipo de ID ("ruc", "cédula", "ambos" o None).
+    Devuelve (archivos sin repetir, ID para mostrar).
+    """
+    ids_especificos_del_base = compradores_info_map[id_base]["ids_especificos"]
+    es_cedula_base = ids_especificos_del_base.get(id_base, {}).get("tipo") == "cedula"
+    ruc_pn_derivado_de_base = f"{id_base}001"
+    tiene_ruc_pn_asociado = ruc_pn_derivado_de_base in ids_especificos_del_base and ids_especificos_del_base[ruc_pn_derivado_de_base].get("tipo") == "ruc_persona_natural"
+
+    xml_files_for_selection: List[str] = []
+    id_display = id_base
+    if id_type == "ambos":
+        if es_cedula_base: xml_files_for_selection.extend(ids_especificos_del_base[id_base]["paths"])
+        if tiene_ruc_pn_asociado: xml_files_for_selection.extend(ids_especificos_del_base[ruc_pn_derivado_de_base]["paths"])
+        id_display = f"{id_base} / {ruc_pn_derivado_de_base}"
+    elif id_type == "ruc" and tiene_ruc_pn_asociado:
+        xml_files_for_selection.extend(ids_especificos_del_base[ruc_pn_derivado_de_base]["paths"])
+    else: # Si no hay clarificación de Cédula/RUC, o no aplica, tomar todos los paths del ID base
+        for data_id_xml in ids_especificos_del_base.values():
+            xml_files_for_selection.extend(data_id_xml["paths"])
+    return list(dict.fromkeys(xml_files_for_selection)), id_display
+
+
+def drop_duplicates_before_dispatch(xml_paths: List[str], unique_id_by_path: Dict[str, str],
+                                    known_ids: Set[str]) -> Tuple[List[str], int]:
+    """
+    Descarta, antes de enviar nada al pool, los archivos cuyo identificador único
+    (Nro. de autorización de la cabecera o clave de acceso del nombre del archivo)
+    ya fue procesado o se repite dentro del lote.
+    Devuelve (archivos a procesar, cantidad de duplicados omitidos).
+    """
+    seen_ids = set(known_ids)
+    paths_to_dispatch: List[str] = []
+    skipped = 0
+    for xml_path in xml_paths:
+        unique_id = unique_id_by_path.get(xml_path) or clave_acceso_from_filename(xml_path)
+        if unique_id:
+            if unique_id in seen_ids:
+                skipped += 1
+                continue
+            seen_ids.add(unique_id)
+        paths_to_dispatch.append(xml_path)
+    if skipped:
+        logger.info(f"Pre-despacho: {skipped} duplicado(s) omitido(s) antes de procesar.")
+    return paths_to_dispatch, skipped
+
+
+def take_cached_results(xml_paths: List[str], cached_entries: Dict[str, Dict[str, Any]],
+                        backup_base_dir: Optional[str] = None,
+                        reuse_backup_pdf: bool = True) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Separa los archivos que se resuelven desde la caché de parseo (sin parsear ni generar PDF,
+    porque su respaldo XML + PDF ya existe) de los que hay que enviar a los workers.
+    Devuelve (resultados como los de process_single_xml_file_task, archivos a despachar).
+    """
+    if not cached_entries or not reuse_backup_pdf:
+        return [], xml_paths
+    cached_results: List[Dict[str, Any]] = []
+    paths_to_dispatch: List[str] = []
+    for xml_path in xml_paths:
+        cache_entry = cached_entries.get(xml_path)
+        result = result_from_cache_entry(xml_path, cache_entry, backup_base_dir) if cache_entry else None
+        if result:
+            cached_results.append(result)
+        else:
+            paths_to_dispatch.append(xml_path)
+    if cached_results:
+        logger.info(f"Caché de parseo: {len(cached_results)} archivo(s) resueltos sin parsear.")
+    return cached_results, paths_to_dispatch
+
+
+class BatchResults:
+    """
+    Acumula los resultados de process_single_xml_file_task de un lote: errores, mapa
+    XML -> PDFs, duplicados y conteos por tipo de documento.
+    Con el PDF diferido, `pending_pdfs` guarda XML -> ruta prevista del PDF de respaldo de los
+    archivos cuyo PDF falta generar (src/core/lazy_pdf.py).
+    """
+
+    def __init__(self, known_ids: Optional[Set[str]] = None):
+        self.conversion_errors: List[str] = []
+        self.pdf_errors: List[str] = []
+        self.critical_errors: List[Dict[str, str]] = []
+        self.xml_to_pdf_map: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]] = {}
+        self.known_ids: Set[str] = set(known_ids or ())
+        self.newly_added_ids: List[str] = []
+        self.newly_processed_count = 0
+        self.skipped_duplicate_count = 0
+        self.processed_counts_by_type: Dict[str, int] = defaultdict(int)
+        self.pending_pdfs: Dict[str, Optional[str]] = {}
+
+    def add_critical_error(self, file_name: str, message: str):
+        self.critical_errors.append({"file": file_name, "message": message})
+
+    def add_worker_result(self, result: Dict[str, Any]) -> Optional[ProcessedRow]:
+        """Registra un resultado del worker. Devuelve la fila nueva o None (error o duplicado)."""
+        if result.get("error"):
+            self.add_critical_error(os.path.basename(result.get("xml_path", "N/A")), result["error"])
+            return None
+
+        temp_pdf_path_result = result.get("temp_pdf_path")
+        cod_doc_result = result.get("cod_doc")
+        backup_pdf_path_result = result.get("backup_pdf_path")
+
+        if result.get("pdf_error"):
+            self.pdf_errors.append(f"{os.path.basename(result.get('xml_path', 'N/A'))}: {result['pdf_error']}")
+        if result.get("conversion_errors"):
+            self.conversion_errors.extend(result["conversion_errors"])
+
+        unique_id_for_table = result.get("unique_id")
+        is_duplicate = bool(unique_id_for_table and unique_id_for_table in self.known_ids)
+
+        if result.get("pdf_pending"):
+            # Un duplicado que pasó el filtro previo (cabecera sin número de autorización) no se
+            # encola: su RIDE se generaría otra vez sobre el mismo respaldo
+            if is_duplicate:
+                self.skipped_duplicate_count += 1
+                return None
+            # PDF diferido: la fila enlaza la ruta prevista del respaldo, que existirá al generarlo
+            backup_pdf_path_result = result.get("pending_backup_pdf_path")
+            self.pending_pdfs[result["xml_path"]] = backup_pdf_path_result
+            self.xml_to_pdf_map[result["xml_path"]] = (None, cod_doc_result, backup_pdf_path_result)
+        # El PDF puede venir del directorio temporal o, si se reutilizó, del respaldo
+        elif temp_pdf_path_result or backup_pdf_path_result:
+            self.xml_to_pdf_map[result["xml_path"]] = (temp_pdf_path_result, cod_doc_result, backup_pdf_path_result)
+
+        if is_duplicate:
+            self.skipped_duplicate_count += 1
+            return None
+
+        row_data_result = result.get("row_data")
+        if not row_data_result:
+            self.add_critical_error(os.path.basename(result.get("xml_path", "N/A")), "Worker no devolvió row_data.")
+            return None
+
+        self.processed_counts_by_type[cod_doc_result] += 1
+        if unique_id_for_table:
+            self.newly_added_ids.append(unique_id_for_table)
+            self.known_ids.add(unique_id_for_table)
+        self.newly_processed_count += 1
+        return (row_data_result, cod_doc_result, backup_pdf_path_result)
@@ -0,0 +1,144 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\clave_acceso.py
+import os
+import re
+import logging
+from datetime import date
+from typing import List, Optional, Sequence
+
+from src.core import xml_source
+from src.core.document_model import Record
+
+logger = logging.getLogger(__name__)
+
+# Decodificador y validador de la clave de acceso del SRI (49 dígitos):
+#
+#   posición  0-7   fecha de emisión (ddmmaaaa)
+#             8-9   tipo de comprobante (codDoc)
+#            10-22  RUC del emisor
+#            23     tipo de ambiente (1 pruebas, 2 producción)
+#            24-29  serie (establecimiento + punto de emisión)
+#            30-38  secuencial
+#            39-46  código numérico
+#            47     tipo de emisión
+#            48     dígito verificador (módulo 11)
+# Sirve para clasificar y deduplicar por el nombre del archivo, sin parsear el comprobante.
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+CLAVE_ACCESO_LENGTH = 49
+
+# Clave de acceso incluida en el nombre del archivo, p.ej. "<clave>.xml"
+_CLAVE_ACCESO_IN_NAME_RE = re.compile(r'(?<!\d)(\d{49})(?!\d)')
+# Clave de acceso en el XML, con el comprobante como CDATA o escapado (&lt;claveAcceso&gt;)
+_CLAVE_ACCESO_IN_XML_RE = re.compile(rb'claveAcceso(?:>|&gt;)\s*(\d{49})(?!\d)')
+# Bytes leídos del inicio del archivo: infoTributaria (con la clave) está al principio del comprobante
+_HEADER_PEEK_BYTES = 8 * 1024
+
+# Pesos del módulo 11: 2, 3, 4, 5, 6, 7 cíclicos desde el dígito 48 hacia la izquierda
+_CHECK_WEIGHTS = tuple(2 + (47 - position) % 6 for position in range(CLAVE_ACCESO_LENGTH - 1))
+if NUMPY_AVAILABLE:
+    _CHECK_WEIGHTS_ARRAY = np.array(_CHECK_WEIGHTS, dtype=np.int64)
+
+
+class ClaveAcceso(Record):
+    """Campos de una clave de acceso. `valida` indica si el dígito verificador es correcto."""
+    _fields = ('clave', 'fecha_emision', 'cod_doc', 'ruc_emisor', 'ambiente', 'estab', 'pto_emi', 'secuencial',
+               'codigo_numerico', 'tipo_emision', 'digito_verificador', 'valida')
+    __slots__ = _fields
+
+
+def _is_well_formed(clave: Optional[str]) -> bool:
+    return bool(clave) and len(clave) == CLAVE_ACCESO_LENGTH and clave.isascii() and clave.isdigit()
+
+
+def _check_digit_from_total(total: int) -> int:
+    digit = 11 - total % 11
+    if digit == 11:
+        return 0
+    if digit == 10:
+        return 1
+    return digit
+
+
+def check_digit(first_48_digits: str) -> int:
+    """Dígito verificador (módulo 11) de los primeros 48 dígitos de una clave de acceso."""
+    return _check_digit_from_total(sum(int(digit) * weight for digit, weight in zip(first_48_digits, _CHECK_WEIGHTS)))
+
+
+def is_valid(clave: Optional[str]) -> bool:
+    """True si `clave` tiene 49 dígitos y su dígito verificador es correcto."""
+    return _is_well_formed(clave) and int(clave[48]) == check_digit(clave[:48])
+
+
+def validate_many(claves: Sequence[Optional[str]]) -> List[bool]:
+    """is_valid() para muchas claves a la vez (con NumPy, en una sola operación matricial)."""
+    well_formed = [_is_well_formed(clave) for clave in claves]
+    candidates = [clave for clave, ok in zip(claves, well_formed) if ok]
+    if not candidates:
+        return well_formed
+    if NUMPY_AVAILABLE:
+        digits = np.frombuffer("".join(candidates).encode('ascii'), dtype=np.uint8).reshape(-1, CLAVE_ACCESO_LENGTH) - 48
+        expected = 11 - (digits[:, :48].astype(np.int64) @ _CHECK_WEIGHTS_ARRAY) % 11
+        expected[expected == 11] = 0
+        expected[expected == 10] = 1
+        candidate_results = iter((expected == digits[:, 48]).tolist())
+    else:
+        candidate_results = iter(int(clave[48]) == check_digit(clave[:48]) for clave in candidates)
+    return [ok and next(candidate_results) for ok in well_formed]
+
+
+def _fecha_emision(clave: str) -> Optional[date]:
+    try:
+        return date(int(clave[4:8]), int(clave[2:4]), int(clave[0:2]))
+    except ValueError:
+        return None
+
+
+def _build(clave: str, valida: bool) -> ClaveAcceso:
+    fecha_emision = _fecha_emision(clave)
+    return ClaveAcceso(
+        clave=clave, fecha_emision=fecha_emision, cod_doc=clave[8:10], ruc_emisor=clave[10:23],
+        ambiente=clave[23], estab=clave[24:27], pto_emi=clave[27:30], secuencial=clave[30:39],
+        codigo_numerico=clave[39:47], tipo_emision=clave[47], digito_verificador=clave[48],
+        valida=valida and fecha_emision is not None)
+
+
+def decode(clave: Optional[str]) -> Optional[ClaveAcceso]:
+    """
+    Campos de la clave de acceso, o None si no tiene 49 dígitos. Una clave con dígito
+    verificador incorrecto o fecha imposible se devuelve con valida=False.
+    """
+    if not _is_well_formed(clave):
+        return None
+    return _build(clave, int(clave[48]) == check_digit(clave[:48]))
+
+
+def decode_many(claves: Sequence[Optional[str]]) -> List[Optional[ClaveAcceso]]:
+    """decode() para muchas claves; la validación del dígito verificador se hace en bloque."""
+    return [_build(clave, valid) if _is_well_formed(clave) else None
+            for clave, valid in zip(claves, validate_many(claves))]
+
+
+def clave_acceso_from_filename(xml_path: str) -> Optional[str]:
+    """Devuelve la clave de acceso de 49 dígitos contenida en el nombre del archivo, si la hay."""
+    match = _CLAVE_ACCESO_IN_NAME_RE.search(os.path.basename(xml_path))
+    return match.group(1) if match else None
+
+
+def clave_acceso_from_header_bytes(xml_path: str) -> Optional[str]:
+    """
+    Clave de acceso leída de los primeros bytes del archivo (etiqueta claveAcceso), sin parsear
+    el XML. None si no aparece al inicio o no se puede leer el archivo.
+    """
+    try:
+        with xml_source.open_binary(xml_path) as xml_file:
+            head = xml_file.read(_HEADER_PEEK_BYTES)
+    except OSError:
+        return None
+    match = _CLAVE_ACCESO_IN_XML_RE.search(head)
+    return match.group(1).decode('ascii') if match else None
@@ -0,0 +1,76 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\date_utils.py
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+# Parseo de fechas del SRI (fechaEmision dd/mm/aaaa, fechaAutorizacion ISO con o sin
+# milisegundos/'Z'): los formatos conocidos se reconocen por posición, sin probar strptime uno
+# por uno. El resultado se memoriza (datetime es inmutable).
+
+# Formatos de respaldo, en el orden en que se probaban antes
+_FALLBACK_FORMATS = (
+    "%d/%m/%Y",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+)
+_FALLBACK_FORMATS_MS = ("%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S.%f%z") + _FALLBACK_FORMATS
+
+_CACHE_SIZE = 4096
+
+
+def _digits(value: str) -> bool:
+    return value.isascii() and value.isdigit()
+
+
+def _parse_dd_mm_yyyy(fecha_str: str) -> Optional[datetime]:
+    """'dd/mm/aaaa' o 'dd/mm/aaaa hh:mm:ss' con todos los campos de dos/cuatro dígitos."""
+    day, month, year = fecha_str[0:2], fecha_str[3:5], fecha_str[6:10]
+    if not _digits(day + month + year):
+        return None
+    if len(fecha_str) == 10:
+        return datetime(int(year), int(month), int(day))
+    if len(fecha_str) == 19 and fecha_str[10] == ' ' and fecha_str[13] == ':' and fecha_str[16] == ':':
+        hour, minute, second = fecha_str[11:13], fecha_str[14:16], fecha_str[17:19]
+        if _digits(hour + minute + second):
+            return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+    return None
+
+
+def _parse_with_formats(fecha_str: str) -> Optional[datetime]:
+    for fmt in (_FALLBACK_FORMATS_MS if '.' in fecha_str else _FALLBACK_FORMATS):
+        try:
+            return datetime.strptime(fecha_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def parse_fecha(fecha_str: Optional[str]) -> Optional[datetime]:
+    """
+    Fecha del SRI como datetime (con zona horaria si la cadena la trae), o None si no se
+    reconoce ningún formato. Resultado memorizado por cadena.
+    """
+    if not fecha_str:
+        return None
+    # Normalizar 'Z' a '+00:00' (fromisoformat no acepta 'Z' antes de Python 3.11)
+    if fecha_str.endswith('Z'):
+        fecha_str = fecha_str[:-1] + '+00:00'
+    length = len(fecha_str)
+    try:
+        if length in (10, 19) and fecha_str[2] == '/' and fecha_str[5] == '/':
+            dt_obj = _parse_dd_mm_yyyy(fecha_str)
+            if dt_obj is not None:
+                return dt_obj
+        elif length >= 19 and fecha_str[4] == '-' and fecha_str[7] == '-' and fecha_str[10] == 'T':
+            return datetime.fromisoformat(fecha_str)
+    except ValueError:
+        pass # Fecha imposible o variante no ISO: se prueba con la lista de formatos
+    return _parse_with_formats(fecha_str)
+
+
+def format_fecha(fecha, fmt: str = '%d/%m/%Y') -> Optional[str]:
+    """Cadena `fmt` de una fecha ya parseada (datetime) o de una cadena del SRI; None si no se reconoce."""
+    dt_obj = fecha if isinstance(fecha, datetime) else parse_fecha(fecha)
+    return dt_obj.strftime(fmt) if dt_obj is not None else None
@@ -0,0 +1,251 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\document_model.py
+from collections.abc import Mapping
+from typing import Any, Iterator, Tuple
+
+# Comprobante parseado (xml_parser.parse_xml) con __slots__ por sección: menos memoria y pickle
+# más pequeño que los dicts. Cada registro es un Mapping de solo lectura que se compara igual que
+# su dict; un campo sin asignar es una clave ausente. 'emisor' y 'factura_info' son vistas.
+
+
+class Record(Mapping):
+    """Registro con __slots__ y acceso tipo dict. Las subclases definen _fields (y __slots__ = _fields)."""
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+    _derived: Tuple[str, ...] = () # Claves calculadas (propiedades), no almacenadas
+    _keys: frozenset = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._keys = frozenset(cls._fields + cls._derived)
+
+    def __init__(self, **values: Any):
+        for key, value in values.items():
+            setattr(self, key, value)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._keys:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # Más rápido que Mapping.get (sin excepción para claves desconocidas)
+        if key in self._keys:
+            return getattr(self, key, default)
+        return default
+
+    def __setitem__(self, key: str, value: Any):
+        """Solo para campos del registro: una clave nueva es un error de programación."""
+        if key not in self._fields:
+            raise KeyError(f"{type(self).__name__} no tiene el campo '{key}'")
+        setattr(self, key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._fields:
+            if hasattr(self, key):
+                yield key
+        yield from self._derived
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __reduce__(self):
+        # pickle por posición: sin los nombres de campo que añadiría el estado por defecto de __slots__
+        values = []
+        unset = []
+        for index, key in enumerate(self._fields):
+            try:
+                values.append(getattr(self, key))
+            except AttributeError:
+                values.append(None)
+                unset.append(index)
+        return (_restore_record, (type(self), tuple(values), tuple(unset)))
+
+
+def _restore_record(record_type, values: tuple, unset: tuple) -> Record:
+    record = record_type.__new__(record_type)
+    for index, (key, value) in enumerate(zip(record_type._fields, values)):
+        if index not in unset:
+            setattr(record, key, value)
+    return record
+
+
+class InfoTributaria(Record):
+    _fields = ('ambiente', 'tipo_emision', 'razon_social', 'nombre_comercial', 'ruc', 'clave_acceso',
+               'cod_doc', 'estab', 'pto_emi', 'secuencial', 'dir_matriz', 'agente_retencion_num_res')
+    __slots__ = _fields
+
+
+class Comprador(Record):
+    """Comprador o, en Retenciones, sujeto retenido."""
+    _fields = ('tipo_identificacion', 'razon_social', 'identificacion', 'direccion', 'guia_remision', 'placa')
+    __slots__ = _fields
+
+
+class ImpuestoResumen(Record):
+    _fields = ('codigo', 'codigo_porcentaje', 'base_imponible', 'tarifa', 'valor', 'valor_devolucion_iva')
+    __slots__ = _fields
+
+
+class Totales(Record):
+    _fields = ('total_sin_impuestos', 'total_descuento', 'propina', 'importe_total', 'impuestos_resumen')
+    __slots__ = _fields
+
+
+class Pago(Record):
+    _fields = ('forma_pago', 'total', 'plazo', 'unidad_tiempo')
+    __slots__ = _fields
+
+
+class InfoFactura(Record):
+    _fields = ('fecha_emision', 'dir_establecimiento', 'contribuyente_especial', 'obligado_contabilidad',
+               'moneda', 'pagos')
+    __slots__ = _fields
+
+
+class InfoNotaDebito(Record):
+    _fields = ('fecha_emision', 'dir_establecimiento', 'cod_doc_modificado', 'num_doc_modificado',
+               'fecha_emision_doc_sustento', 'obligado_contabilidad')
+    __slots__ = _fields
+
+
+class InfoNotaCredito(Record):
+    _fields = ('fecha_emision', 'dir_establecimiento', 'tipo_identificacion_comprador', 'razon_social_comprador',
+               'identificacion_comprador', 'obligado_contabilidad', 'cod_doc_modificado', 'num_doc_modificado',
+               'fecha_emision_doc_sustento', 'moneda', 'motivo', 'valorModificacion', 'contribuyente_especial')
+    __slots__ = _fields
+
+
+class InfoRetencion(Record):
+    _fields = ('fecha_emision', 'dir_establecimiento', 'obligado_contabilidad', 'tipo_identificacion_sujeto_retenido',
+               'razon_social_sujeto_retenido', 'identificacion_sujeto_retenido', 'periodo_fiscal')
+    __slots__ = _fields
+
+
+class ImpuestoDetalle(Record):
+    _fields = ('codigo', 'codigoPorcentaje')
+    __slots__ = _fields
+
+
+class Detalle(Record):
+    """Ítem de Factura/Nota de Crédito o motivo de Nota de Débito (mismas claves)."""
+    _fields = ('codigo_principal', 'codigo_auxiliar', 'descripcion', 'cantidad', 'precio_unitario', 'descuento',
+               'precio_total_sin_impuesto', 'detalles_adicionales', 'impuestos_detalle')
+    __slots__ = _fields
+
+
+class DocSustento(Record):
+    _fields = ('cod_doc_sustento', 'num_doc_sustento', 'num_aut_doc_sustento', 'fecha_emision_doc_sustento')
+    __slots__ = _fields
+
+
+class Retencion(Record):
+    """Línea de retención con los datos de su documento de sustento y los campos tipo 'detalle'."""
+    _fields = ('codigo', 'codigo_retencion', 'base_imponible', 'porcentaje_retener', 'valor_retenido') \
+        + DocSustento._fields + ('descripcion', 'precio_total_sin_impuesto', 'cantidad', 'precio_unitario')
+    __slots__ = _fields
+
+
+class DocModificado(Record):
+    """Documento que modifica una Nota de Crédito/Débito."""
+    _fields = ('cod_doc', 'num_doc', 'fecha_emision')
+    __slots__ = _fields
+
+
+class Emisor(Record):
+    """
+    Vista de solo lectura: info_tributaria más dir_establecimiento, contribuyente_especial y
+    obligado_contabilidad del doc_especifico. No copia nada.
+    """
+    __slots__ = ('_info_tributaria', '_doc_especifico')
+    _extra_keys = ('dir_establecimiento', 'contribuyente_especial', 'obligado_contabilidad', 'agente_retencion_num_res')
+
+    def __init__(self, info_tributaria: Mapping, doc_especifico: Mapping):
+        self._info_tributaria = info_tributaria
+        self._doc_especifico = doc_especifico
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'dir_establecimiento':
+            return self._doc_especifico.get('dir_establecimiento', self._info_tributaria.get('dir_matriz'))
+        if key in ('contribuyente_especial', 'obligado_contabilidad'):
+            return self._doc_especifico.get(key, '')
+        if key == 'agente_retencion_num_res':
+            return self._info_tributaria.get(key, '')
+        return self._info_tributaria[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key: str, value: Any):
+        raise TypeError("Emisor es una vista de solo lectura")
+
+    def __reduce__(self):
+        return (type(self), (self._info_tributaria, self._doc_especifico))
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._info_tributaria
+        for key in self._extra_keys:
+            if key not in self._info_tributaria:
+                yield key
+
+
+class FacturaInfo(Record):
+    """Vista de solo lectura con los datos de cabecera que esperan los generadores de PDF."""
+    __slots__ = ('_info_tributaria', '_doc_especifico')
+    _derived = ('numero_factura', 'fecha_emision', 'clave_acceso', 'tipo_emision_doc', 'pagos')
+
+    def __init__(self, info_tributaria: Mapping, doc_especifico: Mapping):
+        self._info_tributaria = info_tributaria
+        self._doc_especifico = doc_especifico
+
+    def __setitem__(self, key: str, value: Any):
+        raise TypeError("FacturaInfo es una vista de solo lectura")
+
+    def __reduce__(self):
+        return (type(self), (self._info_tributaria, self._doc_especifico))
+
+    @property
+    def numero_factura(self) -> str:
+        info = self._info_tributaria
+        return f"{info.get('estab', '')}-{info.get('pto_emi', '')}-{info.get('secuencial', '')}"
+
+    @property
+    def fecha_emision(self) -> str:
+        return self._doc_especifico.get('fecha_emision', '')
+
+    @property
+    def clave_acceso(self) -> str:
+        return self._info_tributaria.get('clave_acceso', '')
+
+    @property
+    def tipo_emision_doc(self) -> str:
+        return self._info_tributaria.get('tipo_emision', '')
+
+    @property
+    def pagos(self) -> list:
+        return self._doc_especifico.get('pagos', []) # Vacío para ND/NC/Retención
+
+
+class Comprobante(Record):
+    """Documento completo devuelto por xml_parser.parse_xml."""
+    _fields = ('estado', 'numero_autorizacion', 'fecha_autorizacion', 'fecha_autorizacion_dt', 'ambiente', 'mensajes',
+               'info_tributaria', 'comprador', 'doc_especifico', 'totales', 'detalles', 'impuestos_retencion',
+               'info_adicional', 'tipo_documento', 'doc_modificado', 'id_comprador_raw', 'id_comprador_display')
+    _derived = ('emisor', 'factura_info')
+    __slots__ = _fields
+
+    @property
+    def emisor(self) -> Emisor:
+        return Emisor(self.info_tributaria, self.doc_especifico)
+
+    @property
+    def factura_info(self) -> FacturaInfo:
+        return FacturaInfo(self.info_tributaria, self.doc_especifico)
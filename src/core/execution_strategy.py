@@ -0,0 +1,181 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\execution_strategy.py
+import os
+import json
+import logging
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from src import config
+from src.core import xml_source, worker_tasks
+from src.core.worker_pool import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+# Executor de la etapa de CPU de cada lote según su costo estimado (archivos x costo por archivo,
+# aprendido del tiempo de CPU de las tareas): en línea, hilos (solo sin PDFs: fpdf2 es Python
+# puro y con el GIL no genera PDFs en paralelo) o el pool de procesos.
+# ASISTENTE_EJECUCION=en_linea|hilos|procesos fuerza un modo.
+
+MODE_INLINE = "en_linea"
+MODE_THREADS = "hilos"
+MODE_PROCESSES = "procesos"
+EXECUTION_MODES = (MODE_INLINE, MODE_THREADS, MODE_PROCESSES)
+EXECUTION_ENV_VAR = "ASISTENTE_EJECUCION"
+
+COSTS_FILE = os.path.join(config.APP_DATA_DIR, "costos_ejecucion.json")
+# Costos iniciales (segundos por archivo) hasta tener mediciones del equipo
+_DEFAULT_COSTS = {"pdf": 0.05, "sin_pdf": 0.003}
+# Peso de la última medición en el promedio móvil
+_COST_SMOOTHING = 0.3
+
+# Lotes de hasta este tiempo de CPU estimado se ejecutan en línea
+INLINE_MAX_CPU_S = 0.3
+# Lotes sin PDFs de hasta este tiempo de CPU estimado van a hilos: repartirlos entre procesos
+# no compensa los envíos, y los hilos solapan la lectura de los XML
+THREADS_MAX_CPU_S = 1.0
+THREAD_WORKERS = 4
+# Pre-análisis: hasta cuántos archivos sueltos (sin carpetas ni ZIP) se leen en línea
+SCAN_INLINE_MAX_FILES = 64
+
+
+class InlineExecutor(Executor):
+    """Executor que ejecuta cada tarea al enviarla, en el hilo que llama; devuelve un Future ya resuelto."""
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e_task:
+            future.set_exception(e_task)
+        return future
+
+
+class ExecutionPlan(NamedTuple):
+    mode: str
+    executor: Executor
+    num_workers: int
+
+
+class ExecutionStrategy:
+    """
+    Elige el executor de cada lote y registra su costo. Una instancia por aplicación (GUI) o
+    por ejecución (consola); se usa desde un solo hilo a la vez.
+    """
+
+    def __init__(self, worker_pool: WorkerPool, costs_path: Optional[str] = COSTS_FILE):
+        self.worker_pool = worker_pool
+        self._costs_path = costs_path
+        self._costs: Dict[str, float] = dict(_DEFAULT_COSTS)
+        self._costs.update(self._load_costs())
+        self._inline_executor = InlineExecutor()
+        self._thread_executor: Optional[ThreadPoolExecutor] = None
+        # Las tareas en línea o en hilos también respetan WorkerPool.cancel_batch
+        worker_tasks.set_cancelled_batch_value(worker_pool.cancelled_batch)
+
+    def plan(self, num_files: int, render_pdf: bool = True) -> ExecutionPlan:
+        """Executor para procesar `num_files` archivos (staged_pipeline.run_staged)."""
+        estimated_cpu_s = num_files * (self._costs["pdf"] if render_pdf else self._costs["sin_pdf"])
+        mode = _forced_mode()
+        if mode is None:
+            if estimated_cpu_s <= INLINE_MAX_CPU_S:
+                mode = MODE_INLINE
+            elif not render_pdf and estimated_cpu_s <= THREADS_MAX_CPU_S:
+                mode = MODE_THREADS
+            else:
+                mode = MODE_PROCESSES
+        logger.info(f"Ejecución del lote: {mode} ({num_files} archivo(s), ~{estimated_cpu_s:.2f} s de CPU estimados).")
+        return self._plan_for(mode)
+
+    def plan_scan(self, inputs: Iterable[str]) -> ExecutionPlan:
+        """Executor para el pre-análisis de cabeceras de `inputs` (rutas elegidas por el usuario)."""
+        mode = _forced_mode()
+        if mode is None:
+            inputs = list(inputs)
+            few_files = len(inputs) <= SCAN_INLINE_MAX_FILES and not any(
+                os.path.isdir(path) or xml_source.is_archive(path) for path in inputs)
+            mode = MODE_INLINE if few_files else MODE_PROCESSES
+        return self._plan_for(mode)
+
+    def measure_results(self, results: Iterable[Tuple[str, Dict[str, Any]]],
+                        batch_id: Optional[int] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Entrega los resultados de staged_pipeline.run_staged sin cambios y, si el lote termina sin
+        cancelarse, registra con record() el tiempo de CPU que cada tarea midió ("cpu_s", ver
+        worker_tasks.process_xml_chunk_task). Si quien consume deja de iterar, no registra nada.
+        """
+        cpu_totals = {"pdf": [0, 0.0], "sin_pdf": [0, 0.0]} # Archivos y segundos de CPU
+        for xml_path, result in results:
+            cpu_s = result.get("cpu_s")
+            if cpu_s is not None:
+                # Generó su PDF en la tarea; los que reutilizaron el respaldo o lo dejaron diferido, no
+                totals = cpu_totals["pdf" if result.get("temp_pdf_path") else "sin_pdf"]
+                totals[0] += 1
+                totals[1] += cpu_s
+            yield xml_path, result
+        if not worker_tasks.batch_cancelled(batch_id):
+            self.record({key: tuple(totals) for key, totals in cpu_totals.items()})
+
+    def record(self, cpu_totals: Dict[str, Tuple[int, float]]):
+        """
+        Registra el tiempo de CPU de un lote completo (no cancelado): `cpu_totals` es
+        {"pdf" | "sin_pdf": (archivos, segundos de CPU)}. Actualiza los costos por archivo y los guarda.
+        """
+        updated = False
+        for key, (num_files, cpu_s) in cpu_totals.items():
+            if num_files > 0 and cpu_s > 0:
+                self._update_cost(key, cpu_s / num_files)
+                updated = True
+        if updated:
+            self._save_costs()
+
+    def close(self):
+        if self._thread_executor is not None:
+            self._thread_executor.shutdown(wait=True, cancel_futures=True)
+            self._thread_executor = None
+
+    def _plan_for(self, mode: str) -> ExecutionPlan:
+        if mode == MODE_INLINE:
+            return ExecutionPlan(mode, self._inline_executor, 1)
+        if mode == MODE_THREADS:
+            if self._thread_executor is None:
+                self._thread_executor = ThreadPoolExecutor(max_workers=THREAD_WORKERS, thread_name_prefix="lote")
+            return ExecutionPlan(mode, self._thread_executor, THREAD_WORKERS)
+        return ExecutionPlan(mode, self.worker_pool.get_executor(), self.worker_pool.max_workers)
+
+    def _update_cost(self, key: str, measured_s: float):
+        self._costs[key] = (1 - _COST_SMOOTHING) * self._costs[key] + _COST_SMOOTHING * measured_s
+        logger.debug(f"Costo por archivo '{key}': {measured_s * 1000:.1f} ms medidos, {self._costs[key] * 1000:.1f} ms estimados.")
+
+    def _load_costs(self) -> Dict[str, float]:
+        if not self._costs_path or not os.path.exists(self._costs_path):
+            return {}
+        try:
+            with open(self._costs_path, encoding="utf-8") as costs_file:
+                saved_costs = json.load(costs_file)
+            return {key: float(saved_costs[key]) for key in _DEFAULT_COSTS if float(saved_costs.get(key, 0)) > 0}
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"No se pudieron leer los costos de ejecución de {self._costs_path}: {e}")
+            return {}
+
+    def _save_costs(self):
+        if not self._costs_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._costs_path), exist_ok=True)
+            temp_path = f"{self._costs_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as costs_file:
+                json.dump(self._costs, costs_file)
+            os.replace(temp_path, self._costs_path)
+        except OSError as e:
+            logger.warning(f"No se pudieron guardar los costos de ejecución en {self._costs_path}: {e}")
+
+
+def _forced_mode() -> Optional[str]:
+    requested = os.environ.get(EXECUTION_ENV_VAR, "").strip().lower()
+    if not requested:
+        return None
+    if requested not in EXECUTION_MODES:
+        logger.warning(f"{EXECUTION_ENV_VAR}='{requested}' no es válido ({', '.join(EXECUTION_MODES)}). Se elige automáticamente.")
+        return None
+    return requested
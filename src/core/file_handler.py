@@ -11,6 +11,7 @@ from typing import List, Tuple, Optional, Callable, Dict, Any
 from reportlab.lib import colors
 # Importar funciones de parseo y generación de PDF
 from .xml_parser import parse_xml
+from . import xml_backend
 from .pdf_invoice_generator import generate_invoice_pdf # Para Facturas
 from .pdf_generator import generate_other_document_pdf # Para otros documentos
 from reportlab.platypus.flowables import Flowable
@@ -31,15 +32,14 @@ def _get_text_from_element(element: Optional[ET.Element], default: str = "") ->
 
 def _parse_cdata_comprobante(xml_path: str) -> Optional[ET.Element]:
     try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
+        root = xml_backend.parse_file(xml_path)
         comprobante_cdata_element = root.find('.//comprobante')
         if comprobante_cdata_element is not None and comprobante_cdata_element.text:
             cdata_content = comprobante_cdata_element.text.strip()
             # Intentar parsear el contenido CDATA como XML
-            comprobante_root = ET.fromstring(cdata_content)
+            comprobante_root = xml_backend.parse_string(cdata_content)
             return comprobante_root
-    except ET.ParseError as e_parse:
+    except xml_backend.ParseError as e_parse:
         logger.error(f"Error de parseo XML (CDATA o principal) en {xml_path}: {e_parse}")
     except Exception as e_gen:
         logger.error(f"Error inesperado procesando CDATA de {xml_path}: {e_gen}")
@@ -47,8 +47,7 @@ def _parse_cdata_comprobante(xml_path: str) -> Optional[ET.Element]:
 
 def _get_numero_autorizacion_from_xml(xml_path: str) -> Optional[str]:
     try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
+        root = xml_backend.parse_file(xml_path)
         num_auth_element = root.find('.//numeroAutorizacion')
         if num_auth_element is not None and num_auth_element.text:
             return num_auth_element.text.strip()
@@ -60,7 +59,7 @@ def _get_numero_autorizacion_from_xml(xml_path: str) -> Optional[str]:
             
         logger.warning(f"No se encontró 'numeroAutorizacion' ni 'claveAcceso' en {os.path.basename(xml_path)}")
         return None
-    except ET.ParseError as e_parse:
+    except xml_backend.ParseError as e_parse:
         logger.error(f"Error de parseo XML al obtener número de autorización de: {xml_path}: {e_parse}")
         return None # O un valor especial de error si se prefiere
     except Exception as e_gen:
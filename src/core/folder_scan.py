@@ -0,0 +1,98 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\folder_scan.py
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Iterable, Iterator, List, Tuple
+
+from src.core import xml_source
+from src.core.clave_acceso import clave_acceso_from_filename
+
+logger = logging.getLogger(__name__)
+
+# XML a procesar a partir de carpetas, archivos y ZIP. Las carpetas se leen con os.scandir, varias
+# a la vez (unidades de red), y los archivos se entregan a medida que aparecen, sin orden estable.
+
+# Hilos que leen carpetas a la vez
+_SCANDIR_THREADS = 8
+
+XML_EXTENSION = ".xml"
+
+
+def _accepts(name: str, only_clave: bool) -> bool:
+    """Filtro por extensión y, si se pide, por la clave de acceso de 49 dígitos en el nombre."""
+    if not name.lower().endswith(XML_EXTENSION):
+        return False
+    return not only_clave or clave_acceso_from_filename(name) is not None
+
+
+def _scan_dir(dir_path: str, only_clave: bool) -> Tuple[List[str], List[str], List[str]]:
+    """(archivos XML aceptados, archivos ZIP, subcarpetas) de una carpeta, sin seguir enlaces simbólicos."""
+    xml_files: List[str] = []
+    archives: List[str] = []
+    subdirs: List[str] = []
+    try:
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif _accepts(entry.name, only_clave) and entry.is_file():
+                        xml_files.append(entry.path)
+                    elif xml_source.is_archive(entry.name) and entry.is_file():
+                        archives.append(entry.path)
+                except OSError as e:
+                    logger.warning(f"No se pudo leer {entry.path}: {e}. Se omite.")
+    except OSError as e:
+        logger.warning(f"No se pudo leer la carpeta {dir_path}: {e}. Se omite.")
+    return xml_files, archives, subdirs
+
+
+def iter_folder(root: str, only_clave: bool = False) -> Iterator[str]:
+    """
+    Archivos XML bajo `root` (recursivo) y los XML de los ZIP que contiene, a medida que se
+    encuentran. Con `only_clave`, solo los que llevan una clave de acceso en el nombre.
+    """
+    pool = ThreadPoolExecutor(max_workers=_SCANDIR_THREADS, thread_name_prefix="scandir")
+    try:
+        pending = {pool.submit(_scan_dir, root, only_clave)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                xml_files, archives, subdirs = future.result()
+                pending.update(pool.submit(_scan_dir, subdir, only_clave) for subdir in subdirs)
+                yield from xml_files
+                for archive_path in archives:
+                    yield from _archive_members(archive_path, only_clave)
+    finally:
+        # Si quien consume se detiene (cancelación), no se leen más carpetas
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _archive_members(archive_path: str, only_clave: bool) -> Iterator[str]:
+    for member in xml_source.expand_inputs([archive_path]):
+        if _accepts(os.path.basename(member), only_clave):
+            yield member
+
+
+def iter_input_files(inputs: Iterable[str], only_clave: bool = False) -> Iterator[str]:
+    """
+    XML de una selección mixta: carpetas (recursivas), archivos XML y ZIP (sus miembros, ver
+    xml_source). Cada ruta se entrega una sola vez, absoluta. El filtro `only_clave` se aplica
+    a lo encontrado en carpetas y ZIP; un XML indicado explícitamente se acepta siempre.
+    """
+    seen = set()
+    for input_path in inputs:
+        if xml_source.is_member_path(input_path):
+            found: Iterable[str] = (input_path,)
+        elif os.path.isdir(input_path):
+            found = iter_folder(os.path.abspath(input_path), only_clave)
+        elif os.path.isfile(input_path):
+            input_path = os.path.abspath(input_path)
+            found = _archive_members(input_path, only_clave) if xml_source.is_archive(input_path) else (input_path,)
+        else:
+            logger.warning(f"Entrada no encontrada, se omite: {input_path}")
+            continue
+        for xml_path in found:
+            if xml_path not in seen:
+                seen.add(xml_path)
+                yield xml_path
@@ -0,0 +1,215 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\lazy_pdf.py
+import os
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from src.core.worker_tasks import render_pdf_task, backup_rendered_pdf
+
+logger = logging.getLogger(__name__)
+
+# RIDE diferidos: el lote solo extrae las filas y los PDFs se generan después, a pedido (clic en
+# la celda "No."), antes del ZIP de "Exportar Archivos" o en segundo plano entre lotes.
+
+# Hilos para copiar los PDFs generados a la carpeta de respaldos
+_BACKUP_THREADS = 2
+
+# (carpeta temporal de PDFs, ruta prevista del PDF de respaldo)
+_PendingPdf = Tuple[str, Optional[str]]
+
+
+class LazyPdfRenderer:
+    """
+    Cola de PDFs pendientes de una sesión de la GUI. Cada PDF se genera una sola vez; request()
+    y render_all() devuelven Futures con el resultado de render_pdf_task, completado con
+    "backup_pdf_path" (ruta del respaldo, o None si no se pudo respaldar).
+    Los que fallan quedan en failures() hasta que request() los vuelve a encolar.
+    Todos los métodos se pueden llamar desde cualquier hilo.
+    """
+
+    def __init__(self, get_executor: Callable[[], Executor], background_tasks: int = 1,
+                 on_rendered: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self._get_executor = get_executor
+        self._background_tasks = max(1, background_tasks)
+        self._on_rendered = on_rendered
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[str, _PendingPdf]" = OrderedDict() # Sin enviar al pool
+        self._urgent: Deque[str] = deque() # Pedidos con prioridad, aún en _pending
+        self._futures: Dict[str, Future] = {} # Pedidos o en curso, hasta que terminan
+        self._running = 0 # Enviados al pool y sin terminar
+        self._dispatched: Dict[str, _PendingPdf] = {} # Enviados al pool, para reintentar si fallan
+        self._failed: Dict[str, Tuple[str, Optional[str], str]] = {} # (carpeta, respaldo, error)
+        self._render_futures: Set[Future] = set() # Tareas del pool, para cancelar las que no empezaron
+        self._background_enabled = True
+        self._generation = 0 # cancel() descarta los resultados de generaciones anteriores
+        # Envía al pool fuera del hilo que llama: el primer envío arranca los procesos y puede tardar
+        self._dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf_diferido")
+        self._backup_pool = ThreadPoolExecutor(max_workers=_BACKUP_THREADS, thread_name_prefix="pdf_diferido_respaldo")
+
+    def add(self, pending_pdfs: Dict[str, Optional[str]], temp_pdf_dir: str):
+        """Encola los PDFs pendientes de un lote (BatchResults.pending_pdfs)."""
+        with self._lock:
+            for xml_path, backup_pdf_path in pending_pdfs.items():
+                if xml_path not in self._pending and xml_path not in self._futures:
+                    self._pending[xml_path] = (temp_pdf_dir, backup_pdf_path)
+        if pending_pdfs:
+            logger.info(f"PDF diferido: {len(pending_pdfs)} PDF(s) pendientes.")
+        self._schedule()
+
+    def is_pending(self, xml_path: str) -> bool:
+        with self._lock:
+            return xml_path in self._pending or xml_path in self._futures
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending) + len(self._futures.keys() - self._pending.keys())
+
+    def failures(self) -> Dict[str, str]:
+        """PDFs cuya generación falló: {xml: error}."""
+        with self._lock:
+            return {xml_path: error for xml_path, (_temp_pdf_dir, _backup_pdf_path, error) in self._failed.items()}
+
+    def request(self, xml_path: str) -> Optional[Future]:
+        """
+        Genera el PDF de `xml_path` antes que los de segundo plano; si falló antes, lo reintenta.
+        None si no está pendiente.
+        """
+        with self._lock:
+            if xml_path in self._failed:
+                temp_pdf_dir, backup_pdf_path, _error = self._failed.pop(xml_path)
+                self._pending[xml_path] = (temp_pdf_dir, backup_pdf_path)
+            future = self._request_locked(xml_path)
+        self._schedule()
+        return future
+
+    def render_all(self) -> List[Future]:
+        """Pide todos los PDFs pendientes (p. ej. antes de exportar el ZIP)."""
+        with self._lock:
+            for xml_path in list(self._pending):
+                self._request_locked(xml_path)
+            futures = list(self._futures.values())
+        self._schedule()
+        return futures
+
+    def set_background(self, enabled: bool):
+        """Activa o pausa la generación en segundo plano (se pausa mientras corre un lote)."""
+        with self._lock:
+            self._background_enabled = enabled
+        if enabled:
+            self._schedule()
+
+    def cancel(self):
+        """
+        Descarta todo lo pendiente (Reiniciar, nueva entidad): las tareas en cola del pool se
+        cancelan; las que ya empezaron terminan y su resultado se ignora.
+        """
+        with self._lock:
+            self._generation += 1
+            self._pending.clear()
+            self._urgent.clear()
+            self._dispatched.clear()
+            self._failed.clear()
+            futures, self._futures = list(self._futures.values()), {}
+            render_futures, self._render_futures = list(self._render_futures), set()
+            self._running = 0
+        for future in render_futures + futures:
+            future.cancel()
+
+    def shutdown(self):
+        self.cancel()
+        self._dispatcher.shutdown(wait=False, cancel_futures=True)
+        self._backup_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _request_locked(self, xml_path: str) -> Optional[Future]:
+        future = self._futures.get(xml_path)
+        if future is None and xml_path in self._pending:
+            future = self._futures[xml_path] = Future()
+            self._urgent.append(xml_path)
+        return future
+
+    def _schedule(self):
+        """Envía al pool los pedidos con prioridad y, si hay cupo, los de segundo plano."""
+        batch: List[Tuple[str, str, Optional[str]]] = []
+        with self._lock:
+            while self._urgent:
+                xml_path = self._urgent.popleft()
+                if xml_path in self._pending:
+                    batch.append((xml_path, *self._pending.pop(xml_path)))
+            while self._background_enabled and self._pending and self._running + len(batch) < self._background_tasks:
+                xml_path, (temp_pdf_dir, backup_pdf_path) = self._pending.popitem(last=False)
+                batch.append((xml_path, temp_pdf_dir, backup_pdf_path))
+            for xml_path, temp_pdf_dir, backup_pdf_path in batch:
+                self._futures.setdefault(xml_path, Future())
+                self._dispatched[xml_path] = (temp_pdf_dir, backup_pdf_path)
+            self._running += len(batch)
+            generation = self._generation
+        if batch:
+            try:
+                self._dispatcher.submit(self._submit_batch, batch, generation)
+            except RuntimeError: # Cerrado (la ventana se está cerrando)
+                pass
+
+    def _submit_batch(self, batch: List[Tuple[str, str, Optional[str]]], generation: int):
+        try:
+            executor = self._get_executor()
+        except Exception as e_pool:
+            for xml_path, _temp_pdf_dir, _backup_pdf_path in batch:
+                self._finish(_render_error(xml_path, e_pool), generation)
+            return
+        for xml_path, temp_pdf_dir, backup_pdf_path in batch:
+            try:
+                render_future = executor.submit(render_pdf_task, xml_path, temp_pdf_dir)
+            except Exception as e_submit:
+                self._finish(_render_error(xml_path, e_submit), generation)
+                continue
+            with self._lock:
+                if generation == self._generation:
+                    self._render_futures.add(render_future)
+            render_future.add_done_callback(partial(self._rendered, xml_path, backup_pdf_path, generation))
+
+    def _rendered(self, xml_path: str, backup_pdf_path: Optional[str], generation: int, render_future: Future):
+        # Hilo de gestión del pool: la copia al respaldo va a un hilo de E/S
+        with self._lock:
+            self._render_futures.discard(render_future)
+        try:
+            result = render_future.result()
+        except Exception as e_future:
+            result = _render_error(xml_path, e_future)
+        if generation != self._generation:
+            return
+        try:
+            self._backup_pool.submit(self._backup_and_finish, result, backup_pdf_path, generation)
+        except RuntimeError:
+            pass
+
+    def _backup_and_finish(self, result: Dict[str, Any], backup_pdf_path: Optional[str], generation: int):
+        self._finish(backup_rendered_pdf(result, backup_pdf_path), generation)
+
+    def _finish(self, result: Dict[str, Any], generation: int):
+        xml_path = result["xml_path"]
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._running -= 1
+            future = self._futures.pop(xml_path, None)
+            dispatched = self._dispatched.pop(xml_path, None)
+            if result.get("pdf_error") and not result.get("temp_pdf_path") and dispatched:
+                self._failed[xml_path] = (*dispatched, result["pdf_error"])
+        if result.get("pdf_error"):
+            logger.warning(f"PDF diferido de {os.path.basename(xml_path)}: {result['pdf_error']}")
+        # Primero el callback: quien espera el Future encuentra ya enviada la notificación
+        if self._on_rendered:
+            try:
+                self._on_rendered(xml_path, result)
+            except Exception:
+                logger.exception(f"Error notificando el PDF diferido de {os.path.basename(xml_path)}")
+        if future is not None and future.set_running_or_notify_cancel():
+            future.set_result(result)
+        self._schedule()
+
+
+def _render_error(xml_path: str, error: Exception) -> Dict[str, Any]:
+    return {"xml_path": xml_path, "temp_pdf_path": None, "backup_pdf_path": None, "pdf_error": f"Error PDF: {error}"}
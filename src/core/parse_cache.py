@@ -0,0 +1,220 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\parse_cache.py
+import os
+import json
+import sqlite3
+import logging
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Iterable
+
+from src import config
+from src.core import xml_source
+from src.core.clave_acceso import clave_acceso_from_filename
+
+logger = logging.getLogger(__name__)
+
+# Caché persistente de parseo (tabla parse_cache en config.DATABASE_PATH, en modo WAL).
+# Clave: (ruta, tamaño, mtime_ns); un archivo movido o copiado se encuentra por la clave de
+# acceso de su nombre y el mismo tamaño. Los workers solo devuelven la entrada ("cache_entry").
+
+# Cambiar cuando cambie el contenido de row_data (columnas, formatos): invalida lo guardado
+CACHE_VERSION = 1
+
+# Entradas acumuladas antes de escribir una transacción
+WRITE_BATCH_SIZE = 500
+# Límite de parámetros por consulta "IN (...)" (SQLite admite 999 en versiones antiguas)
+_LOOKUP_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parse_cache (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    clave_acceso TEXT,
+    numero_autorizacion TEXT,
+    fecha_autorizacion TEXT,
+    cod_doc TEXT,
+    id_comprador_raw TEXT,
+    razon_social_comprador TEXT,
+    backup_year TEXT,
+    backup_buyer_folder TEXT,
+    row_data TEXT NOT NULL,
+    conversion_errors TEXT,
+    cache_version INTEGER NOT NULL,
+    fecha_cache TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_parse_cache_clave_acceso ON parse_cache (clave_acceso);
+"""
+
+_COLUMNS = ("path", "size", "mtime_ns", "clave_acceso", "numero_autorizacion", "fecha_autorizacion",
+            "cod_doc", "id_comprador_raw", "razon_social_comprador", "backup_year", "backup_buyer_folder",
+            "row_data", "conversion_errors", "cache_version", "fecha_cache")
+
+# Campos de la entrada que forman la cabecera (mismas claves que scan_xml_header)
+_HEADER_FIELDS = ("cod_doc", "clave_acceso", "id_comprador_raw", "razon_social_comprador",
+                  "numero_autorizacion", "fecha_autorizacion")
+
+
+def normalize_path(xml_path: str) -> str:
+    return os.path.normcase(os.path.abspath(xml_path))
+
+
+def build_cache_entry(xml_path: str, stat_result: xml_source.StatResult, parsed_data: Dict[str, Any],
+                      row_data: Dict[str, Any], unique_id: Optional[str], conversion_errors: List[str],
+                      backup_year: Optional[str], backup_buyer_folder: Optional[str]) -> Dict[str, Any]:
+    """
+    Entrada de caché de un XML ya procesado. Se construye en el worker con el os.stat tomado
+    ANTES de parsear: si el archivo cambia durante el proceso, la entrada no volverá a coincidir.
+    """
+    return {
+        "path": normalize_path(xml_path),
+        "size": stat_result.st_size,
+        "mtime_ns": stat_result.st_mtime_ns,
+        "clave_acceso": parsed_data.get('info_tributaria', {}).get('clave_acceso', ''),
+        "numero_autorizacion": unique_id or "",
+        "fecha_autorizacion": parsed_data.get('fecha_autorizacion') or "",
+        "cod_doc": parsed_data.get('info_tributaria', {}).get('cod_doc', ''),
+        "id_comprador_raw": parsed_data.get('id_comprador_raw', "N/A"),
+        "razon_social_comprador": parsed_data.get('comprador', {}).get('razon_social', "N/A"),
+        "backup_year": backup_year,
+        "backup_buyer_folder": backup_buyer_folder,
+        "row_data": row_data,
+        "conversion_errors": list(conversion_errors),
+    }
+
+
+def header_from_cache_entry(entry: Dict[str, Any], xml_path: str) -> Dict[str, str]:
+    """Cabecera equivalente a la de xml_header_scanner.scan_xml_header, sin leer el archivo."""
+    header = {field: entry.get(field) or "" for field in _HEADER_FIELDS}
+    header["xml_path"] = xml_path
+    return header
+
+
+class ParseCache:
+    """
+    Acceso a la tabla parse_cache. Una instancia por hilo (sqlite3 no comparte conexiones
+    entre hilos): WorkerThread y src/cli.py abren la suya para cada lote.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or config.DATABASE_PATH
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Con WAL, NORMAL no pierde consistencia; como mucho se pierde la última transacción de caché
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._pending: List[tuple] = []
+
+    @classmethod
+    def open_default(cls) -> Optional["ParseCache"]:
+        """Abre la caché en config.DATABASE_PATH. Si falla, devuelve None: el lote se procesa sin caché."""
+        try:
+            return cls()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"No se pudo abrir la caché de parseo en {config.DATABASE_PATH}: {e}. Se continúa sin caché.")
+            return None
+
+    def lookup_many(self, xml_paths: Iterable[str], log_summary: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Entradas vigentes para los archivos indicados: {ruta_original: entrada}.
+        Un archivo cuyo tamaño o fecha de modificación cambió no se devuelve.
+        `log_summary=False` cuando se consulta por bloques (quien llama registra el total).
+        """
+        identities: Dict[str, tuple] = {}
+        for xml_path in xml_paths:
+            try:
+                stat_result = xml_source.stat(xml_path)
+            except OSError:
+                continue
+            identities[xml_path] = (normalize_path(xml_path), stat_result.st_size, stat_result.st_mtime_ns)
+
+        hits: Dict[str, Dict[str, Any]] = {}
+        try:
+            rows_by_path = self._select_in("path", [identity[0] for identity in identities.values()])
+            misses_by_clave: Dict[str, List[str]] = {}
+            for xml_path, (norm_path, size, mtime_ns) in identities.items():
+                row = rows_by_path.get(norm_path)
+                if row and row["size"] == size and row["mtime_ns"] == mtime_ns:
+                    hits[xml_path] = row
+                    continue
+                clave_acceso = clave_acceso_from_filename(xml_path)
+                if clave_acceso:
+                    misses_by_clave.setdefault(clave_acceso, []).append(xml_path)
+
+            # Archivos movidos o copiados: misma clave de acceso y mismo tamaño
+            if misses_by_clave:
+                rows_by_clave = self._select_in("clave_acceso", list(misses_by_clave))
+                for clave_acceso, paths_for_clave in misses_by_clave.items():
+                    row = rows_by_clave.get(clave_acceso)
+                    if not row:
+                        continue
+                    for xml_path in paths_for_clave:
+                        if row["size"] == identities[xml_path][1]:
+                            # Copia por archivo: varias copias pueden compartir la misma fila
+                            hits[xml_path] = dict(row, row_data=dict(row["row_data"]))
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Error consultando la caché de parseo: {e}. Se parsearán los archivos.")
+            return {}
+
+        for xml_path, entry in hits.items():
+            # La fila se reporta con la ruta actual (el archivo pudo moverse)
+            entry["row_data"]["original_xml_path"] = xml_path
+        if hits and log_summary:
+            logger.info(f"Caché de parseo: {len(hits)} de {len(identities)} archivo(s) sin cambios.")
+        return hits
+
+    def _select_in(self, column: str, values: List[str]) -> Dict[str, Dict[str, Any]]:
+        rows: Dict[str, Dict[str, Any]] = {}
+        for offset in range(0, len(values), _LOOKUP_CHUNK):
+            chunk = values[offset:offset + _LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM parse_cache "
+                f"WHERE cache_version = ? AND {column} IN ({placeholders})",
+                [CACHE_VERSION] + chunk)
+            for values_row in cursor:
+                entry = dict(zip(_COLUMNS, values_row))
+                entry["row_data"] = json.loads(entry["row_data"])
+                entry["conversion_errors"] = json.loads(entry["conversion_errors"] or "[]")
+                rows[entry[column]] = entry
+        return rows
+
+    def add(self, entry: Optional[Dict[str, Any]]):
+        """
+        Acumula una entrada; se escribe al llegar a WRITE_BATCH_SIZE o en flush().
+        row_data se serializa aquí, antes de que quien llama añada claves propias a la fila.
+        """
+        if not entry:
+            return
+        try:
+            self._pending.append((
+                entry["path"], entry["size"], entry["mtime_ns"], entry["clave_acceso"], entry["numero_autorizacion"],
+                entry["fecha_autorizacion"], entry["cod_doc"], entry["id_comprador_raw"], entry["razon_social_comprador"],
+                entry["backup_year"], entry["backup_buyer_folder"],
+                json.dumps(entry["row_data"], ensure_ascii=False), json.dumps(entry["conversion_errors"], ensure_ascii=False),
+                CACHE_VERSION, datetime.now().isoformat(timespec="seconds")))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Entrada de caché descartada para {entry.get('path', 'N/A')}: {e}")
+            return
+        if len(self._pending) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO parse_cache ({', '.join(_COLUMNS)}) "
+                    f"VALUES ({','.join('?' * len(_COLUMNS))})", rows)
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudieron guardar {len(rows)} entrada(s) en la caché de parseo: {e}")
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
@@ -3,9 +3,10 @@
 import os
 import sys # Necesario para resource_path
 from fpdf import FPDF, FPDFException
-from typing import Dict, Any, List, Optional, TYPE_CHECKING
+from typing import Dict, Any, List, Mapping, Optional, Sequence, TYPE_CHECKING
 from datetime import datetime, timezone # Importar datetime y timezone
 import logging # Importar logging
+from src.core import date_utils
 
 logger = logging.getLogger(__name__) # Obtener logger para este módulo
 
@@ -103,54 +104,20 @@ class InvoicePDF(FPDF):
             self.set_text_color(*COLOR_BLACK) 
 
 # --- Funciones Auxiliares Comunes ---
-def _parse_fecha_pdf(fecha_str: Optional[str]) -> str:
-    """Parsea una cadena de fecha en varios formatos y devuelve 'dd/mm/yyyy' o la original."""
-    if not fecha_str:
+def _parse_fecha_pdf(fecha: Any) -> str:
+    """Fecha (datetime ya parseado o cadena en cualquier formato del SRI) como 'dd/mm/yyyy', o la parte de fecha de la original."""
+    if not fecha:
         return ""
-    try:
-        dt_obj = None
-        val_to_parse = fecha_str.replace('Z', '+00:00') # Manejar Z para UTC
-        
-        possible_formats = [
-            "%d/%m/%Y %H:%M:%S",
-            "%Y-%m-%dT%H:%M:%S%z", # Formato con offset de zona horaria
-            "%Y-%m-%dT%H:%M:%S",   # Formato sin offset de zona horaria
-            "%d/%m/%Y",
-        ]
-        
-        for fmt in possible_formats:
-            try:
-                tz_offset_char = None
-                if '%z' in fmt: # Solo relevante para formatos con %z
-                    if '+' in val_to_parse[-6:]: tz_offset_char = '+'
-                    elif '-' in val_to_parse[-6:]: tz_offset_char = '-'
-
-                # Lógica para manejar el ':' en el offset de zona horaria
-                if '%z' in fmt and tz_offset_char and ':' in val_to_parse[-3:]:
-                    # Formato como "2023-10-26T10:00:00-05:00"
-                    dt_obj = datetime.strptime(val_to_parse[:-3] + val_to_parse[-2:], fmt)
-                elif '%z' in fmt and tz_offset_char and ':' not in val_to_parse[-3:]:
-                    # Formato como "2023-10-26T10:00:00-0500"
-                    dt_obj = datetime.strptime(val_to_parse, fmt)
-                elif '%z' not in fmt:
-                     # Formatos sin información de zona horaria explícita
-                     dt_obj = datetime.strptime(val_to_parse, fmt)
-                
-                if dt_obj: break # Si se parsea correctamente, salir del bucle
-            except ValueError:
-                continue # Probar el siguiente formato
-        
-        # Devolver formateado si se parseó, sino la parte de la fecha de la cadena original
-        return dt_obj.strftime('%d/%m/%Y') if dt_obj else fecha_str.split('T')[0]
-    except Exception:
-        # Fallback muy genérico si todo lo demás falla
-        return fecha_str.split('T')[0] if 'T' in fecha_str else fecha_str
+    fecha_fmt = date_utils.format_fecha(fecha)
+    if fecha_fmt is not None:
+        return fecha_fmt
+    return str(fecha).split('T')[0]
 
-def _safe_get(data: Dict, keys: List[str], default: Any = '') -> Any:
-    """Obtiene un valor de un diccionario anidado de forma segura."""
+def _safe_get(data: Mapping, keys: List[str], default: Any = '') -> Any:
+    """Obtiene un valor de un diccionario anidado (o registro de document_model) de forma segura."""
     temp = data
     for key in keys:
-        if isinstance(temp, dict) and key in temp:
+        if isinstance(temp, Mapping) and key in temp:
             temp = temp[key]
         else:
             return default
@@ -206,7 +173,7 @@ def _calculate_totals(invoice_data: Dict[str, Any]) -> Dict[str, float]:
     impuestos_resumen = _safe_get(invoice_data, ['totales', 'impuestos_resumen'], [])
     if isinstance(impuestos_resumen, list):
         for imp in impuestos_resumen:
-            if isinstance(imp, dict):
+            if isinstance(imp, Mapping):
                 codigo = str(imp.get('codigo', '')) 
                 codigo_porcentaje = str(imp.get('codigo_porcentaje', '')) 
                 
@@ -241,9 +208,9 @@ def _calculate_totals(invoice_data: Dict[str, Any]) -> Dict[str, float]:
 
     total_subsidio_calculado = 0.0
     detalles_list = _safe_get(invoice_data, ['detalles'], [])
-    if isinstance(detalles_list, list):
+    if isinstance(detalles_list, Sequence): # list o xml_streaming.StreamedDetalles
         for item in detalles_list:
-            if isinstance(item, dict):
+            if isinstance(item, Mapping):
                 detalles_adicionales = item.get('detalles_adicionales', {});
                 try: valor_subsidio_item = float(detalles_adicionales.get('valorSubsidio', '0.0')) 
                 except (ValueError, TypeError): valor_subsidio_item = 0.0
@@ -2,7 +2,7 @@
 import os
 import sys
 from datetime import datetime, timezone 
-from typing import Dict, Any, List, Tuple, Optional, TYPE_CHECKING
+from typing import Dict, Any, List, Mapping, Tuple, Optional, TYPE_CHECKING
 from fpdf import FPDFException
 import logging 
 import tempfile 
@@ -156,7 +156,7 @@ def _draw_header_other_docs(pdf: InvoicePDF, invoice_data: Dict[str, Any], font_
         c_ruc = _safe_get(invoice_data, ['emisor', 'ruc'])
         c_num_doc = _safe_get(invoice_data, ['factura_info', 'numero_factura']) 
         c_num_autorizacion = _safe_get(invoice_data, ['numero_autorizacion'])
-        c_fecha_autorizacion_fmt = _parse_fecha_pdf(_safe_get(invoice_data, ['fecha_autorizacion']))
+        c_fecha_autorizacion_fmt = _parse_fecha_pdf(_safe_get(invoice_data, ['fecha_autorizacion_dt'], None) or _safe_get(invoice_data, ['fecha_autorizacion'])) # Fecha ya parseada por xml_parser
 
         c_ambiente_val = _safe_get(invoice_data, ['ambiente'])
         c_ambiente_str = "PRODUCCIÓN" if c_ambiente_val == "2" else "PRUEBAS" if c_ambiente_val == "1" else c_ambiente_val
@@ -330,7 +330,7 @@ def _draw_buyer_info_other_docs(pdf: InvoicePDF, invoice_data: Dict[str, Any], f
             detalles_nd = _safe_get(invoice_data, ['detalles'], []) 
             if detalles_nd and isinstance(detalles_nd, list) and len(detalles_nd) > 0:
                 primer_motivo = detalles_nd[0]
-                if isinstance(primer_motivo, dict):
+                if isinstance(primer_motivo, Mapping):
                     razon_modificacion_valor = primer_motivo.get('descripcion', '') 
         
         if razon_modificacion_valor:
@@ -795,7 +795,7 @@ def _generate_specific_pdf_content(pdf: InvoicePDF, document_data: Dict[str, Any
         
         logger.debug(f"OtroDoc - Iniciando bucle de detalles. Total items en detalles_list: {len(detalles_list)}")
         for item in detalles_list:
-            if not isinstance(item, dict):
+            if not isinstance(item, Mapping):
                 logger.warning(f"OtroDoc - Item en detalles_list no es un diccionario: {item}")
                 continue
             
@@ -881,16 +881,19 @@ except ImportError as e:
 def generate_pdf_from_xml(xml_file_path: str, 
                           output_dir: str, 
                           # logo_path para el emisor eliminado
+                          parsed_data: Optional[Dict[str, Any]] = None,
                           ) -> Optional[str]:
     """
     Parsea un archivo XML, determina el tipo de documento y llama al generador de PDF apropiado.
+    Si se recibe `parsed_data` (resultado previo de parse_xml), se reutiliza y el XML no se vuelve a parsear.
     """
     logger.debug(f"Iniciando generación de PDF desde XML: {xml_file_path} en directorio: {output_dir}")
-    try:
-        parsed_data = parse_xml(xml_file_path) 
-    except Exception as e:
-        logger.error(f"Error al parsear XML {os.path.basename(xml_file_path)}: {e}")
-        return None
+    if parsed_data is None:
+        try:
+            parsed_data = parse_xml(xml_file_path) 
+        except Exception as e:
+            logger.error(f"Error al parsear XML {os.path.basename(xml_file_path)}: {e}")
+            return None
 
     if not parsed_data:
         logger.error(f"No se pudieron parsear los datos del XML: {xml_file_path}")
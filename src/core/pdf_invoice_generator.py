@@ -2,7 +2,7 @@
 import os
 import sys
 from datetime import datetime
-from typing import Dict, Any, List, Tuple, Optional, TYPE_CHECKING
+from typing import Dict, Any, List, Mapping, Tuple, Optional, TYPE_CHECKING
 from fpdf import FPDFException 
 import logging 
 
@@ -142,7 +142,7 @@ def _draw_header_factura(pdf: InvoicePDF, invoice_data: Dict[str, Any], font_to_
         doc_type_str = "FACTURA"
         c_num_factura = _safe_get(invoice_data, ['factura_info', 'numero_factura'])
         c_num_autorizacion = _safe_get(invoice_data, ['numero_autorizacion'])
-        c_fecha_autorizacion_fmt = _parse_fecha_pdf(_safe_get(invoice_data, ['fecha_autorizacion'])) # Usar función centralizada
+        c_fecha_autorizacion_fmt = _parse_fecha_pdf(_safe_get(invoice_data, ['fecha_autorizacion_dt'], None) or _safe_get(invoice_data, ['fecha_autorizacion'])) # Fecha ya parseada por xml_parser
 
         c_ambiente_val = _safe_get(invoice_data, ['ambiente'])
         c_ambiente_str = "PRODUCCIÓN" if c_ambiente_val == "2" else "PRUEBAS" if c_ambiente_val == "1" else c_ambiente_val
@@ -315,7 +315,7 @@ def _define_table_columns_factura(page_width: float, pdf: InvoicePDF, invoice_da
     max_w_unit_data = 0; max_w_subsidio_data = 0; max_w_psinsub_data = 0; max_w_dcto_data = 0; max_w_total_data = 0
     detalles_list_calc = _safe_get(invoice_data, ['detalles'], [])
     for item in detalles_list_calc:
-        if not isinstance(item, dict): continue
+        if not isinstance(item, Mapping): continue
         detalles_adicionales = item.get('detalles_adicionales', {});
         try: valor_subsidio_item = float(detalles_adicionales.get('valorSubsidio', '0.0'))
         except: valor_subsidio_item = 0.0
@@ -754,7 +754,7 @@ def generate_invoice_pdf(invoice_data: Dict[str, Any], output_folder: str) -> st
         
         logger.debug(f"Factura - Iniciando bucle de detalles. Total detalles en XML: {len(detalles_list)}")
         for item in detalles_list:
-            if not isinstance(item, dict):
+            if not isinstance(item, Mapping):
                 logger.warning(f"Factura - Item en detalles_list no es un diccionario: {item}")
                 continue
             
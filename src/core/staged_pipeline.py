@@ -0,0 +1,142 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\staged_pipeline.py
+import os
+import logging
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.core import xml_source
+from src.core.worker_tasks import (process_xml_chunk_task, expand_result, predict_backup_paths, probe_backup,
+                                   complete_backup)
+
+logger = logging.getLogger(__name__)
+
+# Procesamiento por etapas: 1) E/S en hilos (tamaño del XML, ¿existe el respaldo?), 2) CPU en el
+# pool (parseo, fila y PDF, por bloques), 3) E/S en hilos (copia al respaldo, que puede estar en
+# red). Las etapas tienen cupo: si el respaldo es lento, el pool espera.
+
+# Hilos de E/S para comprobar y copiar respaldos
+IO_THREADS = 4
+# Bloques en curso por worker del pool (uno ejecutándose y uno esperando)
+_CPU_TASKS_PER_WORKER = 2
+# Peso con el que se cierra un bloque (bytes de XML) y peso que suma cada PDF por generar:
+# los archivos con PDF van casi de uno en uno y los demás, de a decenas
+_CHUNK_TARGET_BYTES = 256 * 1024
+_PDF_RENDER_WEIGHT = 128 * 1024
+# Archivos como máximo por bloque (los resultados de un bloque llegan juntos a la tabla)
+_CHUNK_MAX_FILES = 32
+# Copias de respaldo en curso o en cola por hilo de E/S antes de frenar la etapa de CPU
+_IO_TASKS_PER_THREAD = 4
+
+PipelineResult = Tuple[str, Dict[str, Any]]
+
+
+BackupProbe = Optional[Tuple[str, str, bool]]
+
+
+def _error_result(xml_path: str, error: Exception) -> Dict[str, Any]:
+    return {"xml_path": xml_path, "error": f"Error en futuro: {error}"}
+
+
+def _probe_input(xml_path: str, backup_paths: Optional[Tuple[str, str]]) -> Tuple[int, BackupProbe]:
+    """Etapa 1: tamaño del XML y, si se conocen sus rutas, estado del respaldo."""
+    try:
+        size = xml_source.getsize(xml_path)
+    except OSError:
+        size = 0
+    return size, probe_backup(backup_paths) if backup_paths else None
+
+
+def _weight(size: int, backup_probe: BackupProbe, render_pdf: bool) -> int:
+    renders_pdf = render_pdf and not (backup_probe and backup_probe[2]) # Sin PDF respaldado que reutilizar
+    return size + (_PDF_RENDER_WEIGHT if renders_pdf else 0)
+
+
+def run_staged(executor: Executor, xml_paths: Iterable[str], num_workers: int, temp_pdf_dir: str,
+               headers: Optional[Dict[str, Dict[str, str]]] = None, reuse_backup_pdf: bool = True,
+               backup_base_dir: Optional[str] = None, render_pdf: bool = True,
+               batch_id: Optional[int] = None) -> Iterator[PipelineResult]:
+    """
+    Procesa `xml_paths` por etapas (ver el comentario del módulo) y entrega (ruta, resultado) a
+    medida que cada archivo termina, con el mismo resultado que process_single_xml_file_task
+    (respaldo incluido). `headers` son las cabeceras del pre-análisis por ruta: sin cabecera,
+    el worker comprueba el respaldo por su cuenta. `render_pdf=False` deja el PDF pendiente
+    (ver render_pdf_arg en process_single_xml_file_task).
+
+    Si quien consume deja de iterar (cancelación), las tareas que no empezaron se descartan y se
+    esperan las copias de respaldo en curso. Con `batch_id` (WorkerPool.begin_batch), tras
+    WorkerPool.cancel_batch los bloques que ya están en los workers terminan en el archivo en curso.
+    """
+    headers = headers or {}
+    cpu_limit = max(1, num_workers * _CPU_TASKS_PER_WORKER) # Bloques en el pool
+    probe_limit = cpu_limit * _CHUNK_MAX_FILES # Archivos comprobados por adelantado
+    io_limit = IO_THREADS * _IO_TASKS_PER_THREAD
+    to_probe: Deque[str] = deque(xml_paths)
+    probed: Deque[Tuple[str, BackupProbe, int]] = deque() # Listos para la CPU, con su peso
+    probed_weight = 0
+    probing: Dict[Future, str] = {}
+    processing: Dict[Future, List[str]] = {}
+    backing_up: Dict[Future, str] = {}
+    io_pool = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="respaldo")
+    try:
+        while to_probe or probed or probing or processing or backing_up:
+            # Etapa 1: sin adelantarse más que el cupo de la etapa 2
+            while to_probe and len(probing) + len(probed) < probe_limit:
+                xml_path = to_probe.popleft()
+                backup_paths = predict_backup_paths(xml_path, headers.get(xml_path), backup_base_dir) if reuse_backup_pdf else None
+                probing[io_pool.submit(_probe_input, xml_path, backup_paths)] = xml_path
+            # Etapa 2: solo si la etapa 3 no está saturada
+            while probed and len(processing) < cpu_limit and len(backing_up) < io_limit:
+                remaining = len(to_probe) + len(probing) + len(probed)
+                max_files = min(_CHUNK_MAX_FILES, -(-remaining // max(1, num_workers))) # Reparto parejo al final
+                chunk_ready = (probed_weight >= _CHUNK_TARGET_BYTES or len(probed) >= max_files
+                               or not (to_probe or probing))
+                if len(processing) >= num_workers and not chunk_ready:
+                    break # Todos los workers ocupados: se sigue llenando el bloque
+                items: List[Tuple[str, BackupProbe]] = []
+                chunk_weight = 0
+                while probed and len(items) < max_files and chunk_weight < _CHUNK_TARGET_BYTES:
+                    xml_path, backup_probe, weight = probed.popleft()
+                    probed_weight -= weight
+                    chunk_weight += weight
+                    items.append((xml_path, backup_probe))
+                processing[executor.submit(process_xml_chunk_task, items, temp_pdf_dir, reuse_backup_pdf,
+                                           backup_base_dir, True, render_pdf, batch_id)] = [xml_path for xml_path, _probe in items]
+            if not (probing or processing or backing_up):
+                continue
+
+            done, _not_done = wait([*probing, *processing, *backing_up], return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in probing:
+                    xml_path = probing.pop(future)
+                    try:
+                        size, backup_probe = future.result()
+                    except Exception as e_probe: # El worker lo comprobará por su cuenta
+                        logger.debug(f"No se pudo comprobar el respaldo de {os.path.basename(xml_path)}: {e_probe}")
+                        size, backup_probe = 0, None
+                    weight = _weight(size, backup_probe, render_pdf)
+                    probed.append((xml_path, backup_probe, weight))
+                    probed_weight += weight
+                elif future in processing:
+                    chunk_paths = processing.pop(future)
+                    try:
+                        results = [expand_result(compact) for compact in future.result()]
+                    except Exception as e_future:
+                        for xml_path in chunk_paths:
+                            yield xml_path, _error_result(xml_path, e_future)
+                        continue
+                    for xml_path, result in zip(chunk_paths, results):
+                        if result.get("pending_backup"):
+                            backing_up[io_pool.submit(complete_backup, result)] = xml_path
+                        else:
+                            yield xml_path, result
+                else:
+                    xml_path = backing_up.pop(future)
+                    try:
+                        yield xml_path, future.result()
+                    except Exception as e_future:
+                        yield xml_path, _error_result(xml_path, e_future)
+    finally:
+        for future in processing:
+            future.cancel()
+        io_pool.shutdown(wait=True, cancel_futures=True)
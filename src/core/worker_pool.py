@@ -0,0 +1,156 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\worker_pool.py
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Tiempo máximo (segundos) que se espera a cada worker al precalentar el pool
+WARM_UP_TIMEOUT_S = 60
+
+
+def _init_worker(cancelled_batch=None):
+    """
+    Inicializador de cada proceso hijo. Se ejecuta una sola vez por worker:
+    importa por adelantado el parser, los generadores de PDF y la clase de
+    código de barras para que la primera tarea no pague ese costo.
+    `cancelled_batch` es el valor compartido de WorkerPool.cancel_batch.
+    """
+    try:
+        from src.core import worker_tasks  # noqa: F401  (importa xml_parser y pdf_generator)
+        worker_tasks.set_cancelled_batch_value(cancelled_batch)
+        from src.core import xml_header_scanner  # noqa: F401
+        from src.core import pdf_invoice_generator  # noqa: F401
+        from src.core.pdf_base import BARCODE_SUPPORT
+        if BARCODE_SUPPORT:
+            import barcode
+            barcode.get_barcode_class('code128')
+    except Exception:
+        # Un fallo aquí no debe romper el pool: la tarea volverá a intentar las importaciones
+        logger.exception("Error precargando módulos en el proceso worker")
+
+
+def _ping() -> int:
+    """Tarea trivial usada para arrancar los workers."""
+    return os.getpid()
+
+
+class _PoolExecutor(Executor):
+    """
+    Executor que entrega WorkerPool.get_executor: envía cada tarea al ProcessPoolExecutor vigente
+    y, si está roto (un worker murió), lo recrea y reintenta el envío una vez. Las tareas que ya
+    estaban en el pool roto fallan con BrokenProcessPool al pedir su resultado.
+    """
+
+    def __init__(self, worker_pool: "WorkerPool"):
+        self._worker_pool = worker_pool
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        executor = self._worker_pool._current_executor()
+        try:
+            return executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            return self._worker_pool._replace_broken(executor).submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        pass # El pool es de la aplicación: se cierra con WorkerPool.shutdown
+
+
+class WorkerPool:
+    """
+    Pool de procesos persistente, propiedad de la aplicación.
+
+    Los workers se crean una única vez (con `_init_worker` como inicializador) y se
+    reutilizan en todos los lotes, incluidos los de "añadir más archivos". Si el pool
+    se rompe (un worker murió), se recrea de forma transparente en el siguiente envío de
+    una tarea (ver _PoolExecutor). Un pool ocupado no se considera roto.
+
+    Cancelación: cada lote pide un número con `begin_batch()` y lo pasa a sus tareas; tras
+    `cancel_batch()` los workers dejan de procesar los archivos restantes de esas tareas
+    (el valor es compartido, no hace falta esperar a que el proceso principal las lea).
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._pool_executor = _PoolExecutor(self)
+        self._mp_context = multiprocessing.get_context()
+        self._cancelled_batch = self._mp_context.Value('q', 0) # Último lote cancelado
+        self._last_batch = 0
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        logger.info(f"Iniciando pool de procesos persistente (workers: {self.max_workers})")
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._mp_context,
+                                   initializer=_init_worker, initargs=(self._cancelled_batch,))
+
+    def begin_batch(self) -> int:
+        """Número de lote para las tareas que se pueden cancelar con cancel_batch."""
+        with self._lock:
+            self._last_batch += 1
+            return self._last_batch
+
+    def cancel_batch(self, batch_id: int):
+        """Cancela el lote `batch_id` (y los anteriores) en los workers. Se puede llamar desde cualquier hilo."""
+        with self._cancelled_batch.get_lock():
+            if batch_id > self._cancelled_batch.value:
+                self._cancelled_batch.value = batch_id
+
+    @property
+    def cancelled_batch(self):
+        """Valor compartido de cancel_batch, para tareas que se ejecutan fuera del pool (ver execution_strategy)."""
+        return self._cancelled_batch
+
+    def _current_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("El pool de procesos está cerrado.")
+            if self._executor is None:
+                self._executor = self._create_executor()
+            return self._executor
+
+    def _replace_broken(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """Recrea el pool si `broken` sigue siendo el vigente (otro hilo pudo recrearlo ya)."""
+        with self._lock:
+            if self._executor is broken:
+                logger.warning("El pool de procesos está roto; se recreará.")
+                broken.shutdown(wait=False)
+                self._executor = None
+        return self._current_executor()
+
+    def get_executor(self) -> Executor:
+        """
+        Executor de la aplicación (ver _PoolExecutor). No espera a los workers: los procesos se
+        crean al enviar la primera tarea.
+        """
+        self._current_executor()
+        return self._pool_executor
+
+    def warm_up(self):
+        """
+        Arranca todos los workers sin bloquear al llamador. Con 'spawn' (Windows)
+        cada proceso hijo re-importa los módulos, así que conviene hacerlo antes
+        del primer lote y no en el clic de "Procesar".
+        """
+        def _warm():
+            try:
+                executor = self.get_executor()
+                for future in [executor.submit(_ping) for _ in range(self.max_workers)]:
+                    future.result(timeout=WARM_UP_TIMEOUT_S)
+                logger.info("Pool de procesos precalentado.")
+            except Exception as e:
+                logger.warning(f"No se pudo precalentar el pool de procesos: {e}")
+        threading.Thread(target=_warm, name="WorkerPoolWarmUp", daemon=True).start()
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        with self._lock:
+            self._closed = True
+            if self._executor is not None:
+                logger.info("Cerrando pool de procesos persistente.")
+                self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+                self._executor = None
@@ -1,14 +1,23 @@
 # d:\Datos\Desktop\Asistente Contable\src\core\worker_tasks.py
 import os
+import time
 import logging
 import shutil # Importar shutil para copiar archivos
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime # Importar datetime para obtener el año actual
-from PySide6.QtCore import QStandardPaths # Importar QStandardPaths para obtener la ruta de AppData
+
+# Qt es opcional: solo se usa para ubicar la carpeta de respaldo en AppData como lo hace la GUI.
+# En el modo por consola (src/cli.py) sin PySide6 se usa config.APP_DATA_DIR.
+try:
+    from PySide6.QtCore import QStandardPaths # Importar QStandardPaths para obtener la ruta de AppData
+    QT_PATHS_AVAILABLE = True
+except ImportError:
+    QT_PATHS_AVAILABLE = False
 
 # Importa directamente los módulos que la tarea necesita,
 # evitando cualquier importación de la GUI.
-from src.core import xml_parser
+from src import config
+from src.core import xml_parser, parse_cache, clave_acceso, date_utils, xml_source
 from src.core.pdf_generator import generate_pdf_from_xml # generate_pdf_from_xml ahora devuelve la ruta del PDF temporal
 # No necesitamos create_temp_folder aquí si temp_pdf_dir_arg ya es una ruta creada
 
@@ -16,18 +25,364 @@ logger = logging.getLogger(__name__) # Esto usará la configuración de logging
 
 # Constante para el nombre de la carpeta de respaldo (debe coincidir con MainWindow)
 BACKUP_FOLDER_NAME = "contribuyentes"
+# Variable de entorno para forzar la carpeta base de respaldos (servidores, ejecuciones desatendidas)
+BACKUP_DIR_ENV_VAR = "ASISTENTE_BACKUP_DIR"
+
+# Último lote cancelado (WorkerPool.cancel_batch); valor compartido que fija el inicializador del worker
+_cancelled_batch = None
+
+
+def set_cancelled_batch_value(cancelled_batch):
+    global _cancelled_batch
+    _cancelled_batch = cancelled_batch
+
+
+def batch_cancelled(batch_id: Optional[int]) -> bool:
+    """True si el lote `batch_id` fue cancelado desde el proceso principal."""
+    return batch_id is not None and _cancelled_batch is not None and batch_id <= _cancelled_batch.value
+
+
+def get_default_backup_base_dir() -> Optional[str]:
+    """
+    Carpeta base de respaldos: ASISTENTE_BACKUP_DIR si está definida; si no,
+    AppData/contribuyentes (vía QStandardPaths) o, sin Qt, APP_DATA_DIR/contribuyentes.
+    """
+    env_backup_dir = os.environ.get(BACKUP_DIR_ENV_VAR)
+    if env_backup_dir:
+        return env_backup_dir
+    if QT_PATHS_AVAILABLE:
+        appdata_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+        if appdata_dir:
+            return os.path.join(appdata_dir, BACKUP_FOLDER_NAME)
+        logger.error("Worker: No se pudo encontrar la ubicación de AppData para el respaldo.")
+        return None
+    return os.path.join(config.APP_DATA_DIR, BACKUP_FOLDER_NAME)
+
+
+def _resolve_backup_year(parsed_data: Dict[str, Any], xml_path: str) -> str:
+    """Año de la carpeta de respaldo: fecha de autorización, luego fecha de emisión, luego año actual."""
+    fecha_autorizacion_dt = parsed_data.get('fecha_autorizacion_dt')
+    if isinstance(fecha_autorizacion_dt, datetime):
+        return str(fecha_autorizacion_dt.year)
+    # Fallback: intentar obtener el año de la fecha de emisión si la fecha de autorización no está
+    fecha_emision_str = parsed_data.get('doc_especifico', {}).get('fecha_emision')
+    if fecha_emision_str:
+        fecha_emision_dt = date_utils.parse_fecha(fecha_emision_str)
+        if fecha_emision_dt is not None:
+            return str(fecha_emision_dt.year)
+        logger.warning(f"Worker: No se pudo parsear fechaEmision '{fecha_emision_str}' para año de respaldo en {os.path.basename(xml_path)}.")
+    # Fallback: año de emisión codificado en la clave de acceso
+    clave = clave_acceso.decode(parsed_data.get('info_tributaria', {}).get('clave_acceso'))
+    if clave and clave.valida:
+        return str(clave.fecha_emision.year)
+    # Fallback final al año actual si no se pudo determinar
+    year = str(datetime.now().year)
+    logger.warning(f"Worker: No se pudo determinar el año para {os.path.basename(xml_path)}. Usando año actual ({year}) para respaldo.")
+    return year
+
+
+def _resolve_backup_buyer_folder(parsed_data: Dict[str, Any], xml_path: str) -> str:
+    """Nombre de carpeta del comprador/sujeto retenido dentro de la carpeta del año."""
+    # Obtener el ID del comprador/sujeto retenido
+    buyer_id = parsed_data.get('comprador', {}).get('identificacion')
+    if not buyer_id:
+        logger.warning(f"Worker: No se encontró ID de comprador/sujeto retenido para {os.path.basename(xml_path)}. Usando 'Desconocido' para respaldo.")
+        buyer_id = "Desconocido"
+    return _safe_folder_name(buyer_id)
+
+
+def _safe_folder_name(buyer_id: str) -> str:
+    # Limpiar el ID del comprador para usarlo como nombre de carpeta
+    buyer_id_safe_folder = "".join(c if c.isalnum() else "_" for c in buyer_id)
+    if not buyer_id_safe_folder: buyer_id_safe_folder = "ID_Desconocido" # Fallback si el ID limpiado queda vacío
+    return buyer_id_safe_folder
+
+
+def _build_backup_paths(backup_base_dir: Optional[str], year: str, buyer_folder: str, xml_path: str,
+                        unique_id: Optional[str]) -> Optional[Tuple[str, str]]:
+    """
+    Rutas de respaldo del XML y del PDF: <base>/<año>/<comprador>/<numeroAutorizacion>.xml|.pdf
+    Devuelve None si no se puede determinar la carpeta base.
+    """
+    backup_base_dir = backup_base_dir or get_default_backup_base_dir()
+    if not backup_base_dir:
+        return None
+
+    # Usar el número de autorización como nombre de archivo base para el respaldo
+    backup_filename_base = unique_id
+    if not backup_filename_base:
+        # Fallback si no hay número de autorización ni clave de acceso
+        backup_filename_base = f"SIN_AUT_{os.path.basename(xml_path).replace('.xml', '')}"
+        logger.warning(f"Worker: No se encontró número de autorización para {os.path.basename(xml_path)}. Usando '{backup_filename_base}' como nombre base para respaldo.")
+
+    backup_buyer_dir = os.path.join(backup_base_dir, year, buyer_folder)
+    return (os.path.join(backup_buyer_dir, f"{backup_filename_base}.xml"),
+            os.path.join(backup_buyer_dir, f"{backup_filename_base}.pdf"))
+
+
+def predict_backup_paths(xml_path: str, header: Optional[Dict[str, str]],
+                         backup_base_dir: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """
+    Rutas de respaldo que calculará el worker, deducidas de la cabecera del pre-análisis
+    (scan_xml_header) sin parsear el XML. Sirven para comprobar en un hilo de E/S, antes de
+    enviar el archivo al pool, si el respaldo ya existe. None si la cabecera no alcanza.
+    """
+    if not header or not header.get("numero_autorizacion"):
+        return None
+    buyer_id = header.get("id_comprador_raw")
+    if not buyer_id or buyer_id == "N/A":
+        return None
+    fecha_autorizacion_dt = date_utils.parse_fecha(header.get("fecha_autorizacion") or None)
+    if fecha_autorizacion_dt is not None:
+        year = str(fecha_autorizacion_dt.year)
+    else:
+        clave = clave_acceso.decode(header.get("clave_acceso"))
+        if not (clave and clave.valida):
+            return None
+        year = str(clave.fecha_emision.year)
+    return _build_backup_paths(backup_base_dir, year, _safe_folder_name(buyer_id), xml_path, header["numero_autorizacion"])
+
+
+def probe_backup(backup_paths: Tuple[str, str]) -> Tuple[str, str, bool]:
+    """(ruta XML, ruta PDF, existen ambos) del respaldo. Se ejecuta en un hilo de E/S."""
+    backup_xml_path, backup_pdf_path = backup_paths
+    return backup_xml_path, backup_pdf_path, os.path.exists(backup_xml_path) and os.path.exists(backup_pdf_path)
+
+
+def _write_backup(xml_path: str, backup_xml_path: str, backup_pdf_path: Optional[str], temp_pdf_path: Optional[str],
+                  unique_id: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Copia el XML y el PDF temporal a sus rutas de respaldo (sin sobrescribir los existentes).
+    Sin `backup_pdf_path` solo se respalda el XML (PDF diferido).
+    Devuelve las rutas de respaldo que quedaron disponibles: (xml, pdf), None en lo que falló.
+    """
+    try:
+        # Crear directorios si no existen
+        os.makedirs(os.path.dirname(backup_xml_path), exist_ok=True)
+
+        # Verificar si el archivo XML de respaldo ya existe para evitar duplicados
+        if not os.path.exists(backup_xml_path):
+            # Copiar el archivo XML original (o el miembro del ZIP de origen)
+            xml_source.copy_to(xml_path, backup_xml_path)
+            logger.debug(f"Worker: XML respaldado en: {backup_xml_path}")
+        else:
+            logger.info(f"Worker: Respaldo XML para {os.path.basename(xml_path)} (Num Aut: {unique_id}) ya existe. Omitiendo copia.")
+
+        if backup_pdf_path:
+            backup_pdf_path = _copy_pdf_to_backup(xml_path, backup_pdf_path, temp_pdf_path)
+        return backup_xml_path, backup_pdf_path
+
+    except Exception as backup_copy_error:
+        logger.error(f"Worker: Error durante la copia de respaldo para {os.path.basename(xml_path)}: {backup_copy_error}")
+        # Si falla la copia, no reportar la ruta de respaldo exitosa
+        return None, None
+
+
+def _copy_pdf_to_backup(xml_path: str, backup_pdf_path: str, temp_pdf_path: Optional[str]) -> Optional[str]:
+    """Copia el PDF temporal al respaldo. Devuelve la ruta de respaldo, o None si no quedó PDF respaldado."""
+    # Copiar el PDF temporal si se generó; también completa respaldos previos sin PDF
+    if os.path.exists(backup_pdf_path):
+        logger.debug(f"Worker: PDF de respaldo existente encontrado: {backup_pdf_path}")
+    elif temp_pdf_path and os.path.exists(temp_pdf_path):
+        shutil.copy2(temp_pdf_path, backup_pdf_path)
+        logger.debug(f"Worker: PDF respaldado en: {backup_pdf_path}")
+    else:
+        if temp_pdf_path:
+            logger.warning(f"Worker: PDF temporal no encontrado para respaldo: {temp_pdf_path}")
+        else:
+            logger.warning(f"Worker: No se generó PDF temporal para respaldo de {os.path.basename(xml_path)}.")
+        return None # No reportar la ruta del PDF de respaldo si no existe
+    return backup_pdf_path
+
+
+def render_pdf_task(xml_path_arg: str, temp_pdf_dir_arg: str) -> Dict[str, Any]:
+    """
+    Genera el PDF de un XML ya procesado con el PDF diferido (src/core/lazy_pdf.py).
+    Se ejecuta en un proceso hijo; la copia al respaldo la hace el proceso principal (backup_rendered_pdf).
+    Es el segundo parseo completo del XML (el primero fue en process_single_xml_file_task).
+    """
+    try:
+        temp_pdf_path = generate_pdf_from_xml(xml_path_arg, temp_pdf_dir_arg)
+        return {"xml_path": xml_path_arg, "temp_pdf_path": temp_pdf_path,
+                "pdf_error": None if temp_pdf_path else "Error PDF: no se generó el archivo."}
+    except Exception as e_pdf_process:
+        logger.exception(f"Error generando el PDF diferido de {os.path.basename(xml_path_arg)}:")
+        return {"xml_path": xml_path_arg, "temp_pdf_path": None, "pdf_error": f"Error PDF: {e_pdf_process}"}
+
+
+def backup_rendered_pdf(result: Dict[str, Any], backup_pdf_path: Optional[str]) -> Dict[str, Any]:
+    """Completa el resultado de render_pdf_task con la copia al respaldo. Se ejecuta en un hilo de E/S."""
+    result["backup_pdf_path"] = None
+    if backup_pdf_path and result.get("temp_pdf_path"):
+        try:
+            os.makedirs(os.path.dirname(backup_pdf_path), exist_ok=True)
+            result["backup_pdf_path"] = _copy_pdf_to_backup(result["xml_path"], backup_pdf_path, result["temp_pdf_path"])
+        except Exception as backup_copy_error:
+            logger.error(f"Error respaldando el PDF diferido de {os.path.basename(result['xml_path'])}: {backup_copy_error}")
+    return result
+
+
+# --- Resultados compactos (tareas por bloques) ---
+# El resultado de process_single_xml_file_task se envía del worker al proceso principal con
+# pickle. Como dict, cada fila repite los ~60 nombres de columna; en forma compacta viaja como
+# (estado, valores de la fila en el orden de ROW_FIELDS, columnas extra de la fila).
+
+# Campos del resultado, en el orden de la tupla de estado
+_RESULT_FIELDS = ("xml_path", "error", "cod_doc", "unique_id", "temp_pdf_path", "backup_pdf_path",
+                  "pdf_reused_from_backup", "pdf_error", "conversion_errors", "pdf_pending",
+                  "pending_backup_pdf_path", "pending_backup", "cache_entry", "cpu_s")
+# Columnas de row_data que se envían por posición (extract_data_from_xml las crea todas)
+ROW_FIELDS = tuple(xml_parser.ALL_CSV_FIELDS)
+_ROW_FIELDS_SET = frozenset(ROW_FIELDS)
+
+CompactResult = Tuple[tuple, Optional[tuple], Optional[Dict[str, Any]]]
+
+# Error de los archivos que no se procesaron porque el lote se canceló
+CANCELLED_ERROR = "Procesamiento cancelado."
+
+
+def compact_result(result: Dict[str, Any]) -> CompactResult:
+    """Forma compacta del resultado de process_single_xml_file_task (ver expand_result)."""
+    row_data = result.get("row_data")
+    row_values = row_extra = None
+    if row_data:
+        row_values = tuple(row_data.get(field) for field in ROW_FIELDS)
+        row_extra = {key: value for key, value in row_data.items() if key not in _ROW_FIELDS_SET} or None
+    cache_entry = result.get("cache_entry")
+    if cache_entry and cache_entry.get("row_data") is row_data:
+        cache_entry = dict(cache_entry, row_data=None) # Es la misma fila: no se envía dos veces
+    status = tuple(cache_entry if field == "cache_entry" else result.get(field) for field in _RESULT_FIELDS)
+    return status, row_values, row_extra
+
+
+def expand_result(compact: CompactResult) -> Dict[str, Any]:
+    """Resultado equivalente al de process_single_xml_file_task. Se ejecuta en el proceso principal."""
+    status, row_values, row_extra = compact
+    result = dict(zip(_RESULT_FIELDS, status))
+    row_data = None
+    if row_values is not None:
+        row_data = dict(zip(ROW_FIELDS, row_values))
+        if row_extra:
+            row_data.update(row_extra)
+    result["row_data"] = row_data
+    cache_entry = result["cache_entry"]
+    if cache_entry and cache_entry.get("row_data") is None:
+        cache_entry["row_data"] = row_data
+    if result["pending_backup"] is None:
+        del result["pending_backup"]
+    return result
+
+
+def process_xml_chunk_task(items: List[Tuple[str, Optional[Tuple[str, str, bool]]]], temp_pdf_dir_arg: str,
+                           reuse_backup_pdf_arg: bool = True, backup_base_dir_arg: Optional[str] = None,
+                           defer_backup_arg: bool = False, render_pdf_arg: bool = True,
+                           batch_id_arg: Optional[int] = None) -> List[CompactResult]:
+    """
+    process_single_xml_file_task para un bloque de archivos: `items` son (ruta, backup_probe).
+    Una tarea por bloque reduce el costo fijo de cada envío al pool, que con XML pequeños
+    pesa más que el propio parseo. Devuelve los resultados en forma compacta, en el mismo orden.
+    Si el lote `batch_id_arg` se cancela, los archivos que faltan se devuelven como cancelados.
+    Cada resultado lleva "cpu_s", el tiempo de CPU del archivo (execution_strategy aprende de él).
+    """
+    results: List[CompactResult] = []
+    for xml_path, backup_probe in items:
+        if batch_cancelled(batch_id_arg):
+            results.append(compact_result({"xml_path": xml_path, "error": CANCELLED_ERROR}))
+            continue
+        # CPU del hilo, no del proceso: en línea o en hilos (execution_strategy) no cuenta a los demás
+        cpu_start = time.thread_time()
+        result = process_single_xml_file_task(
+            xml_path, temp_pdf_dir_arg, reuse_backup_pdf_arg, backup_base_dir_arg,
+            backup_probe, defer_backup_arg, render_pdf_arg)
+        result["cpu_s"] = time.thread_time() - cpu_start
+        results.append(compact_result(result))
+    return results
+
+
+def complete_backup(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Realiza el respaldo que process_single_xml_file_task dejó pendiente (`defer_backup_arg`) y
+    completa el resultado. Se ejecuta en un hilo de E/S del proceso principal (staged_pipeline).
+    """
+    pending_backup = result.pop("pending_backup", None)
+    if pending_backup:
+        _backup_xml_path, result["backup_pdf_path"] = _write_backup(
+            result["xml_path"], pending_backup["xml"], pending_backup["pdf"], result.get("temp_pdf_path"), result.get("unique_id"))
+    return result
+
+
+def result_from_cache_entry(xml_path: str, cache_entry: Dict[str, Any],
+                            backup_base_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Resultado equivalente al de process_single_xml_file_task para un XML que ya está en la
+    caché de parseo (src/core/parse_cache.py) y cuyo respaldo (XML + PDF) existe: no se
+    parsea ni se genera nada. Se ejecuta en el proceso principal.
+
+    Devuelve None si el respaldo no está completo; en ese caso el archivo se envía al worker.
+    """
+    if not cache_entry.get("backup_year") or not cache_entry.get("backup_buyer_folder"):
+        return None
+    unique_id = cache_entry.get("numero_autorizacion") or None
+    backup_paths = _build_backup_paths(backup_base_dir, cache_entry["backup_year"],
+                                       cache_entry["backup_buyer_folder"], xml_path, unique_id)
+    if not backup_paths or not (os.path.exists(backup_paths[0]) and os.path.exists(backup_paths[1])):
+        return None
+    return {
+        "xml_path": xml_path,
+        "temp_pdf_path": None,
+        "backup_pdf_path": backup_paths[1],
+        "pdf_reused_from_backup": True,
+        "row_data": cache_entry["row_data"],
+        "cod_doc": cache_entry.get("cod_doc"),
+        "unique_id": unique_id,
+        "conversion_errors": cache_entry.get("conversion_errors") or [],
+        "pdf_error": None,
+        "cache_entry": None, # Ya está en la caché
+        "error": None
+    }
+
 
 def process_single_xml_file_task(
     xml_path_arg: str, 
     temp_pdf_dir_arg: str, 
     # emisor_logo_path_arg eliminado
+    reuse_backup_pdf_arg: bool = True,
+    backup_base_dir_arg: Optional[str] = None,
+    backup_probe_arg: Optional[Tuple[str, str, bool]] = None,
+    defer_backup_arg: bool = False,
+    render_pdf_arg: bool = True,
 ) -> Dict[str, Any]:
     """
     Procesa un único archivo XML: parsea, extrae datos, genera PDF y realiza respaldo.
     Esta función se ejecuta en un proceso hijo.
+
+    El XML se parsea completo una sola vez, aquí: el pre-análisis solo lee la cabecera
+    (xml_header_scanner) y el documento parseado se reutiliza para la extracción de datos,
+    el PDF y el respaldo. Con el PDF diferido, render_pdf_task vuelve a parsearlo.
+
+    Si `reuse_backup_pdf_arg` es True y el respaldo (XML + PDF) de este número de
+    autorización ya existe, no se genera el PDF: se reutiliza el PDF respaldado.
+
+    `backup_base_dir_arg` permite fijar la carpeta base de respaldos; por defecto se usa
+    get_default_backup_base_dir().
+
+    Para que el proceso no espere a la unidad de respaldos (staged_pipeline):
+    - `backup_probe_arg` es la comprobación ya hecha de si el respaldo existe (probe_backup);
+      se usa si sus rutas coinciden con las calculadas aquí;
+    - con `defer_backup_arg` no se copia nada: el resultado lleva "pending_backup" y la copia
+      la hace complete_backup en el proceso principal.
+
+    Con `render_pdf_arg` en False (PDF diferido) no se genera el PDF: se respalda solo el XML y
+    el resultado lleva "pdf_pending" y la ruta prevista del PDF de respaldo; el PDF lo genera
+    después render_pdf_task.
     """
     try:
         conversion_errors_this_file: List[str] = []
+        # Identidad del archivo para la caché de parseo, tomada antes de leerlo
+        try:
+            xml_stat = xml_source.stat(xml_path_arg)
+        except OSError:
+            xml_stat = None
         parsed_data = xml_parser.parse_xml(xml_path_arg)
         if not parsed_data:
             return {"xml_path": xml_path_arg, "error": "Error de parseo XML."}
@@ -45,134 +400,80 @@ def process_single_xml_file_task(
         row_data["Nro de Autorización"] = unique_id
         row_data["fechaAutorizacion"] = parsed_data.get('fecha_autorizacion') # Fecha de autorización del XML principal
 
+        # --- Rutas de respaldo (se resuelven ANTES de generar el PDF) ---
+        backup_xml_path_result = None
+        backup_pdf_path_result = None
+        backup_year = backup_buyer_folder = None
+        try:
+            backup_year = _resolve_backup_year(parsed_data, xml_path_arg)
+            backup_buyer_folder = _resolve_backup_buyer_folder(parsed_data, xml_path_arg)
+            backup_paths = _build_backup_paths(backup_base_dir_arg, backup_year, backup_buyer_folder, xml_path_arg, unique_id)
+        except Exception as e_backup_paths:
+            logger.error(f"Worker: Error resolviendo rutas de respaldo para {os.path.basename(xml_path_arg)}: {e_backup_paths}")
+            backup_paths = None
+        if backup_paths:
+            backup_xml_path_result, backup_pdf_path_result = backup_paths
+
+        # El documento ya fue procesado en una importación anterior: reutilizar su PDF
+        if not (reuse_backup_pdf_arg and backup_paths):
+            pdf_reused_from_backup = False
+        elif backup_probe_arg is not None and backup_probe_arg[:2] == backup_paths:
+            pdf_reused_from_backup = backup_probe_arg[2]
+        else:
+            pdf_reused_from_backup = os.path.exists(backup_xml_path_result) and os.path.exists(backup_pdf_path_result)
+
         temp_pdf_path_result = None
         pdf_error_result = None
-        if temp_pdf_dir_arg:
+        pdf_pending = not render_pdf_arg and not pdf_reused_from_backup
+        pending_backup_pdf_path = backup_pdf_path_result if pdf_pending else None
+        if pdf_pending:
+            backup_pdf_path_result = None # Se respalda solo el XML
+        elif temp_pdf_dir_arg and not pdf_reused_from_backup:
             try:
                 # generate_pdf_from_xml ya no toma el logo del emisor
-                temp_pdf_path_result = generate_pdf_from_xml(xml_path_arg, temp_pdf_dir_arg)
+                temp_pdf_path_result = generate_pdf_from_xml(xml_path_arg, temp_pdf_dir_arg, parsed_data=parsed_data)
             except Exception as e_pdf_process:
                 pdf_error_result = f"Error PDF: {e_pdf_process}"
 
         # --- Lógica de Respaldo ---
-        backup_pdf_path_result = None # Inicializar la ruta del PDF de respaldo
-        backup_xml_path_result = None # Inicializar la ruta del XML de respaldo
-
-        # Necesitamos el año y el ID del comprador para la estructura de respaldo
-        year = None
-        # Intentar obtener el año de la fecha de autorización
-        fecha_autorizacion_dt = parsed_data.get('fecha_autorizacion_dt')
-        if isinstance(fecha_autorizacion_dt, datetime):
-             year = str(fecha_autorizacion_dt.year)
-        else:
-            # Fallback: intentar obtener el año de la fecha de emisión si la fecha de autorización no está
-            fecha_emision_str = parsed_data.get('doc_especifico', {}).get('fecha_emision')
-            if fecha_emision_str:
-                try:
-                    # Asumir formato DD/MM/YYYY para fechaEmision
-                    date_obj_emision = datetime.strptime(fecha_emision_str, '%d/%m/%Y')
-                    year = str(date_obj_emision.year)
-                except ValueError:
-                    logger.warning(f"Worker: No se pudo parsear fechaEmision '{fecha_emision_str}' para año de respaldo en {os.path.basename(xml_path_arg)}.")
-
-        # Fallback final al año actual si no se pudo determinar
-        if not year:
-            year = str(datetime.now().year)
-            logger.warning(f"Worker: No se pudo determinar el año para {os.path.basename(xml_path_arg)}. Usando año actual ({year}) para respaldo.")
-
-
-        # Obtener el ID del comprador/sujeto retenido
-        buyer_id = parsed_data.get('comprador', {}).get('identificacion')
-        if not buyer_id:
-             logger.warning(f"Worker: No se encontró ID de comprador/sujeto retenido para {os.path.basename(xml_path_arg)}. Usando 'Desconocido' para respaldo.")
-             buyer_id = "Desconocido"
-
-        # Usar el número de autorización como nombre de archivo base para el respaldo
-        backup_filename_base = unique_id
-        if not backup_filename_base:
-             # Fallback si no hay número de autorización ni clave de acceso
-             backup_filename_base = f"SIN_AUT_{os.path.basename(xml_path_arg).replace('.xml', '')}"
-             logger.warning(f"Worker: No se encontró número de autorización para {os.path.basename(xml_path_arg)}. Usando '{backup_filename_base}' como nombre base para respaldo.")
-
-
-        if year and buyer_id and backup_filename_base:
-            try:
-                # Obtener la ruta de AppData
-                appdata_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
-                if not appdata_dir:
-                    logger.error("Worker: No se pudo encontrar la ubicación de AppData para el respaldo.")
-                else:
-                    backup_base_dir = os.path.join(appdata_dir, BACKUP_FOLDER_NAME)
-                    # Limpiar el ID del comprador para usarlo como nombre de carpeta
-                    buyer_id_safe_folder = "".join(c if c.isalnum() else "_" for c in buyer_id)
-                    if not buyer_id_safe_folder: buyer_id_safe_folder = "ID_Desconocido" # Fallback si el ID limpiado queda vacío
-
-                    backup_year_dir = os.path.join(backup_base_dir, year)
-                    backup_buyer_dir = os.path.join(backup_year_dir, buyer_id_safe_folder)
-
-                    # Crear directorios si no existen
-                    os.makedirs(backup_buyer_dir, exist_ok=True)
-                    logger.debug(f"Worker: Directorio de respaldo asegurado: {backup_buyer_dir}")
-
-                    # Rutas de destino para el respaldo
-                    backup_xml_path_result = os.path.join(backup_buyer_dir, f"{backup_filename_base}.xml")
-                    backup_pdf_path_result = os.path.join(backup_buyer_dir, f"{backup_filename_base}.pdf")
-
-                    # Verificar si el archivo XML de respaldo ya existe para evitar duplicados
-                    if not os.path.exists(backup_xml_path_result):
-                        try:
-                            # Copiar el archivo XML original
-                            shutil.copy2(xml_path_arg, backup_xml_path_result)
-                            logger.debug(f"Worker: XML respaldado en: {backup_xml_path_result}")
-
-                            # Copiar el archivo PDF temporal si se generó exitosamente
-                            if temp_pdf_path_result and os.path.exists(temp_pdf_path_result):
-                                shutil.copy2(temp_pdf_path_result, backup_pdf_path_result)
-                                logger.debug(f"Worker: PDF respaldado en: {backup_pdf_path_result}")
-                            elif temp_pdf_path_result:
-                                logger.warning(f"Worker: PDF temporal no encontrado para respaldo: {temp_pdf_path_result}")
-                            else:
-                                logger.warning(f"Worker: No se generó PDF temporal para respaldo de {os.path.basename(xml_path_arg)}.")
-
-                        except Exception as backup_copy_error:
-                            logger.error(f"Worker: Error durante la copia de respaldo para {os.path.basename(xml_path_arg)}: {backup_copy_error}")
-                            # Si falla la copia, no reportar la ruta de respaldo exitosa
-                            backup_xml_path_result = None
-                            backup_pdf_path_result = None
-                    else:
-                        logger.info(f"Worker: Respaldo para {os.path.basename(xml_path_arg)} (Num Aut: {backup_filename_base}) ya existe. Omitiendo copia.")
-                        # Si el XML ya existe, verificar si el PDF también existe y reportar la ruta si es así
-                        if os.path.exists(backup_pdf_path_result):
-                             logger.debug(f"Worker: PDF de respaldo existente encontrado: {backup_pdf_path_result}")
-                        else:
-                             # Si el XML existe pero el PDF no, esto podría indicar un respaldo incompleto previo.
-                             # Podríamos intentar copiar solo el PDF aquí si temp_pdf_path_result existe.
-                             # Por ahora, solo logueamos y no reportamos la ruta del PDF de respaldo.
-                             logger.warning(f"Worker: XML de respaldo existe pero PDF no para {os.path.basename(xml_path_arg)}. PDF de respaldo no reportado.")
-                             backup_pdf_path_result = None # No reportar la ruta del PDF de respaldo si no existe
-
-            except Exception as general_backup_setup_error:
-                logger.error(f"Worker: Error general configurando respaldo para {os.path.basename(xml_path_arg)}: {general_backup_setup_error}")
-                backup_xml_path_result = None
-                backup_pdf_path_result = None
+        pending_backup = None
+        if pdf_reused_from_backup:
+            logger.debug(f"Worker: Respaldo existente para {os.path.basename(xml_path_arg)} (Num Aut: {unique_id}). PDF reutilizado sin regenerar.")
+        elif backup_paths and defer_backup_arg:
+            pending_backup = {"xml": backup_xml_path_result, "pdf": backup_pdf_path_result}
+            backup_pdf_path_result = None # Lo completa complete_backup
+        elif backup_paths:
+            backup_xml_path_result, backup_pdf_path_result = _write_backup(
+                xml_path_arg, backup_xml_path_result, backup_pdf_path_result, temp_pdf_path_result, unique_id)
         else:
-            logger.warning(f"Worker: Datos insuficientes (año, buyer_id o unique_id) para realizar respaldo de {os.path.basename(xml_path_arg)}. Respaldo omitido.")
-
-
+            logger.warning(f"Worker: No se pudo determinar la ubicación de respaldo de {os.path.basename(xml_path_arg)}. Respaldo omitido.")
         # --- Fin Lógica de Respaldo ---
 
+        # Entrada para la caché de parseo; la escribe el proceso principal (escritura por lotes)
+        cache_entry = None
+        if xml_stat is not None:
+            cache_entry = parse_cache.build_cache_entry(
+                xml_path_arg, xml_stat, parsed_data, row_data, unique_id, conversion_errors_this_file,
+                backup_year, backup_buyer_folder)
 
-        return {
+        result = {
             "xml_path": xml_path_arg,
-            "temp_pdf_path": temp_pdf_path_result, # Ruta del PDF temporal
-            "backup_pdf_path": backup_pdf_path_result, # Ruta del PDF de respaldo (si se realizó)
+            "pdf_pending": pdf_pending,
+            "pending_backup_pdf_path": pending_backup_pdf_path,
+            "temp_pdf_path": temp_pdf_path_result, # Ruta del PDF temporal (None si se reutilizó el respaldo)
+            "backup_pdf_path": backup_pdf_path_result, # Ruta del PDF de respaldo (si existe)
+            "pdf_reused_from_backup": pdf_reused_from_backup,
             "row_data": row_data,
             "cod_doc": actual_cod_doc,
             "unique_id": unique_id,
             "conversion_errors": conversion_errors_this_file,
             "pdf_error": pdf_error_result,
+            "cache_entry": cache_entry,
             "error": None # No hay error crítico de procesamiento si llegamos aquí
         }
+        if pending_backup:
+            result["pending_backup"] = pending_backup
+        return result
     except Exception as e_process_file:
         logger.exception(f"Error procesando archivo {os.path.basename(xml_path_arg)} en proceso hijo (worker_tasks):")
         return {"xml_path": xml_path_arg, "error": f"Child Crash in worker_tasks: {type(e_process_file).__name__}: {e_process_file}"}
@@ -0,0 +1,92 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\xml_backend.py
+import os
+import re
+import logging
+import xml.etree.ElementTree as ET
+from typing import Any
+
+from src.core import xml_source
+
+logger = logging.getLogger(__name__)
+
+# Backend de parseo XML para xml_parser y file_handler: ElementTree (por defecto) o lxml, con el
+# mismo parsed_data (benchmarks/check_backend_equivalence.py). lxml parsea más rápido, pero
+# recorrer sus elementos desde Python es ~2x más lento (benchmarks/bench_parser.py).
+try:
+    from lxml import etree as lxml_etree
+    LXML_AVAILABLE = True
+except ImportError:
+    lxml_etree = None
+    LXML_AVAILABLE = False
+
+# Backend a usar: "etree" (por defecto) o "lxml" (p. ej. CDATA enormes). Se hereda en los procesos worker.
+XML_BACKEND_ENV_VAR = "ASISTENTE_XML_BACKEND"
+
+# lxml no acepta cadenas Unicode con declaración de codificación; el CDATA ya está decodificado
+_XML_DECLARATION_RE = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+if LXML_AVAILABLE:
+    # huge_tree: sin límites de tamaño de nodo de texto (CDATA de comprobantes grandes).
+    # resolve_entities/no_network: nada de entidades externas ni descargas (XXE).
+    # Comentarios e instrucciones de proceso se descartan, igual que en ElementTree.
+    _LXML_PARSER_OPTIONS = dict(resolve_entities=False, no_network=True, huge_tree=True,
+                                remove_comments=True, remove_pis=True)
+    ParseError = (ET.ParseError, lxml_etree.XMLSyntaxError)
+else:
+    ParseError = (ET.ParseError,)
+
+
+def _resolve_backend_name() -> str:
+    requested = os.environ.get(XML_BACKEND_ENV_VAR, "").strip().lower()
+    if requested == "lxml":
+        if LXML_AVAILABLE:
+            return "lxml"
+        logger.warning(f"{XML_BACKEND_ENV_VAR}=lxml pero lxml no está instalado. Se usa ElementTree.")
+    elif requested and requested != "etree":
+        logger.warning(f"{XML_BACKEND_ENV_VAR}='{requested}' no reconocido. Se usa ElementTree.")
+    return "etree"
+
+
+_backend_name = _resolve_backend_name()
+_lxml_parser = None
+
+
+def _get_lxml_parser():
+    # Un parser por proceso: los objetos XMLParser de lxml no se pueden compartir entre procesos
+    global _lxml_parser
+    if _lxml_parser is None:
+        _lxml_parser = lxml_etree.XMLParser(**_LXML_PARSER_OPTIONS)
+    return _lxml_parser
+
+
+def get_backend_name() -> str:
+    """'lxml' o 'etree'."""
+    return _backend_name
+
+
+def set_backend(name: str):
+    """Cambia el backend del proceso actual ('lxml' o 'etree'). Para comparaciones y benchmarks."""
+    global _backend_name
+    if name not in ("lxml", "etree"):
+        raise ValueError(f"Backend XML desconocido: {name}")
+    if name == "lxml" and not LXML_AVAILABLE:
+        raise ValueError("lxml no está instalado.")
+    _backend_name = name
+
+
+def parse_file(xml_path: str) -> Any:
+    """Parsea un archivo XML (o miembro de ZIP, ver xml_source) y devuelve su elemento raíz."""
+    if _backend_name == "lxml":
+        with xml_source.open_binary(xml_path) as f:
+            return lxml_etree.parse(f, _get_lxml_parser()).getroot()
+    if xml_source.is_member_path(xml_path):
+        with xml_source.open_binary(xml_path) as f:
+            return ET.parse(f).getroot()
+    return ET.parse(xml_path).getroot()
+
+
+def parse_string(xml_text: str) -> Any:
+    """Parsea XML ya decodificado (p. ej. el CDATA del comprobante) y devuelve su elemento raíz."""
+    if _backend_name == "lxml":
+        return lxml_etree.fromstring(_XML_DECLARATION_RE.sub('', xml_text, count=1), _get_lxml_parser())
+    return ET.fromstring(xml_text)
@@ -0,0 +1,156 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\xml_header_scanner.py
+import xml.etree.ElementTree as ET
+import os
+import logging
+from typing import Dict, List, Optional
+
+from src.core import xml_source
+from src.core.clave_acceso import clave_acceso_from_filename, clave_acceso_from_header_bytes, decode as decode_clave_acceso
+
+logger = logging.getLogger(__name__)
+
+# Cabecera del comprobante (codDoc, clave, comprador) sin parsearlo entero; sin xml_parser ni PDF
+
+# Tamaño de los bloques con los que se alimenta el parser incremental del CDATA
+_CDATA_FEED_CHUNK = 16 * 1024
+
+# Sección de información específica y etiquetas del comprador/sujeto por tipo de documento.
+# Debe coincidir con la lógica de xml_parser.parse_xml para 'id_comprador_raw' y 'comprador'.
+_BUYER_TAGS_BY_COD_DOC = {
+    "01": ("infoFactura", "identificacionComprador", "razonSocialComprador"),
+    "04": ("infoNotaCredito", "identificacionComprador", "razonSocialComprador"),
+    "05": ("infoNotaDebito", "identificacionComprador", "razonSocialComprador"),
+    "07": ("infoCompRetencion", "identificacionSujetoRetenido", "razonSocialSujetoRetenido"),
+}
+# Tipos de documento cuyo comprador se puede leer; los demás nunca se asignan a una entidad
+COD_DOCS_WITH_BUYER = frozenset(_BUYER_TAGS_BY_COD_DOC)
+
+
+def _clean_text(text: Optional[str]) -> str:
+    """Normaliza el texto igual que xml_parser._clean_text."""
+    if not text:
+        return ""
+    return text.strip().replace('\u2013', '-')
+
+
+def header_from_clave_acceso(clave_acceso: str, cod_doc: str, xml_path: str) -> Dict[str, str]:
+    """
+    Cabecera de un documento sin comprador (codDoc fuera de COD_DOCS_WITH_BUYER) a partir de
+    su clave de acceso: no hace falta leer el XML para saber que no pertenece a ninguna entidad.
+    """
+    return {"cod_doc": cod_doc, "clave_acceso": clave_acceso, "id_comprador_raw": "N/A",
+            "razon_social_comprador": "N/A", "numero_autorizacion": clave_acceso,
+            "fecha_autorizacion": "", "xml_path": xml_path}
+
+
+def _scan_comprobante_header(comprobante_cdata: str) -> Dict[str, str]:
+    """
+    Lee el XML del comprobante de forma incremental y se detiene en cuanto tiene
+    codDoc, claveAcceso y la identificación/razón social del comprador.
+    """
+    header = {"cod_doc": "", "clave_acceso": "", "id_comprador_raw": "N/A", "razon_social_comprador": "N/A"}
+    parser = ET.XMLPullParser(events=("start", "end"))
+    info_tag = id_tag = rs_tag = None
+    in_info_tributaria = False
+    in_info_section = False
+    info_section_seen = False
+    buyer_tags_found = set()
+
+    for offset in range(0, len(comprobante_cdata), _CDATA_FEED_CHUNK):
+        parser.feed(comprobante_cdata[offset:offset + _CDATA_FEED_CHUNK])
+        for event, element in parser.read_events():
+            tag = element.tag
+            if event == "start":
+                if tag == "infoTributaria":
+                    in_info_tributaria = True
+                elif info_tag and tag == info_tag and not info_section_seen:
+                    in_info_section = True
+                    info_section_seen = True
+                    # Sección presente: los valores por defecto pasan a ser cadena vacía
+                    header["id_comprador_raw"] = ""
+                    header["razon_social_comprador"] = ""
+                continue
+
+            # event == "end"
+            if in_info_tributaria:
+                if tag == "codDoc" and not header["cod_doc"]:
+                    header["cod_doc"] = _clean_text(element.text)
+                    buyer_tags = _BUYER_TAGS_BY_COD_DOC.get(header["cod_doc"])
+                    if buyer_tags:
+                        info_tag, id_tag, rs_tag = buyer_tags
+                elif tag == "claveAcceso" and not header["clave_acceso"]:
+                    header["clave_acceso"] = _clean_text(element.text)
+                elif tag == "infoTributaria":
+                    in_info_tributaria = False
+                    if not info_tag:
+                        # Tipo de documento sin comprador conocido: no hay nada más que leer
+                        parser.close()
+                        return header
+            elif in_info_section:
+                if tag in (id_tag, rs_tag) and tag not in buyer_tags_found:
+                    buyer_tags_found.add(tag)
+                    header["id_comprador_raw" if tag == id_tag else "razon_social_comprador"] = _clean_text(element.text)
+                elif tag == info_tag:
+                    # Fin de la sección específica: todo lo necesario ya fue leído
+                    return header
+    parser.close()
+    return header
+
+
+def scan_xml_header(xml_path: str) -> Optional[Dict[str, str]]:
+    """
+    Extrae solo los datos de cabecera de un XML de autorización del SRI:
+    número y fecha de autorización, codDoc, claveAcceso y el comprador.
+
+    No construye los detalles ni la información adicional. Devuelve None si el
+    archivo no existe o no se puede parsear.
+    """
+    if not xml_source.exists(xml_path):
+        logger.error(f"Archivo XML no encontrado en {xml_path}")
+        return None
+
+    if not clave_acceso_from_filename(xml_path):
+        # Sin clave en el nombre (batch_pipeline.scan_headers ya clasificó esos archivos):
+        # se busca en los primeros bytes para descartar sin parsear los tipos sin comprador
+        clave = decode_clave_acceso(clave_acceso_from_header_bytes(xml_path))
+        if clave and clave.valida and clave.cod_doc not in COD_DOCS_WITH_BUYER:
+            return header_from_clave_acceso(clave.clave, clave.cod_doc, xml_path)
+
+    try:
+        numero_autorizacion = ""
+        fecha_autorizacion = ""
+        comprobante_cdata = None
+        with xml_source.open_binary(xml_path) as xml_file:
+            for _event, element in ET.iterparse(xml_file, events=("end",)):
+                tag = element.tag
+                if tag == "numeroAutorizacion" and not numero_autorizacion:
+                    numero_autorizacion = _clean_text(element.text)
+                elif tag == "fechaAutorizacion" and not fecha_autorizacion:
+                    fecha_autorizacion = _clean_text(element.text)
+                elif tag == "comprobante" and comprobante_cdata is None:
+                    comprobante_cdata = element.text or ""
+                    element.clear()
+
+        if not comprobante_cdata:
+            logger.error(f"No se encontró la sección <comprobante> o está vacía en {xml_path}")
+            return None
+
+        header = _scan_comprobante_header(comprobante_cdata.lstrip('\ufeff'))
+        if not numero_autorizacion and header["clave_acceso"]:
+            numero_autorizacion = header["clave_acceso"]
+        header["numero_autorizacion"] = numero_autorizacion
+        header["fecha_autorizacion"] = fecha_autorizacion
+        header["xml_path"] = xml_path
+        return header
+    except ET.ParseError as e:
+        logger.error(f"Error de parseo XML (cabecera) en {os.path.basename(xml_path)}: {e}")
+        return None
+    except Exception:
+        logger.exception(f"Error inesperado leyendo la cabecera de {xml_path}")
+        return None
+
+
+
+def scan_xml_headers(xml_paths: List[str]) -> List[Optional[Dict[str, str]]]:
+    """scan_xml_header de un bloque de archivos en una sola tarea (batch_pipeline.scan_headers_streaming)."""
+    return [scan_xml_header(xml_path) for xml_path in xml_paths]
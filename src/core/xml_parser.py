@@ -1,7 +1,7 @@
 # d:\Datos\Desktop\Asistente Contable\src\core\xml_parser.py
 import xml.etree.ElementTree as ET
 import os
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Mapping, Optional, Sequence, Tuple
 import logging
 
 # Namespace handling (puede variar si tus XML usan namespaces explícitos)
@@ -12,6 +12,7 @@ import logging
 ns = {} # Vacío si no hay namespaces explícitos
 
 from datetime import datetime, timezone # <--- Importar datetime y timezone aquí
+from src.core import date_utils, xml_source
 logger = logging.getLogger(__name__) # Obtener logger para este módulo
 
 # Mapeo de códigos de tipo de identificación a nombres legibles
@@ -34,6 +35,14 @@ COD_DOC_MAP = {
 }
 # Importar el mapa necesario desde pdf_base
 from .pdf_base import IMPUESTO_RETENCION_MAP
+# Backend de parseo: lxml si está instalado, si no ElementTree
+from . import xml_backend
+# Registros compactos (__slots__) con acceso tipo dict para cada sección del comprobante
+from .document_model import (
+    Record, Comprobante, InfoTributaria, Comprador, Totales, ImpuestoResumen, Pago, InfoFactura,
+    InfoNotaDebito, InfoNotaCredito, InfoRetencion, Detalle, ImpuestoDetalle, DocSustento, Retencion,
+    DocModificado,
+)
 
 
 # Lista de todos los posibles campos CSV que se pueden extraer.
@@ -83,358 +92,396 @@ def _safe_float_conversion(
         return default_value
 
 
-def _find_text_or_default(element: Optional[ET.Element], xpath: str, default: str = '') -> str:
-    """Helper function to find text in an element or return a default value."""
-    if element is None:
-        return default
-    # Usar findtext con namespaces si están definidos, o sin ellos si ns es {}
-    found = element.findtext(xpath, default=default, namespaces=ns)
-    
-    # Asegurar que text_to_return sea una cadena antes de strip() y replace()
-    # Si found es None y default es None, text_to_return será None.
-    # Si found tiene texto, se usa. Si found es None pero default tiene texto, se usa default.
-    text_value = found if found is not None else default
-    
-    text_to_return = text_value.strip() if isinstance(text_value, str) else (default if isinstance(default, str) else "")
-    # Reemplazar caracteres problemáticos para Helvetica (Latin-1)
-    text_to_return = text_to_return.replace('\u2013', '-') # EN DASH to HYPHEN-MINUS
-    return text_to_return
-
 def _parse_fecha(fecha_str: str, xml_file_path_for_error: str, field_name: str) -> Optional[datetime]:
     if not fecha_str:
         return None
-    
-    possible_formats = [
-        "%d/%m/%Y",
-        "%Y-%m-%dT%H:%M:%S%z",
-        "%Y-%m-%dT%H:%M:%S",
-        "%d/%m/%Y %H:%M:%S"
-    ]
-    
-    # Normalizar 'Z' a '+00:00' para %z
-    if fecha_str.endswith('Z'):
-        fecha_str = fecha_str[:-1] + '+00:00'
-        
-    # Manejar formatos con milisegundos si aparecen
-    if '.' in fecha_str and ('%f' not in possible_formats):
-         possible_formats.insert(0, "%Y-%m-%dT%H:%M:%S.%f%z")
-         possible_formats.insert(0, "%Y-%m-%dT%H:%M:%S.%f")
-
-
-    for fmt in possible_formats:
-        try:
-            dt_obj = datetime.strptime(fecha_str, fmt)
-            return dt_obj
-        except ValueError:
-            continue
-            
-    logger.warning(f"Archivo: {os.path.basename(xml_file_path_for_error)}, Campo: '{field_name}', "
-                   f"Valor: '{fecha_str}'. No se pudo parsear la fecha con los formatos conocidos.")
-    return None
+    dt_obj = date_utils.parse_fecha(fecha_str)
+    if dt_obj is None:
+        logger.warning(f"Archivo: {os.path.basename(xml_file_path_for_error)}, Campo: '{field_name}', "
+                       f"Valor: '{fecha_str}'. No se pudo parsear la fecha con los formatos conocidos.")
+    return dt_obj
+
+
+# --- Extracción compilada por tipo de documento ---
+# Cada sección del comprobante se describe una sola vez como una tupla de campos
+# (clave de salida, etiqueta hija directa, valor por defecto), compilada al importar el módulo.
+# Al parsear, los hijos de cada elemento se recorren UNA vez (_first_children) y todos los
+# campos de la sección se resuelven con búsquedas en ese diccionario, en lugar de una
+# búsqueda './/etiqueta' por campo. Las rutas siguen los esquemas XSD del SRI, donde todos
+# estos campos son hijos directos de su sección.
+
+FieldSpecs = Tuple[Tuple[str, str, Optional[str]], ...]
+
+
+def _tag(tag: str) -> str:
+    return f"{ns.get('', '') or ''}{tag}"
+
+
+def _compile_fields(*fields: Tuple[str, str, Optional[str]]) -> FieldSpecs:
+    """Precalcula las etiquetas (con el prefijo de namespace de `ns`) de una sección."""
+    return tuple((key, _tag(tag), default) for key, tag, default in fields)
+
+
+def _first_children(element: Optional[ET.Element]) -> Dict[str, ET.Element]:
+    """Primer hijo directo de cada etiqueta, en una sola pasada."""
+    children: Dict[str, ET.Element] = {}
+    if element is not None:
+        for child in element:
+            if child.tag not in children:
+                children[child.tag] = child
+    return children
+
+
+def _clean_text(text: str) -> str:
+    # Reemplazar caracteres problemáticos para Helvetica (Latin-1): EN DASH to HYPHEN-MINUS
+    return text.strip().replace('\u2013', '-')
+
+
+def _extract_fields(children: Dict[str, ET.Element], field_specs: FieldSpecs, record_type: type) -> Record:
+    """
+    Resuelve todos los campos de una sección en un registro `record_type` (ver document_model):
+    un elemento presente sin texto da '', uno ausente da el valor por defecto ('' si es None).
+    """
+    record = record_type.__new__(record_type)
+    for key, tag, default in field_specs:
+        child = children.get(tag)
+        if child is None:
+            setattr(record, key, default if default is not None else '')
+        else:
+            text = child.text
+            setattr(record, key, _clean_text(text) if text else '')
+    return record
+
+
+_INFO_TRIBUTARIA_FIELDS = _compile_fields(
+    ('ambiente', 'ambiente', ''),
+    ('tipo_emision', 'tipoEmision', ''),
+    ('razon_social', 'razonSocial', ''),
+    ('nombre_comercial', 'nombreComercial', None), # Default a razonSocial (ver _parse_info_tributaria)
+    ('ruc', 'ruc', ''),
+    ('clave_acceso', 'claveAcceso', ''),
+    ('cod_doc', 'codDoc', ''),
+    ('estab', 'estab', ''),
+    ('pto_emi', 'ptoEmi', ''),
+    ('secuencial', 'secuencial', ''),
+    ('dir_matriz', 'dirMatriz', ''),
+    ('agente_retencion_num_res', 'agenteRetencion', ''), # Para el número de resolución del agente de retención
+)
+_COMPRADOR_FIELDS = _compile_fields(
+    ('tipo_identificacion', 'tipoIdentificacionComprador', ''),
+    ('razon_social', 'razonSocialComprador', ''),
+    ('identificacion', 'identificacionComprador', ''),
+    ('direccion', 'direccionComprador', ''), # Puede no estar en ND
+    ('guia_remision', 'guiaRemision', ''),
+)
+_COMPRADOR_RETENCION_FIELDS = _compile_fields(
+    ('tipo_identificacion', 'tipoIdentificacionSujetoRetenido', ''),
+    ('razon_social', 'razonSocialSujetoRetenido', ''),
+    ('identificacion', 'identificacionSujetoRetenido', ''),
+)
+_TOTALES_FIELDS = _compile_fields(
+    ('total_sin_impuestos', 'totalSinImpuestos', '0.0'),
+    ('total_descuento', 'totalDescuento', '0.0'), # Puede no estar en ND
+    ('propina', 'propina', '0.0'), # Puede no estar en ND
+)
+_IMPUESTO_RESUMEN_FIELDS = _compile_fields(
+    ('codigo', 'codigo', ''),
+    ('codigo_porcentaje', 'codigoPorcentaje', ''),
+    ('base_imponible', 'baseImponible', '0.0'),
+    ('tarifa', 'tarifa', '0.0'),
+    ('valor', 'valor', '0.0'),
+    ('valor_devolucion_iva', 'valorDevolucionIva', '0.0'), # Para Notas de Crédito
+)
+_INFO_FACTURA_FIELDS = _compile_fields(
+    ('fecha_emision', 'fechaEmision', ''),
+    ('dir_establecimiento', 'dirEstablecimiento', ''),
+    ('contribuyente_especial', 'contribuyenteEspecial', ''),
+    ('obligado_contabilidad', 'obligadoContabilidad', ''),
+    ('moneda', 'moneda', ''),
+)
+_PAGO_FIELDS = _compile_fields(
+    ('forma_pago', 'formaPago', ''),
+    ('total', 'total', ''),
+    ('plazo', 'plazo', ''),
+    ('unidad_tiempo', 'unidadTiempo', ''),
+)
+_INFO_NOTA_DEBITO_FIELDS = _compile_fields(
+    ('fecha_emision', 'fechaEmision', ''),
+    ('dir_establecimiento', 'dirEstablecimiento', ''), # Puede no existir
+    ('cod_doc_modificado', 'codDocModificado', ''),
+    ('num_doc_modificado', 'numDocModificado', ''),
+    ('fecha_emision_doc_sustento', 'fechaEmisionDocSustento', ''),
+    ('obligado_contabilidad', 'obligadoContabilidad', ''), # No estándar en ND, pero lo buscamos
+)
+_INFO_NOTA_CREDITO_FIELDS = _compile_fields(
+    ('fecha_emision', 'fechaEmision', ''),
+    ('dir_establecimiento', 'dirEstablecimiento', ''), # Puede no existir
+    ('tipo_identificacion_comprador', 'tipoIdentificacionComprador', ''), # NC tiene info del comprador aquí
+    ('razon_social_comprador', 'razonSocialComprador', ''),
+    ('identificacion_comprador', 'identificacionComprador', ''),
+    ('obligado_contabilidad', 'obligadoContabilidad', ''),
+    ('cod_doc_modificado', 'codDocModificado', ''),
+    ('num_doc_modificado', 'numDocModificado', ''),
+    ('fecha_emision_doc_sustento', 'fechaEmisionDocSustento', ''),
+    ('moneda', 'moneda', ''),
+    ('motivo', 'motivo', ''), # Motivo de la NC
+    ('valorModificacion', 'valorModificacion', '0.0'), # Campo clave para el total de NC
+    ('contribuyente_especial', 'contribuyenteEspecial', ''),
+)
+_INFO_RETENCION_FIELDS = _compile_fields(
+    ('fecha_emision', 'fechaEmision', ''),
+    ('dir_establecimiento', 'dirEstablecimiento', ''), # Puede no existir
+    ('obligado_contabilidad', 'obligadoContabilidad', ''),
+    ('tipo_identificacion_sujeto_retenido', 'tipoIdentificacionSujetoRetenido', ''),
+    ('razon_social_sujeto_retenido', 'razonSocialSujetoRetenido', ''),
+    ('identificacion_sujeto_retenido', 'identificacionSujetoRetenido', ''),
+    ('periodo_fiscal', 'periodoFiscal', ''),
+)
+_DETALLE_FIELDS = _compile_fields(
+    ('codigo_principal', 'codigoPrincipal', ''),
+    ('codigo_auxiliar', 'codigoAuxiliar', ''),
+    ('descripcion', 'descripcion', ''),
+    ('cantidad', 'cantidad', '0'),
+    ('precio_unitario', 'precioUnitario', '0.0'),
+    ('descuento', 'descuento', '0.0'),
+    ('precio_total_sin_impuesto', 'precioTotalSinImpuesto', '0.0'),
+)
+_IMPUESTO_DETALLE_FIELDS = _compile_fields(
+    ('codigo', 'codigo', ''),
+    ('codigoPorcentaje', 'codigoPorcentaje', ''),
+)
+_RETENCION_ITEM_FIELDS = _compile_fields(
+    ('codigo', 'codigo', ''),
+    ('codigo_retencion', 'codigoRetencion', ''),
+    ('base_imponible', 'baseImponible', '0.0'),
+    ('porcentaje_retener', 'porcentajeRetener', '0.0'),
+    ('valor_retenido', 'valorRetenido', '0.0'),
+)
+_DOC_SUSTENTO_FIELDS = _compile_fields(
+    ('cod_doc_sustento', 'codDocSustento', ''),
+    ('num_doc_sustento', 'numDocSustento', ''),
+    ('num_aut_doc_sustento', 'numAutDocSustento', ''),
+    ('fecha_emision_doc_sustento', 'fechaEmisionDocSustento', ''),
+)
+# Etiquetas del sobre de autorización: en las respuestas del web service del SRI el sobre
+# puede venir anidado (RespuestaAutorizacionComprobante/autorizaciones/autorizacion).
+_AUTORIZACION_TAGS = {
+    _tag('estado'): 'estado',
+    _tag('numeroAutorizacion'): 'numero_autorizacion',
+    _tag('fechaAutorizacion'): 'fecha_autorizacion',
+    _tag('ambiente'): 'ambiente',
+    _tag('comprobante'): 'comprobante',
+}
 
 
-def _parse_info_tributaria(info_trib_element: ET.Element) -> Dict[str, Any]:
+def _parse_info_tributaria(info_trib_element: ET.Element) -> Mapping[str, Any]:
     """Parses the infoTributaria section."""
     if info_trib_element is None:
         return {}
-    return {
-        'ambiente': _find_text_or_default(info_trib_element, './/{}ambiente'.format(ns.get('', '') or '')),
-        'tipo_emision': _find_text_or_default(info_trib_element, './/{}tipoEmision'.format(ns.get('', '') or '')),
-        'razon_social': _find_text_or_default(info_trib_element, './/{}razonSocial'.format(ns.get('', '') or '')),
-        'nombre_comercial': _find_text_or_default(info_trib_element, './/{}nombreComercial'.format(ns.get('', '') or ''), default=_find_text_or_default(info_trib_element, './/{}razonSocial'.format(ns.get('', '') or ''))), # Default a razonSocial
-        'ruc': _find_text_or_default(info_trib_element, './/{}ruc'.format(ns.get('', '') or '')),
-        'clave_acceso': _find_text_or_default(info_trib_element, './/{}claveAcceso'.format(ns.get('', '') or '')),
-        'cod_doc': _find_text_or_default(info_trib_element, './/{}codDoc'.format(ns.get('', '') or '')),
-        'estab': _find_text_or_default(info_trib_element, './/{}estab'.format(ns.get('', '') or '')),
-        'pto_emi': _find_text_or_default(info_trib_element, './/{}ptoEmi'.format(ns.get('', '') or '')),
-        'secuencial': _find_text_or_default(info_trib_element, './/{}secuencial'.format(ns.get('', '') or '')),
-        'dir_matriz': _find_text_or_default(info_trib_element, './/{}dirMatriz'.format(ns.get('', '') or '')),
-        'agente_retencion_num_res': _find_text_or_default(info_trib_element, './/{}agenteRetencion'.format(ns.get('', '') or '')), # Para el número de resolución del agente de retención
-    }
+    children = _first_children(info_trib_element)
+    info = _extract_fields(children, _INFO_TRIBUTARIA_FIELDS, InfoTributaria)
+    if _tag('nombreComercial') not in children:
+        info.nombre_comercial = info.razon_social # Default a razonSocial
+    return info
 
-def _parse_comprador(doc_info_element: ET.Element) -> Dict[str, Any]:
+def _parse_comprador(info_children: Dict[str, ET.Element]) -> Comprador:
     """Parses common buyer information from infoFactura, infoNotaDebito, etc."""
-    if doc_info_element is None:
-        return {}
-    return {
-        'tipo_identificacion': _find_text_or_default(doc_info_element, './/{}tipoIdentificacionComprador'.format(ns.get('', '') or '')),
-        'razon_social': _find_text_or_default(doc_info_element, './/{}razonSocialComprador'.format(ns.get('', '') or '')),
-        'identificacion': _find_text_or_default(doc_info_element, './/{}identificacionComprador'.format(ns.get('', '') or '')),
-        'direccion': _find_text_or_default(doc_info_element, './/{}direccionComprador'.format(ns.get('', '') or '')), # Puede no estar en ND
-        # Campos específicos de factura que podrían estar aquí o en infoAdicional
-        'guia_remision': _find_text_or_default(doc_info_element, './/{}guiaRemision'.format(ns.get('', '') or '')),
-        'placa': '', # Generalmente en infoAdicional, buscar allí si es necesario
-    }
+    comprador = _extract_fields(info_children, _COMPRADOR_FIELDS, Comprador)
+    comprador.placa = '' # Generalmente en infoAdicional, buscar allí si es necesario
+    return comprador
 
-def _parse_totales_y_impuestos(doc_info_element: ET.Element, tag_impuestos_container: str, tag_impuesto_item: str) -> Dict[str, Any]:
+def _parse_totales_y_impuestos(info_children: Dict[str, ET.Element], tag_impuestos_container: Optional[str], tag_impuesto_item: Optional[str]) -> Totales:
     """Parses totals and the list of taxes (handles totalConImpuestos/impuestos)."""
-    totales = {}
-    if doc_info_element is None:
-        return {'impuestos_resumen': []} # Devuelve lista vacía si no hay info
-
-    totales['total_sin_impuestos'] = _find_text_or_default(doc_info_element, './/{}totalSinImpuestos'.format(ns.get('', '') or ''), default='0.0')
-    totales['total_descuento'] = _find_text_or_default(doc_info_element, './/{}totalDescuento'.format(ns.get('', '') or ''), default='0.0') # Puede no estar en ND
-    totales['propina'] = _find_text_or_default(doc_info_element, './/{}propina'.format(ns.get('', '') or ''), default='0.0') # Puede no estar en ND
-    totales['importe_total'] = _find_text_or_default(doc_info_element, './/{}valorTotal'.format(ns.get('', '') or ''), default=_find_text_or_default(doc_info_element, './/{}importeTotal'.format(ns.get('', '') or ''), default='0.0')) # Usa valorTotal o importeTotal
+    totales = _extract_fields(info_children, _TOTALES_FIELDS, Totales)
+    # ND usa valorTotal; Factura/LiqCompra importeTotal
+    valor_total_element = info_children.get(_tag('valorTotal'))
+    if valor_total_element is None:
+        valor_total_element = info_children.get(_tag('importeTotal'))
+    if valor_total_element is None:
+        totales.importe_total = '0.0'
+    else:
+        totales.importe_total = _clean_text(valor_total_element.text) if valor_total_element.text else ''
 
     # --- Procesamiento de la lista de impuestos ---
     impuestos_resumen_list = []
-    impuestos_container = doc_info_element.find('.//{}'.format(tag_impuestos_container))
+    impuestos_container = info_children.get(tag_impuestos_container) if tag_impuestos_container else None
     if impuestos_container is not None:
-        # Usar tag_impuesto_item para encontrar los elementos individuales
-        for imp_element in impuestos_container.findall('{}'.format(tag_impuesto_item)):
-            impuesto_dict = {
-                'codigo': _find_text_or_default(imp_element, '{}codigo'.format(ns.get('', '') or ''), default=''),
-                'codigo_porcentaje': _find_text_or_default(imp_element, '{}codigoPorcentaje'.format(ns.get('', '') or ''), default=''),
-                'base_imponible': _find_text_or_default(imp_element, '{}baseImponible'.format(ns.get('', '') or ''), default='0.0'),
-                'tarifa': _find_text_or_default(imp_element, '{}tarifa'.format(ns.get('', '') or ''), default='0.0'),
-                'valor': _find_text_or_default(imp_element, '{}valor'.format(ns.get('', '') or ''), default='0.0'),
-                'valor_devolucion_iva': _find_text_or_default(imp_element, '{}valorDevolucionIva'.format(ns.get('', '') or ''), default='0.0') # Para Notas de Crédito
-            }
-            impuestos_resumen_list.append(impuesto_dict)
-
-    totales['impuestos_resumen'] = impuestos_resumen_list
+        for imp_element in impuestos_container.iterfind(tag_impuesto_item):
+            impuestos_resumen_list.append(_extract_fields(_first_children(imp_element), _IMPUESTO_RESUMEN_FIELDS, ImpuestoResumen))
+
+    totales.impuestos_resumen = impuestos_resumen_list
     return totales
 
-def _parse_info_factura(info_factura_element: ET.Element) -> Dict[str, Any]:
+def _parse_info_factura(info_children: Dict[str, ET.Element]) -> InfoFactura:
     """Parses the infoFactura section."""
-    if info_factura_element is None:
-        return {}
-
-    factura_info = {
-        'fecha_emision': _find_text_or_default(info_factura_element, './/{}fechaEmision'.format(ns.get('', '') or '')),
-        'dir_establecimiento': _find_text_or_default(info_factura_element, './/{}dirEstablecimiento'.format(ns.get('', '') or '')),
-        'contribuyente_especial': _find_text_or_default(info_factura_element, './/{}contribuyenteEspecial'.format(ns.get('', '') or '')),
-        'obligado_contabilidad': _find_text_or_default(info_factura_element, './/{}obligadoContabilidad'.format(ns.get('', '') or '')),
-        'moneda': _find_text_or_default(info_factura_element, './/{}moneda'.format(ns.get('', '') or '')),
-        # tipo_emision_doc no parece estándar, tipoEmision está en infoTributaria
-        # 'tipo_emision_doc': _find_text_or_default(info_factura_element, './/{}tipoEmision'.format(ns.get('', '') or '')),
-    }
+    factura_info = _extract_fields(info_children, _INFO_FACTURA_FIELDS, InfoFactura)
 
     # Parse Pagos
     pagos_list = []
-    pagos_element = info_factura_element.find('.//{}pagos'.format(ns.get('', '') or ''))
+    pagos_element = info_children.get(_tag('pagos'))
     if pagos_element is not None:
-        for pago_element in pagos_element.findall('{}pago'.format(ns.get('', '') or '')):
-            pago_data = {
-                'forma_pago': _find_text_or_default(pago_element, '{}formaPago'.format(ns.get('', '') or '')),
-                'total': _find_text_or_default(pago_element, '{}total'.format(ns.get('', '') or '')),
-                'plazo': _find_text_or_default(pago_element, '{}plazo'.format(ns.get('', '') or ''), default=''),
-                'unidad_tiempo': _find_text_or_default(pago_element, '{}unidadTiempo'.format(ns.get('', '') or ''), default='')
-            }
-            pagos_list.append(pago_data)
-    factura_info['pagos'] = pagos_list
+        for pago_element in pagos_element.iterfind(_tag('pago')):
+            pagos_list.append(_extract_fields(_first_children(pago_element), _PAGO_FIELDS, Pago))
+    factura_info.pagos = pagos_list
 
     return factura_info
 
-def _parse_info_nota_debito(info_nd_element: ET.Element) -> Dict[str, Any]:
-    """Parses the infoNotaDebito section."""
-    if info_nd_element is None:
-        return {}
+def _parse_info_nota_debito(info_children: Dict[str, ET.Element]) -> InfoNotaDebito:
+    """Parses the infoNotaDebito section. No hay sección 'pagos' en Nota de Débito."""
+    return _extract_fields(info_children, _INFO_NOTA_DEBITO_FIELDS, InfoNotaDebito)
 
-    nd_info = {
-        'fecha_emision': _find_text_or_default(info_nd_element, './/{}fechaEmision'.format(ns.get('', '') or '')),
-        'dir_establecimiento': _find_text_or_default(info_nd_element, './/{}dirEstablecimiento'.format(ns.get('', '') or '')), # Puede no existir
-        'cod_doc_modificado': _find_text_or_default(info_nd_element, './/{}codDocModificado'.format(ns.get('', '') or '')),
-        'num_doc_modificado': _find_text_or_default(info_nd_element, './/{}numDocModificado'.format(ns.get('', '') or '')),
-        'fecha_emision_doc_sustento': _find_text_or_default(info_nd_element, './/{}fechaEmisionDocSustento'.format(ns.get('', '') or '')),
-        'obligado_contabilidad': _find_text_or_default(info_nd_element, './/{}obligadoContabilidad'.format(ns.get('', '') or '')), # No estándar en ND, pero lo buscamos
-        # No hay sección 'pagos' en Nota de Débito
-    }
-    return nd_info
-
-def _parse_info_nota_credito(info_nc_element: ET.Element) -> Dict[str, Any]:
+def _parse_info_nota_credito(info_children: Dict[str, ET.Element]) -> InfoNotaCredito:
     """Parses the infoNotaCredito section."""
-    if info_nc_element is None:
-        return {}
+    return _extract_fields(info_children, _INFO_NOTA_CREDITO_FIELDS, InfoNotaCredito)
 
-    nc_info = {
-        'fecha_emision': _find_text_or_default(info_nc_element, './/{}fechaEmision'.format(ns.get('', '') or '')),
-        'dir_establecimiento': _find_text_or_default(info_nc_element, './/{}dirEstablecimiento'.format(ns.get('', '') or '')), # Puede no existir
-        'tipo_identificacion_comprador': _find_text_or_default(info_nc_element, './/{}tipoIdentificacionComprador'.format(ns.get('', '') or '')), # NC tiene info del comprador aquí
-        'razon_social_comprador': _find_text_or_default(info_nc_element, './/{}razonSocialComprador'.format(ns.get('', '') or '')),
-        'identificacion_comprador': _find_text_or_default(info_nc_element, './/{}identificacionComprador'.format(ns.get('', '') or '')),
-        'obligado_contabilidad': _find_text_or_default(info_nc_element, './/{}obligadoContabilidad'.format(ns.get('', '') or '')),
-        'cod_doc_modificado': _find_text_or_default(info_nc_element, './/{}codDocModificado'.format(ns.get('', '') or '')),
-        'num_doc_modificado': _find_text_or_default(info_nc_element, './/{}numDocModificado'.format(ns.get('', '') or '')),
-        'fecha_emision_doc_sustento': _find_text_or_default(info_nc_element, './/{}fechaEmisionDocSustento'.format(ns.get('', '') or '')),
-        'moneda': _find_text_or_default(info_nc_element, './/{}moneda'.format(ns.get('', '') or '')),
-        'motivo': _find_text_or_default(info_nc_element, './/{}motivo'.format(ns.get('', '') or '')), # Motivo de la NC
-        'valorModificacion': _find_text_or_default(info_nc_element, './/{}valorModificacion'.format(ns.get('', '') or ''), default='0.0'), # Campo clave para el total de NC
-        'contribuyente_especial': _find_text_or_default(info_nc_element, './/{}contribuyenteEspecial'.format(ns.get('', '') or '')), # Añadido para NC
-    }
-    return nc_info
-
-def _parse_info_retencion(info_ret_element: ET.Element) -> Dict[str, Any]:
+def _parse_info_retencion(info_children: Dict[str, ET.Element]) -> InfoRetencion:
     """Parses the infoCompRetencion section."""
-    if info_ret_element is None:
-        return {}
-
-    ret_info = {
-        'fecha_emision': _find_text_or_default(info_ret_element, './/{}fechaEmision'.format(ns.get('', '') or '')),
-        'dir_establecimiento': _find_text_or_default(info_ret_element, './/{}dirEstablecimiento'.format(ns.get('', '') or '')), # Puede no existir
-        'obligado_contabilidad': _find_text_or_default(info_ret_element, './/{}obligadoContabilidad'.format(ns.get('', '') or '')),
-        'tipo_identificacion_sujeto_retenido': _find_text_or_default(info_ret_element, './/{}tipoIdentificacionSujetoRetenido'.format(ns.get('', '') or '')),
-        'razon_social_sujeto_retenido': _find_text_or_default(info_ret_element, './/{}razonSocialSujetoRetenido'.format(ns.get('', '') or '')),
-        'identificacion_sujeto_retenido': _find_text_or_default(info_ret_element, './/{}identificacionSujetoRetenido'.format(ns.get('', '') or '')),
-        'periodo_fiscal': _find_text_or_default(info_ret_element, './/{}periodoFiscal'.format(ns.get('', '') or '')),
-    }
-    return ret_info
-
-def _parse_detalles(detalles_container: ET.Element) -> List[Dict[str, Any]]:
+    return _extract_fields(info_children, _INFO_RETENCION_FIELDS, InfoRetencion)
+
+_TAG_DETALLE = _tag('detalle')
+_TAG_CODIGO_INTERNO = _tag('codigoInterno')
+_TAG_DETALLES_ADICIONALES = _tag('detallesAdicionales')
+_TAG_DET_ADICIONAL = _tag('detAdicional')
+_TAG_IMPUESTOS = _tag('impuestos')
+_TAG_IMPUESTO = _tag('impuesto')
+
+def _parse_detalle(det_element: ET.Element) -> Detalle:
+    """Parses one <detalle> (Factura and Nota de Crédito). También lo usa xml_streaming, ítem por ítem."""
+    children = _first_children(det_element)
+    item = _extract_fields(children, _DETALLE_FIELDS, Detalle)
+    # Si codigoPrincipal no se encontró o está vacío, intentar con codigoInterno
+    if not item.codigo_principal:
+        codigo_interno_element = children.get(_TAG_CODIGO_INTERNO)
+        item.codigo_principal = _clean_text(codigo_interno_element.text) if codigo_interno_element is not None and codigo_interno_element.text else ''
+
+    # Detalles Adicionales del item
+    detalles_adicionales: Dict[str, str] = {}
+    det_adicionales_element = children.get(_TAG_DETALLES_ADICIONALES)
+    if det_adicionales_element is not None:
+        for adic_element in det_adicionales_element.iterfind(_TAG_DET_ADICIONAL):
+            nombre = adic_element.get('nombre', '').replace(' ', '_').lower() # Normalizar nombre
+            valor = adic_element.get('valor', adic_element.text.strip() if adic_element.text else '') # SRI a veces usa atributo 'valor'
+            if nombre and valor:
+                # Manejar nombres duplicados si es necesario (ej. concatenar)
+                if nombre in detalles_adicionales:
+                    detalles_adicionales[nombre] = f"{detalles_adicionales[nombre]}; {valor}"
+                else:
+                    detalles_adicionales[nombre] = valor
+    item.detalles_adicionales = detalles_adicionales
+
+    # Impuestos del detalle (usualmente no se muestran directamente en la tabla)
+    impuestos_detalle = []
+    impuestos_detalle_element = children.get(_TAG_IMPUESTOS)
+    if impuestos_detalle_element is not None:
+        for imp_det_element in impuestos_detalle_element.iterfind(_TAG_IMPUESTO):
+            impuestos_detalle.append(_extract_fields(_first_children(imp_det_element), _IMPUESTO_DETALLE_FIELDS, ImpuestoDetalle))
+    item.impuestos_detalle = impuestos_detalle
+    return item
+
+def _parse_detalles(detalles_container: ET.Element) -> List[Detalle]:
     """Parses the detalles section (for Factura and Nota de Crédito)."""
-    logger.debug(f"_parse_detalles: Recibido detalles_container: {detalles_container is not None}")
-    items = []
     if detalles_container is None:
-        logger.debug("_parse_detalles: detalles_container es None, devolviendo lista vacía.")
-        return items
-    # Usar findall directo sobre el contenedor para los hijos 'detalle'
-    for det_element in detalles_container.findall('{}detalle'.format(ns.get('', '') or '')):
-        # Para detalles de Factura, Nota de Crédito
-        ns_map = {'': ns.get('', '')} if ns.get('', '') else {}
-        item = {
-            'codigo_principal': _find_text_or_default(det_element, './/{}codigoPrincipal'.format(ns.get('', '') or ''), default=None), # Intentar primero codigoPrincipal
-            'codigo_auxiliar': _find_text_or_default(det_element, './/{}codigoAuxiliar'.format(ns.get('', '') or '')),
-            'descripcion': _find_text_or_default(det_element, './/{}descripcion'.format(ns.get('', '') or '')),
-            'cantidad': _find_text_or_default(det_element, './/{}cantidad'.format(ns.get('', '') or ''), default='0'),
-            'precio_unitario': _find_text_or_default(det_element, './/{}precioUnitario'.format(ns.get('', '') or ''), default='0.0'),
-            'descuento': _find_text_or_default(det_element, './/{}descuento'.format(ns.get('', '') or ''), default='0.0'),
-            'precio_total_sin_impuesto': _find_text_or_default(det_element, './/{}precioTotalSinImpuesto'.format(ns.get('', '') or ''), default='0.0'),
-            'detalles_adicionales': {},
-            'impuestos_detalle': []
-        }
-        logger.debug(f"_parse_detalles: Encontrado elemento detalle, datos iniciales: {item}")
-        # Si codigoPrincipal no se encontró o está vacío, intentar con codigoInterno
-        if not item['codigo_principal']:
-            item['codigo_principal'] = _find_text_or_default(det_element, './/{}codigoInterno'.format(ns.get('', '') or ''))
-
-        # Detalles Adicionales del item
-        det_adicionales_element = det_element.find('.//{}detallesAdicionales'.format(ns.get('', '') or ''))
-        if det_adicionales_element is not None:
-            for adic_element in det_adicionales_element.findall('.//{}detAdicional'.format(ns.get('', '') or '')):
-                nombre = adic_element.get('nombre', '').replace(' ', '_').lower() # Normalizar nombre
-                valor = adic_element.get('valor', adic_element.text.strip() if adic_element.text else '') # SRI a veces usa atributo 'valor'
-                if nombre and valor:
-                    # Manejar nombres duplicados si es necesario (ej. concatenar)
-                    if nombre in item['detalles_adicionales']:
-                        item['detalles_adicionales'][nombre] = f"{item['detalles_adicionales'][nombre]}; {valor}"
-                    else:
-                        item['detalles_adicionales'][nombre] = valor
-            logger.debug(f"_parse_detalles: Detalles adicionales para item: {item['detalles_adicionales']}")
-
-        # Parsear impuestos del detalle (si es necesario para la tabla, aunque usualmente no se muestran directamente)
-        impuestos_detalle_element = det_element.find('.//{}impuestos'.format(ns.get('', '') or ''))
-        if impuestos_detalle_element is not None:
-            for imp_det_element in impuestos_detalle_element.findall('.//{}impuesto'.format(ns.get('', '') or '')):
-                impuesto_item_detalle = {
-                    'codigo': _find_text_or_default(imp_det_element, './/{}codigo'.format(ns.get('', '') or '')),
-                    'codigoPorcentaje': _find_text_or_default(imp_det_element, './/{}codigoPorcentaje'.format(ns.get('', '') or '')),
-                    # ... otros campos del impuesto del detalle si son necesarios
-                }
-                item['impuestos_detalle'].append(impuesto_item_detalle)
-        items.append(item) # Asegurar que el item se añade a la lista
-    logger.debug(f"_parse_detalles: Total items parseados: {len(items)}")
+        return []
+    items = [_parse_detalle(det_element) for det_element in detalles_container.iterfind(_TAG_DETALLE)]
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"_parse_detalles: Total items parseados: {len(items)}")
     return items
 
-def _parse_motivos(motivos_container: ET.Element) -> List[Dict[str, Any]]:
+def _parse_motivos(motivos_container: ET.Element) -> List[Detalle]:
     """Parses the motivos section (for Nota de Débito)."""
     items = []
     if motivos_container is None:
         return items
-    for mot_element in motivos_container.findall('.//{}motivo'.format(ns.get('', '') or '')):
-        item = {
+    tag_razon = _tag('razon')
+    tag_valor = _tag('valor')
+    for mot_element in motivos_container.iterfind(_tag('motivo')):
+        children = _first_children(mot_element)
+        razon_element = children.get(tag_razon)
+        valor_element = children.get(tag_valor)
+        valor = '0.0' if valor_element is None else (_clean_text(valor_element.text) if valor_element.text else '')
+        item = Detalle(
             # Adaptar nombres para que coincidan con 'detalles' si es posible para pdf_generator
-            'descripcion': _find_text_or_default(mot_element, './/{}razon'.format(ns.get('', '') or '')),
-            'precio_total_sin_impuesto': _find_text_or_default(mot_element, './/{}valor'.format(ns.get('', '') or ''), default='0.0'),
+            descripcion=_clean_text(razon_element.text) if razon_element is not None and razon_element.text else '',
+            precio_total_sin_impuesto=valor,
             # Añadir campos vacíos para compatibilidad con estructura de detalles si es necesario
-            'codigo_principal': '',
-            'codigo_auxiliar': '',
-            'cantidad': '1', # Asumir cantidad 1 para motivos
-            'precio_unitario': _find_text_or_default(mot_element, './/{}valor'.format(ns.get('', '') or ''), default='0.0'), # Asumir valor como precio unitario
-            'descuento': '0.0',
-            'detalles_adicionales': {},
-            'impuestos_detalle': [] # Los impuestos del motivo no están aquí, están en infoNotaDebito/impuestos
-        }
+            codigo_principal='',
+            codigo_auxiliar='',
+            cantidad='1', # Asumir cantidad 1 para motivos
+            precio_unitario=valor, # Asumir valor como precio unitario
+            descuento='0.0',
+            detalles_adicionales={},
+            impuestos_detalle=[] # Los impuestos del motivo no están aquí, están en infoNotaDebito/impuestos
+        )
         items.append(item)
     return items
 
-def _parse_impuestos_retencion(comprobante_retencion_root: ET.Element) -> List[Dict[str, Any]]:
+def _retencion_item(ret_children: Dict[str, ET.Element], doc_sustento: DocSustento) -> Retencion:
+    """Una línea de retención con los datos de su documento de sustento y los campos tipo 'detalle'."""
+    item = _extract_fields(ret_children, _RETENCION_ITEM_FIELDS, Retencion)
+    for key in DocSustento._fields:
+        setattr(item, key, getattr(doc_sustento, key))
+    item.descripcion = f"Ret. Cód.{item.codigo_retencion} ({item.porcentaje_retener}%) Doc: {doc_sustento.num_doc_sustento}"
+    item.precio_total_sin_impuesto = item.valor_retenido
+    item.cantidad = '1'
+    item.precio_unitario = item.valor_retenido
+    return item
+
+def _parse_retenciones_v1(root_children: Dict[str, ET.Element]) -> List[Retencion]:
+    """v1.0.0: impuestos -> impuesto (cada <impuesto> es una retención con su doc. sustento)."""
+    items = []
+    impuestos_container = root_children.get(_tag('impuestos'))
+    if impuestos_container is not None:
+        for imp_element in impuestos_container.iterfind(_tag('impuesto')):
+            imp_children = _first_children(imp_element)
+            items.append(_retencion_item(imp_children, _extract_fields(imp_children, _DOC_SUSTENTO_FIELDS, DocSustento)))
+    return items
+
+def _parse_retenciones_v2(root_children: Dict[str, ET.Element]) -> List[Retencion]:
+    """v2.0.0: docsSustento -> docSustento -> retenciones -> retencion."""
+    items = []
+    docs_sustento_container = root_children.get(_tag('docsSustento'))
+    if docs_sustento_container is not None:
+        for doc_sustento_element in docs_sustento_container.iterfind(_tag('docSustento')):
+            doc_sustento_children = _first_children(doc_sustento_element)
+            doc_sustento = _extract_fields(doc_sustento_children, _DOC_SUSTENTO_FIELDS, DocSustento)
+            retenciones_container = doc_sustento_children.get(_tag('retenciones'))
+            if retenciones_container is not None:
+                for ret_element in retenciones_container.iterfind(_tag('retencion')):
+                    items.append(_retencion_item(_first_children(ret_element), doc_sustento))
+    return items
+
+# Extractor de líneas de retención por versión del comprobanteRetencion
+_RETENCION_PARSERS_BY_VERSION = {
+    '1.0.0': _parse_retenciones_v1,
+    '2.0.0': _parse_retenciones_v2,
+}
+
+def _parse_impuestos_retencion(comprobante_retencion_root: ET.Element, root_children: Optional[Dict[str, ET.Element]] = None) -> List[Retencion]:
     """
     Parses the retentions from a comprobanteRetencion XML, handling v1.0.0 and v2.0.0.
-    For v2.0.0: docsSustento -&gt; docSustento -&gt; retenciones -&gt; retencion
-    For v1.0.0: impuestos -&gt; impuesto
+    For v2.0.0: docsSustento -> docSustento -> retenciones -> retencion
+    For v1.0.0: impuestos -> impuesto
     """
-    items = []
     if comprobante_retencion_root is None:
-        return items
-
-    ns_map = {'ns': ns.get('', '') or ''} # Helper para namespaces si es necesario, aunque findall con {} funciona
+        return []
     version_cr = comprobante_retencion_root.get('version', '1.0.0') # Default a 1.0.0 si no hay atributo
-
-    if version_cr == '2.0.0':
-        docs_sustento_container = comprobante_retencion_root.find('.//{}docsSustento'.format(ns_map['ns']))
-        if docs_sustento_container is not None:
-            for doc_sustento_element in docs_sustento_container.findall('.//{}docSustento'.format(ns_map['ns'])):
-                cod_doc_sustento_padre = _find_text_or_default(doc_sustento_element, './/{}codDocSustento'.format(ns_map['ns']))
-                num_doc_sustento_padre = _find_text_or_default(doc_sustento_element, './/{}numDocSustento'.format(ns_map['ns']))
-                fecha_emision_doc_sustento_padre = _find_text_or_default(doc_sustento_element, './/{}fechaEmisionDocSustento'.format(ns_map['ns']))
-                num_aut_doc_sustento_padre = _find_text_or_default(doc_sustento_element, './/{}numAutDocSustento'.format(ns_map['ns'])) # Nuevo
-
-                retenciones_container = doc_sustento_element.find('.//{}retenciones'.format(ns_map['ns']))
-                if retenciones_container is not None:
-                    for ret_element in retenciones_container.findall('.//{}retencion'.format(ns_map['ns'])):
-                        item = {
-                            'codigo': _find_text_or_default(ret_element, './/{}codigo'.format(ns_map['ns'])),
-                            'codigo_retencion': _find_text_or_default(ret_element, './/{}codigoRetencion'.format(ns_map['ns'])),
-                            'base_imponible': _find_text_or_default(ret_element, './/{}baseImponible'.format(ns_map['ns']), default='0.0'),
-                            'porcentaje_retener': _find_text_or_default(ret_element, './/{}porcentajeRetener'.format(ns_map['ns']), default='0.0'),
-                            'valor_retenido': _find_text_or_default(ret_element, './/{}valorRetenido'.format(ns_map['ns']), default='0.0'),
-                            'cod_doc_sustento': cod_doc_sustento_padre,
-                            'num_doc_sustento': num_doc_sustento_padre,
-                            'num_aut_doc_sustento': num_aut_doc_sustento_padre, # Nuevo
-                            'fecha_emision_doc_sustento': fecha_emision_doc_sustento_padre,
-                            'descripcion': f"Ret. Cód.{_find_text_or_default(ret_element, './/{}codigoRetencion'.format(ns_map['ns']))} ({_find_text_or_default(ret_element, './/{}porcentajeRetener'.format(ns_map['ns']), default='0.0')}%) Doc: {num_doc_sustento_padre}",
-                            'precio_total_sin_impuesto': _find_text_or_default(ret_element, './/{}valorRetenido'.format(ns_map['ns']), default='0.0'),
-                            'cantidad': '1',
-                            'precio_unitario': _find_text_or_default(ret_element, './/{}valorRetenido'.format(ns_map['ns']), default='0.0'),
-                        }
-                        items.append(item)
-    elif version_cr == '1.0.0':
-        impuestos_container = comprobante_retencion_root.find('.//{}impuestos'.format(ns_map['ns']))
-        if impuestos_container is not None:
-            for imp_element in impuestos_container.findall('.//{}impuesto'.format(ns_map['ns'])): # En v1.0.0, cada &lt;impuesto&gt; es una retención
-                item = {
-                    'codigo': _find_text_or_default(imp_element, './/{}codigo'.format(ns_map['ns'])),
-                    'codigo_retencion': _find_text_or_default(imp_element, './/{}codigoRetencion'.format(ns_map['ns'])),
-                    'base_imponible': _find_text_or_default(imp_element, './/{}baseImponible'.format(ns_map['ns']), default='0.0'),
-                    'porcentaje_retener': _find_text_or_default(imp_element, './/{}porcentajeRetener'.format(ns_map['ns']), default='0.0'),
-                    'valor_retenido': _find_text_or_default(imp_element, './/{}valorRetenido'.format(ns_map['ns']), default='0.0'),
-                    'cod_doc_sustento': _find_text_or_default(imp_element, './/{}codDocSustento'.format(ns_map['ns'])),
-                    'num_doc_sustento': _find_text_or_default(imp_element, './/{}numDocSustento'.format(ns_map['ns'])),
-                    'num_aut_doc_sustento': _find_text_or_default(imp_element, './/{}numAutDocSustento'.format(ns_map['ns'])), # Nuevo (aunque menos común en v1)
-                    'fecha_emision_doc_sustento': _find_text_or_default(imp_element, './/{}fechaEmisionDocSustento'.format(ns_map['ns'])),
-                    'descripcion': f"Ret. Cód.{_find_text_or_default(imp_element, './/{}codigoRetencion'.format(ns_map['ns']))} ({_find_text_or_default(imp_element, './/{}porcentajeRetener'.format(ns_map['ns']), default='0.0')}%) Doc: {_find_text_or_default(imp_element, './/{}numDocSustento'.format(ns_map['ns']))}",
-                    'precio_total_sin_impuesto': _find_text_or_default(imp_element, './/{}valorRetenido'.format(ns_map['ns']), default='0.0'),
-                    'cantidad': '1',
-                    'precio_unitario': _find_text_or_default(imp_element, './/{}valorRetenido'.format(ns_map['ns']), default='0.0'),
-                }
-                items.append(item)
-    else:
+    parse_retenciones = _RETENCION_PARSERS_BY_VERSION.get(version_cr)
+    if parse_retenciones is None:
         logger.warning(f"Versión de comprobanteRetencion no manejada en xml_parser: {version_cr}")
-
-    return items
+        return []
+    if root_children is None:
+        root_children = _first_children(comprobante_retencion_root)
+    return parse_retenciones(root_children)
 
 def _parse_info_adicional(info_adic_element: ET.Element) -> Dict[str, Any]:
     """Parses the infoAdicional section."""
     adicional = {}
     if info_adic_element is None:
         return adicional
-    for campo_element in info_adic_element.findall('.//{}campoAdicional'.format(ns.get('', '') or '')):
+    for campo_element in info_adic_element.iterfind(_tag('campoAdicional')):
         nombre = campo_element.get('nombre', '').replace(' ', '_').lower() # Normalizar nombre
-        valor = campo_element.text.strip() if campo_element.text else ''
-        valor_raw = campo_element.text.strip() if campo_element.text else ''
         # Aplicar el reemplazo del EN DASH también aquí
-        valor = valor_raw.replace('\u2013', '-')
+        valor = _clean_text(campo_element.text) if campo_element.text else ''
 
         if nombre and valor:
             # Manejar nombres duplicados si es necesario (ej. concatenar)
@@ -444,51 +491,207 @@ def _parse_info_adicional(info_adic_element: ET.Element) -> Dict[str, Any]:
                 adicional[nombre] = valor
     return adicional
 
-def parse_xml(xml_path: str) -> Optional[Dict[str, Any]]:
+def _parse_comprador_retencion(info_children: Dict[str, ET.Element]) -> Comprador:
+    """Parses subject information for Retenciones (similar to buyer)."""
+    comprador = _extract_fields(info_children, _COMPRADOR_RETENCION_FIELDS, Comprador)
+    comprador.direccion = '' # Dirección del sujeto retenido no es un campo estándar aquí
+    comprador.guia_remision = '' # No aplica
+    comprador.placa = '' # No aplica
+    return comprador
+
+
+# Especificación compilada de cada tipo de documento soportado:
+#   info_tag: sección de información específica (hija directa de la raíz del comprobante)
+#   parse_info / parse_comprador: extractores de esa sección
+#   detalles_tag / parse_detalles: lista de ítems o motivos (None en Retención: se leen por versión)
+#   detalle_item_tag / parse_detalle_item: un ítem de esa lista, para el parseo en streaming de
+#       comprobantes grandes (xml_streaming); None donde las líneas son pocas (ND, Retención)
+#   impuestos_container / impuesto_item: resumen de impuestos dentro de la sección de información
+#   id_tag: etiqueta con la identificación del comprador/sujeto retenido ('id_comprador_raw')
+#   has_doc_modificado: NC/ND referencian un documento modificado
+_DOCUMENT_SPECS: Dict[str, Dict[str, Any]] = {
+    '01': {
+        'tipo_documento': 'Factura', 'info_tag': _tag('infoFactura'),
+        'parse_info': _parse_info_factura, 'parse_comprador': _parse_comprador,
+        'detalles_tag': _tag('detalles'), 'parse_detalles': _parse_detalles,
+        'detalle_item_tag': _TAG_DETALLE, 'parse_detalle_item': _parse_detalle,
+        'impuestos_container': _tag('totalConImpuestos'), 'impuesto_item': _tag('totalImpuesto'),
+        'id_tag': _tag('identificacionComprador'), 'has_doc_modificado': False,
+    },
+    '05': {
+        'tipo_documento': 'Nota de Débito', 'info_tag': _tag('infoNotaDebito'),
+        'parse_info': _parse_info_nota_debito, 'parse_comprador': _parse_comprador,
+        'detalles_tag': _tag('motivos'), 'parse_detalles': _parse_motivos,
+        'detalle_item_tag': None, 'parse_detalle_item': None,
+        'impuestos_container': _tag('impuestos'), 'impuesto_item': _tag('impuesto'), # Diferentes tags en ND
+        'id_tag': _tag('identificacionComprador'), 'has_doc_modificado': True,
+    },
+    '04': {
+        'tipo_documento': 'Nota de Crédito', 'info_tag': _tag('infoNotaCredito'),
+        'parse_info': _parse_info_nota_credito, 'parse_comprador': _parse_comprador,
+        'detalles_tag': _tag('detalles'), 'parse_detalles': _parse_detalles, # Reutiliza el parser de detalles de factura
+        'detalle_item_tag': _TAG_DETALLE, 'parse_detalle_item': _parse_detalle,
+        'impuestos_container': _tag('totalConImpuestos'), 'impuesto_item': _tag('totalImpuesto'),
+        'id_tag': _tag('identificacionComprador'), 'has_doc_modificado': True,
+    },
+    '07': {
+        'tipo_documento': 'Comprobante de Retención', 'info_tag': _tag('infoCompRetencion'),
+        'parse_info': _parse_info_retencion, 'parse_comprador': _parse_comprador_retencion,
+        'detalles_tag': None, 'parse_detalles': None,
+        'detalle_item_tag': None, 'parse_detalle_item': None,
+        # No hay 'totalConImpuestos' o 'impuestos' a nivel de totales como en Factura/ND
+        'impuestos_container': None, 'impuesto_item': None,
+        'id_tag': _tag('identificacionSujetoRetenido'), 'has_doc_modificado': False,
+    },
+}
+
+
+def _parse_autorizacion(auth_root: ET.Element) -> Dict[str, str]:
+    """Primer estado/numeroAutorizacion/fechaAutorizacion/ambiente/comprobante del sobre, en una pasada."""
+    found: Dict[str, str] = {}
+    for child in auth_root: # Solo descendientes, no la raíz (igual que './/etiqueta')
+        for element in child.iter():
+            key = _AUTORIZACION_TAGS.get(element.tag)
+            if key is not None and key not in found:
+                found[key] = element.text or ''
+                if len(found) == len(_AUTORIZACION_TAGS):
+                    return found
+    return found
+
+def _new_comprobante(autorizacion: Mapping[str, str], xml_path: str) -> Comprobante:
+    """Comprobante con los datos del sobre de autorización y las secciones vacías."""
+    parsed_data = Comprobante(
+        estado=_clean_text(autorizacion.get('estado', '')),
+        numero_autorizacion=_clean_text(autorizacion.get('numero_autorizacion', '')),
+        fecha_autorizacion=_clean_text(autorizacion.get('fecha_autorizacion', '')),
+        fecha_autorizacion_dt=None, # Inicializar como None
+        ambiente=_clean_text(autorizacion.get('ambiente', '')),
+        mensajes=[], # TODO: Parsear mensajes si existen
+        # Inicializar secciones principales
+        info_tributaria={},
+        comprador={},
+        doc_especifico={}, # Contendrá infoFactura o infoNotaDebito, etc.
+        totales={},
+        detalles=[], # Usaremos 'detalles' como clave genérica para items/motivos
+        impuestos_retencion=[], # Específico para retenciones
+        info_adicional={},
+        tipo_documento='Desconocido', # Se determinará por codDoc
+        doc_modificado={} # Para Notas de Crédito/Débito
+    )
+
+    # Intentar parsear fecha_autorizacion a datetime
+    fecha_auth_str = parsed_data.get('fecha_autorizacion')
+    parsed_data.fecha_autorizacion_dt = _parse_fecha(fecha_auth_str, xml_path, "fechaAutorizacion (principal)")
+    return parsed_data
+
+def _fill_comprobante(parsed_data: Comprobante, comprobante_root: ET.Element, xml_path: str,
+                      detalles: Optional[Sequence[Detalle]] = None) -> Comprobante:
+    """
+    Completa `parsed_data` a partir de la raíz del comprobante (el XML del CDATA).
+    `detalles`: ítems ya recorridos por xml_streaming; si es None se leen del árbol.
+    """
+    # Un único recorrido de los hijos de la raíz
+    root_children = _first_children(comprobante_root)
+
+    # 1. Parsear InfoTributaria
+    parsed_data.info_tributaria = _parse_info_tributaria(root_children.get(_tag('infoTributaria')))
+
+    # Determinar tipo de documento
+    cod_doc = parsed_data.info_tributaria.get('cod_doc')
+    doc_spec = _DOCUMENT_SPECS.get(cod_doc)
+    doc_info_element = None
+    comprador_id_raw = "N/A" # ID sin procesar para la lógica de entidad
+
+    if doc_spec is not None:
+        parsed_data.tipo_documento = doc_spec['tipo_documento']
+        doc_info_element = root_children.get(doc_spec['info_tag'])
+        info_children = _first_children(doc_info_element)
+        parsed_data.doc_especifico = doc_spec['parse_info'](info_children) if doc_info_element is not None else {}
+        if doc_spec['parse_detalles'] is not None:
+            if detalles is not None: # Ya recorridos en streaming (xml_streaming)
+                parsed_data.detalles = detalles
+            else:
+                parsed_data.detalles = doc_spec['parse_detalles'](root_children.get(doc_spec['detalles_tag']))
+        else: # Comprobante de Retención: las líneas dependen de la versión
+            parsed_data.impuestos_retencion = _parse_impuestos_retencion(comprobante_root, root_children)
+            parsed_data.detalles = parsed_data.impuestos_retencion # También en 'detalles' para consistencia si se usa genéricamente
+        if doc_spec['has_doc_modificado']: # Información del documento que modifica
+            parsed_data.doc_modificado = DocModificado(
+                cod_doc=parsed_data.doc_especifico.get('cod_doc_modificado', ''),
+                num_doc=parsed_data.doc_especifico.get('num_doc_modificado', ''),
+                fecha_emision=parsed_data.doc_especifico.get('fecha_emision_doc_sustento', '')
+            )
+        if doc_info_element is not None:
+            id_element = info_children.get(doc_spec['id_tag'])
+            comprador_id_raw = _clean_text(id_element.text) if id_element is not None and id_element.text else ''
+            # 2. Parsear Comprador (para retenciones, el "comprador" es el "sujetoRetenido")
+            parsed_data.comprador = doc_spec['parse_comprador'](info_children)
+            # 3. Parsear Totales e Impuestos (desde el elemento de info específico)
+            parsed_data.totales = _parse_totales_y_impuestos(info_children, doc_spec['impuestos_container'], doc_spec['impuesto_item'])
+    else:
+        if cod_doc: # Si hay cod_doc pero no es uno de los conocidos
+            logger.warning(f"Tipo de documento '{cod_doc}' no soportado completamente en {xml_path}.")
+        logger.error(f"No se encontró la sección de información específica para el documento {cod_doc} en {xml_path}.")
+
+    # 4. Parsear InfoAdicional
+    parsed_data.info_adicional = _parse_info_adicional(root_children.get(_tag('infoAdicional')))
+
+    # Si numeroAutorizacion no está en el XML principal, intentar obtenerlo de claveAcceso
+    if not parsed_data.numero_autorizacion and parsed_data.info_tributaria.get('clave_acceso'):
+        parsed_data.numero_autorizacion = parsed_data.info_tributaria['clave_acceso']
+        logger.debug(f"Usando claveAcceso como número de autorización para {os.path.basename(xml_path)}.")
+
+
+
+    # --- Consolidar datos para la salida ---
+    # 'emisor' (infoTributaria + dirEstablecimiento, contribuyenteEspecial y obligadoContabilidad
+    # del doc_especifico) y 'factura_info' (cabecera que espera el código PDF, también para ND/NC)
+    # no se copian: Comprobante los expone como vistas sobre info_tributaria y doc_especifico.
+
+    # Añadir el ID "raw" del comprador para la lógica de selección de entidad
+    parsed_data.id_comprador_raw = comprador_id_raw
+    
+    # Consolidar el ID de display para la GUI
+    if parsed_data.comprador and parsed_data.comprador.get('identificacion'):
+        parsed_data.id_comprador_display = parsed_data.comprador['identificacion']
+    # No necesitamos un else aquí, ya que id_comprador_display se inicializaría a "N/A"
+    # si 'comprador' o 'identificacion' no existen, debido a _parse_comprador.
+    # Si comprador_id_raw es "N/A", id_comprador_display también lo será.
+
+    logger.debug(f"Parseo de {os.path.basename(xml_path)} ({parsed_data.tipo_documento}) completado. Detalles encontrados: {len(parsed_data.get('detalles', []))}")
+    return parsed_data
+
+def parse_xml(xml_path: str, streaming: Optional[bool] = None) -> Optional[Comprobante]:
     """
     Parses an XML authorization file from the SRI (Factura, Nota de Débito, etc.).
 
     Args:
         xml_path: The path to the XML file.
+        streaming: True para el parseo en streaming (xml_streaming), False para cargar el árbol
+            completo; None decide por el tamaño del archivo (xml_streaming.should_stream).
 
     Returns:
-        A dictionary containing the parsed data, or None if parsing fails.
+        A Comprobante (document_model; se accede igual que a un dict), or None if parsing fails.
     """
-    if not os.path.exists(xml_path): # Mantener este print para feedback inmediato si el archivo no existe
+    if not xml_source.exists(xml_path): # Mantener este print para feedback inmediato si el archivo no existe
         logger.error(f"Archivo XML no encontrado en {xml_path}")
         return None
 
+    # Import diferido: xml_streaming importa este módulo
+    from src.core import xml_streaming
+    if streaming is None:
+        streaming = xml_streaming.should_stream(xml_path)
+    if streaming:
+        return xml_streaming.parse_xml_streaming(xml_path)
+
     try:
         # Parsear el archivo de autorización principal
-        auth_tree = ET.parse(xml_path)
-        auth_root = auth_tree.getroot()
-
-        parsed_data = {
-            'estado': _find_text_or_default(auth_root, './/{}estado'.format(ns.get('', '') or '')),
-            'numero_autorizacion': _find_text_or_default(auth_root, './/{}numeroAutorizacion'.format(ns.get('', '') or '')),
-            'fecha_autorizacion': _find_text_or_default(auth_root, './/{}fechaAutorizacion'.format(ns.get('', '') or '')),
-            'fecha_autorizacion_dt': None, # Inicializar como None
-            'ambiente': _find_text_or_default(auth_root, './/{}ambiente'.format(ns.get('', '') or '')),
-            'mensajes': [], # TODO: Parsear mensajes si existen
-            # Inicializar secciones principales
-            'info_tributaria': {},
-            'comprador': {},
-            'doc_especifico': {}, # Contendrá infoFactura o infoNotaDebito, etc.
-            'totales': {},
-            'detalles': [], # Usaremos 'detalles' como clave genérica para items/motivos
-            'impuestos_retencion': [], # Específico para retenciones
-            'info_adicional': {},
-            'tipo_documento': 'Desconocido', # Se determinará por codDoc
-            'doc_modificado': {} # Para Notas de Crédito/Débito
-        }
-
-        # Intentar parsear fecha_autorizacion a datetime
-        fecha_auth_str = parsed_data.get('fecha_autorizacion')
-        parsed_data['fecha_autorizacion_dt'] = _parse_fecha(fecha_auth_str, xml_path, "fechaAutorizacion (principal)")
-
+        auth_root = xml_backend.parse_file(xml_path)
+        autorizacion = _parse_autorizacion(auth_root)
+        parsed_data = _new_comprobante(autorizacion, xml_path)
 
         # Encontrar el comprobante dentro del CDATA
-        comprobante_cdata = auth_root.findtext('.//{}comprobante'.format(ns.get('', '') or ''))
+        comprobante_cdata = autorizacion.get('comprobante')
         if not comprobante_cdata:
             logger.error(f"No se encontró la sección <comprobante> o está vacía en {xml_path}")
             return None
@@ -497,141 +700,10 @@ def parse_xml(xml_path: str) -> Optional[Dict[str, Any]]:
         comprobante_cdata = comprobante_cdata.lstrip('\ufeff')
 
         # Parsear el XML del comprobante
-        comprobante_root = ET.fromstring(comprobante_cdata)
-
-        # 1. Parsear InfoTributaria
-        info_trib_element = comprobante_root.find('.//{}infoTributaria'.format(ns.get('', '') or ''))
-        parsed_data['info_tributaria'] = _parse_info_tributaria(info_trib_element)
-
-        # Determinar tipo de documento
-        cod_doc = parsed_data['info_tributaria'].get('cod_doc')
-        doc_info_element = None
-        comprador_id_raw = "N/A" # ID sin procesar para la lógica de entidad
-        detalles_motivos_element = None
-        tag_impuestos_container = ''
-        tag_impuesto_item = ''
-
-        if cod_doc == '01': # Factura
-            parsed_data['tipo_documento'] = 'Factura'
-            doc_info_element = comprobante_root.find('.//{}infoFactura'.format(ns.get('', '') or ''))
-            parsed_data['doc_especifico'] = _parse_info_factura(doc_info_element)
-            logger.debug("Parseando detalles para Factura...")
-            detalles_motivos_element = comprobante_root.find('.//{}detalles'.format(ns.get('', '') or ''))
-            parsed_data['detalles'] = _parse_detalles(detalles_motivos_element)
-            tag_impuestos_container = 'totalConImpuestos'
-            tag_impuesto_item = 'totalImpuesto'
-            if doc_info_element is not None:
-                comprador_id_raw = _find_text_or_default(doc_info_element, './/{}identificacionComprador'.format(ns.get('', '') or ''))
-        elif cod_doc == '05': # Nota de Débito
-            parsed_data['tipo_documento'] = 'Nota de Débito'
-            doc_info_element = comprobante_root.find('.//{}infoNotaDebito'.format(ns.get('', '') or ''))
-            parsed_data['doc_especifico'] = _parse_info_nota_debito(doc_info_element)
-            logger.debug("Parseando motivos para Nota de Débito...")
-            detalles_motivos_element = comprobante_root.find('.//{}motivos'.format(ns.get('', '') or ''))
-            parsed_data['detalles'] = _parse_motivos(detalles_motivos_element) # Usa parser de motivos
-            tag_impuestos_container = 'impuestos' # Diferente tag en ND
-            tag_impuesto_item = 'impuesto'      # Diferente tag en ND
-            # Extraer info del documento modificado
-            parsed_data['doc_modificado'] = {
-                'cod_doc': parsed_data['doc_especifico'].get('cod_doc_modificado', ''),
-                'num_doc': parsed_data['doc_especifico'].get('num_doc_modificado', ''),
-                'fecha_emision': parsed_data['doc_especifico'].get('fecha_emision_doc_sustento', '')
-            }
-            if doc_info_element is not None:
-                comprador_id_raw = _find_text_or_default(doc_info_element, './/{}identificacionComprador'.format(ns.get('', '') or ''))
-        elif cod_doc == '04': # Nota de Crédito
-            parsed_data['tipo_documento'] = 'Nota de Crédito'
-            doc_info_element = comprobante_root.find('.//{}infoNotaCredito'.format(ns.get('', '') or '')) # Asumiendo 'infoNotaCredito'
-            parsed_data['doc_especifico'] = _parse_info_nota_credito(doc_info_element)
-            logger.debug("Parseando detalles para Nota de Crédito...")
-            detalles_motivos_element = comprobante_root.find('.//{}detalles'.format(ns.get('', '') or '')) # Asumiendo 'detalles' como en factura
-            parsed_data['detalles'] = _parse_detalles(detalles_motivos_element) # Reutiliza el parser de detalles de factura
-            tag_impuestos_container = 'totalConImpuestos' # Asumiendo como en factura
-            tag_impuesto_item = 'totalImpuesto'       # Asumiendo como en factura
-            parsed_data['doc_modificado'] = { # Información del documento que modifica
-                'cod_doc': parsed_data['doc_especifico'].get('cod_doc_modificado', ''),
-                'num_doc': parsed_data['doc_especifico'].get('num_doc_modificado', ''),
-                'fecha_emision': parsed_data['doc_especifico'].get('fecha_emision_doc_sustento', '')
-            }
-            if doc_info_element is not None: # NC tiene identificacionComprador dentro de infoNotaCredito
-                comprador_id_raw = _find_text_or_default(doc_info_element, './/{}identificacionComprador'.format(ns.get('', '') or ''))
-        elif cod_doc == '07': # Comprobante de Retención
-            parsed_data['tipo_documento'] = 'Comprobante de Retención'
-            doc_info_element = comprobante_root.find('.//{}infoCompRetencion'.format(ns.get('', '') or ''))
-            parsed_data['doc_especifico'] = _parse_info_retencion(doc_info_element)
-            logger.debug("Parseando impuestos para Comprobante de Retención...")
-            # Pasar el comprobante_root a _parse_impuestos_retencion para que pueda determinar la versión
-            parsed_data['impuestos_retencion'] = _parse_impuestos_retencion(comprobante_root) # Guardar en su propia clave
-            parsed_data['detalles'] = parsed_data['impuestos_retencion'] # También en 'detalles' para consistencia si se usa genéricamente
-            if doc_info_element is not None:
-                comprador_id_raw = _find_text_or_default(doc_info_element, './/{}identificacionSujetoRetenido'.format(ns.get('', '') or ''))
-            # No hay 'totalConImpuestos' o 'impuestos' a nivel de totales como en Factura/ND
-        elif cod_doc: # Si hay cod_doc pero no es uno de los conocidos
-            logger.warning(f"Tipo de documento '{cod_doc}' no soportado completamente en {xml_path}.")
-            # Intentar parsear genéricamente si es posible o devolver error/parcial
-            # Por ahora, dejamos doc_info_element as None
-
-        if doc_info_element is None and cod_doc not in ['01', '04', '05', '07']: # Si no es Factura, NC, ND o Ret y no se encontró info específica
-             logger.error(f"No se encontró la sección de información específica para el documento {cod_doc} en {xml_path}.")
-             # Podrías intentar buscar elementos comunes si existen
-        elif doc_info_element is not None:
-             # 2. Parsear Comprador (desde el elemento de info específico o campos directos en NC)
-             # Para retenciones, el "comprador" es el "sujetoRetenido" (usar función específica)
-             if cod_doc == '07':
-                 parsed_data['comprador'] = _parse_comprador_retencion(doc_info_element)
-             else:
-                 parsed_data['comprador'] = _parse_comprador(doc_info_element)
-
-             # 3. Parsear Totales e Impuestos (desde el elemento de info específico) - No aplica directamente a Retención de la misma forma
-             parsed_data['totales'] = _parse_totales_y_impuestos(doc_info_element, tag_impuestos_container, tag_impuesto_item)
-             
-        # 4. Parsear InfoAdicional
-        info_adic_element = comprobante_root.find('.//{}infoAdicional'.format(ns.get('', '') or ''))
-        parsed_data['info_adicional'] = _parse_info_adicional(info_adic_element)
-
-        # Si numeroAutorizacion no está en el XML principal, intentar obtenerlo de claveAcceso
-        if not parsed_data['numero_autorizacion'] and parsed_data['info_tributaria'].get('clave_acceso'):
-            parsed_data['numero_autorizacion'] = parsed_data['info_tributaria']['clave_acceso']
-            logger.debug(f"Usando claveAcceso como número de autorización para {os.path.basename(xml_path)}.")
-
-
-
-        # --- Consolidar datos para la salida ---
-        # Mover algunos datos a niveles superiores para facilitar acceso en pdf_generator
-        # Emisor (combinando infoTributaria y doc_especifico)
-        parsed_data['emisor'] = {
-            **parsed_data['info_tributaria'], # Copia todo de infoTributaria
-            'dir_establecimiento': parsed_data['doc_especifico'].get('dir_establecimiento', parsed_data['info_tributaria'].get('dir_matriz')), # Usa dirEstablecimiento si existe, sino dirMatriz
-            'contribuyente_especial': parsed_data['doc_especifico'].get('contribuyente_especial', ''),
-            'obligado_contabilidad': parsed_data['doc_especifico'].get('obligado_contabilidad', ''),
-            'agente_retencion_num_res': parsed_data['info_tributaria'].get('agente_retencion_num_res', ''), # Aseguramos que se copie a emisor
-        } # Eliminado 'logo_path': None
-
-        # Factura Info (para mantener compatibilidad con código PDF existente)
-        # Copiar datos relevantes a una clave 'factura_info' aunque sea ND
-        # Esto simplifica el código del PDF que espera 'factura_info'
-        parsed_data['factura_info'] = {
-            'numero_factura': f"{parsed_data['info_tributaria'].get('estab', '')}-{parsed_data['info_tributaria'].get('pto_emi', '')}-{parsed_data['info_tributaria'].get('secuencial', '')}",
-            'fecha_emision': parsed_data['doc_especifico'].get('fecha_emision', ''),
-            'clave_acceso': parsed_data['info_tributaria'].get('clave_acceso', ''),
-            'tipo_emision_doc': parsed_data['info_tributaria'].get('tipo_emision', ''), # Usar el de infoTributaria
-            'pagos': parsed_data['doc_especifico'].get('pagos', []) # Estará vacío para ND
-        }
-
-        # Añadir el ID "raw" del comprador para la lógica de selección de entidad
-        parsed_data['id_comprador_raw'] = comprador_id_raw
-        
-        # Consolidar el ID de display para la GUI
-        if parsed_data['comprador'] and parsed_data['comprador'].get('identificacion'):
-            parsed_data['id_comprador_display'] = parsed_data['comprador']['identificacion']
-        # No necesitamos un else aquí, ya que id_comprador_display se inicializaría a "N/A"
-        # si 'comprador' o 'identificacion' no existen, debido a _parse_comprador.
-        # Si comprador_id_raw es "N/A", id_comprador_display también lo será.
-
-        logger.debug(f"Parseo de {os.path.basename(xml_path)} ({parsed_data['tipo_documento']}) completado. Detalles encontrados: {len(parsed_data.get('detalles', []))}")
-        return parsed_data
+        comprobante_root = xml_backend.parse_string(comprobante_cdata)
+        return _fill_comprobante(parsed_data, comprobante_root, xml_path)
 
-    except ET.ParseError as e: # Mantener este print para feedback inmediato si el XML está mal formado
+    except xml_backend.ParseError as e: # Mantener este print para feedback inmediato si el XML está mal formado
         logger.error(f"Error de parseo XML en {os.path.basename(xml_path)}: {e}")
         return None
     except Exception as e:
@@ -639,23 +711,10 @@ def parse_xml(xml_path: str) -> Optional[Dict[str, Any]]:
         # logger.exception ya incluye el traceback
         return None
 
-def _parse_comprador_retencion(info_ret_element: ET.Element) -> Dict[str, Any]:
-    """Parses subject information for Retenciones (similar to buyer)."""
-    if info_ret_element is None:
-        return {}
-    return {
-        'tipo_identificacion': _find_text_or_default(info_ret_element, './/{}tipoIdentificacionSujetoRetenido'.format(ns.get('', '') or '')),
-        'razon_social': _find_text_or_default(info_ret_element, './/{}razonSocialSujetoRetenido'.format(ns.get('', '') or '')),
-        'identificacion': _find_text_or_default(info_ret_element, './/{}identificacionSujetoRetenido'.format(ns.get('', '') or '')),
-        'direccion': '', # Dirección del sujeto retenido no es un campo estándar aquí
-        'guia_remision': '', # No aplica
-        'placa': '', # No aplica
-    }
-
 # --- Funciones de ayuda para extraer datos específicos para la tabla de la GUI ---
 # Estas funciones se usan en el WorkerThread de main_window.py para poblar la tabla.
 
-def extract_header_data(parsed_xml_data: Dict[str, Any]) -> Optional[Dict[str, str]]:
+def extract_header_data(parsed_xml_data: Mapping[str, Any]) -> Optional[Dict[str, str]]:
     """Extrae datos del encabezado para la GUI desde el XML ya parseado."""
     if not parsed_xml_data:
         return None
@@ -666,7 +725,7 @@ def extract_header_data(parsed_xml_data: Dict[str, Any]) -> Optional[Dict[str, s
         "cod_doc": parsed_xml_data.get('info_tributaria', {}).get('cod_doc', "N/A")
     }
 
-def get_unique_identifier(parsed_xml_data: Dict[str, Any]) -> Optional[str]:
+def get_unique_identifier(parsed_xml_data: Mapping[str, Any]) -> Optional[str]:
     """Obtiene el número de autorización o clave de acceso del XML ya parseado."""
     if not parsed_xml_data:
         return None
@@ -682,7 +741,7 @@ def get_unique_identifier(parsed_xml_data: Dict[str, Any]) -> Optional[str]:
     return None
 
 
-def extract_data_from_xml(parsed_xml_data: Dict[str, Any], xml_file_path: str, cod_doc_filter: str, entity_id_filter: str, conversion_errors_list: List[str]) -> Optional[Dict[str, Any]]:
+def extract_data_from_xml(parsed_xml_data: Mapping[str, Any], xml_file_path: str, cod_doc_filter: str, entity_id_filter: str, conversion_errors_list: List[str]) -> Optional[Dict[str, Any]]:
     """
     Extrae los datos necesarios para una fila de la tabla de la GUI,
     a partir del diccionario de datos ya parseado del XML.
@@ -853,7 +912,7 @@ def extract_data_from_xml(parsed_xml_data: Dict[str, Any], xml_file_path: str, c
     descripciones_articulos = []
     if detalles_list: # Si hay detalles (items o motivos)
         for item in detalles_list[:3]: # Tomar solo los primeros 3
-            if isinstance(item, dict):
+            if isinstance(item, Mapping):
                 # Para items (Factura, NC, LiqCompra)
                 if item.get('descripcion'):
                     descripciones_articulos.append(item['descripcion'])
@@ -875,18 +934,13 @@ if __name__ == '__main__':
         log_format = '%(asctime)s - %(levelname)s - %(name)s - [%(filename)s:%(lineno)d] - %(message)s'
         logging.basicConfig(level=logging.DEBUG, format=log_format)
 
-    # Cambia la ruta al archivo XML que quieras probar
-    test_xml_path_ret = r'D:\Datos\Desktop\Asistente Contable\retencion.xml' # COLOCA AQUÍ EL NOMBRE DE TU ARCHIVO DE RETENCIÓN
-    test_xml_path_nd = r'd:\Datos\Desktop\Asistente Contable\2404202505106003130000120010060001062241438928214.xml' # Nota de Débito
-    test_xml_path_nc = r'D:\Datos\Desktop\Asistente Contable\Nota de credito.xml' # Ejemplo de ruta para Nota de Crédito
-    test_xml_path_fac = r'd:\Datos\Desktop\Asistente Contable\factura_ejemplo.xml' # Ejemplo de ruta para Factura
-
-    test_files = [
-        test_xml_path_fac,
-        test_xml_path_nd,
-        test_xml_path_nc,
-        test_xml_path_ret,
-    ]
+    # Uso: python -m src.core.xml_parser archivo1.xml [archivo2.xml ...]
+    # (para generar XML de prueba: python -m benchmarks.sri_synthetic <carpeta>)
+    import sys
+    test_files = sys.argv[1:]
+    if not test_files:
+        print("Uso: python -m src.core.xml_parser archivo1.xml [archivo2.xml ...]")
+        sys.exit(2)
 
     for test_file_path in test_files:
         if os.path.exists(test_file_path):
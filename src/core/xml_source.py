@@ -0,0 +1,181 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\xml_source.py
+import os
+import time
+import shutil
+import zipfile
+import logging
+import threading
+from collections import OrderedDict
+from typing import IO, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# XML sueltos o miembros de un ZIP, leídos sin extraerlos. Un miembro viaja por el pipeline como
+# ruta virtual "<ruta del zip>!/<miembro>"; solo este módulo sabe abrirla.
+
+MEMBER_SEPARATOR = "!/" # La "/" hace que os.path.basename devuelva el nombre del miembro
+_ARCHIVE_MARKER = ".zip" + MEMBER_SEPARATOR
+# ZIP abiertos por proceso (el índice central se lee una vez, no una vez por miembro)
+_MAX_OPEN_ARCHIVES = 4
+
+_open_archives: "OrderedDict[str, Tuple[Tuple[int, int], zipfile.ZipFile]]" = OrderedDict()
+_open_archives_lock = threading.Lock()
+_open_archives_pid = os.getpid()
+
+
+class MemberStat(NamedTuple):
+    """Equivalente a os.stat_result para un miembro de ZIP (lo que usa parse_cache)."""
+    st_size: int
+    st_mtime_ns: int
+
+
+StatResult = Union[os.stat_result, MemberStat]
+
+
+def is_archive(path: str) -> bool:
+    return path.lower().endswith(".zip")
+
+
+def split_member_path(path: str) -> Optional[Tuple[str, str]]:
+    """(ruta del zip, nombre del miembro) de una ruta virtual, o None si es un archivo normal."""
+    index = path.lower().find(_ARCHIVE_MARKER)
+    if index < 0:
+        return None
+    archive_path = path[:index + len(".zip")]
+    return archive_path, path[index + len(_ARCHIVE_MARKER):]
+
+
+def member_path(archive_path: str, member_name: str) -> str:
+    return f"{archive_path}{MEMBER_SEPARATOR}{member_name}"
+
+
+def is_member_path(path: str) -> bool:
+    return split_member_path(path) is not None
+
+
+def _archive_locked(archive_path: str) -> zipfile.ZipFile:
+    """
+    ZipFile abierto (y reutilizado) para `archive_path`; se reabre si el archivo cambió.
+    Se llama con _open_archives_lock tomado: otro hilo puede cerrar el ZipFile al sacarlo de la
+    lista (más de _MAX_OPEN_ARCHIVES en uso), así que quien lo use para abrir un miembro debe
+    hacerlo sin soltar el lock. Un miembro ya abierto sigue leyéndose aunque se cierre el ZipFile.
+    """
+    stat_result = os.stat(archive_path)
+    identity = (stat_result.st_size, stat_result.st_mtime_ns)
+    global _open_archives_pid
+    if _open_archives_pid != os.getpid():
+        # Proceso hijo creado con fork: los descriptores heredados comparten la posición de
+        # lectura con el padre, no se reutilizan
+        _open_archives.clear()
+        _open_archives_pid = os.getpid()
+    cached = _open_archives.get(archive_path)
+    if cached is not None and cached[0] == identity:
+        _open_archives.move_to_end(archive_path)
+        return cached[1]
+    if cached is not None:
+        cached[1].close()
+    archive = zipfile.ZipFile(archive_path)
+    _open_archives[archive_path] = (identity, archive)
+    while len(_open_archives) > _MAX_OPEN_ARCHIVES:
+        _evicted_identity, evicted = _open_archives.popitem(last=False)[1]
+        evicted.close()
+    return archive
+
+
+def _member_info(path: str) -> zipfile.ZipInfo:
+    archive_path, member_name = split_member_path(path)
+    with _open_archives_lock:
+        return _archive_locked(archive_path).getinfo(member_name) # KeyError si no existe
+
+
+def _open_member(path: str) -> IO[bytes]:
+    archive_path, member_name = split_member_path(path)
+    with _open_archives_lock:
+        archive = _archive_locked(archive_path)
+        return archive.open(archive.getinfo(member_name))
+
+
+def _member_mtime(info: zipfile.ZipInfo) -> float:
+    return time.mktime(info.date_time + (0, 0, -1))
+
+
+def expand_inputs(paths: Iterable[str]) -> List[str]:
+    """
+    Reemplaza cada .zip por las rutas virtuales de sus miembros .xml (en el orden del ZIP).
+    Las demás rutas se devuelven sin cambios. Un ZIP dañado se omite con una advertencia.
+    """
+    expanded: List[str] = []
+    for path in paths:
+        if not (is_archive(path) and os.path.isfile(path)):
+            expanded.append(path)
+            continue
+        try:
+            with _open_archives_lock:
+                infos = _archive_locked(path).infolist()
+            members = [info.filename for info in infos
+                       if not info.is_dir() and info.filename.lower().endswith(".xml")]
+        except (zipfile.BadZipFile, OSError) as e:
+            logger.warning(f"No se pudo leer el ZIP {path}: {e}. Se omite.")
+            continue
+        logger.info(f"ZIP {os.path.basename(path)}: {len(members)} XML.")
+        expanded.extend(member_path(path, member_name) for member_name in members)
+    return expanded
+
+
+def exists(path: str) -> bool:
+    if not is_member_path(path):
+        return os.path.exists(path)
+    try:
+        _member_info(path)
+        return True
+    except (KeyError, OSError, zipfile.BadZipFile):
+        return False
+
+
+def stat(path: str) -> StatResult:
+    """os.stat, o tamaño y fecha del miembro. Lanza OSError si no existe."""
+    if not is_member_path(path):
+        return os.stat(path)
+    try:
+        info = _member_info(path)
+    except (KeyError, zipfile.BadZipFile) as e:
+        raise FileNotFoundError(f"{path}: {e}") from e
+    return MemberStat(info.file_size, int(_member_mtime(info)) * 1_000_000_000)
+
+
+def getsize(path: str) -> int:
+    return stat(path).st_size
+
+
+def open_binary(path: str) -> IO[bytes]:
+    """Abre el archivo (o el miembro del ZIP, descomprimiéndolo al leer) en modo binario."""
+    if not is_member_path(path):
+        return open(path, "rb")
+    try:
+        return _open_member(path)
+    except (KeyError, zipfile.BadZipFile) as e:
+        raise FileNotFoundError(f"{path}: {e}") from e
+
+
+def copy_to(path: str, destination: str):
+    """shutil.copy2 también para miembros de ZIP (conserva la fecha del miembro)."""
+    if not is_member_path(path):
+        shutil.copy2(path, destination)
+        return
+    info = _member_info(path)
+    with open_binary(path) as source, open(destination, "wb") as target:
+        shutil.copyfileobj(source, target)
+    member_mtime = _member_mtime(info)
+    os.utime(destination, (member_mtime, member_mtime))
+
+
+def add_to_zip(zip_file: zipfile.ZipFile, path: str, arcname: str):
+    """zip_file.write(path, arcname) también para miembros de otro ZIP, sin archivo intermedio."""
+    if not is_member_path(path):
+        zip_file.write(path, arcname)
+        return
+    info = _member_info(path)
+    target_info = zipfile.ZipInfo(arcname, date_time=info.date_time)
+    target_info.compress_type = zip_file.compression
+    with open_binary(path) as source, zip_file.open(target_info, "w") as target:
+        shutil.copyfileobj(source, target)
@@ -0,0 +1,279 @@
+# d:\Datos\Desktop\Asistente Contable\src\core\xml_streaming.py
+import os
+import logging
+import xml.etree.ElementTree as ET
+from collections.abc import Sequence
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.core import xml_backend, xml_parser, xml_source
+from src.core.document_model import Comprobante, Detalle
+
+logger = logging.getLogger(__name__)
+
+# Parseo en streaming de comprobantes con miles de líneas; produce el mismo Comprobante que
+# xml_parser.parse_xml (que deriva aquí los archivos de STREAMING_MIN_BYTES o más). El CDATA pasa
+# por bloques a un segundo parser incremental y cada <detalle> se descarta al cerrarse, así que la
+# memoria no crece con las líneas; StreamedDetalles relee el archivo al recorrerse.
+
+# Tamaño mínimo (bytes) del archivo para parsear en streaming; 0 lo desactiva
+STREAMING_ENV_VAR = "ASISTENTE_XML_STREAMING_MIN_BYTES"
+DEFAULT_STREAMING_MIN_BYTES = 1024 * 1024
+
+# Bloque de lectura del archivo de autorización
+_READ_CHUNK_BYTES = 64 * 1024
+# Ítems que se conservan en memoria ("Primeros 3 Articulos" de extract_data_from_xml)
+HEAD_ITEMS = 3
+
+_TAG_INFO_TRIBUTARIA = xml_parser._tag('infoTributaria')
+# Etiquetas de sección de detalles/motivos de cualquier tipo de documento
+_DETALLES_TAGS = frozenset(spec['detalles_tag'] for spec in xml_parser._DOCUMENT_SPECS.values() if spec['detalles_tag'])
+
+
+def _resolve_min_bytes() -> int:
+    requested = os.environ.get(STREAMING_ENV_VAR, "").strip()
+    if not requested:
+        return DEFAULT_STREAMING_MIN_BYTES
+    try:
+        return max(0, int(requested))
+    except ValueError:
+        logger.warning(f"{STREAMING_ENV_VAR}='{requested}' no es un número. Se usa {DEFAULT_STREAMING_MIN_BYTES}.")
+        return DEFAULT_STREAMING_MIN_BYTES
+
+
+STREAMING_MIN_BYTES = _resolve_min_bytes()
+
+
+def should_stream(xml_path: str) -> bool:
+    """True si el archivo es lo bastante grande para parsearlo en streaming."""
+    if STREAMING_MIN_BYTES <= 0:
+        return False
+    try:
+        return xml_source.getsize(xml_path) >= STREAMING_MIN_BYTES
+    except OSError:
+        return False
+
+
+class _EnvelopeTarget:
+    """
+    Destino (target) del parser del sobre de autorización. Equivale a xml_parser._parse_autorizacion
+    (primer elemento de cada etiqueta bajo la raíz, con su texto hasta el primer hijo), pero el
+    texto de <comprobante> no se acumula: se entrega por partes a `feed_comprobante`.
+    """
+
+    def __init__(self, feed_comprobante: Callable[[str], None]):
+        self.found: Dict[str, str] = {}
+        self._feed_comprobante = feed_comprobante
+        self._depth = 0
+        self._capture_key: Optional[str] = None
+        self._capture_parts: List[str] = []
+
+    def start(self, tag: str, attrib: Dict[str, str]):
+        self._stop_capture() # El texto de un elemento termina en su primer hijo
+        self._depth += 1
+        if self._depth > 1: # Solo descendientes, no la raíz
+            key = xml_parser._AUTORIZACION_TAGS.get(tag)
+            if key is not None and key not in self.found:
+                self.found[key] = ''
+                self._capture_key = key
+
+    def data(self, text: str):
+        if self._capture_key == 'comprobante':
+            self._feed_comprobante(text)
+        elif self._capture_key is not None:
+            self._capture_parts.append(text)
+
+    def end(self, tag: str):
+        self._stop_capture()
+        self._depth -= 1
+
+    def close(self) -> Dict[str, str]:
+        return self.found
+
+    def _stop_capture(self):
+        if self._capture_key is not None and self._capture_key != 'comprobante':
+            self.found[self._capture_key] = ''.join(self._capture_parts)
+        self._capture_key = None
+        self._capture_parts = []
+
+
+class _ComprobanteStream:
+    """
+    Parser incremental del XML del comprobante. Construye el árbol como ElementTree, salvo la
+    primera sección de detalles (la que usaría xml_parser): cada ítem se convierte con el
+    parse_detalle_item del tipo de documento y se quita del árbol.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._depth = 0
+        self._started = False
+        self.received = False # Hubo texto en <comprobante> (aunque fuera solo un BOM)
+        self.root: Optional[ET.Element] = None
+        self._spec: Optional[Dict[str, Any]] = None
+        self._info_tributaria_seen = False
+        self._container_seen = False
+        self._container: Optional[ET.Element] = None
+        self.detalles_streamed = False # La sección de detalles se recorrió ítem por ítem
+        self.detalles_done = False
+        self._items: List[Detalle] = []
+
+    def feed(self, text: str):
+        if text:
+            self.received = True
+        if not self._started:
+            # Igual que parse_xml: se descarta el BOM al inicio del CDATA
+            text = text.lstrip('\ufeff')
+            if not text:
+                return
+            self._started = True
+        self._parser.feed(text)
+        self._process_events()
+
+    def close(self):
+        self._parser.close()
+        self._process_events()
+
+    def take_items(self) -> List[Detalle]:
+        items, self._items = self._items, []
+        return items
+
+    def _process_events(self):
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                self._depth += 1
+                if self._depth == 1:
+                    self.root = element
+                elif self._depth == 2 and not self._container_seen and element.tag in _DETALLES_TAGS:
+                    if self._spec is None:
+                        self._container_seen = True # Detalles antes de infoTributaria: se leen del árbol
+                    elif element.tag == self._spec['detalles_tag']:
+                        self._container_seen = True
+                        if self._spec['parse_detalle_item'] is not None:
+                            self._container = element
+                            self.detalles_streamed = True
+                continue
+            if self._depth == 3 and self._container is not None and element.tag == self._spec['detalle_item_tag']:
+                self._items.append(self._spec['parse_detalle_item'](element))
+                self._container.remove(element) # Ya convertido: fuera del árbol
+            elif self._depth == 2:
+                if element is self._container:
+                    self._container = None
+                    self.detalles_done = True
+                elif element.tag == _TAG_INFO_TRIBUTARIA and not self._info_tributaria_seen:
+                    # codDoc decide cómo leer los detalles, que vienen después
+                    self._info_tributaria_seen = True
+                    cod_doc = xml_parser._parse_info_tributaria(element).get('cod_doc')
+                    self._spec = xml_parser._DOCUMENT_SPECS.get(cod_doc)
+            self._depth -= 1
+
+
+def _stream_file(xml_path: str, comprobante: _ComprobanteStream, envelope: _EnvelopeTarget,
+                 stop_after_detalles: bool = False) -> Iterator[Detalle]:
+    """Lee el archivo por bloques y entrega los ítems de detalle a medida que se cierran."""
+    envelope_parser = ET.XMLParser(target=envelope)
+    with xml_source.open_binary(xml_path) as xml_file:
+        while True:
+            chunk = xml_file.read(_READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            envelope_parser.feed(chunk)
+            yield from comprobante.take_items()
+            if stop_after_detalles and comprobante.detalles_done:
+                return
+    envelope_parser.close()
+    if comprobante.received:
+        comprobante.close()
+        yield from comprobante.take_items()
+
+
+def _file_identity(xml_path: str) -> Tuple[int, int]:
+    stat_result = xml_source.stat(xml_path)
+    return stat_result.st_size, stat_result.st_mtime_ns
+
+
+class StreamedDetalles(Sequence):
+    """
+    Ítems de detalle de un comprobante grande, sin tenerlos en memoria: len() y los primeros
+    HEAD_ITEMS están guardados; recorrerla vuelve a leer el archivo (streaming). Se serializa
+    (pickle) como la ruta, el conteo y esos primeros ítems.
+    """
+    __slots__ = ('xml_path', '_identity', '_count', '_head')
+
+    def __init__(self, xml_path: str, identity: Tuple[int, int], count: int, head: List[Detalle]):
+        self.xml_path = xml_path
+        self._identity = identity
+        self._count = count
+        self._head = head
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Detalle]:
+        if _file_identity(self.xml_path) != self._identity:
+            raise ValueError(f"El archivo {os.path.basename(self.xml_path)} cambió después de parsearlo.")
+        comprobante = _ComprobanteStream()
+        count = 0
+        for item in _stream_file(self.xml_path, comprobante, _EnvelopeTarget(comprobante.feed), stop_after_detalles=True):
+            count += 1
+            yield item
+        if count != self._count:
+            logger.warning(f"{os.path.basename(self.xml_path)}: se esperaban {self._count} detalles y se leyeron {count}.")
+
+    def __getitem__(self, index):
+        positions = range(self._count)[index] # IndexError y slices como en una lista
+        if isinstance(index, slice):
+            if not positions or max(positions) < len(self._head):
+                return [self._head[position] for position in positions]
+            logger.debug(f"StreamedDetalles: acceso {index} fuera de los primeros ítems; se lee la lista completa.")
+            return list(self)[index]
+        if positions < len(self._head):
+            return self._head[positions]
+        return next(islice(self, positions, None))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (list, tuple, StreamedDetalles)):
+            return len(other) == self._count and list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (type(self), (self.xml_path, self._identity, self._count, self._head))
+
+    def __repr__(self) -> str:
+        return f"StreamedDetalles({os.path.basename(self.xml_path)!r}, {self._count} ítems)"
+
+
+def parse_xml_streaming(xml_path: str) -> Optional[Comprobante]:
+    """
+    Igual que xml_parser.parse_xml, con memoria acotada: ver el comentario del módulo.
+    'detalles' es una lista normal si tiene HEAD_ITEMS ítems o menos.
+    """
+    try:
+        identity = _file_identity(xml_path)
+        comprobante = _ComprobanteStream()
+        envelope = _EnvelopeTarget(comprobante.feed)
+        head: List[Detalle] = []
+        count = 0
+        for item in _stream_file(xml_path, comprobante, envelope):
+            if count < HEAD_ITEMS:
+                head.append(item)
+            count += 1
+
+        parsed_data = xml_parser._new_comprobante(envelope.found, xml_path)
+        if not comprobante.received:
+            logger.error(f"No se encontró la sección <comprobante> o está vacía en {xml_path}")
+            return None
+        detalles = None
+        if comprobante.detalles_streamed:
+            detalles = head if count <= HEAD_ITEMS else StreamedDetalles(xml_path, identity, count, head)
+            logger.debug(f"Parseo en streaming de {os.path.basename(xml_path)}: {count} detalle(s).")
+        return xml_parser._fill_comprobante(parsed_data, comprobante.root, xml_path, detalles)
+
+    except xml_backend.ParseError as e:
+        logger.error(f"Error de parseo XML en {os.path.basename(xml_path)}: {e}")
+        return None
+    except Exception:
+        logger.exception(f"Error inesperado durante el parseo de {xml_path}")
+        return None
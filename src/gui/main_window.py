@@ -2,22 +2,24 @@
 from datetime import datetime
 import os
 import sys
-from typing import List, Optional, Dict, Any, Tuple, Set
+from typing import List, Optional, Dict, Any, Tuple, Set, Callable, Sequence
 import logging
 import subprocess # Añadido para abrir PDFs y carpetas
 import re # Añadido para expresiones regulares en nombres de carpeta ZIP
+import time
 from collections import defaultdict
+from operator import itemgetter
 
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import wait as wait_futures
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QDialog, QProgressDialog,
     QPushButton, QFileDialog, QLabel, QMessageBox, QDialogButtonBox, QStyle, QStyleOptionHeader,
-    QTableWidget, QTableWidgetItem, QHeaderView, QStyledItemDelegate, QStyleOptionViewItem
+    QTableView, QHeaderView, QStyledItemDelegate, QStyleOptionViewItem, QCheckBox
 )
 
 import urllib.request # Para comprobar actualizaciones
 import urllib.parse # Para parsear URLs en start_update_download
-from PySide6.QtCore import Qt, QThread, Signal, Slot, QModelIndex, QSize, QRect, QSettings, QStandardPaths, QMutex, QWaitCondition, QUrl
+from PySide6.QtCore import Qt, QThread, Signal, Slot, QModelIndex, QSize, QRect, QSettings, QStandardPaths, QMutex, QWaitCondition, QUrl, QTimer
 from PySide6.QtGui import QColor, QPainter, QPalette, QBrush, QFontMetrics, QDesktopServices
 import threading # Para ejecutar la comprobación en segundo plano
 
@@ -27,10 +29,17 @@ from src.utils.file_utils import cleanup_temp_folder, create_zip_archive
 from src.gui.progress_popup import ProgressPopup # Asegúrate que esta línea esté antes de la siguiente si ProgressPopup usa algo de exporter
 from src.utils.exporter import export_to_excel, ExcelExportStatus
 from src.gui.entity_clarification_dialog import EntityClarificationDialog
-from src.core.worker_tasks import process_single_xml_file_task # Importar la tarea del worker
+from src.core import batch_pipeline, folder_scan, staged_pipeline # Etapas del lote compartidas con el modo por consola (src/cli.py)
+from src.core.parse_cache import ParseCache # Caché de parseo en la base local
+from src.core.worker_pool import WorkerPool # Pool de procesos persistente
+from src.core.execution_strategy import ExecutionStrategy # En línea, hilos o procesos según el lote
+from src.core.lazy_pdf import LazyPdfRenderer # PDFs generados después de llenar la tabla
 from src.gui.export_type_selection_dialog import ExportTypeSelectionDialog
 from src.gui.id_type_selection_dialog import IdTypeSelectionDialog
 from src.gui.download_thread import DownloadThread # <--- AÑADIR IMPORTACIÓN
+from src.gui.report_table_model import ReportTableModel, USER_ROLE_PDF_PATH
+from src.utils import report_layout
+from src.utils.report_ledger import ReportLedger, DocumentLedger
 
 logger = logging.getLogger(__name__)
 
@@ -38,36 +47,23 @@ ORGANIZATION_NAME = "Business & Services"
 APPLICATION_NAME = "AsistenteContable"
 SETTINGS_LAST_XML_DIR = "paths/last_xml_dir"
 SETTINGS_LAST_ZIP_DIR = "paths/last_zip_dir"
-
-# Mapping for month numbers to Spanish names for folder creation
-MONTH_NAMES_SPANISH = {
-    1: "ENERO", 2: "FEBRERO", 3: "MARZO", 4: "ABRIL", 5: "MAYO", 6: "JUNIO",
-    7: "JULIO", 8: "AGOSTO", 9: "SEPTIEMBRE", 10: "OCTUBRE", 11: "NOVIEMBRE", 12: "DICIEMBRE"
-}
-
-# Regex to clean up folder names
-FOLDER_NAME_CLEAN_REGEX = re.compile(r'[^\w\s-]') # Keep alphanumeric, space, hyphen
-SPACE_HYPHEN_NORM_REGEX = re.compile(r'[-\s]+') # Replace multiple spaces/hyphens with a single space
+SETTINGS_LAZY_PDF = "processing/lazy_pdf"
+# Cada cuántos archivos se actualiza el mensaje del pre-análisis (carpetas grandes)
+PRE_ANALYSIS_PROGRESS_EVERY = 1000
 
 # --- Configuración de Actualizaciones ---
 APP_VERSION = "1.1.3" # <--- Define aquí la versión actual de tu aplicación
 UPDATE_CHECK_URL = "https://contabilidadsri.com/latest_version.txt"
 
-# --- Constantes para Hipervínculos en Tabla ---
-USER_ROLE_PDF_PATH = Qt.UserRole + 1 # Usar un rol de usuario para guardar la ruta del PDF
+# --- Refresco de la tabla de reporte ---
+# Las filas que llegan del worker se agrupan y la vista se actualiza como máximo una vez por intervalo
+REPORT_REFRESH_INTERVAL_MS = 200
 
-
-def _is_value_significant_for_display(value: Any) -> bool:
-    """
-    Determina si un valor es 'significativo' para la visualización o exportación.
-    Un valor no es significativo si es None, una cadena vacía/espacios en blanco,
-    o una colección vacía. Los números (incluido el 0) se consideran significativos.
-    """
-    if value is None:
-        return False
-    if isinstance(value, str) and not value.strip():
-        return False
-    return True
+# --- Entrega de resultados del worker a la GUI ---
+# Las filas se envían en lotes (por cantidad o por tiempo) y los mensajes de progreso se limitan
+ROW_BATCH_SIZE = 50
+ROW_BATCH_INTERVAL_S = 0.25
+PROGRESS_UPDATE_INTERVAL_S = 0.25
 
 
 class InterruptionRequestedError(Exception):
@@ -79,7 +75,7 @@ class WorkerThread(QThread):
     entity_base_clarification_needed = Signal(dict)
     id_type_for_entity_base_clarification_needed = Signal(str, list)
     entity_determined = Signal(dict, bool, str, dict, set)
-    row_processed = Signal(dict, str, object)
+    rows_processed = Signal(list) # Lote de tuplas (row_data, cod_doc, backup_pdf_path)
     entity_id_mismatch_on_add_more = Signal(str, str, str)
     processing_complete = Signal(list, list, list, bool, str, int, int, list, int, dict, dict)
     log_message_to_gui = Signal(str)
@@ -96,9 +92,15 @@ class WorkerThread(QThread):
                  current_gui_entity_id_display: Optional[str],
                  current_gui_entity_rs: Optional[str],
                  is_gui_initial_process_done: bool,
-                 already_processed_ids_for_entity: Set[str]): # logo_path (asesor) eliminado
+                 already_processed_ids_for_entity: Set[str],
+                 worker_pool: WorkerPool,
+                 execution_strategy: ExecutionStrategy,
+                 render_pdfs: bool = True): # logo_path (asesor) eliminado
         super().__init__()
         self.xml_files = xml_files
+        self.worker_pool = worker_pool
+        self.execution_strategy = execution_strategy
+        self.render_pdfs = render_pdfs # False: PDF diferido (src/core/lazy_pdf.py)
         self.current_gui_entity_id_display = current_gui_entity_id_display
         self.current_gui_entity_rs = current_gui_entity_rs
         self.is_gui_initial_process_done = is_gui_initial_process_done
@@ -107,7 +109,13 @@ class WorkerThread(QThread):
         self._is_interruption_requested = False
         self._worker_was_cancelled_by_user = False
         self._compradores_info_map: Dict[str, Dict[str, Any]] = {}
+        self._unique_id_by_path: Dict[str, str] = {} # Nro. de autorización (o clave) obtenido en el pre-análisis
+        self._parse_cache: Optional[ParseCache] = None # Se abre en run(): la conexión SQLite es de este hilo
+        self._cached_entries: Dict[str, Dict[str, Any]] = {} # Archivos sin cambios desde que se guardaron en la caché
+        self._header_by_path: Dict[str, Dict[str, str]] = {} # Cabeceras del pre-análisis (rutas de respaldo previstas)
         self.processed_counts_by_type = defaultdict(int)
+        self.pending_pdfs: Dict[str, Optional[str]] = {} # XML -> PDF de respaldo previsto (PDF diferido)
+        self._batch_id = self.worker_pool.begin_batch() # Para cancelar en los workers (WorkerPool.cancel_batch)
 
     def request_interruption(self):
         logger.info("Solicitud de interrupción para el hilo de trabajo.")
@@ -118,6 +126,8 @@ class WorkerThread(QThread):
             self._wait_condition.wakeAll()
         finally:
             self._mutex.unlock()
+        # Los workers dejan los bloques en curso sin esperar a que este hilo lea el siguiente resultado
+        self.worker_pool.cancel_batch(self._batch_id)
 
     def _check_interruption(self):
         if self._is_interruption_requested:
@@ -142,37 +152,35 @@ class WorkerThread(QThread):
     def _pre_analyze_xmls_for_compradores(self):
         self.initial_info_to_popup.emit("Analizando archivos XML para identificar compradores...")
         self._compradores_info_map.clear()
-        def classify_id(id_str: str) -> str:
-            if not id_str: return "desconocido"
-            if id_str.isdigit():
-                if len(id_str) == 10: return "cedula"
-                if len(id_str) == 13 and id_str.endswith("001"): return "ruc_persona_natural"
-                if len(id_str) == 13: return "ruc_sociedad"
-            return "otro"
-        def get_id_base(id_str: str, id_type: str) -> str:
-            if id_type == "ruc_persona_natural": return id_str[:10]
-            return id_str
-        for i, xml_path in enumerate(self.xml_files):
-            self._check_interruption()
+        self._unique_id_by_path.clear()
+        self._cached_entries = {}
+        # Carpetas (recursivas) y ZIP se expanden a sus XML mientras se leen las cabeceras (codDoc,
+        # claveAcceso, comprador), repartidas entre todos los núcleos; las de los archivos ya
+        # guardados en la caché de parseo no se leen
+        found_xml_paths = folder_scan.iter_input_files(self.xml_files)
+        headers: List[Tuple[str, Optional[Dict[str, str]]]] = []
+        # Pocos archivos sueltos ("añadir más archivos") se leen en este hilo, sin pasar por el pool
+        scan_plan = self.execution_strategy.plan_scan(self.xml_files)
+        scanned_headers = batch_pipeline.scan_headers_streaming(scan_plan.executor, found_xml_paths, scan_plan.num_workers,
+                                                                self._parse_cache, self._cached_entries)
+        try:
+            for xml_path, header in scanned_headers:
+                self._check_interruption()
+                headers.append((xml_path, header))
+                if len(headers) % PRE_ANALYSIS_PROGRESS_EVERY == 0:
+                    self.initial_info_to_popup.emit(f"Analizando archivos XML para identificar compradores... ({len(headers)} leídos)")
+        finally:
+            scanned_headers.close() # Al cancelar: descarta los bloques que no empezaron
+        # Orden por ruta: la elección entre duplicados no depende del orden del recorrido
+        headers.sort(key=itemgetter(0))
+        self.xml_files = [xml_path for xml_path, _header in headers]
+        self._header_by_path = {xml_path: header for xml_path, header in headers if header}
+        for xml_path, header in headers:
             try:
-                parsed_data = xml_parser.parse_xml(xml_path)
-                if parsed_data:
-                    id_c_raw = parsed_data.get("id_comprador_raw", "N/A")
-                    rs_c = parsed_data.get("comprador", {}).get("razon_social", "N/A")
-                    if id_c_raw != "N/A" and rs_c != "N/A":
-                        rs_c = rs_c.strip()
-                        id_type = classify_id(id_c_raw)
-                        id_base_for_map = get_id_base(id_c_raw, id_type)
-                        if id_base_for_map not in self._compradores_info_map:
-                            self._compradores_info_map[id_base_for_map] = {"razon_social_canonica": rs_c, "ids_especificos": {}}
-                        current_canonical_rs = self._compradores_info_map[id_base_for_map]["razon_social_canonica"].upper()
-                        if "CONSUMIDOR FINAL" in current_canonical_rs and "CONSUMIDOR FINAL" not in rs_c.upper():
-                            self._compradores_info_map[id_base_for_map]["razon_social_canonica"] = rs_c
-                        elif not current_canonical_rs and rs_c:
-                             self._compradores_info_map[id_base_for_map]["razon_social_canonica"] = rs_c
-                        if id_c_raw not in self._compradores_info_map[id_base_for_map]["ids_especificos"]:
-                            self._compradores_info_map[id_base_for_map]["ids_especificos"][id_c_raw] = {"tipo": id_type, "paths": []}
-                        self._compradores_info_map[id_base_for_map]["ids_especificos"][id_c_raw]["paths"].append(xml_path)
+                if header:
+                    if header.get("numero_autorizacion"):
+                        self._unique_id_by_path[xml_path] = header["numero_autorizacion"]
+                    batch_pipeline.add_header_to_compradores_map(self._compradores_info_map, xml_path, header)
             except Exception as e_pre: logger.error(f"Error en pre-análisis de {os.path.basename(xml_path)}: {e_pre}")
         if not self._compradores_info_map:
             self.log_message_to_gui.emit("No se pudo extraer información de comprador válida de ningún archivo XML.")
@@ -185,17 +193,13 @@ class WorkerThread(QThread):
         self._is_interruption_requested = False
         self._worker_was_cancelled_by_user = False
         self._temp_pdf_dir_created_by_this_run = ""
-        all_conversion_errors_for_run: List[str] = []
-        critical_file_processing_errors_for_run: List[Dict[str,str]] = []
-        all_pdf_gen_errors_for_run: List[str] = []
-        xml_to_pdf_map_generated_for_run: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]] = {}
-        newly_processed_count = 0
-        skipped_duplicate_files_count = 0
-        newly_added_identifiers_this_run: List[str] = []
-        self.processed_counts_by_type = defaultdict(int)
+        batch_results = batch_pipeline.BatchResults()
         xml_files_to_process_final_batch: List[str] = []
+        staged_results = None
+        pending_rows_for_gui: List[batch_pipeline.ProcessedRow] = []
 
         try:
+            self._parse_cache = ParseCache.open_default()
             if not self._pre_analyze_xmls_for_compradores(): return
             self._check_interruption()
 
@@ -224,15 +228,9 @@ class WorkerThread(QThread):
                     )
                     self.request_interruption(); return
 
-            comprador_data_seleccionado = self._compradores_info_map[id_base_to_process]
-            razon_social_canonica_seleccionada = comprador_data_seleccionado["razon_social_canonica"]
-            ids_especificos_del_base = comprador_data_seleccionado["ids_especificos"]
+            razon_social_canonica_seleccionada = self._compradores_info_map[id_base_to_process]["razon_social_canonica"]
             id_type_to_process_final: Optional[str] = None
-            es_cedula_base = ids_especificos_del_base.get(id_base_to_process, {}).get("tipo") == "cedula"
-            ruc_pn_derivado_de_base = f"{id_base_to_process}001"
-            tiene_ruc_pn_asociado = ruc_pn_derivado_de_base in ids_especificos_del_base and ids_especificos_del_base[ruc_pn_derivado_de_base].get("tipo") == "ruc_persona_natural"
-
-            if es_cedula_base and tiene_ruc_pn_asociado:
+            if batch_pipeline.needs_id_type_clarification(self._compradores_info_map, id_base_to_process):
                 self.id_type_for_entity_base_clarification_needed.emit(razon_social_canonica_seleccionada, ["RUC", "Cédula", "Ambos"])
                 self._mutex.lock();
                 try:
@@ -241,23 +239,11 @@ class WorkerThread(QThread):
                 finally: self._mutex.unlock()
                 if not id_type_to_process_final: raise InterruptionRequestedError("Selección de tipo de ID (Cédula/RUC) cancelada.")
 
-            xml_files_for_selected_entity_and_id_type: List[str] = []
-            id_display_for_gui = id_base_to_process
-            if id_type_to_process_final == "ambos":
-                if es_cedula_base: xml_files_for_selected_entity_and_id_type.extend(ids_especificos_del_base[id_base_to_process]["paths"])
-                if tiene_ruc_pn_asociado: xml_files_for_selected_entity_and_id_type.extend(ids_especificos_del_base[ruc_pn_derivado_de_base]["paths"])
-                id_display_for_gui = f"{id_base_to_process} / {ruc_pn_derivado_de_base}"
-            elif id_type_to_process_final == "ruc" and tiene_ruc_pn_asociado and ruc_pn_derivado_de_base in ids_especificos_del_base:
-                xml_files_for_selected_entity_and_id_type.extend(ids_especificos_del_base[ruc_pn_derivado_de_base]["paths"])
-            else: # Si no hay clarificación de Cédula/RUC, o no aplica, tomar todos los paths del ID base
-                for id_xml, data_id_xml in ids_especificos_del_base.items():
-                    xml_files_for_selected_entity_and_id_type.extend(data_id_xml["paths"])
-
-            if not xml_files_for_selected_entity_and_id_type:
+            xml_files_to_process_final_batch, id_display_for_gui = batch_pipeline.select_files_for_entity(
+                self._compradores_info_map, id_base_to_process, id_type_to_process_final)
+            if not xml_files_to_process_final_batch:
                 self.log_message_to_gui.emit(f"No hay archivos para la selección de entidad/tipo ID: {id_display_for_gui}"); return
 
-            xml_files_to_process_final_batch = list(set(xml_files_for_selected_entity_and_id_type))
-
             header_data_for_gui_final = {
                 "id_comprador": id_display_for_gui,
                 "razon_social_comprador": razon_social_canonica_seleccionada,
@@ -267,7 +253,7 @@ class WorkerThread(QThread):
 
             try: self._temp_pdf_dir_created_by_this_run = create_temp_folder()
             except Exception as e_temp:
-                critical_file_processing_errors_for_run.append({"file": "N/A", "message": f"Error creando dir. temporal: {e_temp}"})
+                batch_results.add_critical_error("N/A", f"Error creando dir. temporal: {e_temp}")
                 self._temp_pdf_dir_created_by_this_run = ""
 
             current_gui_id_parts_check = [p.strip() for p in (self.current_gui_entity_id_display or "").split('/') if p.strip()]
@@ -277,78 +263,78 @@ class WorkerThread(QThread):
             self.initial_info_to_popup.emit(f"Procesando {len(xml_files_to_process_final_batch)} archivos para {razon_social_canonica_seleccionada} ({id_display_for_gui})...")
             self.progress_total_files_to_popup.emit(len(xml_files_to_process_final_batch))
             current_processed_ids_for_entity_determination = self.already_processed_ids if not is_new_entity_for_gui_final else set()
-            self.entity_determined.emit(header_data_for_gui_final, is_new_entity_for_gui_final, self._temp_pdf_dir_created_by_this_run, xml_to_pdf_map_generated_for_run, current_processed_ids_for_entity_determination)
+            self.entity_determined.emit(header_data_for_gui_final, is_new_entity_for_gui_final, self._temp_pdf_dir_created_by_this_run, batch_results.xml_to_pdf_map, current_processed_ids_for_entity_determination)
             self.msleep(150); self._check_interruption()
-            ids_for_current_batch_processing = set() if is_new_entity_for_gui_final else self.already_processed_ids.copy()
-
-            num_workers = os.cpu_count() or 2
-            logger.info(f"Iniciando procesamiento con ProcessPoolExecutor (workers: {num_workers})")
-
-            with ProcessPoolExecutor(max_workers=num_workers) as executor:
-                future_to_xml_path = {
-                    # Llamada a process_single_xml_file_task sin el logo del asesor.
-                    # Si se necesita pasar el logo del EMISOR, se haría aquí, pero actualmente
-                    # MainWindow no gestiona un logo de emisor global.
-                    # El logo del emisor se maneja si está en parsed_data o si generate_pdf_from_xml lo recibe.
-                    executor.submit(process_single_xml_file_task, xml_path, self._temp_pdf_dir_created_by_this_run, None): xml_path
-                    for xml_path in xml_files_to_process_final_batch
-                }
-
-                for i, future in enumerate(as_completed(future_to_xml_path)):
-                    self._check_interruption()
-                    xml_file_path_original = future_to_xml_path[future]
-                    self.initial_info_to_popup.emit(f"Procesando archivo {i+1}/{len(xml_files_to_process_final_batch)}: {os.path.basename(xml_file_path_original)}")
-
-                    try:
-                        result = future.result()
-
-                        if result.get("error"):
-                            critical_file_processing_errors_for_run.append({"file": os.path.basename(result.get("xml_path", "N/A")), "message": result["error"]})
-                            continue
-
-                        temp_pdf_path_result = result.get("temp_pdf_path")
-                        cod_doc_result = result.get("cod_doc")
-                        backup_pdf_path_result = result.get("backup_pdf_path")
-
-                        if temp_pdf_path_result:
-                            xml_to_pdf_map_generated_for_run[result["xml_path"]] = (temp_pdf_path_result, cod_doc_result, backup_pdf_path_result)
-
-                        if result.get("pdf_error"):
-                            all_pdf_gen_errors_for_run.append(f"{os.path.basename(result.get('xml_path', 'N/A'))}: {result['pdf_error']}")
-                        if result.get("conversion_errors"):
-                            all_conversion_errors_for_run.extend(result["conversion_errors"])
-
-                        unique_id_for_table = result.get("unique_id")
-                        if unique_id_for_table and unique_id_for_table in ids_for_current_batch_processing:
-                            skipped_duplicate_files_count += 1
-                            continue
-
-                        row_data_result = result.get("row_data")
-                        if not row_data_result:
-                             critical_file_processing_errors_for_run.append({"file": os.path.basename(result.get("xml_path", "N/A")), "message": "Worker no devolvió row_data."})
-                             continue
-
-                        self.row_processed.emit(row_data_result, cod_doc_result, backup_pdf_path_result)
-                        self.processed_counts_by_type[cod_doc_result] += 1
-                        if unique_id_for_table:
-                            newly_added_identifiers_this_run.append(unique_id_for_table)
-                            ids_for_current_batch_processing.add(unique_id_for_table)
-                        newly_processed_count += 1
-
-                    except Exception as e_future:
-                        critical_file_processing_errors_for_run.append({"file": os.path.basename(xml_file_path_original), "message": f"Error en futuro: {e_future}"})
+            if not is_new_entity_for_gui_final:
+                batch_results.known_ids.update(self.already_processed_ids)
+
+            # Los duplicados se descartan aquí, sin parsear ni renderizar en los workers.
+            # La comprobación posterior por resultado se mantiene como red de seguridad.
+            xml_files_to_dispatch, batch_results.skipped_duplicate_count = batch_pipeline.drop_duplicates_before_dispatch(
+                xml_files_to_process_final_batch, self._unique_id_by_path, batch_results.known_ids)
+
+            # Documentos sin cambios y con respaldo completo: la fila sale de la caché, sin parsear
+            cached_results, xml_files_to_dispatch = batch_pipeline.take_cached_results(xml_files_to_dispatch, self._cached_entries)
+            for cached_result in cached_results:
+                processed_row = batch_results.add_worker_result(cached_result)
+                if processed_row:
+                    pending_rows_for_gui.append(processed_row)
+                    if len(pending_rows_for_gui) >= ROW_BATCH_SIZE:
+                        self.rows_processed.emit(pending_rows_for_gui)
+                        pending_rows_for_gui = []
+            self._check_interruption()
+
+            # El pool de la aplicación (workers ya iniciados y precargados) solo para lotes que lo justifican
+            plan = self.execution_strategy.plan(len(xml_files_to_dispatch), self.render_pdfs)
+            logger.info(f"Iniciando procesamiento de {len(xml_files_to_dispatch)} archivos ({plan.mode}, workers: {plan.num_workers})")
+
+            # El XML se parsea una única vez, dentro del worker. Los respaldos (comprobación y copia)
+            # se hacen en hilos de E/S: AppData puede estar en un servidor de archivos
+            staged_results = self.execution_strategy.measure_results(staged_pipeline.run_staged(
+                plan.executor, xml_files_to_dispatch, plan.num_workers, self._temp_pdf_dir_created_by_this_run,
+                self._header_by_path, render_pdf=self.render_pdfs, batch_id=self._batch_id), self._batch_id)
+
+            last_rows_flush_time = last_progress_time = time.monotonic()
+            for i, (xml_file_path_original, worker_result) in enumerate(staged_results):
+                self._check_interruption()
+                now = time.monotonic()
+                if now - last_progress_time >= PROGRESS_UPDATE_INTERVAL_S or i + 1 == len(xml_files_to_dispatch):
+                    self.initial_info_to_popup.emit(f"Procesando archivo {i+1}/{len(xml_files_to_dispatch)}: {os.path.basename(xml_file_path_original)}")
+                    last_progress_time = now
+                if pending_rows_for_gui and (len(pending_rows_for_gui) >= ROW_BATCH_SIZE or now - last_rows_flush_time >= ROW_BATCH_INTERVAL_S):
+                    self.rows_processed.emit(pending_rows_for_gui)
+                    pending_rows_for_gui = []
+                    last_rows_flush_time = now
+
+                if self._parse_cache:
+                    self._parse_cache.add(worker_result.get("cache_entry"))
+                processed_row = batch_results.add_worker_result(worker_result)
+                if processed_row:
+                    pending_rows_for_gui.append(processed_row)
 
         except InterruptionRequestedError as ire: logger.info(f"Worker interrumpido: {str(ire)}")
         except Exception as e_general:
             logger.exception(f"Error general en WorkerThread.run: {e_general}")
-            if not critical_file_processing_errors_for_run: critical_file_processing_errors_for_run.append({"file": "N/A", "message": f"Error general del worker: {e_general}"})
+            if not batch_results.critical_errors: batch_results.add_critical_error("N/A", f"Error general del worker: {e_general}")
         finally:
+            # El pool persistente no se cierra; solo se descartan las tareas aún no iniciadas
+            if staged_results is not None:
+                staged_results.close()
+            if self._parse_cache:
+                self._parse_cache.close()
+                self._parse_cache = None
+            # Entregar las filas del último lote antes del resumen final (también si hubo interrupción,
+            # ya que esas filas están contadas en newly_processed_count)
+            if pending_rows_for_gui:
+                self.rows_processed.emit(pending_rows_for_gui)
+            self.processed_counts_by_type = batch_results.processed_counts_by_type
+            self.pending_pdfs = batch_results.pending_pdfs
             self.processing_complete.emit(
-                all_conversion_errors_for_run, all_pdf_gen_errors_for_run, critical_file_processing_errors_for_run,
+                batch_results.conversion_errors, batch_results.pdf_errors, batch_results.critical_errors,
                 self._worker_was_cancelled_by_user, self._temp_pdf_dir_created_by_this_run,
-                newly_processed_count, skipped_duplicate_files_count, newly_added_identifiers_this_run,
-                len(xml_files_to_process_final_batch), dict(self.processed_counts_by_type),
-                xml_to_pdf_map_generated_for_run
+                batch_results.newly_processed_count, batch_results.skipped_duplicate_count, batch_results.newly_added_ids,
+                len(xml_files_to_process_final_batch), dict(batch_results.processed_counts_by_type),
+                batch_results.xml_to_pdf_map
             )
 
 class NoColumnDelegate(QStyledItemDelegate):
@@ -417,74 +403,12 @@ class MainWindow(QMainWindow):
         self.xml_to_pdf_map: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]] = {};
         self.tracked_temp_pdf_dirs: set[str] = set()
 
-        self.COLUMN_DEFINITIONS: Dict[str, Dict[str, Any]] = {
-            "FC": {"name": "Facturas", "coddoc": "01", "type": "received", "group": "received",
-                   "headers": [
-                       "No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial",
-                       "TipoId.", "Id.Comprador", "Razón Social Comprador",
-                       "Formas de Pago",
-                                "Descuento", "Total Sin Impuestos",
-                                "Base IVA 0%", "Base IVA 5%", "Base IVA 8%", "Base IVA 12%", "Base IVA 13%", "Base IVA 14%", "Base IVA 15%",
-                                "No Objeto IVA", "Exento IVA",
-                       "Desc. Adicional",
-                       "Devol. IVA",
-                       "Monto IVA",
-                       "Base ICE", "Monto ICE",
-                       "Base IRBPNR", "Monto IRBPNR",
-                       "Propina",
-                       "Monto Total",
-                       "Guia de Remisión",
-                       "Primeros 3 Articulos",
-                       "Nro de Autorización"
-                   ],
-                   "sum_cols": [
-                       "Descuento", "Total Sin Impuestos",
-                                "Base IVA 0%", "Base IVA 5%", "Base IVA 8%", "Base IVA 12%", "Base IVA 13%", "Base IVA 14%", "Base IVA 15%",
-                       "No Objeto IVA", "Exento IVA",
-                       "Desc. Adicional", "Devol. IVA", "Monto IVA",
-                       "Base ICE", "Monto ICE", "Base IRBPNR", "Monto IRBPNR",
-                       "Propina", "Monto Total"
-                   ]},
-            "ND_R": {"name": "N. Débito", "coddoc": "05", "type": "received", "group": "received",
-                     "headers": ["No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial", "Total Sin Impuestos", "Monto IVA", "Monto Total", "Nro de Autorización"],
-                     "sum_cols": ["Total Sin Impuestos", "Monto IVA", "Monto Total"]},
-            "NC_R": {"name": "N. Crédito", "coddoc": "04", "type": "received", "group": "received",
-                     "headers": ["No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial",
-                                 "TipoId.", "Id.Comprador", "Razón Social Comprador",
-                                 "CodDoc",
-                                 "Fecha D.M.", "CodDocMod", "Num.Doc.Modificado", "N.A.Doc.Modificado",
-                                 "Valor Mod.",
-                                 "Base IVA 0%", "Base IVA 5%", "Base IVA 8%", "Base IVA 12%", "Base IVA 13%", "Base IVA 14%", "Base IVA 15%",
-                                 "No Objeto IVA", "Exento IVA", "Devol. IVA", "Monto IVA",
-                                 "Base ICE", "Monto ICE", "Base IRBPNR", "Monto IRBPNR",
-                                 "Monto Total", "Nro de Autorización"],
-                     "sum_cols": ["Valor Mod.",
-                                  "Base IVA 0%", "Base IVA 5%", "Base IVA 8%", "Base IVA 12%", "Base IVA 13%", "Base IVA 14%", "Base IVA 15%",
-                                  "No Objeto IVA", "Exento IVA", "Devol. IVA", "Monto IVA",
-                                  "Base ICE", "Monto ICE", "Base IRBPNR", "Monto IRBPNR",
-                                  "Monto Total"]},
-            "RET_R": {"name": "Retenciones", "coddoc": "07", "type": "received", "group": "received",
-                      "headers": ["No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial",
-                                  "TipoId.", "Id.Sujeto Retenido", "Razón Social Sujeto Retenido",
-                                  "Periodo Fiscal",
-                                  "CodDocSust", "Fecha D.S.", "Num.Doc.Sustento", "Autorización Doc Sust.",
-                                  "Tipo Impuesto Ret.", "Codigo Ret.", "Base Imponible Ret.", "Porcentaje Ret.", "Valor Retenido",
-                                  "Ret. Renta Pres.", "Ret. IVA Pres.", "Total Ret. ISD",
-                                  "Monto Total", "Nro de Autorización"],
-                      "sum_cols": ["Base Imponible Ret.", "Valor Retenido",
-                                   "Ret. Renta Pres.", "Ret. IVA Pres.", "Total Ret. ISD",
-                                   "Monto Total"]},
-            "LC_R": {"name": "Liq. Compra", "coddoc": "03", "type": "received", "group": "received",
-                     "headers": ["No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial", "Total Sin Impuestos", "Monto IVA", "Monto Total", "Nro de Autorización"],
-                     "sum_cols": ["Total Sin Impuestos", "Monto IVA", "Monto Total"]},
-            "GR_R": {"name": "Guías Remisión", "coddoc": "06", "type": "received", "group": "received",
-                   "headers": ["No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial", "Nro de Autorización"],
-                   "sum_cols": []}
-        }
-        self.DOC_TYPE_ORDER = ["FC", "ND_R", "NC_R", "RET_R", "LC_R", "GR_R"]
+        # La definición del reporte es compartida con el modo por consola (src/utils/report_layout.py)
+        self.COLUMN_DEFINITIONS: Dict[str, Dict[str, Any]] = report_layout.COLUMN_DEFINITIONS
+        self.DOC_TYPE_ORDER = report_layout.DOC_TYPE_ORDER
 
         self.doc_type_buttons: Dict[str, QPushButton] = {}; self.initial_process_done: bool = False
-        self.active_doc_key: Optional[str] = None; self.all_data_by_coddoc: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.active_doc_key: Optional[str] = None; self.all_data_by_coddoc: ReportLedger = ReportLedger()
         self.selected_entity_details = { "id_display": "", "razon_social": "", "ids_to_match": [] }
         self.processed_xml_identifiers_for_current_entity: Set[str] = set() # self.logo_path (asesor) eliminado
         
@@ -493,60 +417,41 @@ class MainWindow(QMainWindow):
         # Los métodos worker_thread y progress_popup se inicializan a None aquí.
         self.worker_thread: Optional[WorkerThread] = None
         self.progress_popup: Optional[ProgressPopup] = None
+        # Pool de procesos de larga vida: se arranca en segundo plano al abrir la ventana
+        # y se reutiliza en todos los lotes. Se cierra en closeEvent.
+        self.worker_pool = WorkerPool()
+        self.worker_pool.warm_up()
+        # Lotes pequeños en línea y medianos sin PDF en hilos; el pool, para el resto
+        self.execution_strategy = ExecutionStrategy(self.worker_pool)
+        # PDF diferido: los RIDE se generan al abrirlos, al exportar o en segundo plano entre lotes
+        self.lazy_pdf_renderer = LazyPdfRenderer(self.worker_pool.get_executor,
+                                                 background_tasks=max(1, self.worker_pool.max_workers // 2),
+                                                 on_rendered=self.lazy_pdf_rendered.emit)
+        self._pdf_to_open_when_rendered: Optional[str] = None
         
         self._init_ui_layout() # Ahora _init_ui_layout puede encontrar handle_export_files
 
         self.download_thread: Optional[DownloadThread] = None
         self.download_progress_dialog: Optional[QProgressDialog] = None
         self.BASE_REPORT_COLUMN_HEADERS: List[str] = xml_parser.ALL_CSV_FIELDS
-        self._cols_to_exclude_from_view = ["original_xml_path", "Formas de Pago"]
-        _desired_order_prefix = ["No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial",
-                                 "TipoId.", "Id.Comprador", "Razón Social Comprador",
-                                 "Id.Sujeto Retenido", "Razón Social Sujeto Retenido", "Periodo Fiscal",
-                                 "Fecha D.M.", "CodDocMod", "Num.Doc.Modificado", "N.A.Doc.Modificado", "Valor Mod.",
-                                 "CodDocSust", "Fecha D.S.", "Num.Doc.Sustento", "Autorización Doc Sust.", "Tipo Impuesto Ret.", "Codigo Ret." ]
-        _desired_order_suffix = ["Primeros 3 Articulos", "Nro de Autorización"]
-        _other_headers = [
-            h for h in self.BASE_REPORT_COLUMN_HEADERS
-            if h not in _desired_order_prefix
-            and h not in _desired_order_suffix
-        ]
-        _master_header_list_for_order = _desired_order_prefix + sorted(_other_headers) + _desired_order_suffix
-        self.HEADER_ORDER_MAP: Dict[str, int] = {
-            name: i for i, name in enumerate(_master_header_list_for_order)
-        }
+        self._cols_to_exclude_from_view = report_layout.COLS_TO_EXCLUDE_FROM_VIEW
+        self.HEADER_ORDER_MAP: Dict[str, int] = report_layout.HEADER_ORDER_MAP
         self.settings = QSettings(ORGANIZATION_NAME, APPLICATION_NAME)
         self.default_directory = QStandardPaths.writableLocation(QStandardPaths.DocumentsLocation)
         self.last_xml_directory = self.settings.value(SETTINGS_LAST_XML_DIR, self.default_directory, type=str)
         self.last_zip_directory = self.settings.value(SETTINGS_LAST_ZIP_DIR, self.default_directory, type=str)
         if not os.path.isdir(self.last_xml_directory): self.last_xml_directory = self.default_directory
         if not os.path.isdir(self.last_zip_directory): self.last_zip_directory = self.default_directory
+        self.lazy_pdf_checkbox.setChecked(self.settings.value(SETTINGS_LAZY_PDF, False, type=bool))
+        self.lazy_pdf_checkbox.toggled.connect(lambda checked: self.settings.setValue(SETTINGS_LAZY_PDF, checked))
+        self.lazy_pdf_rendered.connect(self._handle_lazy_pdf_rendered)
         self.update_available_signal.connect(self._show_update_dialog)
         self._start_update_check_thread()
         self._apply_styles(); self._update_button_visibility_and_default_selection()
 
         # Mapa para traducir nombres de cabecera de visualización a claves de datos internas
-        self.HEADER_TO_DATA_KEY_MAP: Dict[str, Optional[str]] = {
-            "No.": None, # El "No." es generado, no es una clave de datos directa
-            "Fecha": "Fecha", "Fecha Emisión": "Fecha",
-            "Tipo Doc": "tipo_documento_display", # Generado en _populate_report_table
-            "Nro Comprobante": "Nro.Secuencial", "Nro.Secuencial": "Nro.Secuencial",
-            "Nro de Autorización": "Nro de Autorización",
-            "RUC Emisor": "RUC Emisor", "Razón Social Emisor": "Razón Social Emisor",
-            "TipoId.": "TipoId.",
-            "Id.Comprador": "Id.Comprador", "ID Comprador": "Id.Comprador",
-            "Razón Social Comprador": "Razón Social Comprador",
-            "Id.Sujeto Retenido": "Id.Sujeto Retenido", "Razón Social Sujeto Retenido": "Razón Social Sujeto Retenido",
-            "Periodo Fiscal": "Periodo Fiscal",
-            "Fecha D.M.": "Fecha D.M.", "CodDocMod": "CodDocMod", "Num.Doc.Modificado": "Num.Doc.Modificado",
-            "N.A.Doc.Modificado": "N.A.Doc.Modificado", "Valor Mod.": "Valor Mod.",
-            "CodDocSust": "CodDocSust", "Fecha D.S.": "Fecha D.S.", "Num.Doc.Sustento": "Num.Doc.Sustento",
-            "Autorización Doc Sust.": "Autorización Doc Sust.",
-            "Tipo Impuesto Ret.": "Tipo Impuesto Ret.", "Codigo Ret.": "Codigo Ret.",
-            "Base Imponible Ret.": "Base Imponible Ret.", "Porcentaje Ret.": "Porcentaje Ret.", "Valor Retenido": "Valor Retenido",
-            # Las claves de IVA, ICE, IRBPNR, etc., suelen ser iguales al nombre de visualización si no están aquí
-            "Monto Total": "Monto Total", "Total": "Monto Total",
-        }
+        self.HEADER_TO_DATA_KEY_MAP: Dict[str, Optional[str]] = report_layout.HEADER_TO_DATA_KEY_MAP
+        self.report_model.set_header_to_data_key_map(self.HEADER_TO_DATA_KEY_MAP)
 
     # --- Métodos auxiliares refactorizados ---
     def _get_save_file_dialog(self, title: str, default_filename_template: str, entity_rs: Optional[str],
@@ -582,8 +487,9 @@ class MainWindow(QMainWindow):
         Maneja la acción de exportar archivos (ZIP).
         Muestra un diálogo para seleccionar el tipo de exportación.
         """
-        has_any_pdf = any(temp_pdf_path is not None or backup_pdf_path is not None
-                          for temp_pdf_path, cod_doc, backup_pdf_path in self.xml_to_pdf_map.values())
+        has_any_pdf = self.lazy_pdf_renderer.pending_count() > 0 or any(
+            temp_pdf_path is not None or backup_pdf_path is not None
+            for temp_pdf_path, cod_doc, backup_pdf_path in self.xml_to_pdf_map.values())
 
         if not has_any_pdf:
             QMessageBox.information(self, "Exportar Archivos", "No hay PDFs generados para exportar.")
@@ -602,13 +508,6 @@ class MainWindow(QMainWindow):
         Realiza la exportación de archivos (XML y/o PDF) a un archivo ZIP.
         Organiza los archivos dentro del ZIP según el tipo de exportación seleccionado.
         """
-        xml_path_to_row_data: Dict[str, Dict[str, Any]] = {}
-        for cod_doc_key_ignored, rows in self.all_data_by_coddoc.items():
-            for row in rows:
-                original_xml_path = row.get("original_xml_path")
-                if original_xml_path:
-                    xml_path_to_row_data[original_xml_path] = row
-
         main_zip_filepath = self._get_save_file_dialog(
             title="Guardar Archivo ZIP",
             default_filename_template="Comprobantes_{entity}_{timestamp}.zip",
@@ -621,67 +520,9 @@ class MainWindow(QMainWindow):
         main_zip_filename = os.path.basename(main_zip_filepath) # Para el mensaje final
         chosen_dir = os.path.dirname(main_zip_filepath) # Ya guardado por _get_save_file_dialog
 
-        files_to_add_to_main_zip: List[Tuple[str, str]] = []
+        if not self._render_pending_pdfs(): return
         logger.info(f"Iniciando preparación de archivos para ZIP: {main_zip_filepath} (Tipo: {export_type})")
-
-        for xml_path, (temp_pdf_path, cod_doc, backup_pdf_path) in self.xml_to_pdf_map.items():
-            logger.debug(f"Procesando para ZIP: XML={os.path.basename(xml_path)}, TempPDF={os.path.basename(temp_pdf_path) if temp_pdf_path else 'N/A'}, BackupPDF={os.path.basename(backup_pdf_path) if backup_pdf_path else 'N/A'}")
-            try:
-                row_data_for_file = xml_path_to_row_data.get(xml_path)
-                if not cod_doc:
-                    logger.warning(f"  - No se pudo obtener cod_doc para {os.path.basename(xml_path)}. Omitiendo.")
-                    continue
-                if export_type.endswith("_by_date") and not row_data_for_file:
-                    logger.warning(f"  - No se encontraron datos (row_data) para {os.path.basename(xml_path)} para exportación por fecha. Omitiendo.")
-                    continue
-
-                custom_folder_names = {
-                    "01": "FACTURAS DE COMPRA", "04": "NOTAS DE CREDITO RECIBIDAS", "07": "RETENCIONES RECIBIDAS",
-                    "03": "LIQUIDACIONES DE COMPRA", "06": "GUIAS DE REMISION RECIBIDAS", "05": "NOTAS DE DEBITO RECIBIDAS"
-                }
-                doc_type_subfolder_base = custom_folder_names.get(cod_doc)
-                if not doc_type_subfolder_base:
-                    temp_name = xml_parser.COD_DOC_MAP.get(cod_doc, f"Tipo {cod_doc}").upper()
-                    temp_name = FOLDER_NAME_CLEAN_REGEX.sub('', temp_name).strip()
-                    doc_type_subfolder_base = SPACE_HYPHEN_NORM_REGEX.sub(' ', temp_name)
-                    if "RECIBIDAS" not in doc_type_subfolder_base.upper() and "RECIBIDA" not in doc_type_subfolder_base.upper():
-                        doc_type_subfolder_base += " RECIBIDAS"
-                if not doc_type_subfolder_base: doc_type_subfolder_base = f"Tipo_{cod_doc}_RECIBIDAS"
-
-                final_subfolder_path_in_zip = doc_type_subfolder_base
-
-                if export_type.endswith("_by_date"):
-                    year_month_folder = "Fecha Desconocida"
-                    fecha_autorizacion_str = row_data_for_file.get("fechaAutorizacion") if row_data_for_file else None
-                    if fecha_autorizacion_str:
-                        try:
-                            date_part_str = fecha_autorizacion_str.split('T')[0]
-                            date_obj = datetime.strptime(date_part_str, '%Y-%m-%d')
-                            year = date_obj.year
-                            month_name = MONTH_NAMES_SPANISH.get(date_obj.month, f"Mes_{date_obj.month}")
-                            year_month_folder = os.path.join(str(year), month_name)
-                        except Exception as e_date:
-                            logger.warning(f"  - Error parseando fechaAutorizacion '{fecha_autorizacion_str}' para {os.path.basename(xml_path)} para exportación por fecha: {e_date}")
-                    final_subfolder_path_in_zip = os.path.join(doc_type_subfolder_base, year_month_folder)
-
-                logger.debug(f"  - Subcarpeta en ZIP: {final_subfolder_path_in_zip}")
-                include_xml = export_type.startswith("pdf_xml_")
-                pdf_source_path = backup_pdf_path if backup_pdf_path and os.path.exists(backup_pdf_path) else (temp_pdf_path if temp_pdf_path and os.path.exists(temp_pdf_path) else None)
-
-                if include_xml:
-                    if os.path.exists(xml_path):
-                        arcname_xml = os.path.join(final_subfolder_path_in_zip, os.path.basename(xml_path))
-                        files_to_add_to_main_zip.append((xml_path, arcname_xml))
-                        logger.debug(f"  - Añadido XML: {arcname_xml}")
-                    else: logger.warning(f"  - XML no encontrado: {xml_path}")
-
-                if pdf_source_path:
-                    arcname_pdf = os.path.join(final_subfolder_path_in_zip, os.path.basename(pdf_source_path))
-                    files_to_add_to_main_zip.append((pdf_source_path, arcname_pdf))
-                    logger.debug(f"  - Añadido PDF: {arcname_pdf}")
-                else: logger.warning(f"  - PDF (temporal o respaldo) no encontrado para {os.path.basename(xml_path)}. No se añadió PDF al ZIP.")
-
-            except Exception as e: logger.error(f"Error procesando archivo {os.path.basename(xml_path)} para ZIP: {e}")
+        files_to_add_to_main_zip = report_layout.build_zip_entries(self.xml_to_pdf_map, self.all_data_by_coddoc, export_type)
 
         logger.info(f"Total de archivos preparados para añadir al ZIP: {len(files_to_add_to_main_zip)}")
 
@@ -701,6 +542,39 @@ class MainWindow(QMainWindow):
         else:
             logger.info("xml_to_pdf_map está vacío. No hay archivos para exportar.")
             QMessageBox.information(self, "Exportar ZIP", "No hay archivos procesados para exportar.")
+
+    def _render_pending_pdfs(self) -> bool:
+        """Genera los PDFs diferidos que falten antes de armar el ZIP. False si el usuario cancela."""
+        futures = self.lazy_pdf_renderer.render_all()
+        if not futures: return True
+        logger.info(f"Generando {len(futures)} PDF(s) pendientes antes de exportar.")
+        progress_dialog = QProgressDialog("Generando PDFs pendientes...", "Cancelar", 0, len(futures), self)
+        progress_dialog.setWindowTitle("Exportar Archivos")
+        progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(0)
+        try:
+            not_done = futures
+            while not_done:
+                done, not_done = wait_futures(futures, timeout=0.1)
+                progress_dialog.setValue(len(done)); QApplication.processEvents()
+                if progress_dialog.wasCanceled():
+                    logger.info("Exportación cancelada mientras se generaban los PDFs pendientes.")
+                    return False
+        finally:
+            progress_dialog.close(); progress_dialog.deleteLater()
+        # El mapa se actualiza ya, sin esperar a que lleguen las señales encoladas (que solo lo
+        # repetirán); abrir el PDF pedido con un clic queda a cargo de la señal
+        for future in futures:
+            if future.cancelled(): continue
+            result = future.result()
+            self._apply_lazy_pdf_result(result["xml_path"], result)
+        failures = self.lazy_pdf_renderer.failures()
+        if failures:
+            message_parts = [f"No se pudieron generar {len(failures)} PDF(s); el ZIP se creará sin ellos:"]
+            for xml_path, pdf_error in list(failures.items())[:3]: message_parts.append(f"  - {os.path.basename(xml_path)}: {pdf_error}")
+            if len(failures) > 3: message_parts.append(f"  ...y {len(failures) - 3} más (ver log).")
+            QMessageBox.warning(self, "Exportar Archivos", "\n".join(message_parts))
+        return True
     # --- Fin de métodos de exportación movidos ---
 
     def _open_directory_or_select_file(self, path: str, select: bool = False):
@@ -726,7 +600,7 @@ class MainWindow(QMainWindow):
         self._clear_report_data_for_new_entity()
         self.selected_entity_details = { "id_display": "", "razon_social": "", "ids_to_match": [] }
         self.initial_process_done = False; self.processed_xml_identifiers_for_current_entity.clear()
-        self._update_button_visibility_and_default_selection(); self.process_xml_button.setEnabled(True)
+        self._update_button_visibility_and_default_selection(); self._set_process_buttons_enabled(True)
         logger.info("Interfaz reseteada.")
 
     @Slot(str)
@@ -748,20 +622,29 @@ class MainWindow(QMainWindow):
         left_buttons_layout = QVBoxLayout(); left_buttons_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
         self.process_xml_button = QPushButton("Procesar XML"); self.process_xml_button.clicked.connect(self.select_xml_files)
         left_buttons_layout.addWidget(self.process_xml_button)
+        self.process_folder_button = QPushButton("Procesar carpeta"); self.process_folder_button.clicked.connect(self.select_xml_folder)
+        left_buttons_layout.addWidget(self.process_folder_button)
         self.export_excel_button = QPushButton("Exportar a Excel"); self.export_excel_button.clicked.connect(self.handle_export_to_excel)
         left_buttons_layout.addWidget(self.export_excel_button)
         self.export_files_button = QPushButton("Exportar Archivos"); self.export_files_button.clicked.connect(self.handle_export_files)
         left_buttons_layout.addWidget(self.export_files_button)
         self.reset_button = QPushButton("Reiniciar"); self.reset_button.clicked.connect(self.reset_interface)
         left_buttons_layout.addWidget(self.reset_button)
-        buttons_to_standardize = [self.process_xml_button, self.export_excel_button, self.export_files_button, self.reset_button]
+        buttons_to_standardize = [self.process_xml_button, self.process_folder_button, self.export_excel_button, self.export_files_button, self.reset_button]
         max_hint_width = 0
         for button in buttons_to_standardize: max_hint_width = max(max_hint_width, button.sizeHint().width())
         for button in buttons_to_standardize: button.setMinimumWidth(max_hint_width + 10)
+        self.lazy_pdf_checkbox = QCheckBox("PDFs en segundo plano")
+        self.lazy_pdf_checkbox.setToolTip("La tabla se llena sin esperar a los PDF: cada PDF se genera al abrirlo,\n"
+                                          "antes de exportar archivos o en segundo plano cuando no hay un proceso en curso.")
+        left_buttons_layout.addWidget(self.lazy_pdf_checkbox)
         table_area_layout.addLayout(left_buttons_layout, 0)
-        self.report_table = QTableWidget(); self._setup_report_table()
+        self.report_table = QTableView()
+        self.report_model = ReportTableModel(parent=self)
+        self.report_table.setModel(self.report_model)
         self.custom_header = CustomHeaderView(Qt.Orientation.Horizontal, self.report_table)
         self.report_table.setHorizontalHeader(self.custom_header)
+        self._setup_report_table()
         self.no_column_delegate = NoColumnDelegate(self.report_table)
         self.report_table.setItemDelegateForColumn(0, self.no_column_delegate)
         table_area_layout.addWidget(self.report_table, 1)
@@ -771,7 +654,7 @@ class MainWindow(QMainWindow):
         central_widget = QWidget(); central_widget.setLayout(main_layout); self.setCentralWidget(central_widget)
 
     def _apply_styles(self):
-        self.setStyleSheet(""" QMainWindow { background-color: #f0f4f8; } QLabel { color: #333333; padding: 2px; } QLabel[font-weight="bold"] { color: #004a99; } QPushButton { background-color: #007bff; color: white; border-radius: 4px; padding: 8px 12px; font-size: 10pt; } QPushButton:hover { background-color: #0056b3; } QPushButton:disabled { background-color: #c0c0c0; color: #666666; } QTableWidget { border: 1px solid #d0d0d0; gridline-color: #e0e0e0; background-color: white; alternate-background-color: #f7faff; } QTableWidget::item { padding-top: 2px; padding-bottom: 2px; padding-left: 4px; padding-right: 4px; border-bottom: 1px solid #f0f0f0; } QHeaderView::section { background-color: #005cbf; color: white; padding: 4px; font-size: 9pt; font-weight: bold; border-style: solid; border-width: 1px; border-top-color: #3399ff; border-left-color: #3399ff; border-bottom-color: #003366; border-right-color: #003366; } QDialog#ProgressPopup { background-color: #e9eff5; border: 1px solid #007bff; } QDialog#ProgressPopup QLabel { color: #003366; } QPushButton#DocTypeButton { font-size: 8pt; padding: 6px 10px; margin: 1px; border: 1px solid #cccccc; border-radius: 3px; } QPushButton[docGroup="received"] { background-color: #e6f7ff; color: #005cbf; } QPushButton[docGroup="received"]:checked { background-color: #005cbf; color: white; border-color: #004a99;} QPushButton[docGroup="emitted"] { background-color: #e6ffe6; color: #006400; } QPushButton[docGroup="emitted"]:checked { background-color: #006400; color: white; border-color: #004d00;} """)
+        self.setStyleSheet(""" QMainWindow { background-color: #f0f4f8; } QLabel { color: #333333; padding: 2px; } QLabel[font-weight="bold"] { color: #004a99; } QPushButton { background-color: #007bff; color: white; border-radius: 4px; padding: 8px 12px; font-size: 10pt; } QPushButton:hover { background-color: #0056b3; } QPushButton:disabled { background-color: #c0c0c0; color: #666666; } QTableView { border: 1px solid #d0d0d0; gridline-color: #e0e0e0; background-color: white; alternate-background-color: #f7faff; } QTableView::item { padding-top: 2px; padding-bottom: 2px; padding-left: 4px; padding-right: 4px; border-bottom: 1px solid #f0f0f0; } QHeaderView::section { background-color: #005cbf; color: white; padding: 4px; font-size: 9pt; font-weight: bold; border-style: solid; border-width: 1px; border-top-color: #3399ff; border-left-color: #3399ff; border-bottom-color: #003366; border-right-color: #003366; } QDialog#ProgressPopup { background-color: #e9eff5; border: 1px solid #007bff; } QDialog#ProgressPopup QLabel { color: #003366; } QPushButton#DocTypeButton { font-size: 8pt; padding: 6px 10px; margin: 1px; border: 1px solid #cccccc; border-radius: 3px; } QPushButton[docGroup="received"] { background-color: #e6f7ff; color: #005cbf; } QPushButton[docGroup="received"]:checked { background-color: #005cbf; color: white; border-color: #004a99;} QPushButton[docGroup="emitted"] { background-color: #e6ffe6; color: #006400; } QPushButton[docGroup="emitted"]:checked { background-color: #006400; color: white; border-color: #004d00;} """)
         if hasattr(self, 'id_label_title'): self.id_label_title.setProperty("font-weight", "bold")
         if hasattr(self, 'rs_label_title'): self.rs_label_title.setProperty("font-weight", "bold")
 
@@ -791,6 +674,7 @@ class MainWindow(QMainWindow):
         layout.addStretch(1); return layout
 
     update_available_signal = Signal(str, str)
+    lazy_pdf_rendered = Signal(str, dict) # Emitida desde los hilos de LazyPdfRenderer
 
     def _start_update_check_thread(self):
         logger.info("Iniciando hilo de comprobación de actualizaciones...")
@@ -868,11 +752,24 @@ class MainWindow(QMainWindow):
             else: self.download_progress_dialog.setMaximum(0); self.download_progress_dialog.setValue(0)
 
     def _setup_report_table(self):
-        self.report_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.report_table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
         self.report_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
         self.report_table.verticalHeader().setVisible(False); self.report_table.setMinimumHeight(300)
+        # Altura fija de fila: evita recorrer todas las filas tras cada actualización
+        self.report_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.report_table.verticalHeader().setDefaultSectionSize(self.custom_header._single_line_height)
         self.report_table.setAlternatingRowColors(True)
-        self.report_table.cellClicked.connect(self.on_report_table_cell_clicked)
+        self.report_table.clicked.connect(self.on_report_table_cell_clicked)
+        # Temporizador que agrupa las filas nuevas en un único refresco de la vista
+        self._report_refresh_timer = QTimer(self)
+        self._report_refresh_timer.setSingleShot(True)
+        self._report_refresh_timer.setInterval(REPORT_REFRESH_INTERVAL_MS)
+        self._report_refresh_timer.timeout.connect(self._refresh_report_view_incremental)
+        # Igual para los enlaces de la columna "No." a medida que se generan los PDFs diferidos
+        self._pdf_links_refresh_timer = QTimer(self)
+        self._pdf_links_refresh_timer.setSingleShot(True)
+        self._pdf_links_refresh_timer.setInterval(REPORT_REFRESH_INTERVAL_MS)
+        self._pdf_links_refresh_timer.timeout.connect(self.report_model.refresh_pdf_links)
 
     @Slot(bool, str, str)
     def handle_download_finished(self, success: bool, filepath: str, error_message: str):
@@ -920,12 +817,15 @@ class MainWindow(QMainWindow):
         self.export_excel_button.setVisible(has_any_data_for_excel); self.export_excel_button.setEnabled(has_any_data_for_excel)
         self.reset_button.setVisible(has_any_data_in_table or can_export or self.initial_process_done)
         self.process_xml_button.setText("Procesar XML" if not self.initial_process_done else "Procesar más")
-        self.process_xml_button.setEnabled(self.worker_thread is None or not self.worker_thread.isRunning())
+        self._set_process_buttons_enabled(self.worker_thread is None or not self.worker_thread.isRunning())
+
+    def _set_process_buttons_enabled(self, enabled: bool):
+        self.process_xml_button.setEnabled(enabled); self.process_folder_button.setEnabled(enabled)
 
     @Slot()
     def select_xml_files(self):
         file_dialog = QFileDialog(self); file_dialog.setFileMode(QFileDialog.FileMode.ExistingFiles)
-        file_dialog.setNameFilter("Archivos XML (*.xml)")
+        file_dialog.setNameFilter("Archivos XML o ZIP (*.xml *.zip)")
         start_dir = self.last_xml_directory if os.path.isdir(self.last_xml_directory) else self.default_directory
         file_dialog.setDirectory(start_dir)
         if file_dialog.exec():
@@ -935,9 +835,19 @@ class MainWindow(QMainWindow):
                 self.settings.setValue(SETTINGS_LAST_XML_DIR, self.last_xml_directory)
                 self.start_processing(xml_files)
 
+    @Slot()
+    def select_xml_folder(self):
+        start_dir = self.last_xml_directory if os.path.isdir(self.last_xml_directory) else self.default_directory
+        folder = QFileDialog.getExistingDirectory(self, "Seleccionar carpeta con XML (incluye subcarpetas y ZIP)", start_dir)
+        if folder:
+            self.last_xml_directory = folder
+            self.settings.setValue(SETTINGS_LAST_XML_DIR, self.last_xml_directory)
+            # La carpeta se recorre en el hilo de trabajo (folder_scan), no aquí
+            self.start_processing([folder])
+
     def start_processing(self, xml_files: List[str]):
         if self.worker_thread and self.worker_thread.isRunning(): QMessageBox.warning(self, "Proceso en curso", "Espere a que termine el proceso actual."); return
-        self.process_xml_button.setEnabled(False)
+        self._set_process_buttons_enabled(False)
         if self.progress_popup: self.progress_popup.reject(); self.progress_popup = None
         self.progress_popup = ProgressPopup(self); self.progress_popup.setObjectName("ProgressPopup")
         current_entity_id = self.selected_entity_details.get("id_display", "")
@@ -947,13 +857,18 @@ class MainWindow(QMainWindow):
                                           current_entity_id, 
                                           current_entity_rs, 
                                           self.initial_process_done, 
-                                          self.processed_xml_identifiers_for_current_entity)
+                                          self.processed_xml_identifiers_for_current_entity,
+                                          self.worker_pool,
+                                          self.execution_strategy,
+                                          render_pdfs=not self.lazy_pdf_checkbox.isChecked())
+        # Los PDFs diferidos en segundo plano no compiten con el lote por los workers
+        self.lazy_pdf_renderer.set_background(False)
         self.worker_thread.initial_info_to_popup.connect(self.update_progress_popup_message)
         self.worker_thread.progress_total_files_to_popup.connect(self.update_progress_popup_total_files)
         self.worker_thread.entity_base_clarification_needed.connect(self.handle_entity_base_clarification_from_worker)
         self.worker_thread.id_type_for_entity_base_clarification_needed.connect(self.handle_id_type_for_entity_base_clarification_from_worker)
         self.worker_thread.entity_determined.connect(self.handle_entity_determined)
-        self.worker_thread.row_processed.connect(self.add_row_to_table)
+        self.worker_thread.rows_processed.connect(self.add_rows_to_table)
         self.worker_thread.entity_id_mismatch_on_add_more.connect(self.handle_entity_id_mismatch_on_add_more)
         self.worker_thread.processing_complete.connect(self.handle_processing_complete)
         self.worker_thread.log_message_to_gui.connect(self.handle_worker_log_message)
@@ -1044,20 +959,33 @@ class MainWindow(QMainWindow):
         if temp_dir_path_this_run and os.path.isdir(temp_dir_path_this_run): self.tracked_temp_pdf_dirs.add(temp_dir_path_this_run)
         self.initial_process_done = True
 
-    @Slot(dict, str, object)
-    def add_row_to_table(self, row_data: Dict[str, Any], cod_doc: str, backup_pdf_path: Optional[str]):
+    @Slot(list)
+    def add_rows_to_table(self, rows: List[Tuple[Dict[str, Any], str, Optional[str]]]):
+        """Recibe un lote de filas del worker; la vista se refresca una sola vez por lote."""
         if not self.initial_process_done: return
-        if not (row_data and cod_doc): return
+        active_definition = self.COLUMN_DEFINITIONS.get(self.active_doc_key)
+        active_cod_doc = active_definition.get("coddoc") if active_definition else None
+        touches_active_view = False
+        for row_data, cod_doc, backup_pdf_path in rows:
+            if self._append_row_data(row_data, cod_doc, backup_pdf_path) and cod_doc == active_cod_doc:
+                touches_active_view = True
+        if touches_active_view and not self._report_refresh_timer.isActive():
+            self._report_refresh_timer.start()
+
+    def _append_row_data(self, row_data: Dict[str, Any], cod_doc: str, backup_pdf_path: Optional[str]) -> bool:
+        if not (row_data and cod_doc): return False
         unique_id_of_row = row_data.get("Nro de Autorización")
-        if unique_id_of_row and unique_id_of_row in self.processed_xml_identifiers_for_current_entity: return
+        if unique_id_of_row and unique_id_of_row in self.processed_xml_identifiers_for_current_entity: return False
         if "original_xml_path" not in row_data and "xml_path" in row_data:
             row_data["original_xml_path"] = row_data["xml_path"]
         row_data['backup_pdf_path'] = backup_pdf_path
-        self.all_data_by_coddoc[cod_doc].append(row_data)
+        if "tipo_documento_display" not in row_data:
+            cod_doc_original = row_data.get("CodDoc", "")
+            row_data["tipo_documento_display"] = xml_parser.COD_DOC_MAP.get(cod_doc_original, f"Tipo {cod_doc_original}")
+        # El ledger copia los valores en sus columnas: el dict de la fila no se conserva
+        if not self.all_data_by_coddoc.append(cod_doc, row_data): return False
         if unique_id_of_row: self.processed_xml_identifiers_for_current_entity.add(unique_id_of_row)
-        doc_definition = self.COLUMN_DEFINITIONS.get(self.active_doc_key)
-        if doc_definition and doc_definition.get("coddoc") == cod_doc:
-             self._update_displayed_report()
+        return True
 
     @Slot(str, str, str)
     def handle_entity_id_mismatch_on_add_more(self, current_gui_rs: str, current_gui_id: str, new_entity_rs: str):
@@ -1069,18 +997,24 @@ class MainWindow(QMainWindow):
             f"Por favor, presione el botón 'Reiniciar' para limpiar la interfaz actual y luego "
             f"seleccione los archivos correspondientes para procesar los comprobantes de '{new_entity_rs}'."
         )
-        self.process_xml_button.setEnabled(True)
+        self._set_process_buttons_enabled(True)
 
     @Slot(list, list, list, bool, str, int, int, list, int, dict, dict)
     def handle_processing_complete(self, conversion_errors: List[str], errors_pdf_gen: List[str], critical_file_errors: List[dict], was_cancelled_by_user: bool, temp_dir_of_this_worker: str, newly_processed_count: int, skipped_duplicate_files_count: int, newly_added_ids_list: List[str], total_files_attempted_for_table: int, processed_counts_by_type: dict, final_xml_to_pdf_map: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]]):
         final_message_parts = []
+        # Las filas ya mostradas (también las de un lote cancelado) conservan su PDF: la carpeta
+        # temporal del lote sigue registrada y sus PDFs (diferidos o no) entran en el ZIP de exportación
+        self.xml_to_pdf_map.update(final_xml_to_pdf_map)
+        if self.worker_thread and self.worker_thread.pending_pdfs:
+            self.lazy_pdf_renderer.add(self.worker_thread.pending_pdfs, temp_dir_of_this_worker)
+        self.lazy_pdf_renderer.set_background(True)
         if was_cancelled_by_user:
             final_message_parts = ["--- Proceso Cancelado por el Usuario ---"]
-            if temp_dir_of_this_worker and temp_dir_of_this_worker in self.tracked_temp_pdf_dirs:
-                 self.tracked_temp_pdf_dirs.remove(temp_dir_of_this_worker)
         else:
             final_message_parts = ["--- Proceso Finalizado ---"]
-            self.xml_to_pdf_map.update(final_xml_to_pdf_map)
+            # Volcar a la vista las filas que queden pendientes del último intervalo de refresco
+            if self._report_refresh_timer.isActive():
+                self._report_refresh_timer.stop(); self._refresh_report_view_incremental()
             if total_files_attempted_for_table > 0 or newly_processed_count > 0 or skipped_duplicate_files_count > 0 or critical_file_errors: final_message_parts.append(f"{total_files_attempted_for_table} archivo(s) XML considerados.")
             if newly_processed_count > 0: final_message_parts.append(f"  - {newly_processed_count} nuevo(s) registrado(s).")
             elif total_files_attempted_for_table > 0: final_message_parts.append(f"  - 0 nuevos registrados.")
@@ -1105,233 +1039,118 @@ class MainWindow(QMainWindow):
             if not self.progress_popup.isVisible() and (final_message_parts or errors_pdf_gen or critical_file_errors): self.progress_popup.show()
             self.progress_popup.set_message("\n".join(final_message_parts)); self.progress_popup.processing_finished()
         else: QMessageBox.information(self, "Estado del Proceso", "\n".join(final_message_parts))
-        self._update_button_visibility_and_default_selection(); self.process_xml_button.setEnabled(True)
+        self._update_button_visibility_and_default_selection(); self._set_process_buttons_enabled(True)
 
     @Slot()
     def on_worker_finished_cleanup(self):
         if self.worker_thread: self.worker_thread.deleteLater(); self.worker_thread = None
-        if not self.process_xml_button.isEnabled(): self.process_xml_button.setEnabled(True)
+        if not self.process_xml_button.isEnabled(): self._set_process_buttons_enabled(True)
         self._update_button_visibility_and_default_selection()
 
     def _clear_report_data_for_new_entity(self):
         self.id_comprador_label.setText("N/A"); self.razon_social_comprador_label.setText("N/A")
-        self.report_table.setRowCount(0); self.report_table.setColumnCount(0)
+        self._report_refresh_timer.stop(); self.report_model.clear()
         if hasattr(self, 'custom_header') and self.custom_header: self.custom_header.setSummationData({})
         self.xml_to_pdf_map.clear(); self.all_data_by_coddoc.clear()
+        self.lazy_pdf_renderer.cancel(); self._pdf_to_open_when_rendered = None
         for temp_dir in list(self.tracked_temp_pdf_dirs):
             if os.path.exists(temp_dir): cleanup_temp_folder(temp_dir)
         self.tracked_temp_pdf_dirs.clear()
 
-    def _get_data_for_view(self, doc_key_filter: str) -> List[Dict[str, Any]]:
+    def _get_data_for_view(self, doc_key_filter: str) -> DocumentLedger:
         doc_info = self.COLUMN_DEFINITIONS.get(doc_key_filter)
-        if not doc_info: return []
-        return self.all_data_by_coddoc.get(doc_info["coddoc"], [])
+        if not doc_info: return DocumentLedger()
+        return self.all_data_by_coddoc.get(doc_info["coddoc"]) or DocumentLedger()
 
-    def _get_display_headers_for_doc_type(self, doc_key: str, data_rows: List[Dict[str, Any]], include_no_column: bool = True) -> List[str]:
-        doc_definition = self.COLUMN_DEFINITIONS.get(doc_key)
-        if not doc_definition:
-            return []
+    def _get_display_headers_for_doc_type(self, doc_key: str, data_rows: Sequence, include_no_column: bool = True,
+                                          has_data_for_key: Optional[Callable[[str], bool]] = None) -> List[str]:
+        return report_layout.get_display_headers_for_doc_type(doc_key, data_rows, include_no_column, has_data_for_key)
 
-        base_headers_for_doc_type = [h for h in doc_definition.get("headers", []) if h != "No."]
-        headers_with_data = []
-
-        if data_rows:
-            for header_name in base_headers_for_doc_type:
-                if header_name in self._cols_to_exclude_from_view:
-                    continue
-                
-                data_key_for_check = self.HEADER_TO_DATA_KEY_MAP.get(header_name, header_name)
-                has_data = any(
-                    _is_value_significant_for_display(row_data.get(data_key_for_check))
-                    for row_data in data_rows
-                )
-                if has_data:
-                    headers_with_data.append(header_name)
-
-        if doc_key == "RET_R" and "Primeros 3 Articulos" in headers_with_data:
-            headers_with_data.remove("Primeros 3 Articulos")
-
-        sorted_headers_with_data = sorted(
-            headers_with_data, 
-            key=lambda h: self.HEADER_ORDER_MAP.get(h, len(self.HEADER_ORDER_MAP))
-        )
-
-        final_display_headers = []
-        if include_no_column and data_rows and headers_with_data:
-            final_display_headers.append("No.")
-        final_display_headers.extend(sorted_headers_with_data)
-        
-        return final_display_headers
-
-    def _create_table_item(self, header_name_display: str, original_row_data: Dict[str, Any], row_idx: int) -> QTableWidgetItem:
-        table_item = QTableWidgetItem()
-        item_value_str = ""
-
-        if header_name_display == "No.":
-            prefix = self.active_doc_key[:2].upper() if self.active_doc_key else "N"
-            item_value_str = f"{prefix}{row_idx + 1}"
-            backup_pdf_path = original_row_data.get('backup_pdf_path')
-            if backup_pdf_path and os.path.exists(backup_pdf_path):
-                table_item.setData(USER_ROLE_PDF_PATH, backup_pdf_path)
-                table_item.setForeground(QColor("blue")) # El delegado NoColumn anulará esto por blanco
-                font = table_item.font(); font.setItalic(True); font.setUnderline(True); table_item.setFont(font)
-                table_item.setForeground(Qt.GlobalColor.white)
-                table_item.setToolTip(f"Abrir PDF: {os.path.basename(backup_pdf_path)}")
-            else:
-                table_item.setData(USER_ROLE_PDF_PATH, None)
-                font = table_item.font(); font.setUnderline(False); table_item.setFont(font)
-                table_item.setToolTip("")
-            table_item.setData(Qt.ItemDataRole.UserRole, original_row_data.get("original_xml_path"))
-            font = table_item.font(); font.setBold(True); table_item.setFont(font)
-            table_item.setTextAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
-        else:
-            data_key = self.HEADER_TO_DATA_KEY_MAP.get(header_name_display, header_name_display)
-            item_value = original_row_data.get(data_key, "")
-            if isinstance(item_value, float):
-                if any(substring in header_name_display.lower() for substring in 
-                       ["base", "monto", "total", "valor", "descuento", "ret.", "propina", "iva", "ice", "irbpnr"]):
-                    item_value_str = f"{item_value:.2f}"
-                else: item_value_str = str(item_value)
-            else: item_value_str = str(item_value)
-        
-        table_item.setText(item_value_str)
-        return table_item
-
-    def _calculate_column_sums(self, data_rows: List[Dict[str, Any]], display_column_headers: List[str], sum_column_names: List[str]) -> Dict[int, str]:
-        sum_values_for_header: Dict[int, str] = {}
-        if not data_rows or not display_column_headers or not sum_column_names:
-            return sum_values_for_header
-
-        header_to_index_map = {name: i for i, name in enumerate(display_column_headers)}
-
-        for col_name_to_sum_display in sum_column_names:
-            col_idx_in_display = header_to_index_map.get(col_name_to_sum_display)
-            if col_idx_in_display is None: continue
-
-            current_sum = 0.0
-            data_key_for_sum = self.HEADER_TO_DATA_KEY_MAP.get(col_name_to_sum_display, col_name_to_sum_display)
-            
-            for row_data in data_rows:
-                value_from_data = row_data.get(data_key_for_sum, 0.0)
-                try:
-                    if isinstance(value_from_data, (int, float)): current_sum += float(value_from_data)
-                    elif isinstance(value_from_data, str):
-                        cleaned_value_str = value_from_data.replace(',', '.').strip()
-                        if cleaned_value_str: current_sum += float(cleaned_value_str)
-                except (ValueError, TypeError):
-                    logger.debug(f"Suma: No se pudo convertir '{value_from_data}' (tipo: {type(value_from_data)}) "
-                                 f"para la suma de '{col_name_to_sum_display}' (data key: {data_key_for_sum}).")
-            sum_values_for_header[col_idx_in_display] = f"{current_sum:.2f}"
-        return sum_values_for_header
-
-    def _populate_report_table(self, data_rows: List[dict], display_column_headers: List[str], sum_column_names: List[str]):
-        self.report_table.setRowCount(0)
-        if not display_column_headers:
-            self.report_table.setColumnCount(0); self.report_table.setHorizontalHeaderLabels([])
-            self.report_table.horizontalHeader().setVisible(False)
-            if hasattr(self, 'custom_header') and self.custom_header: self.custom_header.setSummationData({})
-            return
-        self.report_table.setColumnCount(len(display_column_headers))
-        self.report_table.setHorizontalHeaderLabels(display_column_headers)
+    def _apply_report_headers_and_sums(self, force_resize: bool = False):
+        """Recalcula columnas visibles y totales a partir del estado incremental del modelo."""
+        doc_definition = self.COLUMN_DEFINITIONS[self.active_doc_key]
+        data_for_current_view = self.report_model.source_rows()
+        display_column_headers = self._get_display_headers_for_doc_type(
+            self.active_doc_key, data_for_current_view, has_data_for_key=self.report_model.has_significant_data)
+        headers_changed = self.report_model.set_headers(display_column_headers)
         self.report_table.horizontalHeader().setVisible(len(display_column_headers) > 0)
-
-        for row_idx, original_row_data in enumerate(data_rows):
-            self.report_table.insertRow(row_idx)
-            if "tipo_documento_display" not in original_row_data:
-                cod_doc_original = original_row_data.get("CodDoc", "")
-                original_row_data["tipo_documento_display"] = xml_parser.COD_DOC_MAP.get(cod_doc_original, f"Tipo {cod_doc_original}")
-            for col_idx, header_name_display in enumerate(display_column_headers):
-                table_item = self._create_table_item(header_name_display, original_row_data, row_idx)
-                self.report_table.setItem(row_idx, col_idx, table_item)
-        self.report_table.resizeColumnsToContents()
-        if hasattr(self, 'custom_header') and self.custom_header and self.report_table.rowCount() > 0:
-            desired_row_height = self.custom_header._single_line_height
-            if desired_row_height <= 0: self.report_table.resizeRowsToContents()
-            else:
-                for r_idx in range(self.report_table.rowCount()): self.report_table.setRowHeight(r_idx, desired_row_height)
-        else: self.report_table.resizeRowsToContents()
-        sum_values = self._calculate_column_sums(data_rows, display_column_headers, sum_column_names)
-        if hasattr(self, 'custom_header') and self.custom_header: self.custom_header.setSummationData(sum_values)
+        if headers_changed or force_resize:
+            self.report_table.resizeColumnsToContents()
+        sum_cols_for_view = [col for col in doc_definition.get("sum_cols", []) if col in display_column_headers]
+        if hasattr(self, 'custom_header') and self.custom_header:
+            self.custom_header.setSummationData(self.report_model.column_sums(sum_cols_for_view))
 
     def _update_displayed_report(self):
+        """Carga completa de la vista (cambio de tipo de documento o de entidad)."""
+        self._report_refresh_timer.stop()
         if not self.active_doc_key:
-            self._populate_report_table([], [], [])
+            self.report_model.clear()
+            self.report_table.horizontalHeader().setVisible(False)
+            if hasattr(self, 'custom_header') and self.custom_header: self.custom_header.setSummationData({})
             return
 
         doc_definition = self.COLUMN_DEFINITIONS[self.active_doc_key]
         data_for_current_view = self._get_data_for_view(self.active_doc_key)
-        display_column_headers = self._get_display_headers_for_doc_type(self.active_doc_key, data_for_current_view)
-
-        sum_cols_for_view = []
-        defined_sum_cols = doc_definition.get("sum_cols", [])
-        if display_column_headers:
-            sum_cols_for_view = [col for col in defined_sum_cols if col in display_column_headers]
-        self._populate_report_table(data_for_current_view, display_column_headers, sum_cols_for_view)
+        self.report_model.set_source(
+            data_for_current_view, self.active_doc_key[:2].upper(), doc_definition.get("headers", []))
+        self._apply_report_headers_and_sums(force_resize=True)
 
-    @Slot(int, int)
-    def on_report_table_cell_clicked(self, row, column):
-        if column == 0:
-            item = self.report_table.item(row, column)
-            if item:
-                pdf_path = item.data(USER_ROLE_PDF_PATH)
-                if pdf_path and isinstance(pdf_path, str) and os.path.exists(pdf_path):
-                    try:
-                        QDesktopServices.openUrl(QUrl.fromLocalFile(pdf_path))
-                        logger.info(f"Abriendo PDF desde la tabla: {pdf_path}")
-                    except Exception as e:
-                        logger.error(f"Error al intentar abrir PDF desde la tabla: {pdf_path}", exc_info=True)
-                        QMessageBox.warning(self, "Error al abrir PDF", f"No se pudo abrir el archivo PDF:\n{pdf_path}\n\nError: {e}")
+    @Slot()
+    def _refresh_report_view_incremental(self):
+        """Añade a la vista las filas llegadas desde el último refresco, sin reconstruir la tabla."""
+        if not self.active_doc_key:
+            return
+        if self.report_model.source_rows() is not self._get_data_for_view(self.active_doc_key):
+            # La lista del tipo de documento aún no estaba enlazada al modelo
+            self._update_displayed_report()
+            return
+        if self.report_model.append_pending_rows():
+            self._apply_report_headers_and_sums()
+
+    @Slot(QModelIndex)
+    def on_report_table_cell_clicked(self, index: QModelIndex):
+        if index.isValid() and index.column() == 0:
+            pdf_path = index.data(USER_ROLE_PDF_PATH)
+            if pdf_path and isinstance(pdf_path, str) and os.path.exists(pdf_path):
+                self._open_pdf(pdf_path)
+                return
+            # PDF diferido: se genera antes que los de segundo plano y se abre al terminar
+            row_data = self.report_model.row_data(index.row())
+            xml_path = row_data.get('original_xml_path') if row_data else None
+            if xml_path and self.lazy_pdf_renderer.request(xml_path) is not None:
+                logger.info(f"Generando a pedido el PDF de {os.path.basename(xml_path)}")
+                self._pdf_to_open_when_rendered = xml_path
+
+    def _open_pdf(self, pdf_path: str):
+        try:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(pdf_path))
+            logger.info(f"Abriendo PDF desde la tabla: {pdf_path}")
+        except Exception as e:
+            logger.error(f"Error al intentar abrir PDF desde la tabla: {pdf_path}", exc_info=True)
+            QMessageBox.warning(self, "Error al abrir PDF", f"No se pudo abrir el archivo PDF:\n{pdf_path}\n\nError: {e}")
+
+    def _apply_lazy_pdf_result(self, xml_path: str, result: dict):
+        pdf_entry = self.xml_to_pdf_map.get(xml_path)
+        if pdf_entry is not None:
+            self.xml_to_pdf_map[xml_path] = (result.get("temp_pdf_path"), pdf_entry[1], result.get("backup_pdf_path"))
+
+    @Slot(str, dict)
+    def _handle_lazy_pdf_rendered(self, xml_path: str, result: dict):
+        self._apply_lazy_pdf_result(xml_path, result)
+        if not self._pdf_links_refresh_timer.isActive(): self._pdf_links_refresh_timer.start()
+        if xml_path == self._pdf_to_open_when_rendered:
+            self._pdf_to_open_when_rendered = None
+            pdf_path = result.get("backup_pdf_path") or result.get("temp_pdf_path")
+            if pdf_path: self._open_pdf(pdf_path)
+            else: QMessageBox.warning(self, "Error al generar PDF", f"No se pudo generar el PDF de {os.path.basename(xml_path)}:\n{result.get('pdf_error')}")
 
     @Slot()
     def handle_export_to_excel(self):
         if not self.initial_process_done:
             QMessageBox.warning(self, "Exportar a Excel", "No se han procesado datos para exportar.")
             return
-        data_by_sheet_to_export: Dict[str, Dict[str, Any]] = {}
-        any_data_found = False
-        for doc_key in self.DOC_TYPE_ORDER:
-            doc_definition = self.COLUMN_DEFINITIONS.get(doc_key)
-            if not doc_definition: continue
-            data_for_this_sheet = self._get_data_for_view(doc_key) # Reutilizar la misma lógica de obtención de datos
-            final_display_headers_excel = self._get_display_headers_for_doc_type(doc_key, data_for_this_sheet, include_no_column=True)
-
-            if data_for_this_sheet:
-                sheet_name_base = doc_definition.get("name", f"Reporte_{doc_key}")[:31].strip()
-                sheet_name = sheet_name_base; count = 1
-                while sheet_name in data_by_sheet_to_export:
-                    sheet_name = f"{sheet_name_base[:28]}_{count}"
-                    if len(sheet_name) > 31: sheet_name = sheet_name[:31]
-                    count += 1
-                sum_display_names_for_sheet = doc_definition.get("sum_cols", [])
-                doc_key_prefix_for_no = doc_key[:2].upper() if doc_key else "N"
-                prepared_data_for_excel_sheet = []
-                for i, row_data_original in enumerate(data_for_this_sheet):
-                    row_for_excel = {}
-                    for display_name in final_display_headers_excel:
-                        if display_name == "No.":
-                            no_value_display = f"{doc_key_prefix_for_no}{i + 1}"
-                            backup_pdf_path = row_data_original.get('backup_pdf_path')
-                            if backup_pdf_path and os.path.exists(backup_pdf_path):
-                                excel_link_url = f"external:{os.path.normpath(backup_pdf_path)}"
-                                row_for_excel[display_name] = ("HYPERLINK", (excel_link_url, no_value_display))
-                            else:
-                                row_for_excel[display_name] = no_value_display
-                        else:
-                            data_key = self.HEADER_TO_DATA_KEY_MAP.get(display_name, display_name)
-                            value = row_data_original.get(data_key)
-                            if isinstance(value, float):
-                                row_for_excel[display_name] = value
-                            else:
-                                row_for_excel[display_name] = value
-                    prepared_data_for_excel_sheet.append(row_for_excel)
-                data_by_sheet_to_export[sheet_name] = {
-                    "data": prepared_data_for_excel_sheet,
-                    "sum_display_names": sum_display_names_for_sheet,
-                    "doc_key_prefix": doc_key_prefix_for_no,
-                    "doc_key_original": doc_key,
-                    "final_ordered_display_names": final_display_headers_excel
-                }
-                any_data_found = True
+        data_by_sheet_to_export = report_layout.build_excel_sheets(self.all_data_by_coddoc)
+        any_data_found = bool(data_by_sheet_to_export)
         if not any_data_found:
             QMessageBox.information(self, "Exportar a Excel", "No hay datos en ninguna pestaña para exportar.")
             return ExcelExportStatus.NO_DATA_OR_COLUMNS
@@ -1389,6 +1208,9 @@ class MainWindow(QMainWindow):
                     logger.warning("El hilo de trabajo no terminó en 3 segundos, terminando forzosamente.")
                     self.worker_thread.terminate(); self.worker_thread.wait()
         if self.progress_popup and self.progress_popup.isVisible(): self.progress_popup.reject()
+        self.lazy_pdf_renderer.shutdown()
+        self.execution_strategy.close()
+        self.worker_pool.shutdown(wait=False)
         self._cleanup_tracked_temp_dirs(); self.settings.sync(); event.accept()
 
 def main():
@@ -0,0 +1,186 @@
+# d:\Datos\Desktop\Asistente Contable\src\gui\report_table_model.py
+import os
+import logging
+from typing import List, Optional, Dict, Any, Mapping
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PySide6.QtGui import QFont, QBrush
+
+from src.utils.report_ledger import DocumentLedger
+
+logger = logging.getLogger(__name__)
+
+# Rol de usuario para guardar la ruta del PDF en la columna "No."
+USER_ROLE_PDF_PATH = Qt.UserRole + 1
+
+# Fragmentos de cabecera cuyas columnas float se muestran con 2 decimales
+_MONEY_HEADER_SUBSTRINGS = ["base", "monto", "total", "valor", "descuento", "ret.", "propina", "iva", "ice", "irbpnr"]
+
+
+class ReportTableModel(QAbstractTableModel):
+    """
+    Modelo de la tabla de reporte sobre el DocumentLedger de un tipo de documento
+    (de `all_data_by_coddoc`, un ReportLedger). No copia los datos: las filas nuevas se
+    añaden al ledger desde MainWindow y `append_pending_rows()` las incorpora al
+    modelo de forma incremental (beginInsertRows). Las celdas, las sumas y las columnas
+    con datos se leen de las columnas del ledger.
+    """
+
+    def __init__(self, header_to_data_key_map: Optional[Dict[str, Optional[str]]] = None, parent=None):
+        super().__init__(parent)
+        self._header_to_data_key_map: Dict[str, Optional[str]] = header_to_data_key_map or {}
+        self._rows: DocumentLedger = DocumentLedger()
+        self._row_count = 0
+        self._headers: List[str] = []
+        self._data_keys: List[Optional[str]] = []
+        self._no_prefix = "N"
+        self._candidate_data_keys: List[str] = []
+        self._pdf_exists_cache: Dict[int, bool] = {}
+        self._font_no = QFont(); self._font_no.setBold(True)
+        self._font_no_link = QFont(self._font_no); self._font_no_link.setItalic(True); self._font_no_link.setUnderline(True)
+        self._brush_no = QBrush(Qt.GlobalColor.white)
+
+    def set_header_to_data_key_map(self, header_to_data_key_map: Dict[str, Optional[str]]):
+        self._header_to_data_key_map = header_to_data_key_map
+
+    def data_key_for_header(self, header_name: str) -> str:
+        return self._header_to_data_key_map.get(header_name, header_name)
+
+    def source_rows(self) -> DocumentLedger:
+        return self._rows
+
+    # --- Carga / actualización ---
+
+    def set_source(self, rows: DocumentLedger, no_prefix: str, candidate_headers: List[str]):
+        """
+        Cambia el ledger que muestra el modelo (al cambiar de tipo de documento).
+        `candidate_headers` son las columnas posibles del tipo de documento.
+        """
+        self.beginResetModel()
+        self._rows = rows
+        self._row_count = 0
+        self._headers = []
+        self._data_keys = []
+        self._no_prefix = no_prefix
+        self._candidate_data_keys = list(dict.fromkeys(self.data_key_for_header(h) for h in candidate_headers if h != "No."))
+        self._pdf_exists_cache = {}
+        self.endResetModel()
+        self.append_pending_rows()
+
+    def clear(self):
+        self.set_source(DocumentLedger(), "N", [])
+
+    def append_pending_rows(self) -> int:
+        """Incorpora al modelo las filas añadidas al ledger desde la última llamada."""
+        first_new = self._row_count
+        last_new = len(self._rows) - 1
+        if last_new < first_new:
+            return 0
+        if self._headers:
+            self.beginInsertRows(QModelIndex(), first_new, last_new)
+            self._row_count = last_new + 1
+            self.endInsertRows()
+        else:
+            # Sin columnas todavía: la vista se reconstruye al fijar las cabeceras
+            self._row_count = last_new + 1
+        return last_new - first_new + 1
+
+    def has_significant_data(self, data_key: str) -> bool:
+        return data_key in self._candidate_data_keys and self._rows.has_significant_data(data_key)
+
+    def set_headers(self, headers: List[str]) -> bool:
+        """Fija las columnas visibles. Devuelve True si cambiaron."""
+        if headers == self._headers:
+            return False
+        self.beginResetModel()
+        self._headers = list(headers)
+        self._data_keys = [None if h == "No." else self.data_key_for_header(h) for h in self._headers]
+        self.endResetModel()
+        return True
+
+    def headers(self) -> List[str]:
+        return list(self._headers)
+
+    def column_sums(self, sum_headers: List[str]) -> Dict[int, str]:
+        """Sumas formateadas indexadas por columna visible, para CustomHeaderView."""
+        sum_values_for_header: Dict[int, str] = {}
+        if not self._row_count:
+            return sum_values_for_header
+        for col_idx, header_name in enumerate(self._headers):
+            if header_name in sum_headers:
+                column_sum = self._rows.column_sum(self.data_key_for_header(header_name), 0, self._row_count)
+                sum_values_for_header[col_idx] = f"{column_sum:.2f}"
+        return sum_values_for_header
+
+    def row_data(self, row: int) -> Optional[Mapping[str, Any]]:
+        if 0 <= row < self._row_count:
+            return self._rows[row]
+        return None
+
+    def refresh_pdf_links(self):
+        """Vuelve a comprobar qué filas tienen PDF (PDFs generados después de mostrar la fila)."""
+        self._pdf_exists_cache = {}
+        if self._row_count and self._headers:
+            self.dataChanged.emit(self.index(0, 0), self.index(self._row_count - 1, 0))
+
+    def pdf_path_for_row(self, row: int) -> Optional[str]:
+        if not 0 <= row < self._row_count:
+            return None
+        backup_pdf_path = self._rows.value(row, 'backup_pdf_path')
+        if not backup_pdf_path:
+            return None
+        exists = self._pdf_exists_cache.get(row)
+        if exists is None:
+            exists = os.path.exists(backup_pdf_path)
+            self._pdf_exists_cache[row] = exists
+        return backup_pdf_path if exists else None
+
+    # --- API de QAbstractTableModel ---
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid() or not self._headers:
+            return 0
+        return self._row_count
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._headers)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal and 0 <= section < len(self._headers):
+            return self._headers[section]
+        return None
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if row >= self._row_count or column >= len(self._headers):
+            return None
+        if column == 0 and self._headers[0] == "No.":
+            if role == Qt.ItemDataRole.DisplayRole:
+                return f"{self._no_prefix}{row + 1}"
+            if role == USER_ROLE_PDF_PATH:
+                return self.pdf_path_for_row(row)
+            if role == Qt.ItemDataRole.UserRole:
+                return self._rows.value(row, "original_xml_path")
+            if role == Qt.ItemDataRole.FontRole:
+                return self._font_no_link if self.pdf_path_for_row(row) else self._font_no
+            if role == Qt.ItemDataRole.ForegroundRole:
+                return self._brush_no
+            if role == Qt.ItemDataRole.ToolTipRole:
+                pdf_path = self.pdf_path_for_row(row)
+                return f"Abrir PDF: {os.path.basename(pdf_path)}" if pdf_path else ""
+            if role == Qt.ItemDataRole.TextAlignmentRole:
+                return int(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+            return None
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            header_name_display = self._headers[column]
+            item_value = self._rows.value(row, self._data_keys[column], "")
+            if isinstance(item_value, float):
+                if any(substring in header_name_display.lower() for substring in _MONEY_HEADER_SUBSTRINGS):
+                    return f"{item_value:.2f}"
+                return str(item_value)
+            return str(item_value)
+        return None
@@ -116,6 +116,8 @@ def export_to_excel(data_by_sheet: Dict[str, SheetExportData],
             - "doc_key_prefix": Prefijo para la columna "No." (ej. "FC", "NC").
             - "doc_key_original": La clave original del documento (ej. "FC", "NC_R", "RET_R").
             - "final_ordered_display_names": La lista final y ordenada de nombres de columnas a exportar.
+            - "sum_values" (opcional): Totales ya calculados {nombre de columna: valor}; si no
+              se indica, se calculan aquí a partir de "data".
         file_path (str): La ruta completa (incluyendo nombre de archivo .xlsx)
                          donde se guardará el archivo Excel.
 
@@ -189,14 +191,17 @@ def export_to_excel(data_by_sheet: Dict[str, SheetExportData],
             if final_ordered_display_names:
                 sum_row_values[final_ordered_display_names[0]] = "Total" # Primera columna de la fila de suma es "Total"
 
-            # Crear un DataFrame temporal solo para calcular sumas si es necesario
-            # Esto es menos eficiente que sumar directamente, pero aprovecha pandas para to_numeric
-            temp_df_for_sums = pd.DataFrame(data_rows_prepared)
+            # Totales ya calculados por quien prepara la hoja (report_layout, sobre el ledger en columnas)
+            precomputed_sum_values = sheet_content.get("sum_values")
+            # Si no vienen, un DataFrame temporal solo para calcular sumas (aprovecha pandas para to_numeric)
+            temp_df_for_sums = pd.DataFrame(data_rows_prepared) if precomputed_sum_values is None else None
 
             for display_name in final_ordered_display_names:
                 if display_name == final_ordered_display_names[0] and final_ordered_display_names[0] in sum_row_values :
                     pass # Ya se puso "Total"
-                elif display_name in sum_display_names_for_sheet:
+                elif precomputed_sum_values is not None and display_name in precomputed_sum_values:
+                    sum_row_values[display_name] = f"{precomputed_sum_values[display_name]:.2f}"
+                elif display_name in sum_display_names_for_sheet and temp_df_for_sums is not None:
                     try:
                         # Extraer valores, manejar hipervínculos si existen
                         col_values = temp_df_for_sums[display_name].apply(lambda x: x[1][1] if isinstance(x, tuple) and x[0] == "HYPERLINK" else x)
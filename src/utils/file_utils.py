@@ -5,6 +5,8 @@ import zipfile
 import logging
 from typing import List, Tuple
 
+from src.core import xml_source
+
 logger = logging.getLogger(__name__)
 
 def cleanup_temp_folder(folder_path: str):
@@ -27,6 +29,8 @@ def create_zip_archive(files_to_add: List[Tuple[str, str]], zip_filepath: str) -
     Args:
         files_to_add: Una lista de tuplas, donde cada tupla contiene:
                       (ruta_completa_al_archivo, nombre_del_archivo_en_el_zip)
+                      La ruta puede ser un miembro de otro ZIP ("lote.zip!/clave.xml", ver
+                      src/core/xml_source.py): se copia sin extraerlo.
         zip_filepath: La ruta completa donde se guardará el archivo ZIP.
 
     Returns:
@@ -35,8 +39,8 @@ def create_zip_archive(files_to_add: List[Tuple[str, str]], zip_filepath: str) -
     try:
         with zipfile.ZipFile(zip_filepath, 'w', zipfile.ZIP_DEFLATED) as zipf:
             for file_path, arcname in files_to_add:
-                if os.path.exists(file_path):
-                    zipf.write(file_path, arcname)
+                if xml_source.exists(file_path):
+                    xml_source.add_to_zip(zipf, file_path, arcname)
                     logger.debug(f"Añadido al ZIP '{zip_filepath}': '{file_path}' como '{arcname}'")
                 else:
                     logger.warning(f"Archivo no encontrado, no se añadió al ZIP '{zip_filepath}': {file_path}")
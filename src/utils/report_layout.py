@@ -0,0 +1,344 @@
+# d:\Datos\Desktop\Asistente Contable\src\utils\report_layout.py
+import os
+import re
+import logging
+from typing import List, Optional, Dict, Any, Tuple, Callable, Mapping, Sequence
+
+from src.core import xml_parser, clave_acceso, date_utils, xml_source
+
+logger = logging.getLogger(__name__)
+
+# Definición del reporte (columnas, totales, hojas de Excel y carpetas del ZIP) compartida
+# por la GUI y el modo por lotes (src/cli.py).
+
+COLUMN_DEFINITIONS: Dict[str, Dict[str, Any]] = {
+    "FC": {"name": "Facturas", "coddoc": "01", "type": "received", "group": "received",
+           "headers": [
+               "No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial",
+               "TipoId.", "Id.Comprador", "Razón Social Comprador",
+               "Formas de Pago",
+                        "Descuento", "Total Sin Impuestos",
+                        "Base IVA 0%", "Base IVA 5%", "Base IVA 8%", "Base IVA 12%", "Base IVA 13%", "Base IVA 14%", "Base IVA 15%",
+                        "No Objeto IVA", "Exento IVA",
+               "Desc. Adicional",
+               "Devol. IVA",
+               "Monto IVA",
+               "Base ICE", "Monto ICE",
+               "Base IRBPNR", "Monto IRBPNR",
+               "Propina",
+               "Monto Total",
+               "Guia de Remisión",
+               "Primeros 3 Articulos",
+               "Nro de Autorización"
+           ],
+           "sum_cols": [
+               "Descuento", "Total Sin Impuestos",
+                        "Base IVA 0%", "Base IVA 5%", "Base IVA 8%", "Base IVA 12%", "Base IVA 13%", "Base IVA 14%", "Base IVA 15%",
+               "No Objeto IVA", "Exento IVA",
+               "Desc. Adicional", "Devol. IVA", "Monto IVA",
+               "Base ICE", "Monto ICE", "Base IRBPNR", "Monto IRBPNR",
+               "Propina", "Monto Total"
+           ]},
+    "ND_R": {"name": "N. Débito", "coddoc": "05", "type": "received", "group": "received",
+             "headers": ["No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial", "Total Sin Impuestos", "Monto IVA", "Monto Total", "Nro de Autorización"],
+             "sum_cols": ["Total Sin Impuestos", "Monto IVA", "Monto Total"]},
+    "NC_R": {"name": "N. Crédito", "coddoc": "04", "type": "received", "group": "received",
+             "headers": ["No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial",
+                         "TipoId.", "Id.Comprador", "Razón Social Comprador",
+                         "CodDoc",
+                         "Fecha D.M.", "CodDocMod", "Num.Doc.Modificado", "N.A.Doc.Modificado",
+                         "Valor Mod.",
+                         "Base IVA 0%", "Base IVA 5%", "Base IVA 8%", "Base IVA 12%", "Base IVA 13%", "Base IVA 14%", "Base IVA 15%",
+                         "No Objeto IVA", "Exento IVA", "Devol. IVA", "Monto IVA",
+                         "Base ICE", "Monto ICE", "Base IRBPNR", "Monto IRBPNR",
+                         "Monto Total", "Nro de Autorización"],
+             "sum_cols": ["Valor Mod.",
+                          "Base IVA 0%", "Base IVA 5%", "Base IVA 8%", "Base IVA 12%", "Base IVA 13%", "Base IVA 14%", "Base IVA 15%",
+                          "No Objeto IVA", "Exento IVA", "Devol. IVA", "Monto IVA",
+                          "Base ICE", "Monto ICE", "Base IRBPNR", "Monto IRBPNR",
+                          "Monto Total"]},
+    "RET_R": {"name": "Retenciones", "coddoc": "07", "type": "received", "group": "received",
+              "headers": ["No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial",
+                          "TipoId.", "Id.Sujeto Retenido", "Razón Social Sujeto Retenido",
+                          "Periodo Fiscal",
+                          "CodDocSust", "Fecha D.S.", "Num.Doc.Sustento", "Autorización Doc Sust.",
+                          "Tipo Impuesto Ret.", "Codigo Ret.", "Base Imponible Ret.", "Porcentaje Ret.", "Valor Retenido",
+                          "Ret. Renta Pres.", "Ret. IVA Pres.", "Total Ret. ISD",
+                          "Monto Total", "Nro de Autorización"],
+              "sum_cols": ["Base Imponible Ret.", "Valor Retenido",
+                           "Ret. Renta Pres.", "Ret. IVA Pres.", "Total Ret. ISD",
+                           "Monto Total"]},
+    "LC_R": {"name": "Liq. Compra", "coddoc": "03", "type": "received", "group": "received",
+             "headers": ["No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial", "Total Sin Impuestos", "Monto IVA", "Monto Total", "Nro de Autorización"],
+             "sum_cols": ["Total Sin Impuestos", "Monto IVA", "Monto Total"]},
+    "GR_R": {"name": "Guías Remisión", "coddoc": "06", "type": "received", "group": "received",
+           "headers": ["No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial", "Nro de Autorización"],
+           "sum_cols": []}
+}
+DOC_TYPE_ORDER = ["FC", "ND_R", "NC_R", "RET_R", "LC_R", "GR_R"]
+
+# Mapa para traducir nombres de cabecera de visualización a claves de datos internas
+HEADER_TO_DATA_KEY_MAP: Dict[str, Optional[str]] = {
+    "No.": None, # El "No." es generado, no es una clave de datos directa
+    "Fecha": "Fecha", "Fecha Emisión": "Fecha",
+    "Tipo Doc": "tipo_documento_display", # Generado al añadir la fila (MainWindow / cli)
+    "Nro Comprobante": "Nro.Secuencial", "Nro.Secuencial": "Nro.Secuencial",
+    "Nro de Autorización": "Nro de Autorización",
+    "RUC Emisor": "RUC Emisor", "Razón Social Emisor": "Razón Social Emisor",
+    "TipoId.": "TipoId.",
+    "Id.Comprador": "Id.Comprador", "ID Comprador": "Id.Comprador",
+    "Razón Social Comprador": "Razón Social Comprador",
+    "Id.Sujeto Retenido": "Id.Sujeto Retenido", "Razón Social Sujeto Retenido": "Razón Social Sujeto Retenido",
+    "Periodo Fiscal": "Periodo Fiscal",
+    "Fecha D.M.": "Fecha D.M.", "CodDocMod": "CodDocMod", "Num.Doc.Modificado": "Num.Doc.Modificado",
+    "N.A.Doc.Modificado": "N.A.Doc.Modificado", "Valor Mod.": "Valor Mod.",
+    "CodDocSust": "CodDocSust", "Fecha D.S.": "Fecha D.S.", "Num.Doc.Sustento": "Num.Doc.Sustento",
+    "Autorización Doc Sust.": "Autorización Doc Sust.",
+    "Tipo Impuesto Ret.": "Tipo Impuesto Ret.", "Codigo Ret.": "Codigo Ret.",
+    "Base Imponible Ret.": "Base Imponible Ret.", "Porcentaje Ret.": "Porcentaje Ret.", "Valor Retenido": "Valor Retenido",
+    # Las claves de IVA, ICE, IRBPNR, etc., suelen ser iguales al nombre de visualización si no están aquí
+    "Monto Total": "Monto Total", "Total": "Monto Total",
+}
+
+COLS_TO_EXCLUDE_FROM_VIEW = ["original_xml_path", "Formas de Pago"]
+
+_DESIRED_ORDER_PREFIX = ["No.", "Fecha", "RUC Emisor", "Razón Social Emisor", "Nro.Secuencial",
+                         "TipoId.", "Id.Comprador", "Razón Social Comprador",
+                         "Id.Sujeto Retenido", "Razón Social Sujeto Retenido", "Periodo Fiscal",
+                         "Fecha D.M.", "CodDocMod", "Num.Doc.Modificado", "N.A.Doc.Modificado", "Valor Mod.",
+                         "CodDocSust", "Fecha D.S.", "Num.Doc.Sustento", "Autorización Doc Sust.", "Tipo Impuesto Ret.", "Codigo Ret." ]
+_DESIRED_ORDER_SUFFIX = ["Primeros 3 Articulos", "Nro de Autorización"]
+_OTHER_HEADERS = [
+    h for h in xml_parser.ALL_CSV_FIELDS
+    if h not in _DESIRED_ORDER_PREFIX
+    and h not in _DESIRED_ORDER_SUFFIX
+]
+HEADER_ORDER_MAP: Dict[str, int] = {
+    name: i for i, name in enumerate(_DESIRED_ORDER_PREFIX + sorted(_OTHER_HEADERS) + _DESIRED_ORDER_SUFFIX)
+}
+
+# --- Exportación ZIP ---
+# Mapping for month numbers to Spanish names for folder creation
+MONTH_NAMES_SPANISH = {
+    1: "ENERO", 2: "FEBRERO", 3: "MARZO", 4: "ABRIL", 5: "MAYO", 6: "JUNIO",
+    7: "JULIO", 8: "AGOSTO", 9: "SEPTIEMBRE", 10: "OCTUBRE", 11: "NOVIEMBRE", 12: "DICIEMBRE"
+}
+
+ZIP_DOC_TYPE_FOLDER_NAMES = {
+    "01": "FACTURAS DE COMPRA", "04": "NOTAS DE CREDITO RECIBIDAS", "07": "RETENCIONES RECIBIDAS",
+    "03": "LIQUIDACIONES DE COMPRA", "06": "GUIAS DE REMISION RECIBIDAS", "05": "NOTAS DE DEBITO RECIBIDAS"
+}
+
+# Tipos de exportación ZIP (ver ExportTypeSelectionDialog)
+ZIP_EXPORT_TYPES = ["pdf_xml_by_type", "pdf_xml_by_date", "pdf_only_by_date"]
+
+# Regex to clean up folder names
+FOLDER_NAME_CLEAN_REGEX = re.compile(r'[^\w\s-]') # Keep alphanumeric, space, hyphen
+SPACE_HYPHEN_NORM_REGEX = re.compile(r'[-\s]+') # Replace multiple spaces/hyphens with a single space
+
+
+def is_value_significant_for_display(value: Any) -> bool:
+    """
+    Determina si un valor es 'significativo' para la visualización o exportación.
+    Un valor no es significativo si es None, una cadena vacía/espacios en blanco,
+    o una colección vacía. Los números (incluido el 0) se consideran significativos.
+    """
+    if value is None:
+        return False
+    if isinstance(value, str) and not value.strip():
+        return False
+    return True
+
+
+def data_key_for_header(header_name: str) -> Optional[str]:
+    return HEADER_TO_DATA_KEY_MAP.get(header_name, header_name)
+
+
+def get_rows_for_doc_key(data_by_coddoc: Mapping[str, Any], doc_key: str) -> Sequence:
+    doc_info = COLUMN_DEFINITIONS.get(doc_key)
+    if not doc_info: return []
+    return data_by_coddoc.get(doc_info["coddoc"], [])
+
+
+def get_display_headers_for_doc_type(doc_key: str, data_rows: Sequence, include_no_column: bool = True,
+                                     has_data_for_key: Optional[Callable[[str], bool]] = None) -> List[str]:
+    """
+    Columnas a mostrar/exportar para un tipo de documento: solo las que tienen algún valor
+    significativo, en el orden de HEADER_ORDER_MAP y con "No." al inicio.
+    Si se pasa `has_data_for_key`, se usa en lugar de recorrer `data_rows`.
+    """
+    doc_definition = COLUMN_DEFINITIONS.get(doc_key)
+    if not doc_definition:
+        return []
+
+    base_headers_for_doc_type = [h for h in doc_definition.get("headers", []) if h != "No."]
+    headers_with_data = []
+
+    if data_rows:
+        for header_name in base_headers_for_doc_type:
+            if header_name in COLS_TO_EXCLUDE_FROM_VIEW:
+                continue
+
+            data_key_for_check = data_key_for_header(header_name)
+            if has_data_for_key is not None:
+                # El modelo de la tabla ya sabe qué columnas tienen datos (calculado al añadir filas)
+                has_data = has_data_for_key(data_key_for_check)
+            else:
+                has_data = any(
+                    is_value_significant_for_display(row_data.get(data_key_for_check))
+                    for row_data in data_rows
+                )
+            if has_data:
+                headers_with_data.append(header_name)
+
+    if doc_key == "RET_R" and "Primeros 3 Articulos" in headers_with_data:
+        headers_with_data.remove("Primeros 3 Articulos")
+
+    sorted_headers_with_data = sorted(
+        headers_with_data,
+        key=lambda h: HEADER_ORDER_MAP.get(h, len(HEADER_ORDER_MAP))
+    )
+
+    final_display_headers = []
+    if include_no_column and data_rows and headers_with_data:
+        final_display_headers.append("No.")
+    final_display_headers.extend(sorted_headers_with_data)
+
+    return final_display_headers
+
+
+def build_excel_sheets(data_by_coddoc: Mapping[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Prepara el argumento `data_by_sheet` de exporter.export_to_excel: una hoja por tipo de
+    documento con datos, en el orden de DOC_TYPE_ORDER. La columna "No." enlaza al PDF
+    respaldado cuando existe.
+    `data_by_coddoc` es un report_ledger.ReportLedger: las columnas, las columnas con datos y
+    los totales se leen del ledger sin recorrer fila por fila.
+    """
+    data_by_sheet_to_export: Dict[str, Dict[str, Any]] = {}
+    for doc_key in DOC_TYPE_ORDER:
+        doc_definition = COLUMN_DEFINITIONS.get(doc_key)
+        if not doc_definition: continue
+        data_for_this_sheet = get_rows_for_doc_key(data_by_coddoc, doc_key)
+        if not data_for_this_sheet: continue
+        final_display_headers_excel = get_display_headers_for_doc_type(
+            doc_key, data_for_this_sheet, include_no_column=True, has_data_for_key=data_for_this_sheet.has_significant_data)
+
+        sheet_name_base = doc_definition.get("name", f"Reporte_{doc_key}")[:31].strip()
+        sheet_name = sheet_name_base; count = 1
+        while sheet_name in data_by_sheet_to_export:
+            sheet_name = f"{sheet_name_base[:28]}_{count}"
+            if len(sheet_name) > 31: sheet_name = sheet_name[:31]
+            count += 1
+        sum_display_names_for_sheet = doc_definition.get("sum_cols", [])
+        doc_key_prefix_for_no = doc_key[:2].upper() if doc_key else "N"
+        value_columns = [(display_name, data_for_this_sheet.column(data_key_for_header(display_name)))
+                         for display_name in final_display_headers_excel if display_name != "No."]
+        backup_pdf_paths = data_for_this_sheet.column('backup_pdf_path')
+        prepared_data_for_excel_sheet = []
+        for i, backup_pdf_path in enumerate(backup_pdf_paths):
+            row_for_excel = {}
+            if "No." in final_display_headers_excel:
+                no_value_display = f"{doc_key_prefix_for_no}{i + 1}"
+                if backup_pdf_path and os.path.exists(backup_pdf_path):
+                    excel_link_url = f"external:{os.path.normpath(backup_pdf_path)}"
+                    row_for_excel["No."] = ("HYPERLINK", (excel_link_url, no_value_display))
+                else:
+                    row_for_excel["No."] = no_value_display
+            for display_name, column_values in value_columns:
+                row_for_excel[display_name] = column_values[i]
+            prepared_data_for_excel_sheet.append(row_for_excel)
+        data_by_sheet_to_export[sheet_name] = {
+            "data": prepared_data_for_excel_sheet,
+            "sum_display_names": sum_display_names_for_sheet,
+            # Totales ya calculados sobre las columnas del ledger (el exportador no los recalcula)
+            "sum_values": {display_name: data_for_this_sheet.column_sum(data_key_for_header(display_name))
+                           for display_name in sum_display_names_for_sheet if display_name in final_display_headers_excel},
+            "doc_key_prefix": doc_key_prefix_for_no,
+            "doc_key_original": doc_key,
+            "final_ordered_display_names": final_display_headers_excel
+        }
+    return data_by_sheet_to_export
+
+
+def _zip_doc_type_folder(cod_doc: str) -> str:
+    doc_type_subfolder_base = ZIP_DOC_TYPE_FOLDER_NAMES.get(cod_doc)
+    if not doc_type_subfolder_base:
+        temp_name = xml_parser.COD_DOC_MAP.get(cod_doc, f"Tipo {cod_doc}").upper()
+        temp_name = FOLDER_NAME_CLEAN_REGEX.sub('', temp_name).strip()
+        doc_type_subfolder_base = SPACE_HYPHEN_NORM_REGEX.sub(' ', temp_name)
+        if "RECIBIDAS" not in doc_type_subfolder_base.upper() and "RECIBIDA" not in doc_type_subfolder_base.upper():
+            doc_type_subfolder_base += " RECIBIDAS"
+    if not doc_type_subfolder_base: doc_type_subfolder_base = f"Tipo_{cod_doc}_RECIBIDAS"
+    return doc_type_subfolder_base
+
+
+def _zip_year_month_folder(fecha_autorizacion_str: Optional[str], xml_path: str) -> str:
+    date_obj = None
+    if fecha_autorizacion_str:
+        # Misma fecha ya parseada (memorizada) al leer el XML; si trae una hora no reconocida, basta la parte de fecha
+        date_obj = date_utils.parse_fecha(fecha_autorizacion_str) or date_utils.parse_fecha(fecha_autorizacion_str.split('T')[0])
+        if date_obj is None:
+            logger.warning(f"  - Error parseando fechaAutorizacion '{fecha_autorizacion_str}' para {os.path.basename(xml_path)} para exportación por fecha.")
+    if date_obj is None:
+        # Sin fecha de autorización utilizable: fecha de emisión de la clave de acceso del nombre
+        clave = clave_acceso.decode(clave_acceso.clave_acceso_from_filename(xml_path))
+        if clave and clave.valida:
+            date_obj = clave.fecha_emision
+    if date_obj is None:
+        return "Fecha Desconocida"
+    month_name = MONTH_NAMES_SPANISH.get(date_obj.month, f"Mes_{date_obj.month}")
+    return os.path.join(str(date_obj.year), month_name)
+
+
+def build_zip_entries(xml_to_pdf_map: Mapping[str, Tuple[Optional[str], Optional[str], Optional[str]]],
+                      data_by_coddoc: Mapping[str, Any],
+                      export_type: str) -> List[Tuple[str, str]]:
+    """
+    Lista de (ruta del archivo, nombre dentro del ZIP) para file_utils.create_zip_archive.
+    Organiza los archivos por tipo de documento y, en los tipos "*_by_date", por año/mes
+    de autorización. Prefiere el PDF respaldado sobre el temporal.
+    `data_by_coddoc` es un report_ledger.ReportLedger; solo se leen dos de sus columnas.
+    """
+    fecha_autorizacion_by_xml_path: Dict[str, Optional[str]] = {}
+    for rows in data_by_coddoc.values():
+        for original_xml_path, fecha_autorizacion in zip(rows.column("original_xml_path"), rows.column("fechaAutorizacion")):
+            if original_xml_path:
+                fecha_autorizacion_by_xml_path[original_xml_path] = fecha_autorizacion
+
+    files_to_add_to_zip: List[Tuple[str, str]] = []
+    for xml_path, (temp_pdf_path, cod_doc, backup_pdf_path) in xml_to_pdf_map.items():
+        logger.debug(f"Procesando para ZIP: XML={os.path.basename(xml_path)}, TempPDF={os.path.basename(temp_pdf_path) if temp_pdf_path else 'N/A'}, BackupPDF={os.path.basename(backup_pdf_path) if backup_pdf_path else 'N/A'}")
+        try:
+            if not cod_doc:
+                logger.warning(f"  - No se pudo obtener cod_doc para {os.path.basename(xml_path)}. Omitiendo.")
+                continue
+            if (export_type.endswith("_by_date") and xml_path not in fecha_autorizacion_by_xml_path
+                    and not clave_acceso.is_valid(clave_acceso.clave_acceso_from_filename(xml_path))):
+                logger.warning(f"  - No se encontraron datos (row_data) para {os.path.basename(xml_path)} para exportación por fecha. Omitiendo.")
+                continue
+
+            doc_type_subfolder_base = _zip_doc_type_folder(cod_doc)
+            final_subfolder_path_in_zip = doc_type_subfolder_base
+            if export_type.endswith("_by_date"):
+                year_month_folder = _zip_year_month_folder(fecha_autorizacion_by_xml_path.get(xml_path), xml_path)
+                final_subfolder_path_in_zip = os.path.join(doc_type_subfolder_base, year_month_folder)
+
+            logger.debug(f"  - Subcarpeta en ZIP: {final_subfolder_path_in_zip}")
+            include_xml = export_type.startswith("pdf_xml_")
+            pdf_source_path = backup_pdf_path if backup_pdf_path and os.path.exists(backup_pdf_path) else (temp_pdf_path if temp_pdf_path and os.path.exists(temp_pdf_path) else None)
+
+            if include_xml:
+                if xml_source.exists(xml_path): # También miembros de un ZIP de origen
+                    arcname_xml = os.path.join(final_subfolder_path_in_zip, os.path.basename(xml_path))
+                    files_to_add_to_zip.append((xml_path, arcname_xml))
+                    logger.debug(f"  - Añadido XML: {arcname_xml}")
+                else: logger.warning(f"  - XML no encontrado: {xml_path}")
+
+            if pdf_source_path:
+                arcname_pdf = os.path.join(final_subfolder_path_in_zip, os.path.basename(pdf_source_path))
+                files_to_add_to_zip.append((pdf_source_path, arcname_pdf))
+                logger.debug(f"  - Añadido PDF: {arcname_pdf}")
+            else: logger.warning(f"  - PDF (temporal o respaldo) no encontrado para {os.path.basename(xml_path)}. No se añadió PDF al ZIP.")
+        except Exception as e: logger.error(f"Error procesando archivo {os.path.basename(xml_path)} para ZIP: {e}")
+    return files_to_add_to_zip
@@ -0,0 +1,308 @@
+# d:\Datos\Desktop\Asistente Contable\src\utils\report_ledger.py
+import logging
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from src.core import xml_parser
+from src.utils.report_layout import is_value_significant_for_display
+
+logger = logging.getLogger(__name__)
+
+# Filas del reporte guardadas en columnas por tipo de documento (GUI y src/cli.py): montos en
+# arreglos float64 (NumPy o array('d')), el resto en listas con los textos repetidos compartidos.
+# Lo que no encaja en su columna se guarda aparte por fila, para reconstruirla tal cual llegó.
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Columnas monetarias de row_data (xml_parser.extract_data_from_xml): float, o '' en
+# "No Objeto IVA", "Exento IVA" y "Desc. Adicional" cuando el comprobante no las tiene.
+# "Tipo Impuesto Ret." y "Codigo Ret." no: empiezan en 0.0 y en Retenciones pasan a texto.
+FLOAT_COLUMNS: Tuple[str, ...] = (
+    "Descuento", "Total Sin Impuestos", "Valor Mod.",
+    "Base Imponible Ret.", "Porcentaje Ret.", "Valor Retenido",
+    "Base IVA 0%", "Base IVA 5%", "Base IVA 8%", "Base IVA 12%", "Base IVA 13%", "Base IVA 14%", "Base IVA 15%",
+    "No Objeto IVA", "Exento IVA", "Desc. Adicional", "Devol. IVA", "Monto IVA",
+    "Base ICE", "Monto ICE", "Base IRBPNR", "Monto IRBPNR",
+    "Propina", "Ret. IVA Pres.", "Ret. Renta Pres.", "Total Ret. ISD", "Monto Total",
+)
+
+# Resto de claves conocidas de una fila (las añadidas por worker_tasks, MainWindow y cli incluidas)
+OBJECT_COLUMNS: Tuple[str, ...] = tuple(
+    key for key in dict.fromkeys(xml_parser.ALL_CSV_FIELDS + [
+        "Formas de Pago", "fechaAutorizacion", "tipo_documento_display", "backup_pdf_path"])
+    if key not in FLOAT_COLUMNS
+)
+
+# Columnas de texto con pocos valores distintos: cada texto se guarda una sola vez por reporte
+POOLED_COLUMNS = frozenset([
+    "CodDoc", "Fecha", "RUC Emisor", "Razón Social Emisor", "TipoId.", "Id.Comprador", "Razón Social Comprador",
+    "Id.Sujeto Retenido", "Razón Social Sujeto Retenido", "Periodo Fiscal", "Fecha D.M.", "CodDocMod",
+    "CodDocSust", "Fecha D.S.", "Tipo Impuesto Ret.", "Codigo Ret.", "Formas de Pago", "tipo_documento_display",
+])
+
+AUTORIZACION_KEY = "Nro de Autorización"
+
+_INITIAL_CAPACITY = 256
+
+# Marca de "clave ausente en la fila" (distinta de None, que es un valor válido)
+_MISSING = object()
+# En las columnas float, NaN representa la celda '' (un NaN real del XML va al desborde de la fila)
+_BLANK = float('nan')
+
+
+def to_float_for_sum(value: Any) -> Optional[float]:
+    """Valor numérico de una celda para los totales; None si no aporta (vacío o no numérico)."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        cleaned_value_str = value.replace(',', '.').strip()
+        if cleaned_value_str:
+            try:
+                return float(cleaned_value_str)
+            except ValueError:
+                return None
+    return None
+
+
+class LedgerRow(Mapping):
+    """Vista de solo lectura de una fila del ledger, con acceso tipo dict."""
+    __slots__ = ('_ledger', '_index')
+
+    def __init__(self, ledger: "DocumentLedger", index: int):
+        self._ledger = ledger
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._ledger.value(self._index, key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._ledger.value(self._index, key, default)
+
+    def __iter__(self) -> Iterator[str]:
+        return self._ledger.row_keys(self._index)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"LedgerRow({dict(self)!r})"
+
+
+class DocumentLedger(Sequence):
+    """
+    Filas de un tipo de documento, en columnas. Es una secuencia de LedgerRow (vistas tipo dict),
+    pero la tabla y las exportaciones leen directamente con value(), column() y column_sum().
+    """
+
+    def __init__(self, string_pool: Optional[Dict[str, str]] = None):
+        self._size = 0
+        self._capacity = _INITIAL_CAPACITY
+        if NUMPY_AVAILABLE:
+            self._floats = {key: np.zeros(self._capacity, dtype=np.float64) for key in FLOAT_COLUMNS}
+        else:
+            self._floats = {key: array('d') for key in FLOAT_COLUMNS}
+        self._objects: Dict[str, List[Any]] = {key: [] for key in OBJECT_COLUMNS}
+        # Por fila: valores que no caben en su columna y claves fuera del esquema
+        self._overflow: Dict[int, Dict[str, Any]] = {}
+        self._significant_keys: Set[str] = set()
+        self._string_pool: Dict[str, str] = string_pool if string_pool is not None else {}
+        self._index_by_autorizacion: Dict[str, int] = {}
+
+    # --- Escritura ---
+
+    def append(self, row_data: Mapping) -> int:
+        """Copia los valores de `row_data` en las columnas. Devuelve el índice de la fila."""
+        index = self._size
+        if NUMPY_AVAILABLE and index == self._capacity:
+            self._grow()
+        overflow: Dict[str, Any] = {}
+        significant_keys = self._significant_keys
+
+        for key, column in self._floats.items():
+            value = row_data.get(key, _MISSING)
+            if type(value) is float and value == value:
+                if key not in significant_keys:
+                    significant_keys.add(key)
+            elif type(value) is str and not value:
+                value = _BLANK
+            else:
+                # int, texto, None, NaN o ausente: se conserva tal cual y la columna guarda su valor para sumas
+                overflow[key] = value
+                if value is not _MISSING and key not in significant_keys and is_value_significant_for_display(value):
+                    significant_keys.add(key)
+                value = to_float_for_sum(value)
+                if value is None or value != value:
+                    value = 0.0
+            if NUMPY_AVAILABLE:
+                column[index] = value
+            else:
+                column.append(value)
+
+        string_pool = self._string_pool
+        for key, column in self._objects.items():
+            value = row_data.get(key, _MISSING)
+            if value is not _MISSING:
+                if type(value) is str and key in POOLED_COLUMNS:
+                    value = string_pool.setdefault(value, value)
+                if key not in significant_keys and is_value_significant_for_display(value):
+                    significant_keys.add(key)
+            column.append(value)
+
+        for key, value in row_data.items():
+            if key not in self._floats and key not in self._objects:
+                overflow[key] = value
+                if key not in significant_keys and is_value_significant_for_display(value):
+                    significant_keys.add(key)
+        if overflow:
+            self._overflow[index] = overflow
+
+        numero_autorizacion = row_data.get(AUTORIZACION_KEY)
+        if numero_autorizacion:
+            self._index_by_autorizacion[numero_autorizacion] = index
+        self._size = index + 1
+        return index
+
+    def _grow(self):
+        self._capacity *= 2
+        for key, column in self._floats.items():
+            grown_column = np.zeros(self._capacity, dtype=np.float64)
+            grown_column[:self._size] = column[:self._size]
+            self._floats[key] = grown_column
+
+    # --- Lectura ---
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [LedgerRow(self, i) for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("fila fuera de rango")
+        return LedgerRow(self, index)
+
+    def value(self, row: int, key: str, default: Any = None) -> Any:
+        """Valor de una celda (como dict.get sobre la fila original)."""
+        overflow = self._overflow.get(row)
+        if overflow is not None and key in overflow:
+            value = overflow[key]
+            return default if value is _MISSING else value
+        column = self._floats.get(key)
+        if column is not None:
+            value = float(column[row])
+            return '' if value != value else value
+        column = self._objects.get(key)
+        if column is not None:
+            value = column[row]
+            return default if value is _MISSING else value
+        return default
+
+    def row_keys(self, row: int) -> Iterator[str]:
+        overflow = self._overflow.get(row, {})
+        for key in FLOAT_COLUMNS:
+            if overflow.get(key) is not _MISSING:
+                yield key
+        for key, column in self._objects.items():
+            if column[row] is not _MISSING:
+                yield key
+        for key, value in overflow.items():
+            if key not in self._floats and key not in self._objects:
+                yield key
+
+    def column(self, key: str) -> List[Any]:
+        """Valores de una columna para todas las filas (None donde la fila no tiene la clave)."""
+        if key in self._floats:
+            # tolist() devuelve float de Python (no np.float64), igual que array('d')
+            column_values = ['' if value != value else value for value in self._floats[key][:self._size].tolist()]
+        elif key in self._objects:
+            column_values = [None if value is _MISSING else value for value in self._objects[key]]
+        else:
+            column_values = [None] * self._size
+        for row, overflow in self._overflow.items():
+            if key in overflow:
+                value = overflow[key]
+                column_values[row] = None if value is _MISSING else value
+        return column_values
+
+    def column_sum(self, key: str, start: int = 0, stop: Optional[int] = None) -> float:
+        """Suma de las celdas numéricas de una columna en las filas [start, stop)."""
+        stop = self._size if stop is None else min(stop, self._size)
+        column = self._floats.get(key)
+        if column is not None:
+            # Las celdas '' (NaN) no suman
+            if NUMPY_AVAILABLE:
+                return float(np.nansum(column[start:stop]))
+            return sum(value for value in column[start:stop] if value == value)
+        total = 0.0
+        for row in range(start, stop):
+            value_float = to_float_for_sum(self.value(row, key))
+            if value_float is not None:
+                total += value_float
+        return total
+
+    def has_significant_data(self, key: str) -> bool:
+        """True si alguna fila tiene un valor significativo en `key` (ver is_value_significant_for_display)."""
+        return key in self._significant_keys
+
+    def row_for_autorizacion(self, numero_autorizacion: str) -> Optional[int]:
+        return self._index_by_autorizacion.get(numero_autorizacion)
+
+
+class ReportLedger(Mapping):
+    """
+    Filas del reporte agrupadas por cod_doc: {cod_doc: DocumentLedger}.
+    Sustituye al antiguo defaultdict(list) de dicts (MainWindow.all_data_by_coddoc y src/cli.py).
+    """
+
+    def __init__(self):
+        self._ledgers: Dict[str, DocumentLedger] = {}
+        self._string_pool: Dict[str, str] = {}
+        self._cod_doc_by_autorizacion: Dict[str, str] = {}
+
+    def append(self, cod_doc: str, row_data: Mapping) -> bool:
+        """
+        Añade una fila al tipo de documento `cod_doc`. Devuelve False (sin añadirla) si ya hay
+        una fila con el mismo Nro de Autorización.
+        """
+        numero_autorizacion = row_data.get(AUTORIZACION_KEY)
+        if numero_autorizacion and numero_autorizacion in self._cod_doc_by_autorizacion:
+            logger.debug(f"Fila duplicada omitida en el reporte: {numero_autorizacion}")
+            return False
+        ledger = self._ledgers.get(cod_doc)
+        if ledger is None:
+            ledger = self._ledgers[cod_doc] = DocumentLedger(self._string_pool)
+        ledger.append(row_data)
+        if numero_autorizacion:
+            self._cod_doc_by_autorizacion[numero_autorizacion] = cod_doc
+        return True
+
+    def locate(self, numero_autorizacion: str) -> Optional[Tuple[str, int]]:
+        """(cod_doc, fila) del comprobante con ese Nro de Autorización, o None."""
+        cod_doc = self._cod_doc_by_autorizacion.get(numero_autorizacion)
+        if cod_doc is None:
+            return None
+        return cod_doc, self._ledgers[cod_doc].row_for_autorizacion(numero_autorizacion)
+
+    def clear(self):
+        self._ledgers.clear()
+        self._string_pool.clear()
+        self._cod_doc_by_autorizacion.clear()
+
+    def __getitem__(self, cod_doc: str) -> DocumentLedger:
+        return self._ledgers[cod_doc]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ledgers)
+
+    def __len__(self) -> int:
+        return len(self._ledgers)